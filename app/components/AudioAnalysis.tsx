@@ -1,14 +1,17 @@
 "use client";
 import React from "react";
+import type { AudioAnalysisResult } from "@/lib/hooks/useAudioProcessor";
 
 interface AnalysisProps {
-  data: {
-    tempo: number;
-    key: string;
-    pitch: string | null;
-  };
+  data: AudioAnalysisResult;
 }
 
+// แสดงค่าความมั่นใจเป็นเปอร์เซ็นต์ (เฉพาะผลจากโหมด fast)
+const ConfidenceLabel: React.FC<{ value?: number }> = ({ value }) =>
+  value === undefined ? null : (
+    <p className="mt-1 text-xs text-[#8E8E8E]">ความมั่นใจ {Math.round(value * 100)}%</p>
+  );
+
 // การ์ดแสดงผลวิเคราะห์เสียงที่ backend ส่งกลับมา เช่น tempo, key และ pitch
 const AudioAnalysis: React.FC<AnalysisProps> = ({ data }) => {
   return (
@@ -21,14 +24,17 @@ const AudioAnalysis: React.FC<AnalysisProps> = ({ data }) => {
         <div className="rounded-lg bg-[#1E1B18] p-3 border border-[#2C2824]">
           <p className="text-xs uppercase tracking-wide text-[#A78BFA]">Tempo</p>
           <p className="text-xl font-semibold">{Math.round(data.tempo)} BPM</p>
+          <ConfidenceLabel value={data.confidence?.tempo} />
         </div>
         <div className="rounded-lg bg-[#1E1B18] p-3 border border-[#2C2824]">
           <p className="text-xs uppercase tracking-wide text-[#A78BFA]">Key</p>
           <p className="text-xl font-semibold">{data.key}</p>
+          <ConfidenceLabel value={data.confidence?.key} />
         </div>
         <div className="rounded-lg bg-[#1E1B18] p-3 border border-[#2C2824]">
           <p className="text-xs uppercase tracking-wide text-[#A78BFA]">Pitch</p>
           <p className="text-xl font-semibold">{data.pitch || "-"}</p>
+          <ConfidenceLabel value={data.confidence?.pitch} />
         </div>
       </div>
     </div>
@@ -0,0 +1,211 @@
+"""
+
+- front-end สำหรับวิเคราะห์เสียงแบบ decode ครั้งเดียวและทำ spectral transform ครั้งเดียว
+- intermediate ที่ใช้ร่วมกัน: สัญญาณที่ decode แล้ว, STFT magnitude, onset strength และ pseudo-CQT ที่สร้างจาก STFT
+- feature ทั้งหมด (tempo, pitch, key, spectral centroid, RMS/LUFS, waveform overview) คำนวณจาก intermediate เหล่านี้
+"""
+
+import warnings
+from functools import lru_cache
+
+import librosa
+import numpy as np
+import pyloudnorm as pyln
+
+from backend.config import ANALYSIS_SAMPLE_RATE
+
+ANALYSIS_N_FFT = 4096
+ANALYSIS_HOP_LENGTH = 512
+ANALYSIS_N_MELS = 128
+# pseudo-CQT: 12 bin ต่อ octave ตั้งแต่ C2 ขึ้นไป 6 octave (ครอบคลุมช่วง pitch C2-C7 ของ yin เดิม)
+CQT_FMIN_NOTE = "C2"
+CQT_BINS_PER_OCTAVE = 12
+CQT_OCTAVES = 6
+PITCH_HARMONICS = 4
+PITCH_FMIN_NOTE = "C2"
+PITCH_FMAX_NOTE = "C7"
+# เฟรมที่เบากว่า peak เกินค่านี้ไม่นำมาประมาณ pitch (ช่วงเงียบ/หางเสียง)
+PITCH_ENERGY_GATE_DB = 40.0
+WAVEFORM_OVERVIEW_POINTS = 256
+
+# โปรไฟล์มาตรฐานของคีย์ major/minor (Krumhansl) ใช้เป็นแม่แบบสำหรับเทียบกับ chroma ของเพลง
+KEY_PROFILE_MAJOR = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+KEY_PROFILE_MINOR = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+# รายชื่อโน้ต 12 ตัวในหนึ่ง octave
+KEY_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+
+
+def estimate_key(chroma_mean: np.ndarray) -> tuple[str, np.ndarray]:
+    """เดาคีย์จาก chroma เฉลี่ย คืนชื่อคีย์และ profile (หมุนแล้ว) ของคีย์ที่เลือก"""
+    # เลื่อน profile ไปทีละตำแหน่งเพื่อจำลองทุกคีย์ แล้ววัดความคล้ายกับ chroma ของเพลง
+    maj_scores = [np.correlate(chroma_mean, np.roll(KEY_PROFILE_MAJOR, i))[0] for i in range(12)]
+    min_scores = [np.correlate(chroma_mean, np.roll(KEY_PROFILE_MINOR, i))[0] for i in range(12)]
+
+    # เลือกคีย์ major และ minor ที่ได้คะแนนสูงสุด
+    maj_idx = int(np.argmax(maj_scores))
+    min_idx = int(np.argmax(min_scores))
+
+    # เลือก key จาก profile ที่ได้คะแนน correlation สูงกว่า
+    if maj_scores[maj_idx] >= min_scores[min_idx]:
+        return f"{KEY_NAMES[maj_idx]} major", np.roll(KEY_PROFILE_MAJOR, maj_idx)
+    return f"{KEY_NAMES[min_idx]} minor", np.roll(KEY_PROFILE_MINOR, min_idx)
+
+
+def key_from_chroma(chroma_mean: np.ndarray) -> tuple[str, float]:
+    """คีย์ + confidence (Pearson correlation ระหว่าง chroma เฉลี่ยกับ profile ของคีย์ที่เลือก ตัดให้อยู่ใน 0..1)"""
+    key, profile = estimate_key(chroma_mean)
+    if np.std(chroma_mean) == 0:
+        return key, 0.0
+    return key, float(np.clip(np.corrcoef(chroma_mean, profile)[0, 1], 0.0, 1.0))
+
+
+def tempo_from_onset(onset_env: np.ndarray, sr: int, hop_length: int) -> tuple[float, float]:
+    """tempo + ความชัดของ pulse (autocorrelation ของ onset envelope ที่ lag ของ tempo, 0..1)"""
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=FutureWarning)
+        tempo = float(librosa.beat.tempo(onset_envelope=onset_env, sr=sr, hop_length=hop_length)[0])
+    autocorr = librosa.autocorrelate(onset_env - onset_env.mean())
+    lag = int(round(60.0 * sr / (hop_length * max(tempo, 1e-6))))
+    clarity = float(autocorr[lag] / autocorr[0]) if autocorr[0] > 0 and lag < autocorr.size else 0.0
+    return tempo, float(np.clip(clarity, 0.0, 1.0))
+
+
+def pitch_from_f0(f0: np.ndarray) -> tuple[str | None, float]:
+    """โน้ตจากค่ากลางของ f0 + confidence (สัดส่วนเฟรมที่อยู่ในระยะ ±1 semitone จากค่ากลาง)"""
+    f0 = np.asarray(f0, dtype=np.float64)
+    f0 = f0[np.isfinite(f0) & (f0 > 0)]
+    if not f0.size:
+        return None, 0.0
+    # ใช้ค่ากลางของ pitch เพื่อลดผลกระทบจากโน้ตสั้นหรือเสียงรบกวนบางช่วง
+    pitch_hz = float(np.median(f0))
+    stable = np.abs(12.0 * np.log2(f0 / pitch_hz)) <= 1.0
+    return librosa.hz_to_note(pitch_hz), float(np.mean(stable))
+
+
+@lru_cache(maxsize=8)
+def _pseudo_cqt_basis(sr: int, n_fft: int) -> np.ndarray:
+    # กระจายพลังงานของแต่ละ STFT bin ไปยัง CQT bin สองตัวที่ใกล้ที่สุด (interpolate บนสเกล log ความถี่)
+    n_bins = CQT_BINS_PER_OCTAVE * CQT_OCTAVES
+    fmin = librosa.note_to_hz(CQT_FMIN_NOTE)
+    freqs = np.fft.rfftfreq(n_fft, d=1.0 / sr)
+    basis = np.zeros((n_bins, freqs.size), dtype=np.float32)
+    valid = freqs > 0
+    position = np.full(freqs.shape, -1.0)
+    position[valid] = CQT_BINS_PER_OCTAVE * np.log2(freqs[valid] / fmin)
+    for fft_bin in np.flatnonzero((position > -1.0) & (position < n_bins)):
+        lower = int(np.floor(position[fft_bin]))
+        frac = position[fft_bin] - lower
+        if lower >= 0:
+            basis[lower, fft_bin] += 1.0 - frac
+        if lower + 1 < n_bins:
+            basis[lower + 1, fft_bin] += frac
+    basis.setflags(write=False)
+    return basis
+
+
+class FeatureFrontEnd:
+    """intermediate ร่วมของการวิเคราะห์: decode ครั้งเดียวที่ sr แล้วคำนวณ STFT/onset/pseudo-CQT ครั้งเดียว"""
+
+    def __init__(self, channels: np.ndarray, sr: int) -> None:
+        self.sr = int(sr)
+        self.channels = np.atleast_2d(np.asarray(channels, dtype=np.float32))
+        self.mono = self.channels.mean(axis=0)
+        self.hop_length = ANALYSIS_HOP_LENGTH
+        self.magnitude = np.abs(librosa.stft(self.mono, n_fft=ANALYSIS_N_FFT, hop_length=self.hop_length))
+        power = self.magnitude**2
+        mel_db = librosa.power_to_db(
+            librosa.feature.melspectrogram(S=power, sr=self.sr, n_mels=ANALYSIS_N_MELS), ref=np.max
+        )
+        self.onset_envelope = librosa.onset.onset_strength(S=mel_db, sr=self.sr, hop_length=self.hop_length)
+        self.cqt = _pseudo_cqt_basis(self.sr, ANALYSIS_N_FFT) @ self.magnitude
+
+    @classmethod
+    def from_file(cls, input_path: str, sr: int = ANALYSIS_SAMPLE_RATE) -> "FeatureFrontEnd":
+        # decode + resample ครั้งเดียว (เก็บทุก channel ไว้วัด LUFS ส่วน feature อื่นใช้ mono)
+        channels, sample_rate = librosa.load(input_path, sr=sr, mono=False)
+        return cls(channels, sample_rate)
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.channels.shape[1] / float(self.sr)
+
+    def tempo(self) -> tuple[float, float]:
+        return tempo_from_onset(self.onset_envelope, self.sr, self.hop_length)
+
+    def key(self) -> tuple[str, float]:
+        # พับ pseudo-CQT เป็น chroma (bin 0 = C)
+        chroma = self.cqt.reshape(CQT_OCTAVES, CQT_BINS_PER_OCTAVE, -1).sum(axis=0)
+        chroma = chroma / np.maximum(chroma.max(axis=0, keepdims=True), 1e-10)
+        return key_from_chroma(chroma.mean(axis=1))
+
+    def pitch(self) -> tuple[str | None, float]:
+        # harmonic summation บน pseudo-CQT: bin ที่ harmonic 1..N รวมกันดังที่สุดคือ pitch ของเฟรมนั้น
+        fmin = librosa.note_to_hz(CQT_FMIN_NOTE)
+        lowest = int(round(CQT_BINS_PER_OCTAVE * np.log2(librosa.note_to_hz(PITCH_FMIN_NOTE) / fmin)))
+        highest = int(round(CQT_BINS_PER_OCTAVE * np.log2(librosa.note_to_hz(PITCH_FMAX_NOTE) / fmin)))
+        highest = min(highest, self.cqt.shape[0] - 1)
+        salience = np.zeros((highest - lowest + 1, self.cqt.shape[1]), dtype=np.float32)
+        for harmonic in range(1, PITCH_HARMONICS + 1):
+            offset = int(round(CQT_BINS_PER_OCTAVE * np.log2(harmonic)))
+            rows = np.arange(lowest, highest + 1) + offset
+            usable = rows < self.cqt.shape[0]
+            salience[usable] += (0.8 ** (harmonic - 1)) * self.cqt[rows[usable]]
+
+        frame_energy = self.magnitude.sum(axis=0)
+        voiced = (frame_energy > 0) & (librosa.amplitude_to_db(frame_energy, ref=np.max) > -PITCH_ENERGY_GATE_DB)
+        if not np.any(voiced):
+            return None, 0.0
+        best_bins = lowest + np.argmax(salience[:, voiced], axis=0)
+        f0 = fmin * 2.0 ** (best_bins / CQT_BINS_PER_OCTAVE)
+        return pitch_from_f0(f0)
+
+    def spectral_centroid_hz(self) -> float:
+        centroid = librosa.feature.spectral_centroid(S=self.magnitude, sr=self.sr, n_fft=ANALYSIS_N_FFT)[0]
+        weights = self.magnitude.sum(axis=0)
+        if weights.sum() <= 0:
+            return 0.0
+        return float(np.average(centroid, weights=weights))
+
+    def rms_db(self) -> float:
+        rms = librosa.feature.rms(S=self.magnitude, frame_length=ANALYSIS_N_FFT)[0]
+        return float(20.0 * np.log10(max(float(np.sqrt(np.mean(rms**2))), 1e-10)))
+
+    def loudness_lufs(self) -> float | None:
+        # BS.1770 (pyloudnorm) บนสัญญาณที่ decode แล้วทุก channel; เพลงสั้นกว่า 400 ms หรือเงียบสนิทคืน None
+        try:
+            loudness = pyln.Meter(self.sr).integrated_loudness(self.channels.T)
+        except ValueError:
+            return None
+        return float(loudness) if np.isfinite(loudness) else None
+
+    def waveform_overview(self, points: int = WAVEFORM_OVERVIEW_POINTS) -> list[float]:
+        # peak ของแต่ละช่วงเท่า ๆ กัน (0..1) สำหรับวาดภาพรวม waveform
+        peaks = np.abs(self.channels).max(axis=0)
+        if not peaks.size:
+            return []
+        buckets = np.array_split(peaks, min(points, peaks.size))
+        return [round(float(bucket.max()), 4) for bucket in buckets]
+
+
+def extract_features(input_path: str, sr: int = ANALYSIS_SAMPLE_RATE) -> dict:
+    """วิเคราะห์ทั้งเพลงจาก front-end ร่วม คืน tempo/pitch/key พร้อม confidence และ feature เสริม"""
+    front_end = FeatureFrontEnd.from_file(input_path, sr=sr)
+    tempo, tempo_confidence = front_end.tempo()
+    pitch_note, pitch_confidence = front_end.pitch()
+    key, key_confidence = front_end.key()
+    loudness = front_end.loudness_lufs()
+    return {
+        "tempo": tempo,
+        "pitch": pitch_note,
+        "key": key,
+        "confidence": {
+            "tempo": round(tempo_confidence, 3),
+            "pitch": round(pitch_confidence, 3),
+            "key": round(key_confidence, 3),
+        },
+        "duration_seconds": round(front_end.duration_seconds, 3),
+        "spectral_centroid_hz": round(front_end.spectral_centroid_hz(), 1),
+        "rms_db": round(front_end.rms_db(), 2),
+        "loudness_lufs": None if loudness is None else round(loudness, 2),
+        "waveform": front_end.waveform_overview(),
+    }
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import itertools
+import os
+import time
 from collections import OrderedDict
 from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Sequence
 
 import librosa
 import numpy as np
@@ -11,6 +14,8 @@ import soundfile as sf
 import torch
 from torch import nn
 
+from backend.config import AUTO_EQ_BLOCK_FRAMES, AUTO_EQ_LSTM_SEGMENTS, AUTO_EQ_STREAMING_MIN_BYTES
+
 SR = 44100
 N_FFT = 2048
 HOP_LENGTH = 512
@@ -26,6 +31,18 @@ LSTM_MODEL_BLEND = 0.65
 LSTM_HIGH_FREQ_DAMP_START_HZ = 8000.0
 LSTM_HIGH_FREQ_DAMP_END_HZ = 16000.0
 LSTM_HIGH_FREQ_DAMP_MIN = 0.55
+LSTM_BATCH_FILES = 8
+
+FILTER_ENGINE_FIR = "fir"
+FILTER_ENGINE_STFT = "stft"
+SUPPORTED_FILTER_ENGINES = (FILTER_ENGINE_FIR, FILTER_ENGINE_STFT)
+DEFAULT_FILTER_ENGINE = FILTER_ENGINE_FIR
+# FFT size of one overlap-save block (kernel length is N_FFT + 1, so each block yields ~14k new samples).
+FIR_BLOCK_FFT_SIZE = 16384
+# Streaming mode: LSTM analysis block (~BLOCK_SECONDS of mel frames) plus context frames on each side.
+LSTM_STREAM_BLOCK_FRAMES = int(round(BLOCK_SECONDS * SR / HOP_LENGTH))
+LSTM_STREAM_CONTEXT_FRAMES = 64
+LSTM_STREAM_MEDIAN_STEP_DB = 0.01
 
 SUPPORTED_GENRES = ("pop", "rock", "trap", "country", "soul")
 
@@ -99,13 +116,28 @@ class AutoEQLSTM(nn.Module):
             nn.Linear(model_ch, n_mels),
         )
 
-    def forward(self, mel_db_frames: torch.Tensor, genre_ids: torch.Tensor) -> torch.Tensor:
+    def forward(
+        self,
+        mel_db_frames: torch.Tensor,
+        genre_ids: torch.Tensor,
+        lengths: torch.Tensor | None = None,
+    ) -> torch.Tensor:
         genre_embedding = self.emb(genre_ids)
         genre_embedding = genre_embedding[:, None, :].expand(-1, mel_db_frames.shape[1], -1)
         x = torch.cat((mel_db_frames, genre_embedding), dim=-1)
         x = self.input_proj(x)
         x = self.input_norm(x)
-        x, _ = self.lstm(x)
+        if lengths is None:
+            x, _ = self.lstm(x)
+        else:
+            # Padded batch: pack so the backward direction starts at each sequence's real end.
+            packed = nn.utils.rnn.pack_padded_sequence(
+                x, lengths.to("cpu"), batch_first=True, enforce_sorted=False
+            )
+            packed_out, _ = self.lstm(packed)
+            x, _ = nn.utils.rnn.pad_packed_sequence(
+                packed_out, batch_first=True, total_length=mel_db_frames.shape[1]
+            )
         return self.output_proj(x)
 
 
@@ -241,6 +273,24 @@ def load_auto_eq_model(device: str = "cpu", model_id: str = DEFAULT_AUTO_EQ_MODE
     raise AutoEQModelLoadError("Auto-EQ checkpoint does not contain a supported state_dict.")
 
 
+def warmup_auto_eq_model(model_id: str = DEFAULT_AUTO_EQ_MODEL_ID) -> dict[str, float]:
+    """โหลดโมเดล Auto-EQ และรัน forward กับ input ศูนย์หนึ่งครั้ง คืนเวลาโหลด/อุ่นเครื่อง (วินาที)"""
+    started = time.perf_counter()
+    model = load_auto_eq_model("cpu", model_id=model_id)
+    loaded = time.perf_counter()
+
+    dummy_frames = 32
+    with torch.no_grad():
+        if getattr(model, "auto_eq_kind", "cnn") == "lstm":
+            genre2id = getattr(model, "auto_eq_genre2id", None) or {SUPPORTED_GENRES[0]: 0}
+            genre = next(iter(genre2id))
+            _predict_lstm_delta_mel_db(model, np.zeros((N_MELS, dummy_frames), dtype=np.float32), genre)
+        else:
+            device = next(model.parameters()).device
+            model(torch.zeros(1, 1, N_MELS, dummy_frames, device=device))
+    return {"load_seconds": loaded - started, "warmup_seconds": time.perf_counter() - loaded}
+
+
 def waveform_to_mel_db(y: np.ndarray, sr: int = SR) -> np.ndarray:
     waveform = np.asarray(y, dtype=np.float32)
     mel = librosa.feature.melspectrogram(
@@ -306,6 +356,70 @@ def _apply_frequency_curve(channel: np.ndarray, sr: int, gain_curve: np.ndarray)
     return restored.astype(np.float32)
 
 
+def design_fir_kernel(gain_curve: np.ndarray) -> np.ndarray:
+    """ออกแบบ FIR แบบ linear-phase (ยาว n_fft + 1, หน่วง n_fft / 2 sample) จาก gain curve ขนาด n_fft // 2 + 1 bin"""
+    curve = np.asarray(gain_curve, dtype=np.float64)
+    n_fft = 2 * (curve.shape[-1] - 1)
+    half = n_fft // 2
+    # Zero-phase impulse response of the curve, rotated to be causal and tapered to limit truncation ripple.
+    impulse = np.fft.irfft(curve, n=n_fft, axis=-1)
+    kernel = np.concatenate((impulse[..., -half:], impulse[..., : half + 1]), axis=-1)
+    kernel *= np.hanning(n_fft + 3)[1:-1]
+    return kernel.astype(np.float32)
+
+
+@lru_cache(maxsize=64)
+def _static_fir_kernel(sr: int, genre: str, delta_clamp_db: float, model_id: str) -> np.ndarray:
+    # The CNN curve depends only on (sr, genre, clamp), so its kernel is designed once per combination.
+    freqs = np.fft.rfftfreq(N_FFT, d=1.0 / sr)
+    kernel = design_fir_kernel(_build_gain_curve(freqs, genre, delta_clamp_db))
+    kernel.setflags(write=False)
+    return kernel
+
+
+class OverlapSaveFilter:
+    """FIR แบบ overlap-save ทุก channel พร้อมกัน เก็บ input ท้าย block ไว้ต่อกับ block ถัดไปได้
+
+    kernels: (taps,) ใช้ร่วมทุก channel หรือ (channels, taps) แยกต่อ channel
+    """
+
+    def __init__(self, kernels: np.ndarray, channels: int, fft_size: int = FIR_BLOCK_FFT_SIZE) -> None:
+        kernels = np.atleast_2d(np.asarray(kernels, dtype=np.float32))
+        self.taps = int(kernels.shape[-1])
+        self.delay = (self.taps - 1) // 2
+        self.fft_size = max(int(fft_size), 1 << int(np.ceil(np.log2(2 * self.taps))))
+        self.block_size = self.fft_size - self.taps + 1
+        self._spectra = np.fft.rfft(kernels, n=self.fft_size, axis=-1)
+        self._history = np.zeros((channels, self.taps - 1), dtype=np.float32)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """กรอง block รูป (channels, samples) คืนผลยาวเท่าเดิม (หน่วงด้วย self.delay sample)"""
+        block = np.asarray(block, dtype=np.float32)
+        history = self.taps - 1
+        output = np.empty(block.shape, dtype=np.float32)
+        for start in range(0, block.shape[1], self.block_size):
+            count = min(self.block_size, block.shape[1] - start)
+            segment = block[:, max(start - history, 0) : start + count]
+            if start < history:
+                segment = np.concatenate((self._history[:, start:], segment), axis=1)
+            filtered = np.fft.irfft(np.fft.rfft(segment, n=self.fft_size, axis=-1) * self._spectra, n=self.fft_size)
+            output[:, start : start + count] = filtered[:, history : history + count]
+        if block.shape[1] >= history:
+            self._history = block[:, block.shape[1] - history :].copy()
+        else:
+            self._history = np.concatenate((self._history, block), axis=1)[:, -history:]
+        return output
+
+
+def _apply_fir_filter(waveform: np.ndarray, kernels: np.ndarray) -> np.ndarray:
+    # waveform: (samples, channels) -> filter all channels per block, flush the tail, then drop the linear-phase delay.
+    channels_first = np.asarray(waveform, dtype=np.float32).T
+    fir = OverlapSaveFilter(kernels, channels=channels_first.shape[0])
+    head = fir.process(channels_first)
+    tail = fir.process(np.zeros((channels_first.shape[0], fir.delay), dtype=np.float32))
+    return np.concatenate((head, tail), axis=1)[:, fir.delay :].T
+
+
 def _smooth_1d(values: np.ndarray, kernel_size: int) -> np.ndarray:
     if kernel_size <= 1:
         return np.asarray(values, dtype=np.float32)
@@ -320,7 +434,8 @@ def _smooth_1d(values: np.ndarray, kernel_size: int) -> np.ndarray:
     return np.convolve(padded, kernel, mode="valid").astype(np.float32)
 
 
-def _smooth_axis(values: np.ndarray, axis: int, kernel_size: int) -> np.ndarray:
+def _smooth_axis_reference(values: np.ndarray, axis: int, kernel_size: int) -> np.ndarray:
+    # Original per-row implementation, kept as the reference for tests and the benchmark.
     if kernel_size <= 1:
         return np.asarray(values, dtype=np.float32)
 
@@ -329,6 +444,28 @@ def _smooth_axis(values: np.ndarray, axis: int, kernel_size: int) -> np.ndarray:
     )
 
 
+def _smooth_axis(values: np.ndarray, axis: int, kernel_size: int) -> np.ndarray:
+    """box filter ตามแกนเดียวแบบ vectorized (cumulative sum) ให้ผลเหมือน _smooth_1d ทุกแถว
+
+    kernel คู่ถูกปัดขึ้นเป็นคี่ และเติมขอบด้วยค่าที่ขอบ (mode="edge") เหมือนเดิม
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if kernel_size <= 1:
+        return values
+
+    kernel_size = max(int(kernel_size), 1)
+    if kernel_size % 2 == 0:
+        kernel_size += 1
+
+    radius = kernel_size // 2
+    rows = np.moveaxis(values, axis, -1)
+    # One extra leading edge sample becomes the zero of the running sum after subtracting it out.
+    padded = np.pad(rows, [(0, 0)] * (rows.ndim - 1) + [(radius + 1, radius)], mode="edge")
+    cumulative = np.cumsum(padded, axis=-1, dtype=np.float64)
+    smoothed = (cumulative[..., kernel_size:] - cumulative[..., :-kernel_size]) / float(kernel_size)
+    return np.moveaxis(smoothed.astype(np.float32), -1, axis)
+
+
 def _match_channel_length(channel: np.ndarray, target_length: int) -> np.ndarray:
     if channel.shape[0] == target_length:
         return channel.astype(np.float32)
@@ -337,41 +474,83 @@ def _match_channel_length(channel: np.ndarray, target_length: int) -> np.ndarray
     return np.pad(channel, (0, target_length - channel.shape[0]), mode="constant").astype(np.float32)
 
 
-def _predict_lstm_delta_mel_db(model: AutoEQLSTM, mel_db: np.ndarray, genre: str) -> np.ndarray:
+def _predict_lstm_delta_mel_db_batch(
+    model: AutoEQLSTM,
+    mel_dbs: Sequence[np.ndarray],
+    genre: str,
+) -> list[np.ndarray]:
     genre2id = getattr(model, "auto_eq_genre2id", None)
     if not isinstance(genre2id, dict) or genre not in genre2id:
         raise ValueError(f"Genre '{genre}' is not supported by the selected Auto-EQ model.")
+    if not mel_dbs:
+        return []
 
     device = next(model.parameters()).device
-    mel_frames = torch.from_numpy(mel_db.T.astype(np.float32)).unsqueeze(0).to(device)
-    genre_ids = torch.tensor([genre2id[genre]], dtype=torch.long, device=device)
+    lengths = [int(mel_db.shape[1]) for mel_db in mel_dbs]
+    n_mels = int(mel_dbs[0].shape[0])
+    mel_frames = np.zeros((len(mel_dbs), max(lengths), n_mels), dtype=np.float32)
+    for row, mel_db in enumerate(mel_dbs):
+        mel_frames[row, : lengths[row]] = mel_db.T
+
+    batch = torch.from_numpy(mel_frames).to(device)
+    genre_ids = torch.full((len(mel_dbs),), genre2id[genre], dtype=torch.long, device=device)
+    length_tensor = torch.tensor(lengths, dtype=torch.long)
 
     with torch.no_grad():
-        predicted = model(mel_frames, genre_ids)
+        # A single sequence needs no padding, so skip the pack/unpack round trip.
+        predicted = model(batch, genre_ids, None if len(mel_dbs) == 1 else length_tensor)
 
-    return predicted.squeeze(0).detach().cpu().numpy().T.astype(np.float32)
+    predicted_np = predicted.detach().cpu().numpy()
+    return [predicted_np[row, : lengths[row]].T.astype(np.float32) for row in range(len(mel_dbs))]
 
 
-def _build_lstm_gain_curve(
-    model: AutoEQLSTM,
-    channel: np.ndarray,
-    sr: int,
-    genre: str,
-    delta_clamp_db: float,
-) -> np.ndarray:
+def _predict_lstm_delta_mel_db(model: AutoEQLSTM, mel_db: np.ndarray, genre: str) -> np.ndarray:
+    return _predict_lstm_delta_mel_db_batch(model, [mel_db], genre)[0]
+
+
+def _lstm_mel_input(model: AutoEQLSTM, channel: np.ndarray, sr: int) -> np.ndarray:
     model_sr = int(getattr(model, "auto_eq_sample_rate", sr))
     working_channel = np.asarray(channel, dtype=np.float32)
     if model_sr != sr:
         working_channel = librosa.resample(working_channel, orig_sr=sr, target_sr=model_sr)
+    return waveform_to_mel_db(working_channel, sr=model_sr)
 
-    mel_db = waveform_to_mel_db(working_channel, sr=model_sr)
-    predicted_delta_db = _predict_lstm_delta_mel_db(model, mel_db, genre)
 
-    smoothed_delta_db = np.clip(predicted_delta_db, -delta_clamp_db, delta_clamp_db)
-    smoothed_delta_db = _smooth_axis(smoothed_delta_db, axis=1, kernel_size=LSTM_TIME_SMOOTH_FRAMES)
+def _lstm_gain_curve_from_delta(
+    model: AutoEQLSTM,
+    predicted_delta_db: np.ndarray | Sequence[np.ndarray],
+    sr: int,
+    delta_clamp_db: float,
+) -> np.ndarray:
+    # A list means sampled windows: each is time-smoothed on its own, then the frames are pooled for the median.
+    windows = [predicted_delta_db] if isinstance(predicted_delta_db, np.ndarray) else list(predicted_delta_db)
+    smoothed_delta_db = np.concatenate(
+        [
+            _smooth_axis(np.clip(window, -delta_clamp_db, delta_clamp_db), axis=1, kernel_size=LSTM_TIME_SMOOTH_FRAMES)
+            for window in windows
+        ],
+        axis=1,
+    )
     smoothed_delta_db = _smooth_axis(smoothed_delta_db, axis=0, kernel_size=LSTM_FREQ_SMOOTH_BINS)
 
     mel_curve_db = np.median(smoothed_delta_db, axis=1).astype(np.float32)
+    return _lstm_gain_curve_from_mel_curve(model, mel_curve_db, sr, delta_clamp_db)
+
+
+def _segment_starts(total_frames: int, segments: int, window: int = LSTM_STREAM_BLOCK_FRAMES) -> list[int] | None:
+    """ตำแหน่งเริ่มของหน้าต่างตัวอย่างที่กระจายเท่า ๆ กันทั้งเพลง (None = เพลงสั้นพอ ใช้ทั้งเพลง)"""
+    if segments <= 0 or total_frames <= segments * window:
+        return None
+    return [int(start) for start in np.linspace(0, total_frames - window, segments).round()]
+
+
+def _lstm_gain_curve_from_mel_curve(
+    model: AutoEQLSTM,
+    mel_curve_db: np.ndarray,
+    sr: int,
+    delta_clamp_db: float,
+) -> np.ndarray:
+    model_sr = int(getattr(model, "auto_eq_sample_rate", sr))
     mel_curve_db = _smooth_1d(mel_curve_db, kernel_size=LSTM_FREQ_SMOOTH_BINS)
     mel_curve_db = np.clip(mel_curve_db * LSTM_MODEL_BLEND, -delta_clamp_db, delta_clamp_db)
 
@@ -396,6 +575,52 @@ def _build_lstm_gain_curve(
     return np.power(10.0, gain_db / 20.0).astype(np.float32)
 
 
+def _build_lstm_gain_curves(
+    model: AutoEQLSTM,
+    waveforms: Sequence[tuple[np.ndarray, int]],
+    genre: str,
+    delta_clamp_db: float,
+    segments: int = 0,
+) -> list[np.ndarray]:
+    """สร้าง gain curve ของทุก channel ทุกไฟล์ด้วย LSTM forward เดียว คืน array (channels, bins) ต่อไฟล์
+
+    segments > 0: ป้อน LSTM เฉพาะหน้าต่างยาว BLOCK_SECONDS จำนวน segments หน้าต่างที่กระจายเท่า ๆ กัน
+    แทนทุกเฟรมของเพลง (เวลา LSTM คงที่ไม่ขึ้นกับความยาวเพลง)
+    """
+    windows_per_channel: list[list[np.ndarray]] = []
+    for waveform, sr in waveforms:
+        for channel_idx in range(waveform.shape[1]):
+            mel_db = _lstm_mel_input(model, waveform[:, channel_idx], sr)
+            starts = _segment_starts(mel_db.shape[1], segments)
+            if starts is None:
+                windows_per_channel.append([mel_db])
+            else:
+                windows_per_channel.append(
+                    [mel_db[:, start : start + LSTM_STREAM_BLOCK_FRAMES] for start in starts]
+                )
+
+    flat_windows = [window for windows in windows_per_channel for window in windows]
+    predicted = iter(_predict_lstm_delta_mel_db_batch(model, flat_windows, genre))
+    deltas = iter([[next(predicted) for _ in windows] for windows in windows_per_channel])
+    return [
+        np.stack(
+            [_lstm_gain_curve_from_delta(model, next(deltas), sr, delta_clamp_db) for _ in range(waveform.shape[1])]
+        )
+        for waveform, sr in waveforms
+    ]
+
+
+def _build_lstm_gain_curve(
+    model: AutoEQLSTM,
+    channel: np.ndarray,
+    sr: int,
+    genre: str,
+    delta_clamp_db: float,
+) -> np.ndarray:
+    waveform = np.asarray(channel, dtype=np.float32)[:, np.newaxis]
+    return _build_lstm_gain_curves(model, [(waveform, sr)], genre, delta_clamp_db)[0][0]
+
+
 def _apply_lstm_auto_eq_channel(
     channel: np.ndarray,
     sr: int,
@@ -408,42 +633,332 @@ def _apply_lstm_auto_eq_channel(
     return _match_channel_length(processed_channel, len(channel))
 
 
-def apply_auto_eq_file(
+class _StreamingMedian:
+    """median ต่อแถวจาก histogram ขนาดคงที่ (ค่าอยู่ในช่วง [-limit, limit] คลาดเคลื่อนไม่เกินครึ่ง step)"""
+
+    def __init__(self, rows: int, limit: float, step: float = LSTM_STREAM_MEDIAN_STEP_DB) -> None:
+        self.limit = max(float(limit), step)
+        self.bins = int(np.ceil(2.0 * self.limit / step)) + 1
+        self.step = 2.0 * self.limit / (self.bins - 1)
+        self.counts = np.zeros((rows, self.bins), dtype=np.int64)
+        self.total = 0
+
+    def update(self, values: np.ndarray) -> None:
+        rows, frames = values.shape
+        if frames == 0:
+            return
+        indices = np.clip(np.rint((values + self.limit) / self.step).astype(np.int64), 0, self.bins - 1)
+        indices += np.arange(rows, dtype=np.int64)[:, np.newaxis] * self.bins
+        self.counts += np.bincount(indices.ravel(), minlength=rows * self.bins).reshape(rows, self.bins)
+        self.total += frames
+
+    def median(self) -> np.ndarray:
+        # Same convention as np.median: mean of the two middle ranks when the count is even.
+        cumulative = np.cumsum(self.counts, axis=1)
+        lower = np.argmax(cumulative > (self.total - 1) // 2, axis=1)
+        upper = np.argmax(cumulative > self.total // 2, axis=1)
+        return (((lower + upper) / 2.0) * self.step - self.limit).astype(np.float32)
+
+
+class ModelRateReader:
+    """อ่านช่วง sample (ที่ sample rate ของโมเดล) จากไฟล์แบบ random access เติมศูนย์นอกขอบไฟล์
+
+    ใช้ร่วมกับ spectrogram_tiles (model_sr = sample rate ของไฟล์) ให้ STFT ทีละ block ตรงกับ Auto-EQ
+    """
+
+    def __init__(self, handle: sf.SoundFile, model_sr: int) -> None:
+        self.handle = handle
+        self.sr = int(handle.samplerate)
+        self.model_sr = int(model_sr)
+        divisor = np.gcd(self.sr, self.model_sr)
+        self._native_step = self.sr // divisor
+        self._model_step = self.model_sr // divisor
+        self.length = int(np.ceil(handle.frames * self.model_sr / self.sr))
+
+    def _read_native(self, start: int, stop: int) -> np.ndarray:
+        segment = np.zeros((self.handle.channels, stop - start), dtype=np.float32)
+        lo, hi = max(start, 0), min(stop, self.handle.frames)
+        if hi > lo:
+            self.handle.seek(lo)
+            segment[:, lo - start : hi - start] = self.handle.read(hi - lo, dtype="float32", always_2d=True).T
+        return segment
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        if self.sr == self.model_sr:
+            return self._read_native(start, stop)
+        # Resample a margin around the request, aligned so model-rate indices stay integral.
+        margin = 4 * N_FFT
+        first_step = (start - margin) // self._model_step
+        last_step = -(-(stop + margin) // self._model_step)
+        native = self._read_native(first_step * self._native_step, last_step * self._native_step)
+        resampled = librosa.resample(native, orig_sr=self.sr, target_sr=self.model_sr)
+        offset = start - first_step * self._model_step
+        segment = resampled[:, offset : offset + stop - start]
+        # Outside the track the full-file resampler sees nothing, so keep the padding silent.
+        segment[:, : max(-start, 0)] = 0.0
+        segment[:, max(self.length - start, 0) :] = 0.0
+        return segment
+
+
+def _mel_power_frames(reader: ModelRateReader, first: int, last: int) -> np.ndarray:
+    # Frames [first, last) of a centred (zero-padded) STFT, identical to waveform_to_mel_db on the full track.
+    half = N_FFT // 2
+    segment = reader.read(first * HOP_LENGTH - half, (last - 1) * HOP_LENGTH + half)
+    return librosa.feature.melspectrogram(
+        y=segment,
+        sr=reader.model_sr,
+        n_fft=N_FFT,
+        hop_length=HOP_LENGTH,
+        n_mels=N_MELS,
+        power=2.0,
+        center=False,
+    )
+
+
+def _stream_lstm_gain_curves(
+    model: AutoEQLSTM,
+    handle: sf.SoundFile,
+    genre: str,
+    delta_clamp_db: float,
+    segments: int = 0,
+) -> np.ndarray:
+    """รอบแรกของโหมด streaming: สะสม median ของ delta จาก LSTM ทีละ block ของ mel frame (segments > 0: เฉพาะ block ตัวอย่าง)
+
+    LSTM เห็นบริบทรอบ block เพียง LSTM_STREAM_CONTEXT_FRAMES เฟรม (ไม่ใช่ทั้งเพลง)
+    จึงได้ curve ใกล้เคียงแต่ไม่เท่ากับโหมดอ่านทั้งไฟล์ทุกบิต
+    """
+    reader = ModelRateReader(handle, int(getattr(model, "auto_eq_sample_rate", handle.samplerate)))
+    total_frames = 1 + reader.length // HOP_LENGTH
+    block = LSTM_STREAM_BLOCK_FRAMES
+    context = LSTM_STREAM_CONTEXT_FRAMES
+
+    # ref=np.max ของ waveform_to_mel_db คือ peak ของทั้งเพลง จึงต้องสแกนหา peak ก่อน
+    peak_power = np.zeros(handle.channels, dtype=np.float64)
+    for first in range(0, total_frames, block):
+        mel_power = _mel_power_frames(reader, first, min(first + block, total_frames))
+        peak_power = np.maximum(peak_power, mel_power.max(axis=(1, 2)))
+    ref_db = 10.0 * np.log10(np.maximum(peak_power, 1e-10))
+
+    medians = [_StreamingMedian(N_MELS, delta_clamp_db) for _ in range(handle.channels)]
+    for first in _segment_starts(total_frames, segments, block) or range(0, total_frames, block):
+        last = min(first + block, total_frames)
+        window_first, window_last = max(first - context, 0), min(last + context, total_frames)
+        mel_power = _mel_power_frames(reader, window_first, window_last)
+        mel_db = 10.0 * np.log10(np.maximum(mel_power, 1e-10)) - ref_db[:, np.newaxis, np.newaxis]
+        mel_db = np.maximum(mel_db, -80.0).astype(np.float32)
+
+        predicted = _predict_lstm_delta_mel_db_batch(model, list(mel_db), genre)
+        for channel_idx, delta_db in enumerate(predicted):
+            smoothed = np.clip(delta_db, -delta_clamp_db, delta_clamp_db)
+            smoothed = _smooth_axis(smoothed, axis=1, kernel_size=LSTM_TIME_SMOOTH_FRAMES)
+            core = smoothed[:, first - window_first : last - window_first]
+            medians[channel_idx].update(_smooth_axis(core, axis=0, kernel_size=LSTM_FREQ_SMOOTH_BINS))
+
+    return np.stack(
+        [
+            _lstm_gain_curve_from_mel_curve(model, median.median(), handle.samplerate, delta_clamp_db)
+            for median in medians
+        ]
+    )
+
+
+def _apply_auto_eq_streaming(
     input_path: str,
     output_path: str,
+    model: nn.Module,
     genre: str,
-    delta_clamp_db: float = DELTA_CLAMP_DB,
-    model_id: str = DEFAULT_AUTO_EQ_MODEL_ID,
-) -> str:
-    genre_value, delta_value, model_key = _validate_inputs(genre, delta_clamp_db, model_id)
-    model = load_auto_eq_model("cpu", model_id=model_key)
-
+    delta_clamp_db: float,
+    block_frames: int | None = None,
+    lstm_segments: int = 0,
+) -> None:
+    """Auto-EQ แบบสองรอบ ใช้หน่วยความจำตามขนาด block ไม่ขึ้นกับความยาวไฟล์
+
+    - รอบแรก (analyze): LSTM สะสมสถิติ curve ทีละ block / CNN ใช้ kernel คงที่ ไม่ต้องสแกน
+    - รอบสอง (apply): กรอง FIR แบบ overlap-save ทีละ block แล้วเขียนผ่าน soundfile.SoundFile
+    """
+    block = max(int(AUTO_EQ_BLOCK_FRAMES if block_frames is None else block_frames), 1)
+    with sf.SoundFile(input_path) as source:
+        sr, channels, total = int(source.samplerate), int(source.channels), int(source.frames)
+        if sr <= 0:
+            raise ValueError("Invalid sample rate in input file.")
+
+        if getattr(model, "auto_eq_kind", "cnn") == "lstm":
+            kernels = design_fir_kernel(
+                _stream_lstm_gain_curves(model, source, genre, delta_clamp_db, segments=lstm_segments)
+            )
+        else:
+            model_id = str(getattr(model, "auto_eq_model_id", DEFAULT_AUTO_EQ_MODEL_ID))
+            kernels = _static_fir_kernel(sr, genre, float(delta_clamp_db), model_id)
+
+        fir = OverlapSaveFilter(kernels, channels=channels)
+        pending_delay = fir.delay
+        written = 0
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        with sf.SoundFile(output_path, mode="w", samplerate=sr, channels=channels) as writer:
+            source.seek(0)
+            blocks = source.blocks(blocksize=block, dtype="float32", always_2d=True)
+            # The last (zero) block flushes the linear-phase delay out of the filter.
+            for data in itertools.chain(map(np.transpose, blocks), [np.zeros((channels, fir.delay), dtype=np.float32)]):
+                filtered = fir.process(data)
+                skip = min(pending_delay, filtered.shape[1])
+                pending_delay -= skip
+                filtered = filtered[:, skip : skip + total - written]
+                writer.write(np.clip(filtered, -1.0, 1.0).T)
+                written += filtered.shape[1]
+
+
+def _read_auto_eq_input(input_path: str) -> tuple[np.ndarray, int]:
     waveform, sr = sf.read(input_path, always_2d=True, dtype="float32")
     if sr <= 0:
         raise ValueError("Invalid sample rate in input file.")
+    return waveform, sr
 
+
+def _process_waveform(
+    waveform: np.ndarray,
+    sr: int,
+    model: nn.Module,
+    genre: str,
+    delta_clamp_db: float,
+    lstm_gain_curves: np.ndarray | None = None,
+    filter_engine: str = DEFAULT_FILTER_ENGINE,
+    lstm_segments: int = 0,
+) -> np.ndarray:
     if getattr(model, "auto_eq_kind", "cnn") == "lstm":
-        processed_channels = [
-            _apply_lstm_auto_eq_channel(waveform[:, channel_idx], sr, model, genre_value, delta_value)
-            for channel_idx in range(waveform.shape[1])
-        ]
+        if lstm_gain_curves is None:
+            lstm_gain_curves = _build_lstm_gain_curves(
+                model, [(waveform, sr)], genre, delta_clamp_db, segments=lstm_segments
+            )[0]
+        if filter_engine == FILTER_ENGINE_FIR:
+            processed = _apply_fir_filter(waveform, design_fir_kernel(lstm_gain_curves))
+        else:
+            processed = np.stack(
+                [
+                    _match_channel_length(
+                        _apply_frequency_curve(waveform[:, channel_idx], sr, lstm_gain_curves[channel_idx]),
+                        waveform.shape[0],
+                    )
+                    for channel_idx in range(waveform.shape[1])
+                ],
+                axis=1,
+            )
+    elif filter_engine == FILTER_ENGINE_FIR:
+        model_id = str(getattr(model, "auto_eq_model_id", DEFAULT_AUTO_EQ_MODEL_ID))
+        processed = _apply_fir_filter(waveform, _static_fir_kernel(int(sr), genre, float(delta_clamp_db), model_id))
     else:
         freqs = np.fft.rfftfreq(N_FFT, d=1.0 / sr)
-        gain_curve = _build_gain_curve(freqs, genre_value, delta_value)
-        processed_channels = [
-            _apply_frequency_curve(waveform[:, channel_idx], sr, gain_curve)
-            for channel_idx in range(waveform.shape[1])
-        ]
+        gain_curve = _build_gain_curve(freqs, genre, delta_clamp_db)
+        processed = np.stack(
+            [_apply_frequency_curve(waveform[:, channel_idx], sr, gain_curve) for channel_idx in range(waveform.shape[1])],
+            axis=1,
+        )
+
+    return np.clip(processed, -1.0, 1.0)
 
-    processed = np.stack(processed_channels, axis=1)
-    processed = np.clip(processed, -1.0, 1.0)
 
+def _validate_filter_engine(filter_engine: str) -> str:
+    engine = filter_engine.strip().lower()
+    if engine not in SUPPORTED_FILTER_ENGINES:
+        raise ValueError(
+            f"Unsupported filter engine '{filter_engine}'. Supported engines: {', '.join(SUPPORTED_FILTER_ENGINES)}."
+        )
+    return engine
+
+
+def _validate_lstm_segments(lstm_segments: int | None) -> int:
+    segments = AUTO_EQ_LSTM_SEGMENTS if lstm_segments is None else int(lstm_segments)
+    if segments < 0:
+        raise ValueError("lstm_segments must be zero (full track) or a positive number of windows.")
+    return segments
+
+
+def _write_auto_eq_output(output_path: str, processed: np.ndarray, sr: int) -> None:
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
     sf.write(output_path, processed, sr)
 
+
+def apply_auto_eq_file(
+    input_path: str,
+    output_path: str,
+    genre: str,
+    delta_clamp_db: float = DELTA_CLAMP_DB,
+    model_id: str = DEFAULT_AUTO_EQ_MODEL_ID,
+    filter_engine: str = DEFAULT_FILTER_ENGINE,
+    streaming: bool | None = None,
+    lstm_segments: int | None = None,
+) -> str:
+    # streaming=None: เลือกโหมด streaming อัตโนมัติเมื่อไฟล์ใหญ่กว่า AUTO_EQ_STREAMING_MIN_BYTES (เฉพาะ engine FIR)
+    # lstm_segments=None: ใช้ AUTO_EQ_LSTM_SEGMENTS (0 = ป้อน LSTM ทุกเฟรมของเพลง)
+    genre_value, delta_value, model_key = _validate_inputs(genre, delta_clamp_db, model_id)
+    engine = _validate_filter_engine(filter_engine)
+    segments = _validate_lstm_segments(lstm_segments)
+    if streaming and engine != FILTER_ENGINE_FIR:
+        raise ValueError("Streaming Auto-EQ requires the FIR filter engine.")
+    model = load_auto_eq_model("cpu", model_id=model_key)
+
+    if streaming is None:
+        streaming = engine == FILTER_ENGINE_FIR and os.path.getsize(input_path) >= AUTO_EQ_STREAMING_MIN_BYTES
+    if streaming:
+        _apply_auto_eq_streaming(input_path, output_path, model, genre_value, delta_value, lstm_segments=segments)
+        return output_path
+
+    waveform, sr = _read_auto_eq_input(input_path)
+    # LSTM: all channels go through a single padded forward pass instead of one pass per channel.
+    processed = _process_waveform(
+        waveform, sr, model, genre_value, delta_value, filter_engine=engine, lstm_segments=segments
+    )
+    _write_auto_eq_output(output_path, processed, sr)
+
     # ปลดปล่อยหน่วยความจำ: ล้างโมเดลและ Tensor หลัง inference
     del model, waveform, processed
     if torch.cuda.is_available():
         torch.cuda.empty_cache()
 
     return output_path
+
+
+def apply_auto_eq_files(
+    input_paths: Sequence[str],
+    output_paths: Sequence[str],
+    genre: str,
+    delta_clamp_db: float = DELTA_CLAMP_DB,
+    model_id: str = DEFAULT_AUTO_EQ_MODEL_ID,
+    batch_size: int = LSTM_BATCH_FILES,
+    filter_engine: str = DEFAULT_FILTER_ENGINE,
+    lstm_segments: int | None = None,
+) -> list[str]:
+    """Bulk Auto-EQ สำหรับงานประมวลผลย้อนหลังหลายไฟล์ (genre/model เดียวกัน)
+
+    สำหรับโมเดล LSTM จะรวมทุก channel ของไฟล์ครั้งละ ``batch_size`` ไฟล์เป็น batch เดียว
+    (padded + packed sequence) ผลลัพธ์แต่ละไฟล์เทียบเท่ากับเรียก apply_auto_eq_file ทีละไฟล์
+    """
+    if len(input_paths) != len(output_paths):
+        raise ValueError("input_paths and output_paths must have the same length.")
+    if int(batch_size) < 1:
+        raise ValueError("batch_size must be at least 1.")
+
+    genre_value, delta_value, model_key = _validate_inputs(genre, delta_clamp_db, model_id)
+    engine = _validate_filter_engine(filter_engine)
+    segments = _validate_lstm_segments(lstm_segments)
+    model = load_auto_eq_model("cpu", model_id=model_key)
+    is_lstm = getattr(model, "auto_eq_kind", "cnn") == "lstm"
+
+    pairs = list(zip(input_paths, output_paths))
+    for offset in range(0, len(pairs), int(batch_size)):
+        chunk = pairs[offset : offset + int(batch_size)]
+        waveforms = [_read_auto_eq_input(input_path) for input_path, _ in chunk]
+        gain_curves: list[np.ndarray | None] = (
+            list(_build_lstm_gain_curves(model, waveforms, genre_value, delta_value, segments=segments))
+            if is_lstm
+            else [None] * len(chunk)
+        )
+        for (_, output_path), (waveform, sr), curves in zip(chunk, waveforms, gain_curves):
+            processed = _process_waveform(waveform, sr, model, genre_value, delta_value, curves, engine)
+            _write_auto_eq_output(output_path, processed, sr)
+        del waveforms, gain_curves
+
+    del model
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+    return [str(output_path) for output_path in output_paths]
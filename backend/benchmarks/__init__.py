@@ -0,0 +1 @@
+# backend/benchmarks package: micro-benchmark สำหรับงาน DSP (รันด้วย python -m backend.benchmarks.<ชื่อโมดูล>)
@@ -0,0 +1,77 @@
+# backend/benchmarks/analysis_features.py
+# micro-benchmark: /analyze โหมด full แบบเดิม (decode + transform แยกกันทีละ feature) เทียบกับ front-end ร่วม
+# (decode ครั้งเดียว + STFT ครั้งเดียว ใน backend.audio_features) ที่ให้ feature มากกว่า
+# รัน: python -m backend.benchmarks.analysis_features
+
+import os
+import tempfile
+import time
+import warnings
+
+import librosa
+import numpy as np
+import pyloudnorm as pyln
+import soundfile as sf
+
+from backend.audio_features import PITCH_FMAX_NOTE, PITCH_FMIN_NOTE, estimate_key, extract_features
+
+SAMPLE_RATE = 44100
+DURATIONS_MINUTES = (1, 3)
+BPM = 124.0
+
+
+def _separate_passes_reference(input_path: str) -> dict:
+    # โหมด full เดิม (tempo / yin / chroma_cqt ที่ sample rate เดิม) + feature เสริมที่คำนวณแยกกันทีละ pass
+    y, sr = librosa.load(input_path, sr=None, mono=True)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=FutureWarning)
+        tempo = float(librosa.beat.tempo(y=y, sr=sr)[0])
+    f0 = librosa.yin(y, fmin=librosa.note_to_hz(PITCH_FMIN_NOTE), fmax=librosa.note_to_hz(PITCH_FMAX_NOTE), sr=sr)
+    f0 = f0[~np.isnan(f0)]
+    pitch = librosa.hz_to_note(float(np.median(f0))) if f0.size else None
+    key, _ = estimate_key(librosa.feature.chroma_cqt(y=y, sr=sr).mean(axis=1))
+
+    centroid = float(np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)))
+    rms = float(np.mean(librosa.feature.rms(y=y)))
+    data, file_sr = sf.read(input_path, always_2d=True)
+    loudness = float(pyln.Meter(file_sr).integrated_loudness(data))
+    return {"tempo": tempo, "pitch": pitch, "key": key, "centroid": centroid, "rms": rms, "lufs": loudness}
+
+
+def _write_track(path: str, minutes: int, rng: np.random.Generator) -> None:
+    # คอร์ด D minor + click ตามจังหวะ + noise เบา ๆ (stereo)
+    seconds = minutes * 60
+    t = np.arange(SAMPLE_RATE * seconds) / SAMPLE_RATE
+    y = sum(0.12 * np.sin(2 * np.pi * freq * t) for freq in (146.83, 174.61, 220.0, 293.66))
+    click = np.exp(-np.arange(1200) / 200.0) * rng.standard_normal(1200) * 0.5
+    for beat in np.arange(0.0, seconds, 60.0 / BPM):
+        start = int(beat * SAMPLE_RATE)
+        end = min(start + click.size, y.size)
+        y[start:end] += click[: end - start]
+    y = y + 0.01 * rng.standard_normal(y.size)
+    sf.write(path, np.stack((y, np.roll(y, 441)), axis=1).astype(np.float32) * 0.6, SAMPLE_RATE)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    print(f"{'duration':>10} {'separate (s)':>13} {'shared (s)':>11} {'speedup':>8}  tempo/key (separate | shared)")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for minutes in DURATIONS_MINUTES:
+            path = os.path.join(temp_dir, f"track_{minutes}m.wav")
+            _write_track(path, minutes, rng)
+            reference, reference_s = _timed(lambda: _separate_passes_reference(path))
+            shared, shared_s = _timed(lambda: extract_features(path))
+            print(
+                f"{minutes:>8} m {reference_s:>13.2f} {shared_s:>11.2f} {reference_s / max(shared_s, 1e-9):>7.1f}x"
+                f"  {reference['tempo']:.1f} {reference['key']} | {shared['tempo']:.1f} {shared['key']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# backend/benchmarks/auto_eq_filter.py
+# micro-benchmark: Auto-EQ แบบ STFT/ISTFT เดิม เทียบกับ FIR overlap-save (สัญญาณ stereo)
+# รัน: python -m backend.benchmarks.auto_eq_filter
+
+import time
+import tracemalloc
+
+import numpy as np
+
+from backend.auto_eq_inference import (
+    AUTO_EQ_MODEL_CNN_V1,
+    AutoEQCNN,
+    FILTER_ENGINE_FIR,
+    FILTER_ENGINE_STFT,
+    _process_waveform,
+)
+
+SAMPLE_RATE = 44100
+DURATIONS_MINUTES = (1, 5)
+GENRE = "rock"
+DELTA_CLAMP_DB = 2.0
+
+
+def _run(waveform: np.ndarray, model: AutoEQCNN, engine: str) -> tuple[np.ndarray, float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    processed = _process_waveform(waveform, SAMPLE_RATE, model, GENRE, DELTA_CLAMP_DB, filter_engine=engine)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return processed, elapsed, peak / (1024 * 1024)
+
+
+def main() -> None:
+    model = AutoEQCNN(ch1=4, ch2=8, ch3=16)
+    model.auto_eq_kind = "cnn"
+    model.auto_eq_model_id = AUTO_EQ_MODEL_CNN_V1
+    rng = np.random.default_rng(0)
+
+    print(f"{'duration':>10} {'stft (s)':>9} {'stft MB':>8} {'fir (s)':>8} {'fir MB':>7} {'speedup':>8} {'residual dB':>12}")
+    for minutes in DURATIONS_MINUTES:
+        waveform = (0.1 * rng.standard_normal((minutes * 60 * SAMPLE_RATE, 2))).astype(np.float32)
+        expected, stft_s, stft_mb = _run(waveform, model, FILTER_ENGINE_STFT)
+        actual, fir_s, fir_mb = _run(waveform, model, FILTER_ENGINE_FIR)
+        residual = np.sqrt(np.mean((actual - expected) ** 2)) / np.sqrt(np.mean(expected**2))
+
+        print(
+            f"{minutes:>8} m {stft_s:>9.3f} {stft_mb:>8.0f} {fir_s:>8.3f} {fir_mb:>7.0f} "
+            f"{stft_s / max(fir_s, 1e-9):>7.1f}x {20 * np.log10(residual):>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# backend/benchmarks/auto_eq_segments.py
+# micro-benchmark: เวลาประมาณ curve ของ Auto-EQ LSTM แบบทั้งเพลง เทียบกับหน้าต่างตัวอย่าง (sampled segments)
+# ใช้ checkpoint จริงถ้ามี ไม่เช่นนั้นใช้โมเดลสุ่ม (เวลาเท่ากัน แต่ค่าความเบี่ยงเบนไม่มีความหมาย)
+# รัน: python -m backend.benchmarks.auto_eq_segments
+
+import time
+
+import numpy as np
+import torch
+
+from backend.auto_eq_inference import (
+    AUTO_EQ_MODEL_LSTM_LAST,
+    AutoEQLSTM,
+    AutoEQModelLoadError,
+    SUPPORTED_GENRES,
+    _build_lstm_gain_curves,
+    load_auto_eq_model,
+)
+from backend.config import AUTO_EQ_LSTM_SEGMENTS
+
+SAMPLE_RATE = 44100
+DURATIONS_MINUTES = (1, 3, 6)
+DELTA_CLAMP_DB = 6.0
+
+
+def _load_model() -> tuple[AutoEQLSTM, str]:
+    try:
+        return load_auto_eq_model("cpu", model_id=AUTO_EQ_MODEL_LSTM_LAST), "checkpoint"
+    except AutoEQModelLoadError:
+        torch.manual_seed(0)
+        model = AutoEQLSTM().eval()
+        model.auto_eq_kind = "lstm"
+        model.auto_eq_genre2id = {genre: idx for idx, genre in enumerate(SUPPORTED_GENRES)}
+        model.auto_eq_sample_rate = SAMPLE_RATE
+        return model, "random init"
+
+
+def _track(minutes: int, rng: np.random.Generator) -> np.ndarray:
+    # ท่อนละ 20 วินาที แต่ละท่อน spectral tilt และความดังต่างกัน
+    sections = []
+    for _ in range(minutes * 3):
+        noise = rng.standard_normal(SAMPLE_RATE * 20)
+        spectrum = np.fft.rfft(noise) * ((np.fft.rfftfreq(noise.size, d=1.0 / SAMPLE_RATE) + 20.0) / 1000.0) ** (
+            rng.uniform(-0.5, 0.5)
+        )
+        section = np.fft.irfft(spectrum, noise.size)
+        sections.append(section / np.max(np.abs(section)) * rng.uniform(0.1, 0.8))
+    mono = np.concatenate(sections)
+    return np.stack((mono, np.roll(mono, SAMPLE_RATE)), axis=1).astype(np.float32)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    model, source = _load_model()
+    rng = np.random.default_rng(0)
+    segments = AUTO_EQ_LSTM_SEGMENTS or 12
+    print(f"model: {source}, segments: {segments}")
+    print(f"{'duration':>10} {'full (s)':>9} {'sampled (s)':>12} {'speedup':>8} {'max dev dB':>11}")
+    for minutes in DURATIONS_MINUTES:
+        waveform = _track(minutes, rng)
+        full, full_s = _timed(lambda: _build_lstm_gain_curves(model, [(waveform, SAMPLE_RATE)], "pop", DELTA_CLAMP_DB))
+        sampled, sampled_s = _timed(
+            lambda: _build_lstm_gain_curves(
+                model, [(waveform, SAMPLE_RATE)], "pop", DELTA_CLAMP_DB, segments=segments
+            )
+        )
+        deviation = float(np.max(np.abs(20.0 * np.log10(sampled[0]) - 20.0 * np.log10(full[0]))))
+        print(
+            f"{minutes:>8} m {full_s:>9.2f} {sampled_s:>12.2f} {full_s / max(sampled_s, 1e-9):>7.1f}x {deviation:>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# backend/benchmarks/compressor_envelope.py
+# micro-benchmark: envelope follower ของ compressor (ลูป Python เดิม เทียบกับ kernel ใหม่)
+# รัน: python -m backend.benchmarks.compressor_envelope
+
+import math
+import time
+
+import numpy as np
+
+from backend.eq_compressor import _follow_envelope, _follow_envelope_reference
+
+SAMPLE_RATE = 44100
+CONTROL_HOP = 64
+DURATIONS_MINUTES = (1, 5, 20)
+
+
+def _coefficients(attack_ms: float = 5.0, release_ms: float = 80.0) -> tuple[float, float]:
+    frame_time_s = CONTROL_HOP / float(SAMPLE_RATE)
+    return (
+        math.exp(-frame_time_s / (attack_ms / 1000.0)),
+        math.exp(-frame_time_s / (release_ms / 1000.0)),
+    )
+
+
+def _best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    attack_coeff, release_coeff = _coefficients()
+    rng = np.random.default_rng(0)
+    # เรียกครั้งแรกเพื่อให้ numba compile ก่อนจับเวลา
+    _follow_envelope(np.zeros(16, dtype=np.float32), attack_coeff, release_coeff)
+
+    print(f"{'duration':>10} {'frames':>10} {'reference (s)':>14} {'engine (s)':>12} {'speedup':>9} {'max |diff|':>11}")
+    for minutes in DURATIONS_MINUTES:
+        frames = minutes * 60 * SAMPLE_RATE // CONTROL_HOP
+        peaks = rng.uniform(0.0, 1.0, frames).astype(np.float32)
+
+        reference_s = _best_of(lambda: _follow_envelope_reference(peaks, attack_coeff, release_coeff), 1)
+        engine_s = _best_of(lambda: _follow_envelope(peaks, attack_coeff, release_coeff), 5)
+        expected, _ = _follow_envelope_reference(peaks, attack_coeff, release_coeff)
+        actual, _ = _follow_envelope(peaks, attack_coeff, release_coeff)
+        max_diff = float(np.max(np.abs(expected - actual)))
+
+        print(
+            f"{minutes:>8} m {frames:>10} {reference_s:>14.4f} {engine_s:>12.5f} "
+            f"{reference_s / max(engine_s, 1e-9):>8.1f}x {max_diff:>11.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
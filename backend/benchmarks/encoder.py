@@ -0,0 +1,78 @@
+# backend/benchmarks/encoder.py
+# micro-benchmark: แปลง 4 stem (WAV stereo) เป็น MP3 320k แบบเดิม (pydub -> ffmpeg) เทียบกับ encoder แบบ streaming
+# วัดเวลารวมและหน่วยความจำ Python สูงสุด (tracemalloc) — แบบเดิมต้องมี ffmpeg ใน PATH ถ้าไม่มีจะข้าม
+# รัน: python -m backend.benchmarks.encoder
+
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+from backend.config import STEM_TARGETS
+from backend.services.encoder import EncoderService
+
+SAMPLE_RATE = 44100
+TRACK_SECONDS = 180
+
+
+def _convert_to_mp3_reference(wav_path: str, remove_source: bool = True) -> str:
+    """convert_to_mp3 แบบเดิม (pydub: decode ทั้งไฟล์เข้าหน่วยความจำแล้วส่งต่อให้ ffmpeg) เก็บไว้เทียบใน benchmark"""
+    try:
+        from pydub import AudioSegment
+    except ImportError as exc:
+        raise RuntimeError("ต้องติดตั้ง pydub ก่อน: pip install pydub") from exc
+
+    mp3_path = wav_path.rsplit(".", 1)[0] + ".mp3"
+    audio = AudioSegment.from_wav(wav_path)
+    audio.export(mp3_path, format="mp3", bitrate="320k")
+    if remove_source and os.path.exists(wav_path):
+        os.remove(wav_path)
+    return mp3_path
+
+
+def _write_stems(folder: str, rng: np.random.Generator) -> list[str]:
+    paths = []
+    t = np.arange(SAMPLE_RATE * TRACK_SECONDS) / SAMPLE_RATE
+    for index, stem in enumerate(STEM_TARGETS):
+        y = 0.2 * np.sin(2 * np.pi * (110.0 * (index + 1)) * t) + 0.02 * rng.standard_normal(t.size)
+        path = os.path.join(folder, f"{stem}.wav")
+        sf.write(path, np.stack((y, np.roll(y, 300)), axis=1).astype(np.float32), SAMPLE_RATE, subtype="PCM_16")
+        paths.append(path)
+    return paths
+
+
+def _measure(fn) -> tuple[float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    service = EncoderService()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = _write_stems(temp_dir, rng)
+        print(f"{len(paths)} stems x {TRACK_SECONDS} s stereo @ {SAMPLE_RATE} Hz -> MP3 320k")
+        print(f"{'variant':>10} {'seconds':>8} {'peak MB':>8}")
+        if shutil.which("ffmpeg"):
+            seconds, peak_mb = _measure(lambda: [_convert_to_mp3_reference(p, remove_source=False) for p in paths])
+            print(f"{'pydub':>10} {seconds:>8.2f} {peak_mb:>8.1f}")
+        else:
+            print(f"{'pydub':>10} {'(ข้าม: ไม่พบ ffmpeg)':>17}")
+        seconds, peak_mb = _measure(
+            lambda: [service.encode(p, p.rsplit(".", 1)[0] + ".mp3", "mp3") for p in paths]
+        )
+        print(f"{'streaming':>10} {seconds:>8.2f} {peak_mb:>8.1f}")
+        print(f"encoder realtime factor: {service.stats()['realtime_factor']}x")
+
+
+if __name__ == "__main__":
+    main()
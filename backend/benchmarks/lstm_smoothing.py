@@ -0,0 +1,57 @@
+# backend/benchmarks/lstm_smoothing.py
+# micro-benchmark: การ smooth delta ของ Auto-EQ LSTM (apply_along_axis เดิม เทียบกับ cumulative sum)
+# รัน: python -m backend.benchmarks.lstm_smoothing
+
+import time
+
+import numpy as np
+
+from backend.auto_eq_inference import (
+    HOP_LENGTH,
+    LSTM_FREQ_SMOOTH_BINS,
+    LSTM_TIME_SMOOTH_FRAMES,
+    N_MELS,
+    SR,
+    _smooth_axis,
+    _smooth_axis_reference,
+)
+
+DURATIONS_MINUTES = (1, 10)
+
+
+def _best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _smooth_both(smooth, delta_db: np.ndarray) -> np.ndarray:
+    # ลำดับเดียวกับ _lstm_gain_curve_from_delta: smooth ตามเวลา แล้วตามความถี่
+    smoothed = smooth(delta_db, axis=1, kernel_size=LSTM_TIME_SMOOTH_FRAMES)
+    return smooth(smoothed, axis=0, kernel_size=LSTM_FREQ_SMOOTH_BINS)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    print(f"{'duration':>10} {'frames':>8} {'reference (s)':>14} {'vectorized (s)':>15} {'speedup':>9} {'max |diff|':>11}")
+    for minutes in DURATIONS_MINUTES:
+        frames = 1 + minutes * 60 * SR // HOP_LENGTH
+        delta_db = rng.uniform(-2.0, 2.0, size=(N_MELS, frames)).astype(np.float32)
+
+        reference_s = _best_of(lambda: _smooth_both(_smooth_axis_reference, delta_db), 1)
+        vectorized_s = _best_of(lambda: _smooth_both(_smooth_axis, delta_db), 5)
+        max_diff = float(
+            np.max(np.abs(_smooth_both(_smooth_axis_reference, delta_db) - _smooth_both(_smooth_axis, delta_db)))
+        )
+
+        print(
+            f"{minutes:>8} m {frames:>8} {reference_s:>14.4f} {vectorized_s:>15.5f} "
+            f"{reference_s / max(vectorized_s, 1e-9):>8.1f}x {max_diff:>11.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# backend/benchmarks/pitch_shift.py
+# micro-benchmark: real-time factor ของ pitch shift แบบเดิม (librosa ทั้งไฟล์, mono) เทียบกับ engine แบบ block (stereo)
+# ที่ ±2 / ±6 / ±12 semitone (ขีดจำกัดของแพ็กเกจ FREE / BASIC / PRO ใน auth_guard.validate_tier_and_quota)
+# RTF = เวลาประมวลผล / ความยาวเพลง (ยิ่งน้อยยิ่งเร็ว)
+# รัน: python -m backend.benchmarks.pitch_shift
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from backend.pitch_shifter import pitch_shift_file
+
+SAMPLE_RATE = 44100
+TRACK_SECONDS = 120
+SEMITONES = (2, -2, 6, -6, 12, -12)
+
+
+def _pitch_shift_audio_reference(input_path: str, steps: float, output_path: str) -> str:
+    """pitch_shift_audio แบบเดิม (librosa โหลดเป็น mono ทั้งไฟล์) เก็บไว้เทียบใน benchmark"""
+    y, sr = librosa.load(input_path, sr=None)
+    shifted = librosa.effects.pitch_shift(y, sr=sr, n_steps=steps)
+    sf.write(output_path, shifted, sr)
+    return output_path
+
+
+def _write_track(path: str, rng: np.random.Generator) -> None:
+    t = np.arange(SAMPLE_RATE * TRACK_SECONDS) / SAMPLE_RATE
+    y = sum(0.1 * np.sin(2 * np.pi * freq * t) for freq in (196.0, 246.94, 293.66, 392.0))
+    y = y + 0.02 * rng.standard_normal(y.size)
+    sf.write(path, np.stack((y, np.roll(y, 500)), axis=1).astype(np.float32), SAMPLE_RATE, subtype="FLOAT")
+
+
+def _measure(fn) -> tuple[float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "track.wav")
+        output_path = os.path.join(temp_dir, "shifted.wav")
+        _write_track(input_path, rng)
+        # เรียกครั้งแรกเพื่อให้ numba/FFT plan ของ librosa พร้อมก่อนจับเวลา
+        _pitch_shift_audio_reference(input_path, 1, output_path)
+
+        print(f"track: {TRACK_SECONDS} s stereo @ {SAMPLE_RATE} Hz")
+        print(
+            f"{'semitones':>9} {'reference RTF':>14} {'engine RTF':>11} {'speedup':>8} "
+            f"{'reference MB':>13} {'engine MB':>10}"
+        )
+        for semitones in SEMITONES:
+            reference_s, reference_mb = _measure(lambda: _pitch_shift_audio_reference(input_path, semitones, output_path))
+            engine_s, engine_mb = _measure(lambda: pitch_shift_file(input_path, output_path, semitones))
+            print(
+                f"{semitones:>+9d} {reference_s / TRACK_SECONDS:>14.4f} {engine_s / TRACK_SECONDS:>11.4f} "
+                f"{reference_s / max(engine_s, 1e-9):>7.1f}x {reference_mb:>13.1f} {engine_mb:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,27 @@ import asyncio
 import shutil
 import logging
 
-from backend.config import ALL_CLEANUP_DIRS, DEFAULT_CLEANUP_TTL_SECONDS, CLEANUP_INTERVAL_SECONDS
+from backend.config import (
+    ALL_CLEANUP_DIRS,
+    DEFAULT_CLEANUP_TTL_SECONDS,
+    CLEANUP_INTERVAL_SECONDS,
+    RESULT_CACHE_TTL_SECONDS,
+)
+from backend.services.job_manager import job_manager
+from backend.services.result_cache import result_cache
+from backend.services.artifact_registry import artifact_registry
 
 logger = logging.getLogger(__name__)
 
 # โฟลเดอร์ทั้งหมดที่ต้องตรวจสอบลบไฟล์เก่า (ดึงมาจาก backend.config)
 CLEANUP_DIRS = ALL_CLEANUP_DIRS
 
+
+def _belongs_to_active_job(filename: str, active_ids: set[str]) -> bool:
+    # ไฟล์ของงานมีชื่อเป็น {file_id}, {file_id}.wav หรือ {file_id}_xxx (เช่น zip)
+    stem = filename.split(".", 1)[0]
+    return any(stem == file_id or filename.startswith(f"{file_id}_") for file_id in active_ids)
+
 async def periodic_cleanup(interval_seconds: int = CLEANUP_INTERVAL_SECONDS, ttl_seconds: int = DEFAULT_CLEANUP_TTL_SECONDS):
     """
     งานเบื้องหลังสำหรับกวาดลบไฟล์/โฟลเดอร์ที่เก่าเกินเวลาที่กำหนด (ttl_seconds)
@@ -20,6 +34,13 @@ async def periodic_cleanup(interval_seconds: int = CLEANUP_INTERVAL_SECONDS, ttl
     while True:
         try:
             now = time.time()
+            # งานที่ยังรอคิว/กำลังประมวลผลอยู่ ห้ามลบไฟล์ input/output ของงานนั้น
+            active_ids = await asyncio.to_thread(job_manager.active_file_ids)
+            await asyncio.to_thread(job_manager.purge_finished_jobs, ttl_seconds)
+            # แคชผลลัพธ์มี TTL ของตัวเอง และ evict แบบ LRU เมื่อเกินขนาดที่กำหนด
+            await asyncio.to_thread(result_cache.evict, RESULT_CACHE_TTL_SECONDS)
+            # รายการใน artifact registry หมดอายุพร้อมไฟล์ (TTL เดียวกัน)
+            await asyncio.to_thread(artifact_registry.purge_expired)
             for d in CLEANUP_DIRS:
                 if not os.path.exists(d):
                     continue
@@ -27,6 +48,8 @@ async def periodic_cleanup(interval_seconds: int = CLEANUP_INTERVAL_SECONDS, ttl
                 # อ่านรายการไฟล์และโฟลเดอร์ทั้งหมดในไดเรกทอรี
                 for filename in os.listdir(d):
                     file_path = os.path.join(d, filename)
+                    if _belongs_to_active_job(filename, active_ids):
+                        continue
                     
                     try:
                         # เช็คเวลาสร้าง/แก้ไขล่าสุด
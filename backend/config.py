@@ -8,12 +8,21 @@ DIR_UPLOADS = "uploads"
 DIR_SEPARATED = "separated"
 DIR_EQ_APPLIED = "eq_applied"
 DIR_COMPRESSED = "compressed"
+# ฐานข้อมูลคิวงาน (ไม่อยู่ในรายการ cleanup เพราะต้องอยู่ข้าม restart)
+DIR_JOBS = "jobs"
+# แคชผลลัพธ์แบบ content-addressed (มี TTL/ขนาดของตัวเอง จึงไม่อยู่ในรายการ cleanup ปกติ)
+DIR_CACHE = "cache"
 
 # รายการโฟลเดอร์ทั้งหมดที่ต้องกวาดลบไฟล์หมดอายุ (รวม compressed ไว้แล้ว)
 ALL_CLEANUP_DIRS = [DIR_UPLOADS, DIR_SEPARATED, DIR_EQ_APPLIED, DIR_COMPRESSED]
 
-# ขนาดไฟล์อัปโหลดสูงสุด (100MB)
-MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+# ขนาดไฟล์อัปโหลดสูงสุด (ค่าเริ่มต้น 100MB)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+# แคชผลลัพธ์ (key = hash ของไฟล์อัปโหลด + operation + พารามิเตอร์ + model id)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(24 * 3600)))
 
 # ระยะเวลาหมดอายุและช่วงเวลารันระบบ cleanup (วินาที)
 DEFAULT_CLEANUP_TTL_SECONDS = int(os.getenv("SEPARATE_TTL_SECONDS", "1200"))
@@ -22,6 +31,91 @@ CLEANUP_INTERVAL_SECONDS = int(os.getenv("CLEANUP_INTERVAL_SECONDS", "300"))
 # ข้อจำกัด Concurrency
 MAX_CONCURRENT_TASKS = int(os.getenv("MAX_CONCURRENT_TASKS", "2"))
 
+# Admission control แยกตามชนิดทรัพยากร (แทน semaphore ตัวเดียว)
+# CONCURRENCY = จำนวนงานที่รันพร้อมกัน, QUEUE = จำนวนงานที่รอได้ก่อนปฏิเสธด้วย 429
+SCHED_SEPARATION_CONCURRENCY = int(os.getenv("SCHED_SEPARATION_CONCURRENCY", str(MAX_CONCURRENT_TASKS)))
+SCHED_SEPARATION_QUEUE = int(os.getenv("SCHED_SEPARATION_QUEUE", "20"))
+SCHED_INFERENCE_CONCURRENCY = int(os.getenv("SCHED_INFERENCE_CONCURRENCY", str(MAX_CONCURRENT_TASKS)))
+SCHED_INFERENCE_QUEUE = int(os.getenv("SCHED_INFERENCE_QUEUE", "8"))
+SCHED_LIGHT_DSP_CONCURRENCY = int(os.getenv("SCHED_LIGHT_DSP_CONCURRENCY", str(MAX_CONCURRENT_TASKS)))
+SCHED_LIGHT_DSP_QUEUE = int(os.getenv("SCHED_LIGHT_DSP_QUEUE", "16"))
+SCHED_ENCODING_CONCURRENCY = int(os.getenv("SCHED_ENCODING_CONCURRENCY", str(MAX_CONCURRENT_TASKS)))
+SCHED_ENCODING_QUEUE = int(os.getenv("SCHED_ENCODING_QUEUE", "16"))
+
+# โหลดโมเดลล่วงหน้าตอนเริ่มเซิร์ฟเวอร์ (คั่นด้วย comma เช่น "umxl,cnn-v1,lstm-last" หรือ "all"; ว่าง = ไม่โหลด)
+# /ready จะตอบ 503 จนกว่าโมเดลที่ระบุจะโหลดและอุ่นเครื่องเสร็จ
+PRELOAD_MODELS = [name.strip() for name in os.getenv("PRELOAD_MODELS", "").split(",") if name.strip()]
+
+# Execution backend ของงาน CPU หนัก: "thread" (asyncio.to_thread, ค่าเดิม) หรือ "process"
+# (process pool แยกตามชนิดงาน: separation / inference / dsp เพื่อไม่ให้ติด GIL และกระจายงานได้หลาย core)
+DSP_EXECUTOR = os.getenv("DSP_EXECUTOR", "thread").strip().lower()
+EXECUTOR_SEPARATION_WORKERS = int(os.getenv("EXECUTOR_SEPARATION_WORKERS", "1"))
+EXECUTOR_INFERENCE_WORKERS = int(os.getenv("EXECUTOR_INFERENCE_WORKERS", "1"))
+EXECUTOR_DSP_WORKERS = int(os.getenv("EXECUTOR_DSP_WORKERS", str(max((os.cpu_count() or 2) - 1, 1))))
+# recycle worker หลังทำงานครบ N งาน (กัน memory รั่ว/fragmentation สะสม) — 0 = ไม่ recycle
+EXECUTOR_MAX_TASKS_PER_CHILD = int(os.getenv("EXECUTOR_MAX_TASKS_PER_CHILD", "50"))
+# จำกัด address space ต่อ worker (MB, RLIMIT_AS บน Linux) — 0 = ไม่จำกัด
+EXECUTOR_MAX_MEMORY_MB = int(os.getenv("EXECUTOR_MAX_MEMORY_MB", "0"))
+# จำนวน thread ของ PyTorch ต่อ worker (กัน oversubscription เมื่อมีหลาย process) — 0 = ค่าเริ่มต้นของ torch
+EXECUTOR_TORCH_THREADS = int(os.getenv("EXECUTOR_TORCH_THREADS", "0"))
+
+# คิวงานแยก Stem แบบถาวร (SQLite ใช้ร่วมกันทุก uvicorn worker)
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(DIR_JOBS, "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(MAX_CONCURRENT_TASKS)))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1.0"))
+# worker ส่ง heartbeat ระหว่างประมวลผล ถ้าขาดหายนานกว่า JOB_STALE_SECONDS ถือว่า worker ตายแล้วคืนงานเข้าคิว
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# การแยก Stem แบบแบ่งช่วง (Segmented): ความยาวหน้าต่างและช่วง crossfade ระหว่างหน้าต่าง (วินาที)
+# ตั้ง SEPARATION_SEGMENT_SECONDS=0 เพื่อใช้โหมดเดิม (ประมวลผลทั้งไฟล์ในครั้งเดียว)
+SEPARATION_SEGMENT_SECONDS = float(os.getenv("SEPARATION_SEGMENT_SECONDS", "0"))
+SEPARATION_OVERLAP_SECONDS = float(os.getenv("SEPARATION_OVERLAP_SECONDS", "2"))
+# จำนวน thread ของ PyTorch สำหรับ session แยกเสียง (0 = ค่าเริ่มต้นของ torch)
+SEPARATION_NUM_THREADS = int(os.getenv("SEPARATION_NUM_THREADS", "0"))
+
+# Compressor แบบ streaming: ไฟล์ที่ใหญ่กว่าเกณฑ์นี้จะถูกอ่าน/เขียนทีละ block (ผลลัพธ์เท่าเดิมทุกบิต)
+COMPRESSOR_STREAMING_MIN_BYTES = int(os.getenv("COMPRESSOR_STREAMING_MIN_BYTES", str(32 * 1024 * 1024)))
+COMPRESSOR_BLOCK_FRAMES = int(os.getenv("COMPRESSOR_BLOCK_FRAMES", "262144"))
+
+# Auto-EQ แบบ streaming (สองรอบ analyze/apply): ไฟล์ที่ใหญ่กว่าเกณฑ์นี้จะถูกประมวลผลทีละ block
+AUTO_EQ_STREAMING_MIN_BYTES = int(os.getenv("AUTO_EQ_STREAMING_MIN_BYTES", str(32 * 1024 * 1024)))
+AUTO_EQ_BLOCK_FRAMES = int(os.getenv("AUTO_EQ_BLOCK_FRAMES", "262144"))
+# Auto-EQ LSTM: จำนวนหน้าต่างตัวอย่าง (ยาว 5 วินาที กระจายเท่า ๆ กัน) ที่ใช้ประมาณ curve (0 = ใช้ทุกเฟรมของเพลง)
+AUTO_EQ_LSTM_SEGMENTS = int(os.getenv("AUTO_EQ_LSTM_SEGMENTS", "12"))
+
+# /analyze?mode=fast: resample ครั้งเดียวที่ ANALYSIS_SAMPLE_RATE แล้ววิเคราะห์เฉพาะช่วงตัวอย่าง
+# (ANALYSIS_EXCERPTS ช่วง ยาวช่วงละ ANALYSIS_EXCERPT_SECONDS วินาที กระจายเท่า ๆ กันทั้งเพลง)
+ANALYSIS_SAMPLE_RATE = int(os.getenv("ANALYSIS_SAMPLE_RATE", "22050"))
+ANALYSIS_EXCERPTS = int(os.getenv("ANALYSIS_EXCERPTS", "3"))
+ANALYSIS_EXCERPT_SECONDS = float(os.getenv("ANALYSIS_EXCERPT_SECONDS", "15"))
+
+# Pitch shift แบบ streaming (ทุก channel): จำนวนเฟรมที่อ่าน/ประมวลผลต่อ block
+PITCH_SHIFT_BLOCK_FRAMES = int(os.getenv("PITCH_SHIFT_BLOCK_FRAMES", "65536"))
+# Pitch variant ของ stem ที่ render ล่วงหน้าเบื้องหลังหลัง /separate เสร็จ (ค่าว่าง = ปิด)
+# และระยะเวลาที่งานเบื้องหลังรอระหว่างตรวจว่า light_dsp pool ว่าง (ให้งาน interactive ได้ก่อน)
+PITCH_VARIANT_SEMITONES = tuple(
+    int(value) for value in os.getenv("PITCH_VARIANT_SEMITONES", "-2,-1,1,2").split(",") if value.strip()
+)
+PITCH_VARIANT_IDLE_POLL_SECONDS = float(os.getenv("PITCH_VARIANT_IDLE_POLL_SECONDS", "0.5"))
+
+# Encoder แบบ streaming (libsndfile: MP3 ผ่าน LAME, FLAC, WAV) แทน pydub
+# จำนวนไฟล์ที่ encode พร้อมกันได้สูงสุด (ค่าเริ่มต้น = จำนวน core), จำนวนเฟรมต่อ block และ bitrate ของ MP3 (CBR)
+ENCODER_MAX_CONCURRENT = int(os.getenv("ENCODER_MAX_CONCURRENT", str(os.cpu_count() or 1)))
+ENCODER_BLOCK_FRAMES = int(os.getenv("ENCODER_BLOCK_FRAMES", "65536"))
+ENCODER_MP3_BITRATE_KBPS = int(os.getenv("ENCODER_MP3_BITRATE_KBPS", "320"))
+
+# Waveform peaks (min/max) ของ stem ที่สร้างระหว่างแยกเสียง: จำนวน sample ต่อ peak ของแต่ละระดับ zoom
+# (เรียงจากละเอียดไปหยาบ แต่ละค่าต้องหารค่าถัดไปลงตัว, ค่าว่าง = ไม่สร้างตอนแยกเสียง)
+WAVEFORM_PEAK_SAMPLES_PER_PEAK = tuple(
+    int(value) for value in os.getenv("WAVEFORM_PEAK_SAMPLES_PER_PEAK", "256,1024,4096,16384").split(",") if value.strip()
+)
+# Spectrogram tiles ของ stem (สร้างครั้งเดียวต่อ stem เมื่อถูกขอครั้งแรก): จำนวนระดับ zoom
+# (ระดับ L รวม 2^L เฟรม x 2^L bin) และขนาดด้านของ tile (จำนวนเฟรม/bin ต่อ tile)
+SPECTROGRAM_LEVELS = int(os.getenv("SPECTROGRAM_LEVELS", "4"))
+SPECTROGRAM_TILE_SIZE = int(os.getenv("SPECTROGRAM_TILE_SIZE", "256"))
+
 # สเต็มเป้าหมายและ Genres ที่รองรับในระบบ
 STEM_TARGETS = ("vocals", "drums", "bass", "other")
 SUPPORTED_GENRES = ("pop", "rock", "trap", "country", "soul")
@@ -8,9 +8,18 @@ import math
 import os
 
 import numpy as np
+import soundfile as sf
 import torchaudio
 import torch
 
+from backend.config import COMPRESSOR_BLOCK_FRAMES, COMPRESSOR_STREAMING_MIN_BYTES
+
+try:
+    # numba ติดมากับ librosa อยู่แล้ว ใช้ compile ลูป envelope เป็น machine code
+    from numba import njit
+except ImportError:  # pragma: no cover - fallback เมื่อไม่มี numba
+    njit = None
+
 # preset แต่ละ genre ใช้เป็นค่าเริ่มต้นก่อนจะถูกปรับเพิ่มด้วย strength หรือ override จากผู้ใช้
 COMP_GENRE_PRESETS = {
     "general": {"threshold": -24.0, "ratio": 4.0, "attack": 5, "release": 80},
@@ -67,21 +76,77 @@ def _compute_gain_reduction_db(
     return reduction_db
 
 
-def _compress_waveform(
-    waveform: torch.Tensor,
+def _follow_envelope_reference(
+    peaks: np.ndarray,
+    attack_coeff: float,
+    release_coeff: float,
+    initial: float = 0.0,
+) -> tuple[np.ndarray, float]:
+    # ลูป Python ต้นแบบ (ใช้เป็น fallback และเป็นค่าอ้างอิงในการทดสอบ)
+    envelope = np.zeros_like(peaks, dtype=np.float32)
+    env_prev = np.float32(initial)
+    for idx, peak in enumerate(peaks):
+        # ใช้ attack/release คนละ coefficient เพื่อให้ envelope ตอบสนองแบบ compressor จริง
+        coeff = attack_coeff if peak > env_prev else release_coeff
+        env_prev = coeff * env_prev + (1.0 - coeff) * peak
+        envelope[idx] = env_prev
+    return envelope, float(env_prev)
+
+
+if njit is not None:
+
+    @njit(cache=True, nogil=True)
+    def _follow_envelope_kernel(peaks, attack_coeff, attack_rest, release_coeff, release_rest, initial):  # pragma: no cover - compiled
+        # สูตรเดียวกับ _follow_envelope_reference ทุกขั้น: ลูปเดิมคำนวณเป็น float32
+        # (python float คูณ np.float32 ได้ float32 ตามกฎ promotion ของ NumPy 2) จึงคำนวณ float32 ให้ตรงกันทุกบิต
+        envelope = np.empty(peaks.shape[0], dtype=np.float32)
+        env_prev = initial
+        for idx in range(peaks.shape[0]):
+            peak = peaks[idx]
+            if peak > env_prev:
+                env_prev = attack_coeff * env_prev + attack_rest * peak
+            else:
+                env_prev = release_coeff * env_prev + release_rest * peak
+            envelope[idx] = env_prev
+        return envelope, env_prev
+
+else:
+    _follow_envelope_kernel = None
+
+
+def _follow_envelope(
+    peaks: np.ndarray,
+    attack_coeff: float,
+    release_coeff: float,
+    initial: float = 0.0,
+) -> tuple[np.ndarray, float]:
+    """คำนวณ envelope แบบ attack/release จาก peak ต่อเฟรม คืน (envelope, state สุดท้าย)
+
+    ใช้ kernel ที่ compile ด้วย numba ถ้ามี (เร็วกว่าลูป Python หลายสิบเท่า)
+    state สุดท้ายใช้ต่อ envelope ข้าม block ได้ในโหมด streaming
+    """
+    peaks = np.ascontiguousarray(peaks, dtype=np.float32)
+    if _follow_envelope_kernel is None:
+        return _follow_envelope_reference(peaks, attack_coeff, release_coeff, initial)
+    envelope, env_last = _follow_envelope_kernel(
+        peaks,
+        np.float32(attack_coeff),
+        np.float32(1.0 - attack_coeff),
+        np.float32(release_coeff),
+        np.float32(1.0 - release_coeff),
+        np.float32(initial),
+    )
+    return envelope, float(env_last)
+
+
+def _validate_compressor_args(
     sample_rate: int,
-    threshold: float,
     ratio: float,
     attack: float,
     release: float,
     knee: float,
-    makeup_gain: float,
-    dry_wet: float,
     output_ceiling: float | None,
-    control_hop: int = 64,
-) -> torch.Tensor:
-    # แกนหลักของ compressor:
-    # สร้าง envelope, คำนวณ gain reduction, แล้วผสม dry/wet ก่อนคืนผลลัพธ์
+) -> None:
     if sample_rate <= 0:
         raise ValueError("sample_rate must be > 0.")
     if ratio < 1.0:
@@ -95,23 +160,34 @@ def _compress_waveform(
     if output_ceiling is not None and output_ceiling > 0.0:
         raise ValueError("output_ceiling must be <= 0 dBFS.")
 
-    # แปลง Tensor เป็น numpy เพื่อคำนวณระดับสัญญาณแบบ sample-by-sample ได้ง่าย
-    mix = _normalize_mix_value(dry_wet)
 
-    # ย้ายข้อมูลมาอยู่บน CPU และแปลงเป็น float32 เพื่อให้คำนวณด้วย numpy ได้ง่าย
-    wave = waveform.detach().cpu().numpy().astype(np.float32)
-    if wave.ndim == 1:
-        # ถ้าเป็น mono ให้เพิ่มแกน channel เพื่อให้โค้ดด้านล่างใช้รูปแบบเดียวกันเสมอ
-        wave = wave[np.newaxis, :]
-    if wave.shape[1] == 0:
-        # ถ้าไฟล์ว่างก็คืนค่าเดิมทันที
-        return waveform
+def _envelope_coefficients(sample_rate: int, hop: int, attack: float, release: float) -> tuple[float, float]:
+    # attack/release กำหนดความเร็วในการตอบสนองของ envelope เมื่อระดับสัญญาณเปลี่ยน
+    attack_s = max(float(attack), 0.1) / 1000.0
+    release_s = max(float(release), 0.1) / 1000.0
+    frame_time_s = hop / float(sample_rate)
+    return math.exp(-frame_time_s / attack_s), math.exp(-frame_time_s / release_s)
+
 
-    dry = wave.copy()
+def _compress_block(
+    wave: np.ndarray,
+    hop: int,
+    coefficients: tuple[float, float],
+    threshold: float,
+    ratio: float,
+    knee: float,
+    makeup_gain: float,
+    mix: float,
+    env_state: float = 0.0,
+) -> tuple[np.ndarray, float]:
+    """บีบอัด wave รูปทรง (channels, frames) หนึ่งช่วง แล้วคืน (mixed, state ของ envelope)
+
+    ถ้าเรียกต่อกันทีละ block ที่ยาวเป็นจำนวนเท่าของ hop (ยกเว้น block สุดท้าย)
+    พร้อมส่ง state ต่อ จะได้ผลลัพธ์เท่ากับการประมวลผลทั้งไฟล์ในครั้งเดียวทุกบิต
+    """
     # ใช้ peak ของทุก channel เป็น sidechain กลางสำหรับบีบอัดทั้งสัญญาณ
     sidechain = np.max(np.abs(wave), axis=0)
 
-    hop = max(int(control_hop), 1)
     # pad สัญญาณให้หารด้วย hop ลงตัวก่อน reshape เป็นเฟรมควบคุม
     pad_len = (-sidechain.shape[0]) % hop
     if pad_len > 0:
@@ -121,21 +197,7 @@ def _compress_waveform(
 
     # ยุบสัญญาณเป็น peak ต่อเฟรม เพื่อใช้เป็นตัวควบคุม envelope ของ compressor
     peaks = sidechain_padded.reshape(-1, hop).max(axis=1).astype(np.float32)
-    envelope = np.zeros_like(peaks, dtype=np.float32)
-
-    # attack/release กำหนดความเร็วในการตอบสนองของ envelope เมื่อระดับสัญญาณเปลี่ยน
-    attack_s = max(float(attack), 0.1) / 1000.0
-    release_s = max(float(release), 0.1) / 1000.0
-    frame_time_s = hop / float(sample_rate)
-    attack_coeff = math.exp(-frame_time_s / attack_s)
-    release_coeff = math.exp(-frame_time_s / release_s)
-
-    env_prev = 0.0
-    for idx, peak in enumerate(peaks):
-        # ใช้ attack/release คนละ coefficient เพื่อให้ envelope ตอบสนองแบบ compressor จริง
-        coeff = attack_coeff if peak > env_prev else release_coeff
-        env_prev = coeff * env_prev + (1.0 - coeff) * peak
-        envelope[idx] = env_prev
+    envelope, env_state = _follow_envelope(peaks, coefficients[0], coefficients[1], env_state)
 
     # แปลง envelope ไปอยู่ในสเกล dB ก่อนคำนวณ gain reduction
     levels_db = 20.0 * np.log10(np.maximum(envelope, 1e-8))
@@ -155,20 +217,135 @@ def _compress_waveform(
     # wet คือสัญญาณที่ผ่านการบีบอัดแล้ว
     wet = wave * gain_samples[np.newaxis, :]
     # dry/wet ช่วยผสมสัญญาณเดิมกลับเข้าไปได้แบบ parallel compression
-    mixed = dry * (1.0 - mix) + wet * mix
+    mixed = wave * (1.0 - mix) + wet * mix
+    return mixed, env_state
 
-    if output_ceiling is not None:
-        # จำกัด peak ขั้นสุดท้ายเพื่อไม่ให้ดังเกิน ceiling ที่ผู้ใช้ตั้งไว้
-        ceiling_lin = 10.0 ** (float(output_ceiling) / 20.0)
-        peak = float(np.max(np.abs(mixed)))
-        if peak > ceiling_lin and peak > 1e-8:
-            mixed *= ceiling_lin / peak
+
+def _ceiling_scale(peak: float, output_ceiling: float | None) -> float | None:
+    # คืนตัวคูณสำหรับจำกัด peak ขั้นสุดท้ายไม่ให้ดังเกิน ceiling (None = ไม่ต้องปรับ)
+    if output_ceiling is None:
+        return None
+    ceiling_lin = 10.0 ** (float(output_ceiling) / 20.0)
+    if peak > ceiling_lin and peak > 1e-8:
+        return ceiling_lin / peak
+    return None
+
+
+def _compress_waveform(
+    waveform: torch.Tensor,
+    sample_rate: int,
+    threshold: float,
+    ratio: float,
+    attack: float,
+    release: float,
+    knee: float,
+    makeup_gain: float,
+    dry_wet: float,
+    output_ceiling: float | None,
+    control_hop: int = 64,
+) -> torch.Tensor:
+    # แกนหลักของ compressor:
+    # สร้าง envelope, คำนวณ gain reduction, แล้วผสม dry/wet ก่อนคืนผลลัพธ์
+    _validate_compressor_args(sample_rate, ratio, attack, release, knee, output_ceiling)
+
+    # แปลง Tensor เป็น numpy เพื่อคำนวณระดับสัญญาณแบบ sample-by-sample ได้ง่าย
+    mix = _normalize_mix_value(dry_wet)
+
+    # ย้ายข้อมูลมาอยู่บน CPU และแปลงเป็น float32 เพื่อให้คำนวณด้วย numpy ได้ง่าย
+    wave = waveform.detach().cpu().numpy().astype(np.float32)
+    if wave.ndim == 1:
+        # ถ้าเป็น mono ให้เพิ่มแกน channel เพื่อให้โค้ดด้านล่างใช้รูปแบบเดียวกันเสมอ
+        wave = wave[np.newaxis, :]
+    if wave.shape[1] == 0:
+        # ถ้าไฟล์ว่างก็คืนค่าเดิมทันที
+        return waveform
+
+    hop = max(int(control_hop), 1)
+    mixed, _ = _compress_block(
+        wave,
+        hop,
+        _envelope_coefficients(sample_rate, hop, attack, release),
+        threshold=threshold,
+        ratio=ratio,
+        knee=knee,
+        makeup_gain=makeup_gain,
+        mix=mix,
+    )
+
+    scale = _ceiling_scale(float(np.max(np.abs(mixed))), output_ceiling)
+    if scale is not None:
+        mixed *= scale
 
     # กันค่าเกินช่วงเสียงมาตรฐานก่อนแปลงกลับเป็น Tensor
     mixed = np.clip(mixed, -1.0, 1.0).astype(np.float32)
     return torch.from_numpy(mixed)
 
 
+def _compress_file_streaming(
+    input_path: str,
+    output_path: str,
+    threshold: float,
+    ratio: float,
+    attack: float,
+    release: float,
+    knee: float,
+    makeup_gain: float,
+    dry_wet: float,
+    output_ceiling: float | None,
+    control_hop: int = 64,
+    block_frames: int | None = None,
+) -> None:
+    """บีบอัดไฟล์ทีละ block ผ่าน soundfile โดยส่ง state ของ envelope ต่อข้าม block
+
+    - ผลลัพธ์เท่ากับ _compress_waveform ทุกบิต แต่ใช้หน่วยความจำตามขนาด block ไม่ใช่ความยาวไฟล์
+    - output_ceiling ต้องรู้ peak ของทั้งไฟล์ก่อน จึงสแกนรอบแรกเพื่อหา peak (ไม่เขียนไฟล์)
+      แล้วค่อยประมวลผลซ้ำพร้อมคูณ scale และเขียนไฟล์ในรอบที่สอง
+    """
+    sample_rate = sf.info(input_path).samplerate
+    _validate_compressor_args(sample_rate, ratio, attack, release, knee, output_ceiling)
+    mix = _normalize_mix_value(dry_wet)
+
+    hop = max(int(control_hop), 1)
+    coefficients = _envelope_coefficients(sample_rate, hop, attack, release)
+    # ขนาด block ต้องหารด้วย hop ลงตัว เพื่อให้เฟรมควบคุมตรงกับการประมวลผลทั้งไฟล์
+    block_value = COMPRESSOR_BLOCK_FRAMES if block_frames is None else int(block_frames)
+    block = max(block_value // hop, 1) * hop
+
+    def _blocks():
+        env_state = 0.0
+        with sf.SoundFile(input_path) as source:
+            for data in source.blocks(blocksize=block, dtype="float32", always_2d=True):
+                mixed, env_state = _compress_block(
+                    np.ascontiguousarray(data.T),
+                    hop,
+                    coefficients,
+                    threshold=threshold,
+                    ratio=ratio,
+                    knee=knee,
+                    makeup_gain=makeup_gain,
+                    mix=mix,
+                    env_state=env_state,
+                )
+                yield mixed
+
+    scale = None
+    if output_ceiling is not None:
+        # รอบแรก: สแกนหา peak ของสัญญาณหลังบีบอัดทั้งไฟล์
+        peak = 0.0
+        for mixed in _blocks():
+            if mixed.shape[1]:
+                peak = max(peak, float(np.max(np.abs(mixed))))
+        scale = _ceiling_scale(peak, output_ceiling)
+
+    with sf.SoundFile(input_path) as source:
+        channels = source.channels
+    with sf.SoundFile(output_path, mode="w", samplerate=sample_rate, channels=channels, subtype="FLOAT") as writer:
+        for mixed in _blocks():
+            if scale is not None:
+                mixed *= scale
+            writer.write(np.clip(mixed, -1.0, 1.0).astype(np.float32).T)
+
+
 def apply_compression(
     input_path: str,
     strength: str = "medium",
@@ -183,9 +360,11 @@ def apply_compression(
     makeup_gain: float = 0.0,
     dry_wet: float = 100.0,
     output_ceiling: float | None = None,
+    streaming: bool | None = None,
 ) -> str:
     # ฟังก์ชันนี้เป็นตัวเชื่อมระหว่าง API layer กับ DSP จริง:
     # โหลดไฟล์, รวม preset + override, บีบอัดเสียง, แล้วบันทึกไฟล์ผลลัพธ์
+    # streaming=None: เลือกโหมด streaming อัตโนมัติเมื่อไฟล์ใหญ่กว่า COMPRESSOR_STREAMING_MIN_BYTES
     os.makedirs(output_dir, exist_ok=True)
 
     # สร้างชื่อไฟล์ปลายทางจากชื่อเดิมและ genre ที่ใช้ปรับ
@@ -196,9 +375,6 @@ def apply_compression(
         )
     output_path = os.path.join(output_dir, f"{os.path.splitext(filename)[0]}_{genre}_compressed.wav")
 
-    # โหลด waveform และ sample rate จากไฟล์ต้นฉบับ
-    waveform, sample_rate = torchaudio.load(input_path)
-
     # เริ่มจาก preset ตาม genre แล้วค่อยขยับตาม strength และค่าที่ผู้ใช้ส่ง override มา
     genre_kwargs = COMP_GENRE_PRESETS.get(genre, COMP_GENRE_PRESETS["general"]).copy()
 
@@ -224,6 +400,29 @@ def apply_compression(
     # ถ้าผู้ใช้ไม่ส่ง knee มา ให้ใช้ค่า soft knee กลาง ๆ เป็น default
     knee_value = 6.0 if knee is None else float(knee)
 
+    if streaming is None:
+        streaming = os.path.getsize(input_path) >= COMPRESSOR_STREAMING_MIN_BYTES
+
+    if streaming:
+        # อ่าน/เขียนทีละ block ผลลัพธ์เหมือนโหมดปกติ แต่ไม่โหลดทั้งไฟล์เข้า RAM
+        _compress_file_streaming(
+            input_path,
+            output_path,
+            threshold=genre_kwargs["threshold"],
+            ratio=genre_kwargs["ratio"],
+            attack=genre_kwargs["attack"],
+            release=genre_kwargs["release"],
+            knee=knee_value,
+            makeup_gain=float(makeup_gain),
+            dry_wet=float(dry_wet),
+            output_ceiling=output_ceiling,
+        )
+        print(f"Compression ({strength}, genre={genre}, streaming) done: {output_path}")
+        return output_path
+
+    # โหลด waveform และ sample rate จากไฟล์ต้นฉบับ
+    waveform, sample_rate = torchaudio.load(input_path)
+
     # ส่งค่าทั้งหมดเข้าแกน compressor แล้วเซฟผลเป็นไฟล์ WAV
     compressed = _compress_waveform(
         waveform=waveform,
@@ -10,8 +10,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
+from backend.config import JOB_WORKERS, PRELOAD_MODELS
 from backend.cleanup_task import periodic_cleanup
-from backend.routers import stems, audio_ops
+from backend.routers import stems, audio_ops, jobs
+from backend.services import job_worker
+from backend.services.executor import start_executors, shutdown_executors
+from backend.services.scheduler import scheduler_metrics
+from backend.services.result_cache import result_cache
+from backend.services.pitch_variants import pitch_variants
+from backend.services.spectrograms import spectrograms
+from backend.services.encoder import encoder
+from backend.services.artifact_registry import artifact_registry
+from backend.services.job_manager import job_manager
+from backend.services.model_warmup import preload_models, readiness
 
 # ตั้งค่า Logging
 logging.basicConfig(level=logging.INFO)
@@ -23,12 +34,26 @@ cleanup_ttl = int(os.getenv("SEPARATE_TTL_SECONDS", "1200"))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # สร้างทะเบียน artifact ใหม่จากไฟล์ผลลัพธ์บนดิสก์ (ข้ามงานที่ยังไม่เสร็จ — worker จะลงทะเบียนเองเมื่อจบงาน)
+    active_ids = await asyncio.to_thread(job_manager.active_file_ids)
+    await asyncio.to_thread(artifact_registry.rebuild_from_disk, active_ids)
     # เริ่มต้น background task กวาดลบไฟล์ชั่วคราวที่หมดอายุ
     cleanup_task = asyncio.create_task(periodic_cleanup(interval_seconds=300, ttl_seconds=cleanup_ttl))
-    logger.info("FastAPI backend started with background cleanup task.")
+    # สร้าง process pool ของงาน CPU หนักล่วงหน้า (เมื่อ DSP_EXECUTOR=process)
+    start_executors()
+    # โหลดและอุ่นเครื่องโมเดลใน background (ไม่บล็อกการเริ่มเซิร์ฟเวอร์; ดูสถานะที่ /ready)
+    warmup_task = asyncio.create_task(preload_models(PRELOAD_MODELS)) if PRELOAD_MODELS else None
+    # เริ่ม worker pool ที่ดึงงานจากคิวถาวร (เช่น /separate) มาประมวลผลเบื้องหลัง
+    worker_tasks = job_worker.start_workers(JOB_WORKERS)
+    logger.info("FastAPI backend started with background cleanup task and %d job workers.", JOB_WORKERS)
     yield
     # เมื่อปิดการทำงานเซิร์ฟเวอร์
     cleanup_task.cancel()
+    if warmup_task is not None:
+        warmup_task.cancel()
+    for task in worker_tasks:
+        task.cancel()
+    shutdown_executors()
     logger.info("FastAPI backend shutting down.")
 
 
@@ -51,12 +76,23 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
     # ให้ browser อ่านค่า X-File-Id จาก response ของ Auto-EQ/Compressor/Pitch ได้
-    expose_headers=["X-File-Id"],
+    # Retry-After เมื่อคิวเต็ม (429), X-Pitch-Variant ของ pitch variant ที่ render ล่วงหน้า, ขนาดของ spectrogram tile
+    # และช่วงเวลาจริงของไฟล์ที่ตัดด้วย ?start=&end=
+    expose_headers=[
+        "X-File-Id",
+        "Retry-After",
+        "X-Pitch-Variant",
+        "X-Tile-Width",
+        "X-Tile-Height",
+        "X-Slice-Start",
+        "X-Slice-End",
+    ],
 )
 
 # ลงทะเบียน Routers
 app.include_router(stems.router)
 app.include_router(audio_ops.router)
+app.include_router(jobs.router)
 
 
 @app.exception_handler(Exception)
@@ -77,3 +113,33 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
 async def health():
     """Health check endpoint สำหรับตรวจสอบสถานะเซิร์ฟเวอร์"""
     return {"status": "ok", "service": "HarmoniQ API Backend"}
+
+
+def _readiness_status(models: dict) -> str:
+    return "failed" if any(state["state"] == "failed" for state in models.values()) else "warming"
+
+
+@app.get("/ready", tags=["health"])
+async def ready():
+    """Readiness check: 200 เมื่อโมเดลใน PRELOAD_MODELS โหลดและอุ่นเครื่องเสร็จแล้ว มิฉะนั้น 503
+
+    ต่างจาก /health ที่บอกแค่ว่า process ยังทำงานอยู่
+    """
+    is_ready, models = readiness(PRELOAD_MODELS)
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"status": "ready" if is_ready else _readiness_status(models), "models": models},
+    )
+
+
+@app.get("/metrics", tags=["health"])
+async def metrics():
+    """สถานะคิวของแต่ละ resource pool (active / queue_depth / rejected / เวลาเฉลี่ยต่องาน)
+    สถิติแคชผลลัพธ์ hit rate ของ pitch variant ที่ render ล่วงหน้า throughput ของ encoder และ spectrogram ที่สร้างแล้ว"""
+    return {
+        "scheduler": scheduler_metrics(),
+        "cache": result_cache.stats(),
+        "pitch_variants": pitch_variants.stats(),
+        "encoder": encoder.stats(),
+        "spectrograms": spectrograms.stats(),
+    }
@@ -0,0 +1,216 @@
+"""
+
+- pitch shift แบบ stereo (ทุก channel พร้อมกัน) ทีละ block ด้วยหน่วยความจำคงที่
+- อัลกอริทึมเดียวกับ librosa.effects.pitch_shift: phase vocoder (time stretch) แล้ว resample กลับ
+  แต่ทำแบบ streaming: STFT/ISTFT ต่อเนื่องข้าม block, สะสม phase แบบ vectorized และ resample ด้วย soxr.ResampleStream
+- ใช้แทน pitch_shift_audio เดิมที่ downmix เป็น mono และโหลด/แปลงทั้งไฟล์ในหน่วยความจำ
+"""
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+from backend.config import PITCH_SHIFT_BLOCK_FRAMES
+
+PITCH_SHIFT_N_FFT = 2048
+PITCH_SHIFT_HOP_LENGTH = PITCH_SHIFT_N_FFT // 4
+# ตรงกับ res_type="soxr_hq" ที่ librosa.effects.pitch_shift ใช้เป็นค่าเริ่มต้น
+PITCH_SHIFT_RESAMPLE_QUALITY = "HQ"
+
+
+class StreamingPitchShifter:
+    """pitch shift สัญญาณรูปทรง (channels, n) ทีละ block โดยส่ง state ต่อข้าม block
+
+    - process(block) คืน sample ที่พร้อมแล้ว (จำนวนไม่เท่ากับ input ในแต่ละครั้ง)
+    - flush() ปิดท้ายสัญญาณ (zero pad แบบ center=True ของ STFT) แล้วคืน sample ที่เหลือทั้งหมด
+    - ผลรวมทุกครั้งเท่ากับ librosa.effects.pitch_shift ของทั้งสัญญาณ ก่อน fix_length
+      (ผู้เรียกตัด/เติมให้ยาวเท่า input เอง)
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        channels: int,
+        semitones: float,
+        n_fft: int = PITCH_SHIFT_N_FFT,
+        hop_length: int = PITCH_SHIFT_HOP_LENGTH,
+    ) -> None:
+        if n_fft % hop_length:
+            raise ValueError("n_fft ต้องหารด้วย hop_length ลงตัว")
+        self.channels = int(channels)
+        self.n_fft = int(n_fft)
+        self.hop = int(hop_length)
+        # rate ของ time stretch แบบเดียวกับ librosa (ยืดเวลาแล้ว resample กลับจะได้ความยาวเดิม)
+        self.rate = 2.0 ** (-float(semitones) / 12.0)
+        self.window = np.hanning(self.n_fft + 1)[:-1].astype(np.float32)
+        self._window_sq = self.window**2
+        bins = self.n_fft // 2 + 1
+        self._phi_advance = (self.hop * np.linspace(0.0, np.pi, bins)).astype(np.float32)
+
+        self._input_frames = 0
+        # input ที่ยังไม่ถูกตัดเป็นเฟรม (เริ่มด้วย zero pad n_fft/2 แบบ center=True)
+        self._pending = np.zeros((self.channels, self.n_fft // 2), dtype=np.float32)
+        self._magnitude = np.zeros((0, self.channels, bins), dtype=np.float32)
+        self._angle = np.zeros((0, self.channels, bins), dtype=np.float32)
+        self._frame_offset = 0
+        self._next_step = 0
+        self._phase: np.ndarray | None = None
+        # overlap-add ฝั่ง synthesis: สัญญาณและผลรวม window^2 (normalize แบบ librosa.istft)
+        self._ola = np.zeros((self.channels, 0), dtype=np.float32)
+        self._ola_weight = np.zeros(0, dtype=np.float32)
+        self._ola_frames = 0
+        self._consumed = 0
+        self._stretched = 0
+        self._resampler = soxr.ResampleStream(
+            sample_rate / self.rate, sample_rate, self.channels, dtype="float32", quality=PITCH_SHIFT_RESAMPLE_QUALITY
+        )
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """รับ block รูปทรง (channels, n) คืน sample ที่ประมวลผลเสร็จแล้วรูปทรง (channels, m)"""
+        block = np.asarray(block, dtype=np.float32)
+        self._input_frames += block.shape[1]
+        self._pending = np.concatenate((self._pending, block), axis=1)
+        self._analyze()
+        last_frame = self._frame_offset + self._magnitude.shape[0] - 1
+        # step j ใช้เฟรม floor(j * rate) และเฟรมถัดไป จึงประมวลผลได้ถึง step ที่เฟรมถัดไปมาถึงแล้ว
+        steps_end = int(np.floor((last_frame - 1) / self.rate)) + 1 if last_frame >= 1 else 0
+        while steps_end > self._next_step and int(np.floor((steps_end - 1) * self.rate)) + 1 > last_frame:
+            steps_end -= 1
+        self._stretch(steps_end)
+        return self._resample(self._emit(self._ola_frames * self.hop), last=False)
+
+    def flush(self) -> np.ndarray:
+        self._pending = np.concatenate(
+            (self._pending, np.zeros((self.channels, self.n_fft // 2), dtype=np.float32)), axis=1
+        )
+        self._analyze()
+        total_frames = self._frame_offset + self._magnitude.shape[0]
+        # phase vocoder ของ librosa เติมเฟรมศูนย์ 2 เฟรมท้ายไว้ interpolate เฟรมสุดท้าย
+        padding = np.zeros((2,) + self._magnitude.shape[1:], dtype=np.float32)
+        self._magnitude = np.concatenate((self._magnitude, padding), axis=0)
+        self._angle = np.concatenate((self._angle, padding), axis=0)
+        # จำนวน step ทั้งหมด = len(np.arange(0, total_frames, rate))
+        self._stretch(int(np.ceil(total_frames / self.rate)))
+
+        # ความยาวสัญญาณที่ยืดแล้ว = round(n / rate) แบบ librosa.istft(length=...)
+        expected = int(round(self._input_frames / self.rate))
+        stretched = self._emit(self._consumed + self._ola.shape[1])
+        emitted_before = self._stretched - stretched.shape[1]
+        stretched = stretched[:, : max(expected - emitted_before, 0)]
+        missing = expected - emitted_before - stretched.shape[1]
+        if missing > 0:
+            stretched = np.concatenate((stretched, np.zeros((self.channels, missing), dtype=np.float32)), axis=1)
+        return self._resample(stretched, last=True)
+
+    def _analyze(self) -> None:
+        # ตัด input ที่ครบเฟรมเป็น STFT แล้วเก็บ magnitude/phase แยกกัน รูปทรง (frames, channels, bins)
+        available = (self._pending.shape[1] - self.n_fft) // self.hop + 1
+        if available <= 0:
+            return
+        starts = np.arange(available) * self.hop
+        segments = self._pending[:, starts[:, np.newaxis] + np.arange(self.n_fft)] * self.window
+        spectra = np.fft.rfft(np.swapaxes(segments, 0, 1), axis=-1).astype(np.complex64)
+        self._magnitude = np.concatenate((self._magnitude, np.abs(spectra)), axis=0)
+        self._angle = np.concatenate((self._angle, np.angle(spectra)), axis=0)
+        self._pending = self._pending[:, available * self.hop :]
+
+    def _stretch(self, steps_end: int) -> None:
+        if steps_end <= self._next_step:
+            return
+        time_steps = np.arange(self._next_step, steps_end) * self.rate
+        floors = np.floor(time_steps)
+        index = floors.astype(np.int64) - self._frame_offset
+        alpha = (time_steps - floors).astype(np.float32)[:, np.newaxis, np.newaxis]
+        magnitude = (1.0 - alpha) * self._magnitude[index] + alpha * self._magnitude[index + 1]
+
+        if self._phase is None:
+            self._phase = self._angle[0].astype(np.float64)
+        # ผลต่าง phase ระหว่างเฟรมคำนวณครั้งเดียวต่อคู่เฟรม แล้วสะสมทุก step ใน block พร้อมกันด้วย cumsum
+        # (แทนลูปทีละเฟรมของ librosa; สะสมแบบ float64 จึงไม่ drift เหมือน float32)
+        used = slice(int(index[0]), int(index[-1]) + 2)
+        dphase = np.diff(self._angle[used], axis=0) - self._phi_advance
+        dphase -= 2.0 * np.pi * np.round(dphase / (2.0 * np.pi))
+        increments = (self._phi_advance + dphase)[index - index[0]]
+        accumulated = np.cumsum(increments, axis=0, dtype=np.float64)
+        phase = np.empty_like(accumulated)
+        phase[0] = self._phase
+        phase[1:] = self._phase + accumulated[:-1]
+        self._phase = np.mod(self._phase + accumulated[-1], 2.0 * np.pi)
+        self._next_step = steps_end
+
+        # ทิ้งเฟรมที่ step ถัดไปไม่ใช้แล้ว
+        keep_from = int(np.floor(self._next_step * self.rate)) - self._frame_offset
+        if keep_from > 0:
+            self._magnitude = self._magnitude[keep_from:]
+            self._angle = self._angle[keep_from:]
+            self._frame_offset += keep_from
+
+        # wrap ก่อนแปลงเป็น float32 (phase สะสมมีค่าหลักล้าน rad ได้ ความละเอียด float32 ไม่พอ)
+        phase = np.mod(phase, 2.0 * np.pi).astype(np.float32)
+        stretched = np.empty(magnitude.shape, dtype=np.complex64)
+        np.multiply(magnitude, np.cos(phase), out=stretched.real)
+        np.multiply(magnitude, np.sin(phase), out=stretched.imag)
+        self._overlap_add(np.fft.irfft(stretched, n=self.n_fft, axis=-1).astype(np.float32))
+
+    def _overlap_add(self, frames: np.ndarray) -> None:
+        # frames (J, channels, n_fft): เฟรม j วางที่ตำแหน่ง j * hop บวกซ้อนทีละ hop แบบ vectorized
+        count = frames.shape[0]
+        frames *= self.window
+        origin = self._ola_frames * self.hop - self._consumed
+        needed = origin + (count - 1) * self.hop + self.n_fft
+        grow = needed - self._ola.shape[1]
+        if grow > 0:
+            self._ola = np.concatenate((self._ola, np.zeros((self.channels, grow), dtype=np.float32)), axis=1)
+            self._ola_weight = np.concatenate((self._ola_weight, np.zeros(grow, dtype=np.float32)))
+        for part in range(self.n_fft // self.hop):
+            piece = slice(part * self.hop, (part + 1) * self.hop)
+            span = slice(origin + part * self.hop, origin + part * self.hop + count * self.hop)
+            self._ola[:, span] += np.swapaxes(frames[:, :, piece], 0, 1).reshape(self.channels, -1)
+            self._ola_weight[span] += np.tile(self._window_sq[piece], count)
+        self._ola_frames += count
+
+    def _emit(self, until: int) -> np.ndarray:
+        # คืน sample ของ OLA ที่ไม่มีเฟรมในอนาคตทับแล้ว (ตำแหน่ง < until) หลัง normalize ด้วย window^2
+        consumed = self._consumed
+        ready = max(min(until - consumed, self._ola.shape[1]), 0)
+        output = self._ola[:, :ready].copy()
+        weight = self._ola_weight[:ready]
+        output /= np.where(weight > np.finfo(np.float32).tiny, weight, 1.0)
+        self._ola = self._ola[:, ready:]
+        self._ola_weight = self._ola_weight[ready:]
+        self._consumed = consumed + ready
+
+        # ตัดครึ่งเฟรมแรก (n_fft / 2) ออกแบบ center=True
+        trim = max(self.n_fft // 2 - consumed, 0)
+        output = output[:, trim:]
+        self._stretched += output.shape[1]
+        return output
+
+    def _resample(self, stretched: np.ndarray, last: bool) -> np.ndarray:
+        resampled = self._resampler.resample_chunk(np.ascontiguousarray(stretched.T), last=last)
+        return np.ascontiguousarray(resampled.T)
+
+
+def pitch_shift_file(
+    input_path: str, output_path: str, semitones: float, block_frames: int | None = None
+) -> str:
+    """pitch shift ไฟล์ทีละ block (ทุก channel) แล้วเขียนผลลัพธ์ยาวเท่าไฟล์ต้นฉบับ"""
+    block = max(int(PITCH_SHIFT_BLOCK_FRAMES if block_frames is None else block_frames), 1)
+    with sf.SoundFile(input_path) as source:
+        remaining = source.frames
+        shifter = StreamingPitchShifter(source.samplerate, source.channels, semitones)
+        with sf.SoundFile(output_path, mode="w", samplerate=source.samplerate, channels=source.channels) as sink:
+
+            def _write(shifted: np.ndarray) -> None:
+                # ตัดส่วนเกินท้ายไฟล์ให้ยาวเท่า input (fix_length แบบ librosa)
+                nonlocal remaining
+                shifted = shifted[:, :remaining]
+                remaining -= shifted.shape[1]
+                sink.write(shifted.T)
+
+            for data in source.blocks(blocksize=block, dtype="float32", always_2d=True):
+                _write(shifter.process(data.T))
+            _write(shifter.flush())
+            if remaining > 0:
+                sink.write(np.zeros((remaining, source.channels), dtype=np.float32))
+    return output_path
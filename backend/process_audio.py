@@ -8,13 +8,37 @@
 import os
 import glob
 import time
+import threading
 import torch
 import warnings
 import torchaudio
 import numpy as np
 import librosa
 import soundfile as sf
-from backend.config import STEM_TARGETS, DIR_SEPARATED
+from typing import Callable
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from backend.audio_features import (
+    PITCH_FMAX_NOTE,
+    PITCH_FMIN_NOTE,
+    extract_features,
+    key_from_chroma,
+    pitch_from_f0,
+    tempo_from_onset,
+)
+from backend.pitch_shifter import pitch_shift_file
+from backend.waveform_peaks import PeakPyramidBuilder, peaks_path
+from backend.config import (
+    ANALYSIS_EXCERPTS,
+    ANALYSIS_EXCERPT_SECONDS,
+    ANALYSIS_SAMPLE_RATE,
+    STEM_TARGETS,
+    DIR_SEPARATED,
+    SEPARATION_SEGMENT_SECONDS,
+    SEPARATION_OVERLAP_SECONDS,
+    SEPARATION_NUM_THREADS,
+    WAVEFORM_PEAK_SAMPLES_PER_PEAK,
+)
 
 # เลือกใช้ GPU อัตโนมัติถ้ามี
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -53,9 +77,275 @@ def get_openunmix_separator():
     )
 
 
-def separate_audio(input_path: str, output_dir: str = DIR_SEPARATED) -> str:
+def _resolve_separator_rate(separator) -> int:
+    # บาง checkpoint เก็บ sample_rate เป็น Tensor จึงแปลงให้เป็น int ก่อน
+    return int(
+        separator.sample_rate.item()
+        if isinstance(separator.sample_rate, torch.Tensor)
+        else separator.sample_rate
+    )
+
+
+# openunmix.utils.preprocess ส่งชื่อ method แบบเก่านี้ให้ torchaudio (ให้ kernel ต่างจากค่าเริ่มต้น)
+OPENUNMIX_RESAMPLING_METHOD = "sinc_interpolation"
+
+
+class SeparationSession:
+    """Session สำหรับ inference ของ Open-Unmix ที่ใช้ซ้ำได้ข้าม request (และเครื่องมือแบบ batch)
+
+    - เตรียม separator ครั้งเดียว: freeze(), ย้ายไป DEVICE และแปลง sample_rate ที่เป็น Tensor เป็น int
+    - แคช resampler ตามคู่ sample rate (คำนวณ kernel ครั้งเดียว) และใช้ STFT/ISTFT ของ separator ที่อยู่บน device แล้ว
+    - รันทุกขั้นใต้ torch.inference_mode() และตั้งจำนวน thread ด้วย torch.set_num_threads
+    - จับเวลาแยกตามขั้น (load / resample / stft / model / wiener / istft / write / peaks) ต่อ thread
+      ผ่าน track() จึงใช้ session เดียวกันพร้อมกันหลายงานได้
+    """
+
+    def __init__(self, separator, device: torch.device = DEVICE, num_threads: int = SEPARATION_NUM_THREADS):
+        self.source = separator
+        separator.freeze()
+        self.separator = separator.to(device)
+        self.device = device
+        self.separator_rate = _resolve_separator_rate(self.separator)
+        self.num_threads = int(num_threads)
+        if self.num_threads > 0:
+            torch.set_num_threads(self.num_threads)
+        self._resamplers: dict = {}
+        self._resampler_lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def track(self):
+        """เก็บเวลาของแต่ละขั้นระหว่างอยู่ใน block นี้ (คืน dict ชื่อขั้น -> วินาที)"""
+        timings: dict = {}
+        previous = getattr(self._local, "timings", None)
+        self._local.timings = timings
+        try:
+            yield timings
+        finally:
+            self._local.timings = previous
+
+    @contextmanager
+    def phase(self, name: str):
+        timings = getattr(self._local, "timings", None)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if timings is not None:
+                if self.device.type == "cuda":
+                    torch.cuda.synchronize(self.device)
+                timings[name] = timings.get(name, 0.0) + (time.perf_counter() - started)
+
+    def _resampler(self, orig_freq: int, new_freq: int, method: str = "sinc_interp_hann"):
+        key = (int(orig_freq), int(new_freq), method)
+        with self._resampler_lock:
+            resampler = self._resamplers.get(key)
+            if resampler is None:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    resampler = torchaudio.transforms.Resample(
+                        orig_freq=key[0], new_freq=key[1], resampling_method=method
+                    ).to(self.device)
+                self._resamplers[key] = resampler
+        return resampler
+
+    def estimate(self, audio_tensor: torch.Tensor, rate: int) -> dict:
+        """แยก audio_tensor รูปทรง (channels, frames) คืน waveform ของแต่ละ stem บน CPU ที่ sample rate ของไฟล์ต้นฉบับ
+
+        ทำขั้นตอนเดียวกับ openunmix.predict.separate + Separator.forward แต่แยกเวลาของแต่ละขั้น
+        """
+        from openunmix.filtering import wiener
+
+        separator = self.separator
+        with torch.inference_mode():
+            audio = audio_tensor.to(self.device)
+            if audio.ndim == 1:
+                audio = audio[None, :]
+            audio = audio[:2]
+            if audio.shape[0] == 1:
+                # mono -> stereo แบบเดียวกับ openunmix.utils.preprocess
+                audio = torch.repeat_interleave(audio, 2, dim=0)
+            audio = audio[None, ...]
+            input_frames = int(audio.shape[-1])
+
+            if rate != self.separator_rate:
+                with self.phase("resample"):
+                    # ใช้ชื่อ method เดียวกับ openunmix.utils.preprocess เพื่อให้ผลลัพธ์ตรงกับเดิม
+                    audio = self._resampler(rate, self.separator_rate, OPENUNMIX_RESAMPLING_METHOD)(audio)
+
+            with self.phase("stft"):
+                mix_stft = separator.stft(audio)
+                magnitude = separator.complexnorm(mix_stft)
+
+            with self.phase("model"):
+                spectrograms = torch.zeros(
+                    magnitude.shape + (separator.nb_targets,), dtype=audio.dtype, device=magnitude.device
+                )
+                for index, target_module in enumerate(separator.target_models.values()):
+                    spectrograms[..., index] = target_module(magnitude.clone())
+
+            with self.phase("wiener"):
+                # (samples, frames, bins, channels, sources) ตามที่ openunmix.filtering ต้องการ
+                spectrograms = spectrograms.permute(0, 3, 2, 1, 4)
+                mix_stft = mix_stft.permute(0, 3, 2, 1, 4)
+                nb_sources = separator.nb_targets + (1 if separator.residual else 0)
+                nb_frames = spectrograms.shape[1]
+                window_len = separator.wiener_win_len or nb_frames
+                targets_stft = torch.zeros(
+                    mix_stft.shape + (nb_sources,), dtype=audio.dtype, device=mix_stft.device
+                )
+                for sample in range(mix_stft.shape[0]):
+                    for start in range(0, nb_frames, window_len):
+                        frames = slice(start, min(nb_frames, start + window_len))
+                        targets_stft[sample, frames] = wiener(
+                            spectrograms[sample, frames],
+                            mix_stft[sample, frames],
+                            separator.niter,
+                            softmask=separator.softmask,
+                            residual=separator.residual,
+                        )
+                targets_stft = targets_stft.permute(0, 5, 3, 2, 1, 4).contiguous()
+
+            with self.phase("istft"):
+                estimates = separator.istft(targets_stft, length=audio.shape[2])
+
+            stems = {}
+            for index, target in enumerate(separator.target_models):
+                waveform = estimates[0, index]
+                if self.separator_rate != rate:
+                    with self.phase("resample"):
+                        waveform = self._resampler(self.separator_rate, rate)(waveform)
+                # ความยาวหลัง resample ไป-กลับอาจต่างจากต้นฉบับเล็กน้อย
+                stems[target] = waveform[..., :input_frames].cpu()
+            return stems
+
+
+_session_lock = threading.Lock()
+_session: SeparationSession | None = None
+
+
+def get_separation_session() -> SeparationSession:
+    """คืน SeparationSession ที่ใช้ร่วมกันทั้ง process (สร้างใหม่เมื่อ separator ที่แคชไว้เปลี่ยน)"""
+    global _session
+    separator = get_openunmix_separator()
+    with _session_lock:
+        if _session is None or _session.source is not separator:
+            _session = SeparationSession(separator)
+        return _session
+
+
+def _estimate_stems(audio_tensor: torch.Tensor, rate: int, session: SeparationSession) -> dict:
+    """รันโมเดลกับ audio_tensor รูปทรง (channels, frames) แล้วคืน waveform ของแต่ละ stem
+    บน CPU ที่ sample rate เดียวกับไฟล์ต้นฉบับ (ใช้ร่วมกันทั้งโหมด one-shot และ segmented)"""
+    return session.estimate(audio_tensor, rate)
+
+
+def _write_stem_peaks(output_dir: str, builders: dict, session: SeparationSession) -> None:
+    """เขียนไฟล์ peaks ของ stem ที่สะสมไว้ระหว่างเขียนเสียง (ไม่ต้องอ่าน stem ซ้ำ)"""
+    with session.phase("peaks"):
+        for target, builder in builders.items():
+            builder.write(peaks_path(output_dir, target))
+
+
+def _separate_segmented(
+    input_path: str,
+    output_dir: str,
+    session: SeparationSession,
+    segment_seconds: float,
+    overlap_seconds: float,
+    progress_callback: Callable[[float], None] | None = None,
+) -> None:
+    """แยก stem ทีละหน้าต่างความยาวคงที่ แล้ว crossfade ช่วงที่ซ้อนกันก่อนเขียนต่อท้ายไฟล์ผลลัพธ์
+
+    - อ่านไฟล์ต้นฉบับด้วย soundfile ทีละหน้าต่าง (seek + read) ไม่โหลดทั้งไฟล์
+    - เก็บไว้ในหน่วยความจำเฉพาะหน้าต่างปัจจุบันและหางช่วง overlap ของหน้าต่างก่อนหน้า
+      ทำให้หน่วยความจำขึ้นกับขนาดหน้าต่าง ไม่ขึ้นกับความยาวเพลง
+    """
+    writers: dict = {}
+    peaks: dict = {}
     try:
-        from openunmix.predict import separate
+        with sf.SoundFile(input_path) as source:
+            rate = source.samplerate
+            total_frames = source.frames
+            window = max(int(round(segment_seconds * rate)), 1)
+            # overlap ต้องไม่เกินครึ่งหน้าต่าง เพื่อให้แต่ละหน้าต่างมีส่วนที่ไม่ซ้อนกันเสมอ
+            overlap = min(max(int(round(overlap_seconds * rate)), 0), window // 2)
+            hop = window - overlap
+            # น้ำหนัก crossfade แบบเส้นตรง: หน้าต่างก่อนหน้า (1 - w) + หน้าต่างปัจจุบัน w
+            fade_in = ((np.arange(overlap, dtype=np.float32) + 0.5) / max(overlap, 1))[:, np.newaxis]
+            pending: dict = {}
+
+            position = 0
+            while position < total_frames:
+                is_last = position + window >= total_frames
+                with session.phase("load"):
+                    source.seek(position)
+                    block = source.read(min(window, total_frames - position), dtype="float32", always_2d=True)
+                    audio_tensor = torch.from_numpy(np.ascontiguousarray(block.T))
+                estimates = _estimate_stems(audio_tensor, rate, session)
+
+                for target, waveform in estimates.items():
+                    segment = waveform.numpy().T[: block.shape[0]].astype(np.float32, copy=True)
+                    tail = pending.get(target)
+                    if tail is not None:
+                        n = min(tail.shape[0], segment.shape[0])
+                        segment[:n] = tail[:n] * (1.0 - fade_in[:n]) + segment[:n] * fade_in[:n]
+
+                    writer = writers.get(target)
+                    if writer is None:
+                        writer = sf.SoundFile(
+                            os.path.join(output_dir, f"{target}.wav"),
+                            mode="w",
+                            samplerate=rate,
+                            channels=segment.shape[1],
+                            subtype="FLOAT",
+                        )
+                        writers[target] = writer
+                        if WAVEFORM_PEAK_SAMPLES_PER_PEAK:
+                            peaks[target] = PeakPyramidBuilder(rate)
+
+                    with session.phase("write"):
+                        if is_last or overlap == 0:
+                            written = segment
+                            pending.pop(target, None)
+                        else:
+                            # เขียนส่วนที่ไม่ซ้อนกันต่อท้ายไฟล์ทันที แล้วเก็บหางไว้ crossfade กับหน้าต่างถัดไป
+                            written = segment[:-overlap]
+                            pending[target] = segment[-overlap:].copy()
+                        writer.write(written)
+                    if target in peaks:
+                        with session.phase("peaks"):
+                            peaks[target].add(written)
+
+                del audio_tensor, estimates
+                if progress_callback is not None:
+                    progress_callback(min(position + window, total_frames) / float(total_frames))
+                if is_last:
+                    break
+                position += hop
+        _write_stem_peaks(output_dir, peaks, session)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+
+def separate_audio(
+    input_path: str,
+    output_dir: str = DIR_SEPARATED,
+    segment_seconds: float | None = None,
+    overlap_seconds: float | None = None,
+    progress_callback: Callable[[float], None] | None = None,
+) -> str:
+    """แยกไฟล์ WAV เป็น stem (vocals, drums, bass, other) แล้วบันทึกลง output_dir
+
+    - segment_seconds > 0 และไฟล์ยาวกว่าหน้าต่าง: ใช้โหมด segmented (หน่วยความจำจำกัดตามขนาดหน้าต่าง)
+    - segment_seconds = 0: ประมวลผลทั้งไฟล์ในครั้งเดียวแบบเดิม
+    - ค่า None จะใช้ค่าจาก SEPARATION_SEGMENT_SECONDS / SEPARATION_OVERLAP_SECONDS
+    - progress_callback(fraction) ถูกเรียกเมื่อประมวลผลแต่ละหน้าต่างเสร็จ (ใช้รายงานความคืบหน้าของ job)
+    - สร้าง waveform peaks ของแต่ละ stem ไว้ที่ peaks/{stem}.peaks จากข้อมูลที่เขียน (WAVEFORM_PEAK_SAMPLES_PER_PEAK)
+    """
+    try:
+        from openunmix.predict import separate  # noqa: F401
     except ImportError as exc:
         raise RuntimeError("ต้องติดตั้ง openunmix ก่อน: pip install openunmix") from exc
 
@@ -63,67 +353,48 @@ def separate_audio(input_path: str, output_dir: str = DIR_SEPARATED) -> str:
     if os.path.splitext(input_path)[-1].lower() != ".wav":
         raise ValueError("รองรับเฉพาะไฟล์ WAV (.wav)")
 
-    try:
-        audio_tensor, rate = torchaudio.load(input_path)
-        input_frames = int(audio_tensor.shape[-1])
-        separator = get_openunmix_separator()
+    segment_value = SEPARATION_SEGMENT_SECONDS if segment_seconds is None else float(segment_seconds)
+    overlap_value = SEPARATION_OVERLAP_SECONDS if overlap_seconds is None else float(overlap_seconds)
+    if segment_value < 0.0 or overlap_value < 0.0:
+        raise ValueError("segment_seconds และ overlap_seconds ต้องไม่ติดลบ")
 
-        # ใช้โมเดลแบบ inference อย่างเดียว และย้ายไปยัง CPU/GPU ที่เลือกไว้
-        separator.freeze()
-        separator = separator.to(DEVICE)
-        # บาง checkpoint เก็บ sample_rate เป็น Tensor จึงแปลงให้เป็น int ก่อน
-        separator_rate = int(
-            separator.sample_rate.item()
-            if isinstance(separator.sample_rate, torch.Tensor)
-            else separator.sample_rate
-        )
-        # คำนวณความยาวที่คาดว่าผลลัพธ์จะมี ถ้าโมเดลทำงานที่ sample rate ต่างจากไฟล์ต้นฉบับ
-        expected_model_frames = int(round(input_frames * (separator_rate / float(rate))))
-
-        # รันโมเดลเพื่อแยกเสียงออกเป็น vocals, drums, bass และ other
-        estimates = separate(
-            audio=audio_tensor.to(DEVICE),
-            rate=rate,
-            targets=list(STEM_TARGETS),
-            separator=separator,
-            device=str(DEVICE),
-        )
-
-        # วนบันทึกผลลัพธ์ทีละ stem เป็นไฟล์ WAV แยกกัน
-        for target, waveform in estimates.items():
-            # บางกรณีโมเดลคืนค่าเป็น 3 มิติ ให้ตัด batch dimension ออกก่อน
-            if waveform.ndim == 3:
-                waveform = waveform.squeeze(0)
-
-            estimate_frames = int(waveform.shape[-1])
-            # เดาว่า waveform ที่ได้อยู่ใน sample rate ไหนจากความยาวของข้อมูล
-            # เพื่อจะได้ resample กลับให้ตรงกับไฟล์ต้นฉบับก่อนเซฟ
-            if abs(estimate_frames - expected_model_frames) <= 8:
-                estimate_rate = separator_rate
-            elif abs(estimate_frames - input_frames) <= 8:
-                estimate_rate = rate
-            else:
-                estimate_rate = separator_rate
-
-            # ถ้า sample rate ไม่ตรงกับต้นฉบับ ให้แปลงก่อนบันทึก
-            if estimate_rate != rate:
-                waveform = torchaudio.functional.resample(
-                    waveform,
-                    orig_freq=estimate_rate,
-                    new_freq=rate,
+    try:
+        # separator ถูก freeze/ย้าย device ไว้แล้วใน session (ไม่ทำซ้ำทุก request)
+        session = get_separation_session()
+
+        with session.track() as timings:
+            info = sf.info(input_path)
+            if segment_value > 0.0 and info.frames > int(round(segment_value * info.samplerate)):
+                _separate_segmented(
+                    input_path, output_dir, session, segment_value, overlap_value, progress_callback=progress_callback
                 )
-
-            # เซฟ stem แต่ละตัวเป็น vocals.wav, drums.wav, bass.wav, other.wav
-            torchaudio.save(
-                os.path.join(output_dir, f"{target}.wav"),
-                waveform.cpu(),
-                sample_rate=rate,
-            )
-
+            else:
+                with session.phase("load"):
+                    audio_tensor, rate = torchaudio.load(input_path)
+                estimates = _estimate_stems(audio_tensor, rate, session)
+
+                # เซฟ stem แต่ละตัวเป็น vocals.wav, drums.wav, bass.wav, other.wav
+                with session.phase("write"):
+                    for target, waveform in estimates.items():
+                        torchaudio.save(
+                            os.path.join(output_dir, f"{target}.wav"),
+                            waveform,
+                            sample_rate=rate,
+                        )
+                if WAVEFORM_PEAK_SAMPLES_PER_PEAK:
+                    builders = {}
+                    for target, waveform in estimates.items():
+                        builders[target] = PeakPyramidBuilder(rate)
+                        builders[target].add(waveform.numpy().T)
+                    _write_stem_peaks(output_dir, builders, session)
+                del audio_tensor, estimates
+                if progress_callback is not None:
+                    progress_callback(1.0)
+
+        print("เวลาแต่ละขั้น (วินาที):", ", ".join(f"{name}={value:.2f}" for name, value in timings.items()))
         print("แยกเสียงเสร็จแล้ว:", output_dir)
 
-        # ปลดปล่อยหน่วยความจำ: ล้าง Tensor และ CUDA cache หลังเสร็จการ inference
-        del audio_tensor, estimates
+        # ปลดปล่อยหน่วยความจำ: ล้าง CUDA cache หลังเสร็จการ inference
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
 
@@ -134,68 +405,129 @@ def separate_audio(input_path: str, output_dir: str = DIR_SEPARATED) -> str:
         raise
 
 
-def analyze_audio(input_path: str) -> dict:
-    """วิเคราะห์ไฟล์เสียงแล้วคืนค่า tempo, pitch และ key"""
+def warmup_separator() -> dict:
+    """โหลด Open-Unmix และรัน inference กับเสียงเงียบ 1 วินาทีเพื่ออุ่น kernel (เรียกตอนเริ่มเซิร์ฟเวอร์)
+
+    คืนเวลาที่ใช้โหลดโมเดลและเวลาที่ใช้ dummy inference (วินาที)
+    """
+    started = time.perf_counter()
+    session = get_separation_session()
+    loaded = time.perf_counter()
+
+    session.estimate(torch.zeros(2, session.separator_rate), session.separator_rate)
+    return {"load_seconds": loaded - started, "warmup_seconds": time.perf_counter() - loaded}
+
+
+ANALYSIS_MODES = ("full", "fast")
+
+
+def _load_analysis_excerpts(input_path: str, sr: int, excerpts: int, excerpt_seconds: float) -> list[np.ndarray]:
+    """decode + resample ครั้งเดียวที่ sr เฉพาะช่วงตัวอย่างที่กระจายเท่า ๆ กัน (เพลงสั้นใช้ทั้งเพลง)"""
     try:
-        # แปลงเป็น mono ก่อน เพื่อให้การวิเคราะห์ภาพรวมของเพลงง่ายและสม่ำเสมอ
-        y, sr = librosa.load(input_path, sr=None, mono=True)
-
-        # ใช้ beat.tempo (ใน librosa 0.11 ยังมี alias) และละเว้น FutureWarning
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore", category=FutureWarning)
-            tempo = float(librosa.beat.tempo(y=y, sr=sr)[0])
-
-        f0 = librosa.yin(y, fmin=librosa.note_to_hz("C2"), fmax=librosa.note_to_hz("C7"))
-        f0 = f0[~np.isnan(f0)]
-        pitch_note = None
-        if f0.size:
-            # ใช้ค่ากลางของ pitch เพื่อลดผลกระทบจากโน้ตสั้นหรือเสียงรบกวนบางช่วง
-            pitch_hz = float(np.median(f0))
-            pitch_note = librosa.hz_to_note(pitch_hz)
-
-        # เปรียบเทียบ chroma ของเพลงกับ profile major/minor เพื่อเดาว่าเพลงอยู่คีย์ไหน
-        chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-        chroma_mean = chroma.mean(axis=1)
-
-        # โปรไฟล์มาตรฐานของคีย์ major ใช้เป็นแม่แบบสำหรับเทียบกับ chroma ของเพลง
-        maj_profile = np.array(
-            [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]
-        )
-        # โปรไฟล์มาตรฐานของคีย์ minor ใช้เป็นแม่แบบสำหรับเทียบกับ chroma ของเพลง
-        min_profile = np.array(
-            [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]
-        )
-        # รายชื่อโน้ต 12 ตัวในหนึ่ง octave
-        keys = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
-
-        # เลื่อน profile ไปทีละตำแหน่งเพื่อจำลองทุกคีย์ แล้ววัดความคล้ายกับ chroma ของเพลง
-        maj_scores = [np.correlate(chroma_mean, np.roll(maj_profile, i))[0] for i in range(12)]
-        min_scores = [np.correlate(chroma_mean, np.roll(min_profile, i))[0] for i in range(12)]
-
-        # เลือกคีย์ major และ minor ที่ได้คะแนนสูงสุด
-        maj_idx = int(np.argmax(maj_scores))
-        min_idx = int(np.argmax(min_scores))
-
-        # เลือก key จาก profile ที่ได้คะแนน correlation สูงกว่า
-        if maj_scores[maj_idx] >= min_scores[min_idx]:
-            key = f"{keys[maj_idx]} major"
-        else:
-            key = f"{keys[min_idx]} minor"
-
-        return {"tempo": tempo, "pitch": pitch_note, "key": key}
+        duration = float(librosa.get_duration(path=input_path))
+    except Exception:
+        duration = 0.0
+    if excerpts <= 0 or excerpt_seconds <= 0 or duration <= excerpts * excerpt_seconds:
+        y, _ = librosa.load(input_path, sr=sr, mono=True)
+        return [y]
+
+    # เว้นต้นและท้ายเพลง (intro/outro มักไม่มีจังหวะ/คีย์ชัด)
+    offsets = np.linspace(0.0, duration - excerpt_seconds, excerpts + 2)[1:-1]
+    return [
+        librosa.load(input_path, sr=sr, mono=True, offset=float(offset), duration=excerpt_seconds)[0]
+        for offset in offsets
+    ]
+
+
+def _fast_tempo(excerpts: list[np.ndarray], sr: int) -> tuple[float, float]:
+    # confidence = ความชัดของ pulse (autocorrelation ของ onset envelope ที่ lag ของ tempo)
+    # คูณสัดส่วนช่วงตัวอย่างที่ได้ tempo ตรงกัน (±4%)
+    # hop 256 ที่ 22.05 kHz ให้ความละเอียดของ lag เท่ากับ hop 512 ที่ 44.1 kHz ของโหมด full
+    hop_length = max(int(round(256 * sr / 22050)), 1)
+    estimates, clarities = [], []
+    for excerpt in excerpts:
+        onset_env = librosa.onset.onset_strength(y=excerpt, sr=sr, hop_length=hop_length)
+        tempo, clarity = tempo_from_onset(onset_env, sr, hop_length)
+        estimates.append(tempo)
+        clarities.append(clarity)
+
+    tempo = float(np.median(estimates))
+    agreement = float(np.mean([abs(estimate - tempo) <= 0.04 * tempo for estimate in estimates]))
+    return tempo, float(np.mean(clarities)) * agreement
+
+
+def _fast_pitch(excerpts: list[np.ndarray], sr: int) -> tuple[str | None, float]:
+    # confidence = สัดส่วนเฟรมที่ pitch อยู่ในระยะ ±1 semitone จากค่ากลาง
+    f0 = np.concatenate(
+        [
+            librosa.yin(
+                excerpt,
+                fmin=librosa.note_to_hz(PITCH_FMIN_NOTE),
+                fmax=librosa.note_to_hz(PITCH_FMAX_NOTE),
+                sr=sr,
+            )
+            for excerpt in excerpts
+        ]
+    )
+    return pitch_from_f0(f0)
+
+
+def _fast_key(excerpts: list[np.ndarray], sr: int) -> tuple[str, float]:
+    # confidence = Pearson correlation ระหว่าง chroma เฉลี่ยกับ profile ของคีย์ที่เลือก (ตัดให้อยู่ใน 0..1)
+    chroma = np.concatenate([librosa.feature.chroma_cqt(y=excerpt, sr=sr) for excerpt in excerpts], axis=1)
+    return key_from_chroma(chroma.mean(axis=1))
+
+
+def _analyze_audio_fast(input_path: str) -> dict:
+    """โหมดเร็ว: resample ครั้งเดียว วิเคราะห์เฉพาะช่วงตัวอย่าง และคำนวณ tempo/pitch/key พร้อมกัน"""
+    sr = ANALYSIS_SAMPLE_RATE
+    excerpts = _load_analysis_excerpts(input_path, sr, ANALYSIS_EXCERPTS, ANALYSIS_EXCERPT_SECONDS)
+    # FFT/CQT ของ numpy/librosa ปล่อย GIL เป็นส่วนใหญ่ จึงรันสามงานพร้อมกันด้วย thread ได้
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="analyze") as pool:
+        tempo_future = pool.submit(_fast_tempo, excerpts, sr)
+        pitch_future = pool.submit(_fast_pitch, excerpts, sr)
+        key_future = pool.submit(_fast_key, excerpts, sr)
+        tempo, tempo_confidence = tempo_future.result()
+        pitch_note, pitch_confidence = pitch_future.result()
+        key, key_confidence = key_future.result()
+
+    return {
+        "tempo": tempo,
+        "pitch": pitch_note,
+        "key": key,
+        "mode": "fast",
+        "confidence": {
+            "tempo": round(tempo_confidence, 3),
+            "pitch": round(pitch_confidence, 3),
+            "key": round(key_confidence, 3),
+        },
+    }
+
+
+def analyze_audio(input_path: str, mode: str = "full") -> dict:
+    """วิเคราะห์ไฟล์เสียงแล้วคืนค่า tempo, pitch และ key พร้อม confidence
+
+    mode="fast" คืนผลเร็ว (ช่วงตัวอย่างที่ ANALYSIS_SAMPLE_RATE) ให้ UI แสดงผลทันที
+    mode="full" วิเคราะห์ทั้งเพลงผ่าน front-end ร่วม (backend.audio_features) และคืน feature เสริม
+    (spectral centroid, RMS/LUFS, ภาพรวม waveform)
+    """
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unsupported analysis mode '{mode}'. Use one of: {', '.join(ANALYSIS_MODES)}.")
+    try:
+        if mode == "fast":
+            return _analyze_audio_fast(input_path)
+
+        # decode ครั้งเดียว + STFT ครั้งเดียว แล้วคำนวณทุก feature จาก intermediate ร่วม
+        return {**extract_features(input_path), "mode": "full"}
     except Exception as e:
         print(f"[ERROR] analyze_audio: {e}")
         raise
 
 
 def pitch_shift_audio(input_path: str, steps: float, output_path: str) -> str:
-    """เลื่อน pitch ของไฟล์เสียงตามจำนวน half-steps ที่ระบุ"""
+    """เลื่อน pitch ของไฟล์เสียงตามจำนวน half-steps ที่ระบุ (คงทุก channel, ประมวลผลทีละ block)"""
     try:
-        # ใช้ librosa ทำ pitch shifting แล้วเขียนผลลัพธ์กลับเป็นไฟล์ใหม่
-        y, sr = librosa.load(input_path, sr=None)
-        shifted = librosa.effects.pitch_shift(y, sr=sr, n_steps=steps)
-        sf.write(output_path, shifted, sr)
-        return output_path
+        return pitch_shift_file(input_path, output_path, steps)
     except Exception as e:
         print(f"[ERROR] pitch_shift_audio: {e}")
         raise
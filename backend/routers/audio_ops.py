@@ -9,7 +9,18 @@ from uuid import uuid4
 from fastapi import APIRouter, UploadFile, File, Query, Header, Request, HTTPException, BackgroundTasks
 from fastapi.responses import FileResponse, JSONResponse
 
-from backend.services.storage import save_upload, convert_to_mp3, processing_semaphore, UPLOAD_DIR
+from backend.services.storage import (
+    save_upload,
+    convert_to_mp3,
+    UPLOAD_DIR,
+    UPLOAD_LIMIT_MESSAGE,
+)
+from backend.services.executor import run_cpu_task, TASK_DSP, TASK_INFERENCE
+from backend.services.encoder import encoder, media_type_for
+from backend.services.result_cache import result_cache, upload_cache_key
+from backend.services.artifact_registry import artifact_registry, ARTIFACT_EQ, ARTIFACT_COMPRESSED, ARTIFACT_PITCH_SHIFT
+from backend.services.scheduler import get_pool, POOL_INFERENCE, POOL_LIGHT_DSP, POOL_ENCODING
+from backend.config import AUTO_EQ_LSTM_SEGMENTS, MAX_UPLOAD_BYTES
 from backend.process_audio import analyze_audio, pitch_shift_audio
 from backend.eq_compressor import apply_compression
 from backend.utils.auth_guard import validate_request_quota, increment_guest_quota
@@ -20,6 +31,7 @@ from backend.auto_eq_inference import (
     MIN_DELTA_CLAMP_DB,
     MAX_DELTA_CLAMP_DB,
     DEFAULT_AUTO_EQ_MODEL_ID,
+    DEFAULT_FILTER_ENGINE,
     SUPPORTED_AUTO_EQ_MODELS,
 )
 
@@ -57,25 +69,53 @@ async def apply_eq_ai(
     # ตรวจสิทธิ์ก่อนเริ่มงาน (B6: ไฟล์ไม่ผ่าน validate จะไม่เสียโควตา)
     validate_request_quota(request=request, user_tier=x_user_tier, user_id=x_user_id, model_type=model_id)
     try:
-        file_id, input_path = await save_upload(file, trim_start=trim_start, trim_end=trim_end)
-        # ผ่านการตรวจสอบไฟล์แล้ว -> ถึงค่อยนับโควตา (เฉพาะ Guest)
-        increment_guest_quota(request, user_id=x_user_id)
+        file_id, input_path, upload_digest = await save_upload(file, trim_start=trim_start, trim_end=trim_end)
         output_filename = f"{file_id}_eq_ai_{model_id}_{genre}.wav"
         output_path = os.path.join("eq_applied", output_filename)
         os.makedirs("eq_applied", exist_ok=True)
 
-        async with processing_semaphore:
-            result_path = await asyncio.to_thread(
-                apply_auto_eq_file,
-                input_path,
-                output_path,
-                genre,
-                delta_clamp_db,
-                model_id,
-            )
+        cache_key = upload_cache_key(
+            upload_digest,
+            "apply-eq-ai",
+            {
+                "genre": genre,
+                "delta_clamp_db": delta_clamp_db,
+                "trim_start": trim_start,
+                "trim_end": trim_end,
+                "export_format": export_format,
+                "filter_engine": DEFAULT_FILTER_ENGINE,
+                "lstm_segments": AUTO_EQ_LSTM_SEGMENTS,
+            },
+            model_id,
+        )
+        cached_entry = result_cache.lookup(cache_key)
+        if cached_entry is None:
+            # คิว inference เต็ม -> ตอบ 429 ก่อนหักโควตา
+            get_pool(POOL_INFERENCE).check_admission()
+        # ผ่านการตรวจสอบไฟล์แล้ว -> ถึงค่อยนับโควตา (เฉพาะ Guest)
+        increment_guest_quota(request, user_id=x_user_id)
 
-        if export_format == "mp3":
-            result_path = await asyncio.to_thread(convert_to_mp3, result_path)
+        result_path = None
+        if cached_entry is not None:
+            result_path = await asyncio.to_thread(result_cache.restore_file, cached_entry, output_path)
+        if result_path is None:
+            async with get_pool(POOL_INFERENCE).slot():
+                result_path = await run_cpu_task(
+                    TASK_INFERENCE,
+                    apply_auto_eq_file,
+                    input_path,
+                    output_path,
+                    genre,
+                    delta_clamp_db,
+                    model_id,
+                )
+
+            if export_format == "mp3":
+                async with get_pool(POOL_ENCODING).slot():
+                    result_path = await asyncio.to_thread(convert_to_mp3, result_path)
+            await asyncio.to_thread(result_cache.store_file, cache_key, result_path)
+        # ลงทะเบียนไฟล์ผลลัพธ์ให้ /download/{file_id} หาได้โดยไม่ต้องสแกนโฟลเดอร์
+        await asyncio.to_thread(artifact_registry.record, file_id, result_path, ARTIFACT_EQ)
 
         # ส่ง X-File-Id กลับไปเพื่อให้ Frontend เก็บ file_id ไว้แสดงผล/ดาวน์โหลดในประวัติ
         return FileResponse(
@@ -131,30 +171,60 @@ async def apply_compressor(
     # ตรวจสิทธิ์ก่อนเริ่มงาน (B6: ไฟล์ไม่ผ่าน validate จะไม่เสียโควตา)
     validate_request_quota(request=request, user_tier=x_user_tier, user_id=x_user_id)
     try:
-        file_id, input_path = await save_upload(file, trim_start=trim_start, trim_end=trim_end)
+        file_id, input_path, upload_digest = await save_upload(file, trim_start=trim_start, trim_end=trim_end)
+        os.makedirs("compressed", exist_ok=True)
+
+        compressor_params = {
+            "threshold": threshold,
+            "ratio": ratio,
+            "attack": attack,
+            "release": release,
+            "knee": knee,
+            "makeup_gain": makeup_gain,
+            "dry_wet": dry_wet,
+            "output_ceiling": output_ceiling,
+        }
+        cache_key = upload_cache_key(
+            upload_digest,
+            "apply-compressor",
+            {
+                "strength": strength,
+                "genre": genre,
+                **compressor_params,
+                "trim_start": trim_start,
+                "trim_end": trim_end,
+                "export_format": export_format,
+            },
+        )
+        cached_entry = result_cache.lookup(cache_key)
+        if cached_entry is None:
+            get_pool(POOL_LIGHT_DSP).check_admission()
         # ผ่านการตรวจสอบไฟล์แล้ว -> ถึงค่อยนับโควตา (เฉพาะ Guest)
         increment_guest_quota(request, user_id=x_user_id)
-        os.makedirs("compressed", exist_ok=True)
 
-        async with processing_semaphore:
-            output_path = await asyncio.to_thread(
-                apply_compression,
-                input_path,
-                strength,
-                genre,
-                "compressed",
-                threshold=threshold,
-                ratio=ratio,
-                attack=attack,
-                release=release,
-                knee=knee,
-                makeup_gain=makeup_gain,
-                dry_wet=dry_wet,
-                output_ceiling=output_ceiling,
-            )
+        output_path = None
+        if cached_entry is not None:
+            # ตั้งชื่อแบบเดียวกับ apply_compression (rebuild_from_disk จับคู่ file_id จากชื่อไฟล์)
+            stem_name = os.path.splitext(os.path.basename(input_path))[0]
+            cached_target = os.path.join("compressed", f"{stem_name}_{genre}_compressed.wav")
+            output_path = await asyncio.to_thread(result_cache.restore_file, cached_entry, cached_target)
+        if output_path is None:
+            async with get_pool(POOL_LIGHT_DSP).slot():
+                output_path = await run_cpu_task(
+                    TASK_DSP,
+                    apply_compression,
+                    input_path,
+                    strength,
+                    genre,
+                    "compressed",
+                    **compressor_params,
+                )
 
-        if export_format == "mp3":
-            output_path = await asyncio.to_thread(convert_to_mp3, output_path)
+            if export_format == "mp3":
+                async with get_pool(POOL_ENCODING).slot():
+                    output_path = await asyncio.to_thread(convert_to_mp3, output_path)
+            await asyncio.to_thread(result_cache.store_file, cache_key, output_path)
+        await asyncio.to_thread(artifact_registry.record, file_id, output_path, ARTIFACT_COMPRESSED)
 
         # ส่ง X-File-Id กลับไปเพื่อให้ Frontend เก็บ file_id ไว้แสดงผล/ดาวน์โหลดในประวัติ
         return FileResponse(
@@ -186,18 +256,21 @@ async def pitch_shift(
     """เอนด์พอยต์ปรับ Pitch ของไฟล์เสียง"""
     # ตรวจสิทธิ์ก่อนเริ่มงาน (B6: ไฟล์ไม่ผ่าน validate จะไม่เสียโควตา)
     validate_request_quota(request=request, user_tier=x_user_tier, user_id=x_user_id, pitch_shift_semitones=int(steps))
+    get_pool(POOL_LIGHT_DSP).check_admission()
     try:
-        file_id, input_path = await save_upload(file, trim_start=trim_start, trim_end=trim_end)
+        file_id, input_path, upload_digest = await save_upload(file, trim_start=trim_start, trim_end=trim_end)
         # ผ่านการตรวจสอบไฟล์แล้ว -> ถึงค่อยนับโควตา (เฉพาะ Guest)
         increment_guest_quota(request, user_id=x_user_id)
         output_filename = f"{file_id}_pitch.wav"
         output_path = os.path.join(UPLOAD_DIR, output_filename)
 
-        async with processing_semaphore:
-            result_path = await asyncio.to_thread(pitch_shift_audio, input_path, steps, output_path)
+        async with get_pool(POOL_LIGHT_DSP).slot():
+            result_path = await run_cpu_task(TASK_DSP, pitch_shift_audio, input_path, steps, output_path)
 
         if export_format == "mp3":
-            result_path = await asyncio.to_thread(convert_to_mp3, result_path)
+            async with get_pool(POOL_ENCODING).slot():
+                result_path = await asyncio.to_thread(convert_to_mp3, result_path)
+        await asyncio.to_thread(artifact_registry.record, file_id, result_path, ARTIFACT_PITCH_SHIFT)
 
         # ส่ง X-File-Id กลับไปเพื่อให้ Frontend เก็บ file_id ไว้แสดงผล/ดาวน์โหลดในประวัติ
         return FileResponse(
@@ -234,27 +307,25 @@ async def convert_format(
     input_path = os.path.join(UPLOAD_DIR, f"{file_id}_{filename}")
     with open(input_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
-    if os.path.getsize(input_path) > 100 * 1024 * 1024:
+    if os.path.getsize(input_path) > MAX_UPLOAD_BYTES:
         os.remove(input_path)
-        raise HTTPException(status_code=400, detail="ไฟล์ต้องมีขนาดไม่เกิน 100MB")
+        raise HTTPException(status_code=400, detail=UPLOAD_LIMIT_MESSAGE)
 
     try:
         result_path = input_path
         if ext != export_format:
-            from pydub import AudioSegment
             output_path = os.path.join(UPLOAD_DIR, f"{file_id}.{export_format}")
-            audio = AudioSegment.from_file(input_path, format=ext)
-            if export_format == "mp3":
-                audio.export(output_path, format="mp3", bitrate="320k")
-            else:
-                audio.export(output_path, format="wav")
+            # encode แบบ streaming ทีละ block (ไม่ decode ทั้งไฟล์เข้าหน่วยความจำ)
+            await asyncio.to_thread(encoder.encode, input_path, output_path, export_format)
             result_path = output_path
             background.add_task(_cleanup_convert_files, input_path)
+        # ไฟล์ที่ส่งกลับ (ผลการแปลง หรือไฟล์เดิมเมื่อ format เดียวกัน) ก็เป็นไฟล์ชั่วคราว ลบหลังส่งเสร็จ
+        background.add_task(_cleanup_convert_files, result_path)
 
         download_name = f"{os.path.splitext(filename)[0]}.{export_format}"
         return FileResponse(
             result_path,
-            media_type="audio/mpeg" if export_format == "mp3" else "audio/wav",
+            media_type=media_type_for(export_format),
             filename=download_name,
             background=background,
         )
@@ -262,6 +333,7 @@ async def convert_format(
         raise http_exc
     except Exception as e:
         logger.error(f"Error converting format: {e}")
+        _cleanup_convert_files(input_path)
         raise HTTPException(status_code=500, detail="การแปลงฟอร์แมตเสียงล้มเหลว")
 
 
@@ -278,13 +350,19 @@ def _cleanup_convert_files(path: str) -> None:
 async def analyze(
     file: UploadFile = File(...),
     trim_start: float | None = Query(None),
-    trim_end: float | None = Query(None)
+    trim_end: float | None = Query(None),
+    mode: str = Query(
+        "full",
+        pattern="^(fast|full)$",
+        description="fast = ผลเร็วจากช่วงตัวอย่างพร้อม confidence, full = วิเคราะห์ทั้งเพลง",
+    ),
 ):
     """เอนด์พอยต์วิเคราะห์ค่าสเปกตรัมและความถี่เสียง"""
+    get_pool(POOL_LIGHT_DSP).check_admission()
     try:
-        _, input_path = await save_upload(file, trim_start=trim_start, trim_end=trim_end)
-        async with processing_semaphore:
-            result = await asyncio.to_thread(analyze_audio, input_path)
+        _, input_path, _ = await save_upload(file, trim_start=trim_start, trim_end=trim_end)
+        async with get_pool(POOL_LIGHT_DSP).slot():
+            result = await run_cpu_task(TASK_DSP, analyze_audio, input_path, mode)
         return JSONResponse(content=result)
     finally:
         if "input_path" in locals() and os.path.exists(input_path):
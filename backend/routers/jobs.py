@@ -0,0 +1,21 @@
+# backend/routers/jobs.py
+# FastAPI APIRouter สำหรับติดตามสถานะงานในคิว (เช่น /separate ที่ตอบกลับ 202 ทันที)
+
+import os
+import asyncio
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from backend.services.job_manager import job_manager
+
+router = APIRouter(tags=["jobs"])
+
+
+@router.get("/jobs/{file_id}")
+async def get_job_status(file_id: str):
+    """คืนสถานะงาน ลำดับในคิว ความคืบหน้า (0-1) และเวลาที่คาดว่าจะเสร็จ (วินาที)"""
+    safe_file_id = os.path.basename(file_id)
+    status = await asyncio.to_thread(job_manager.describe_job, safe_file_id)
+    if status is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "ไม่พบงานสำหรับ file id นี้"})
+    return status
@@ -1,20 +1,44 @@
 # backend/routers/stems.py
 # FastAPI APIRouter สำหรับระบบแยกเสียงดนตรี (Stem Separation), ดาวน์โหลด และ Export
 
+import io
 import os
+import time
 import asyncio
-import zipfile
+import functools
 import logging
+from urllib.parse import urlencode
 import soundfile as sf
 import numpy as np
 from fastapi import APIRouter, UploadFile, File, Query, Header, Request, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 
-from backend.services.storage import save_upload, convert_to_mp3, processing_semaphore, UPLOAD_DIR
+from backend.config import DIR_SEPARATED, SEPARATION_SEGMENT_SECONDS, SEPARATION_OVERLAP_SECONDS, STEM_TARGETS
+from backend.services.storage import save_upload, convert_to_mp3
+from backend.services.encoder import encoder, media_type_for
+from backend.services.zip_stream import iter_zip_stream, zip_stream_size
+from backend.services.audio_slice import iter_wav_slice, slice_frames, wav_slice_size
 from backend.services.job_manager import job_manager
+from backend.services.artifact_registry import (
+    artifact_registry,
+    ARTIFACT_STEM,
+    ARTIFACT_KARAOKE,
+    ARTIFACT_VOCAL_POLISH,
+    ARTIFACT_EXPORT,
+    DOWNLOADABLE_KINDS,
+)
+from backend.services.job_worker import register_handler
+from backend.services.executor import run_cpu_task, TASK_SEPARATION, TASK_DSP
+from backend.services.result_cache import result_cache, upload_cache_key
+from backend.services.scheduler import get_pool, POOL_SEPARATION, POOL_LIGHT_DSP, POOL_ENCODING
+from backend.services.pitch_variants import pitch_variants
+from backend.services.spectrograms import spectrograms
 from backend.process_audio import separate_audio
+from backend.waveform_peaks import build_peaks_file, peaks_path, read_peaks_level
+from backend.spectrogram_tiles import read_spectrogram_info, read_spectrogram_tile
+from backend.config import SPECTROGRAM_TILE_SIZE
 from backend.auto_mastering import polish_vocal_file, apply_lufs_mastering
-from backend.utils.auth_guard import validate_request_quota, increment_guest_quota
+from backend.utils.auth_guard import validate_request_quota, validate_tier_and_quota, increment_guest_quota
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["stems"])
@@ -55,14 +79,134 @@ def mixdown_stems(file_paths: list[str]) -> tuple[np.ndarray, int]:
     return mix.astype(np.float32), samplerate
 
 
-def create_zip_archive(zip_path: str, entries: list[tuple[str, str]]) -> None:
-    """สร้างไฟล์ zip จากรายการ (source_path, arcname) — ใช้ร่วมกัน /separate และ export (C3)"""
-    with zipfile.ZipFile(zip_path, "w") as zipf:
-        for file_path, arcname in entries:
-            zipf.write(file_path, arcname)
+def zip_response(entries: list[tuple[str, str]], filename: str) -> StreamingResponse:
+    """ส่ง ZIP ที่สร้างระหว่างส่ง response (ไม่มีสำเนา archive บนดิสก์ และไบต์แรกออกทันที) — ใช้ร่วมกัน /download และ export"""
+    return StreamingResponse(
+        iter_zip_stream(entries),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Content-Length": str(zip_stream_size(entries)),
+        },
+    )
 
 
-@router.post("/separate")
+# model id ของการแยกเสียง (ส่วนหนึ่งของ key ในแคชผลลัพธ์)
+SEPARATION_MODEL_ID = "umxl"
+
+# สัดส่วนความคืบหน้าของขั้นแยกเสียง (ที่เหลือคือ encode MP3 ของแต่ละ stem แล้วลงทะเบียน artifact)
+SEPARATION_PROGRESS_SHARE = 0.9
+
+
+async def _encode_stem(output_dir: str, stem: str) -> tuple[str, float]:
+    """encode stem หนึ่งไฟล์เป็น MP3 คืน (ชื่อ stem, เวลา encode)"""
+    mp3_path = os.path.join(output_dir, f"{stem}.mp3")
+    if os.path.exists(mp3_path):
+        return stem, 0.0
+    # เก็บ WAV ต้นฉบับไว้ เพื่อให้ player/karaoke/vocal-polish ยังใช้งานได้
+    result = await asyncio.to_thread(encoder.encode, os.path.join(output_dir, f"{stem}.wav"), mp3_path, "mp3")
+    return stem, result["seconds"]
+
+
+async def _encode_separation_output(file_id: str, output_dir: str, export_format: str = "wav") -> dict:
+    """ขั้นหลังแยกเสียงแบบ fan-out/fan-in: encode MP3 ทุก stem พร้อมกัน (จำกัดด้วย ENCODER_MAX_CONCURRENT)
+    และอัปเดต progress ทีละ stem ที่เสร็จ คืนเวลาต่อ stem สำหรับผลลัพธ์ของงาน (ZIP สร้างตอนดาวน์โหลด)
+    """
+    started = time.perf_counter()
+    stems = [stem for stem in STEM_TARGETS if os.path.exists(os.path.join(output_dir, f"{stem}.wav"))]
+    timings = {stem: {"encode_seconds": 0.0} for stem in stems}
+    if export_format == "mp3" and stems:
+        tasks = [asyncio.create_task(_encode_stem(output_dir, stem)) for stem in stems]
+        try:
+            for done in asyncio.as_completed(tasks):
+                stem, encode_seconds = await done
+                timings[stem]["encode_seconds"] = round(encode_seconds, 3)
+                finished = sum(1 for task in tasks if task.done())
+                fraction = SEPARATION_PROGRESS_SHARE + (1.0 - SEPARATION_PROGRESS_SHARE) * finished / len(tasks)
+                await asyncio.to_thread(job_manager.update_progress, file_id, fraction)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    return {"postprocess_seconds": round(time.perf_counter() - started, 3), "stems": timings}
+
+
+def record_separation_output(file_id: str, output_dir: str) -> None:
+    """ลงทะเบียนไฟล์ stem (WAV + MP3 ถ้ามี) ของงานแยกเสียงที่เสร็จแล้ว — งานที่ยังไม่เสร็จจึงไม่มี stem ให้ดาวน์โหลด"""
+    paths = [os.path.join(output_dir, f"{stem}.{ext}") for stem in STEM_TARGETS for ext in ("wav", "mp3")]
+    artifact_registry.record_many(file_id, paths, ARTIFACT_STEM)
+
+
+def separation_archive_entries(file_id: str) -> list[tuple[str, str]]:
+    """ไฟล์ stem ที่ลงทะเบียนไว้ของ file_id สำหรับ ZIP ของ /download (ไม่มี = งานยังไม่เสร็จหรือหมดอายุแล้ว)"""
+    return [(entry["path"], entry["name"]) for entry in artifact_registry.find(file_id, [ARTIFACT_STEM])]
+
+
+def find_stem_folder(file_id: str) -> str | None:
+    """โฟลเดอร์ของ stem ที่ลงทะเบียนไว้ (ใช้วางไฟล์ที่สร้างต่อจาก stems เช่น karaoke/vocal polish/export mix)"""
+    entries = artifact_registry.find(file_id, [ARTIFACT_STEM])
+    return os.path.dirname(entries[0]["path"]) if entries else None
+
+
+def report_separation_progress(file_id: str, fraction: float) -> None:
+    # ฟังก์ชันระดับ module เพื่อให้ pickle ส่งไป worker process ได้ (job_manager เขียนลง SQLite ร่วมกัน)
+    job_manager.update_progress(file_id, fraction * SEPARATION_PROGRESS_SHARE)
+
+
+def _remove_job_input(input_path: str) -> None:
+    """ลบไฟล์ input เมื่องานจบแล้วเท่านั้น (สำเร็จ หรือล้มเหลวที่ไม่ลองใหม่)"""
+    if os.path.exists(input_path):
+        os.remove(input_path)
+
+
+async def run_separation_job(job: dict) -> dict:
+    """Handler ของคิวงานชนิด "separate": แยกเสียง -> encode MP3 (ถ้าเลือก) พร้อมกันทุก stem -> ลงทะเบียน stems
+    ใน artifact registry (ZIP สร้างแบบ streaming ตอน GET /download/{file_id})"""
+    file_id = job["file_id"]
+    output_dir = job["output_dir"]
+    input_path = job["payload"]["input_path"]
+    export_format = job["payload"].get("export_format", "wav")
+
+    try:
+        if not os.path.exists(input_path):
+            raise RuntimeError("ไม่พบไฟล์ต้นฉบับของงานนี้ (ไฟล์อาจหมดอายุก่อนถึงคิว)")
+        os.makedirs(output_dir, exist_ok=True)
+
+        separation_started = time.perf_counter()
+        async with get_pool(POOL_SEPARATION).slot():
+            await run_cpu_task(
+                TASK_SEPARATION,
+                separate_audio,
+                input_path,
+                output_dir,
+                progress_callback=functools.partial(report_separation_progress, file_id),
+            )
+        separation_seconds = time.perf_counter() - separation_started
+
+        async with get_pool(POOL_ENCODING).slot():
+            timings = await _encode_separation_output(file_id, output_dir, export_format)
+        await asyncio.to_thread(record_separation_output, file_id, output_dir)
+        # เก็บผลลัพธ์ลงแคช เพื่อให้การอัปโหลดไฟล์เดิมด้วยพารามิเตอร์เดิมไม่ต้องแยกเสียงซ้ำ
+        await asyncio.to_thread(result_cache.store_directory, job["payload"].get("cache_key"), output_dir)
+        # render pitch variant ที่ใช้บ่อยเบื้องหลัง (priority ต่ำ ไม่ถ่วงเวลาจบงาน)
+        pitch_variants.schedule(output_dir)
+
+        result = {"zip_url": f"/download/{file_id}", "timings": {"separation_seconds": round(separation_seconds, 3), **timings}}
+    except asyncio.CancelledError:
+        # server กำลังปิด: เก็บไฟล์ input ไว้ให้งานที่ requeue_stale_jobs คืนเข้าคิวหลัง restart ประมวลผลต่อได้
+        raise
+    except Exception:
+        _remove_job_input(input_path)
+        raise
+    _remove_job_input(input_path)
+    return result
+
+
+register_handler("separate", run_separation_job)
+
+
+@router.post("/separate", status_code=202)
 async def separate(
     request: Request,
     file: UploadFile = File(...),
@@ -72,119 +216,356 @@ async def separate(
     x_user_tier: str = Header("FREE"),
     x_user_id: str = Header(None)
 ):
-    """เอนด์พอยต์แยกแทร็กเสียง (Drums, Bass, Vocal, Other)"""
+    """เอนด์พอยต์แยกแทร็กเสียง (Drums, Bass, Vocal, Other)
+
+    ส่งงานเข้าคิวแล้วตอบกลับ 202 ทันที ให้ client ติดตามสถานะที่ GET /jobs/{file_id}
+    """
     # ตรวจสิทธิ์ก่อนเริ่มงาน (B6: ไฟล์ไม่ผ่าน validate จะไม่เสียโควตา)
     validate_request_quota(request=request, user_tier=x_user_tier, user_id=x_user_id)
+    queued = False
     try:
-        file_id, input_path = await save_upload(file, trim_start=trim_start, trim_end=trim_end)
+        file_id, input_path, upload_digest = await save_upload(file, trim_start=trim_start, trim_end=trim_end)
+        output_dir = os.path.join(DIR_SEPARATED, file_id)
+        cache_key = upload_cache_key(
+            upload_digest,
+            "separate",
+            {
+                "trim_start": trim_start,
+                "trim_end": trim_end,
+                "export_format": export_format,
+                "segment_seconds": SEPARATION_SEGMENT_SECONDS,
+                "overlap_seconds": SEPARATION_OVERLAP_SECONDS,
+            },
+            SEPARATION_MODEL_ID,
+        )
+        cached_entry = result_cache.lookup(cache_key)
+
+        if cached_entry is None:
+            # คิวแยกเสียงเต็ม (นับรวมงานที่รอในคิวถาวร) -> ตอบ 429 ก่อนหักโควตา
+            pending = await asyncio.to_thread(job_manager.queue_length)
+            get_pool(POOL_SEPARATION).check_admission(pending=pending)
+
         # ผ่านการตรวจสอบไฟล์แล้ว -> ถึงค่อยนับโควตา (เฉพาะ Guest)
         increment_guest_quota(request, user_id=x_user_id)
-
-        output_dir = os.path.join("separated", file_id)
         os.makedirs(output_dir, exist_ok=True)
-        job_manager.register_job(file_id, output_dir)
 
-        async with processing_semaphore:
-            await asyncio.to_thread(separate_audio, input_path, output_dir)
-
-        job_manager.complete_job(file_id)
+        if cached_entry is not None:
+            # แคชตรง: ใช้ stems เดิมทันทีโดยไม่เข้าคิว/ไม่ใช้ slot ของ separation pool
+            await asyncio.to_thread(result_cache.restore_directory, cached_entry, output_dir)
+            await asyncio.to_thread(record_separation_output, file_id, output_dir)
+            pitch_variants.schedule(output_dir)
+            result = {"zip_url": f"/download/{file_id}", "cached": True}
+            await asyncio.to_thread(job_manager.register_job, file_id, output_dir)
+            await asyncio.to_thread(job_manager.complete_job, file_id, result)
+            return JSONResponse(
+                content={"status": "completed", "file_id": file_id, "status_url": f"/jobs/{file_id}", **result}
+            )
 
-        if export_format == "mp3":
-            for root, _, files in os.walk(output_dir):
-                for name in files:
-                    if name.lower().endswith(".wav"):
-                        wav_path = os.path.join(root, name)
-                        # เก็บ WAV ต้นฉบับไว้ เพื่อให้ player/karaoke/vocal-polish ยังใช้งานได้
-                        await asyncio.to_thread(convert_to_mp3, wav_path, remove_source=False)
-
-        zip_filename = f"{file_id}_separated.zip"
-        zip_path = os.path.join(UPLOAD_DIR, zip_filename)
-        # สร้าง zip แบบ async (B10: เดิม block event loop กับไฟล์หลายร้อย MB)
-        entries = []
-        for root, _, files in os.walk(output_dir):
-            for name in files:
-                file_path = os.path.join(root, name)
-                entries.append((file_path, os.path.relpath(file_path, output_dir)))
-        await asyncio.to_thread(create_zip_archive, zip_path, entries)
+        await asyncio.to_thread(
+            job_manager.enqueue_job,
+            file_id,
+            output_dir,
+            "separate",
+            {"input_path": input_path, "export_format": export_format, "cache_key": cache_key},
+        )
+        queued = True
+        status = await asyncio.to_thread(job_manager.describe_job, file_id)
 
         return JSONResponse(
+            status_code=202,
             content={
-                "status": "success",
+                "status": "queued",
                 "file_id": file_id,
+                "status_url": f"/jobs/{file_id}",
                 "zip_url": f"/download/{file_id}",
-            }
+                "queue_position": status["queue_position"] if status else None,
+                "eta_seconds": status["eta_seconds"] if status else None,
+            },
         )
 
     finally:
-        if "input_path" in locals() and os.path.exists(input_path):
+        # ไฟล์ input ของงานที่เข้าคิวแล้ว worker จะลบเองหลังประมวลผล
+        if not queued and "input_path" in locals() and os.path.exists(input_path):
             os.remove(input_path)
 
 
+def _wants_window(entry: dict, start: float | None, end: float | None, export_format: str | None) -> bool:
+    """ต้องตัดช่วง/แปลงไฟล์ไหม (ไม่ระบุช่วงและ format ตรงกับไฟล์เดิม -> ส่งไฟล์ทั้งไฟล์ตามปกติ)"""
+    if start is not None or end is not None:
+        return True
+    return export_format is not None and media_type_for(export_format) != entry["media_type"]
+
+
+async def audio_window_response(
+    entry: dict, start: float | None, end: float | None, export_format: str | None, filename: str | None = None
+) -> Response:
+    """ส่งเฉพาะช่วงเวลา [start, end) (วินาที) ของไฟล์เสียงที่ลงทะเบียนไว้ — ใช้ร่วมกัน /separated และ /download
+
+    - WAV: stream จากตำแหน่งที่ seek ไป พร้อม header ที่มีขนาดของช่วงที่ตัด (ตั้ง Content-Length ได้)
+    - MP3: encode เฉพาะช่วงนั้นตอนขอ (ใช้ slot ของ encoding pool)
+    - ไม่ระบุ format ใช้ชนิดเดิมของไฟล์; header X-Slice-Start / X-Slice-End คือช่วงจริงที่ส่ง (ปัดเป็นเฟรม)
+    """
+    path = entry["path"]
+    try:
+        info = await asyncio.to_thread(sf.info, path)
+        first, frames = slice_frames(info.frames, info.samplerate, start, end)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except RuntimeError:
+        raise HTTPException(status_code=400, detail=f"ไฟล์ {entry['name']} ไม่ใช่ไฟล์เสียงที่ตัดช่วงได้")
+    export_format = export_format or ("mp3" if entry["media_type"] == media_type_for("mp3") else "wav")
+
+    headers = {
+        "X-Slice-Start": f"{first / info.samplerate:.6f}",
+        "X-Slice-End": f"{(first + frames) / info.samplerate:.6f}",
+    }
+    if filename:
+        stem_name = filename.rsplit(".", 1)[0]
+        headers["Content-Disposition"] = f'attachment; filename="{stem_name}.{export_format}"'
+
+    if export_format == "mp3":
+        get_pool(POOL_ENCODING).check_admission()
+        buffer = io.BytesIO()
+        async with get_pool(POOL_ENCODING).slot():
+            await asyncio.to_thread(encoder.encode_window, path, buffer, "mp3", first, frames)
+        return Response(content=buffer.getvalue(), media_type=media_type_for("mp3"), headers=headers)
+
+    headers["Content-Length"] = str(wav_slice_size(info.channels, info.subtype, frames))
+    return StreamingResponse(iter_wav_slice(path, first, frames), media_type=media_type_for("wav"), headers=headers)
+
+
 @router.get("/download/{file_id}")
-async def download_file(file_id: str):
+async def download_file(
+    file_id: str,
+    start: float | None = Query(None, description="วินาที"),
+    end: float | None = Query(None, description="วินาที"),
+    export_format: str | None = Query(None, pattern="^(wav|mp3)$"),
+):
     """ดาวน์โหลดไฟล์ผลลัพธ์ของ file_id ที่กำหนด (ZIP stems / Auto-EQ / Compressor / Pitch Shift)
 
-    - ลำดับการค้นหา: ZIP ของ stems ใน uploads/ ก่อน -> แล้วค้นหาไฟล์ output ที่ขึ้นต้นด้วย
-      {file_id}_ ใน uploads/, eq_applied/, compressed/ (ทุกไฟล์ถูก TTL cleanup ลบภายใน 20 นาที)
+    - ค้นหาจากทะเบียน artifact (ไม่สแกนโฟลเดอร์): stems ของงาน /separate ที่เสร็จแล้ว (ส่งเป็น ZIP แบบ streaming)
+      ก่อน -> แล้วไฟล์ผลลัพธ์ Pitch Shift / Auto-EQ / Compressor (ทุกไฟล์หมดอายุตาม TTL ของ cleanup)
+    - start / end / export_format ใช้กับไฟล์ผลลัพธ์เดี่ยว: ส่งเฉพาะช่วงเวลานั้น (ดู audio_window_response)
     - ถ้าไม่พบ -> 404 แสดงว่าไฟล์ถูกลบไปแล้ว (หมดอายุ) หรือไม่เคยถูกสร้าง
     """
     safe_file_id = os.path.basename(file_id)
 
-    # 1) ZIP รวมทุก Stem (จาก /separate)
-    zip_path = os.path.join(UPLOAD_DIR, f"{safe_file_id}_separated.zip")
-    if os.path.exists(zip_path):
-        return FileResponse(
-            zip_path,
-            media_type="application/zip",
-            filename="separated.zip",
-        )
-
-    # 2) ค้นหาไฟล์ output อื่น ๆ (Auto-EQ / Compressor / Pitch Shift) ที่ขึ้นต้นด้วย file_id_
-    for directory in [UPLOAD_DIR, "eq_applied", "compressed"]:
-        if not os.path.isdir(directory):
-            continue
-        try:
-            names = os.listdir(directory)
-        except OSError:
-            continue
-        for name in sorted(names):
-            if name.startswith(f"{safe_file_id}_") and os.path.isfile(os.path.join(directory, name)):
-                path = os.path.join(directory, name)
-                ext = name.lower().rsplit(".", 1)[-1]
-                media_type = (
-                    "audio/mpeg" if ext == "mp3" else "audio/wav" if ext == "wav" else "application/octet-stream"
-                )
-                return FileResponse(path, media_type=media_type, filename=name)
+    # 1) ZIP รวมทุก Stem (จาก /separate) สร้างระหว่างส่งจากไฟล์ในโฟลเดอร์งาน
+    entries = await asyncio.to_thread(separation_archive_entries, safe_file_id)
+    if entries:
+        if start is not None or end is not None or export_format is not None:
+            raise HTTPException(status_code=400, detail="ตัดช่วงเวลาได้เฉพาะไฟล์เดี่ยว (ใช้ /separated/{file_id}/{filename} สำหรับ stem)")
+        return zip_response(entries, "separated.zip")
+
+    # 2) ไฟล์ output อื่น ๆ (Pitch Shift / Auto-EQ / Compressor)
+    outputs = await asyncio.to_thread(artifact_registry.find, safe_file_id, DOWNLOADABLE_KINDS)
+    if outputs:
+        entry = outputs[0]
+        if _wants_window(entry, start, end, export_format):
+            return await audio_window_response(entry, start, end, export_format, filename=entry["name"])
+        return FileResponse(entry["path"], media_type=entry["media_type"], filename=entry["name"])
 
     return JSONResponse(status_code=404, content={"status": "error", "message": "ไม่พบไฟล์สำหรับดาวน์โหลด (ไฟล์อาจถูกลบตามเวลาหมดอายุ)"})
 
 
+@router.get("/separated/{file_id}/{stem}/pitch")
+async def get_pitch_variant(
+    file_id: str,
+    stem: str,
+    semitones: int = Query(..., ge=-12, le=12),
+    x_user_tier: str = Header("FREE"),
+    x_user_id: str = Header(None)
+):
+    """ส่งคืน stem ที่เลื่อน pitch แล้ว: ใช้ variant ที่ render ล่วงหน้าทันที ไม่มีก็ render ตอนนี้แล้วเก็บไว้
+
+    header X-Pitch-Variant บอกว่าได้ผลจาก variant ล่วงหน้า (prerendered) หรือ render ใหม่ (rendered)
+    """
+    # ตรวจเฉพาะช่วง semitone ของแพ็กเกจ (ไม่หักโควตา); Guest ใช้สิทธิ์ FREE เสมอ
+    validate_tier_and_quota(user_tier=x_user_tier if x_user_id else "FREE", used_quota=0, pitch_shift_semitones=semitones)
+
+    safe_file_id = os.path.basename(file_id)
+    safe_stem = os.path.basename(stem)
+    source = await asyncio.to_thread(artifact_registry.get, safe_file_id, f"{safe_stem}.wav")
+    if safe_stem not in STEM_TARGETS or source is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": f"ไม่พบไฟล์ stem {stem}"})
+    source_path = source["path"]
+    folder = os.path.dirname(source_path)
+
+    if semitones == 0:
+        return FileResponse(source_path, media_type="audio/wav", headers={"X-Pitch-Variant": "original"})
+
+    if not pitch_variants.has_variant(folder, safe_stem, semitones):
+        get_pool(POOL_LIGHT_DSP).check_admission()
+    path, prerendered = await pitch_variants.get_variant(folder, safe_stem, semitones)
+    return FileResponse(
+        path,
+        media_type="audio/wav",
+        headers={"X-Pitch-Variant": "prerendered" if prerendered else "rendered"},
+    )
+
+
+def derived_cache_headers(source: dict, path: str, variant: str) -> dict:
+    """header cache ของข้อมูลที่คำนวณจาก stem (peaks / spectrogram): ไม่เปลี่ยนตลอดอายุของ stem
+    จึงให้ browser cache ได้จนไฟล์หมดอายุ และตรวจซ้ำด้วย ETag ของไฟล์ที่คำนวณไว้
+    """
+    stat = os.stat(path)
+    max_age = max(int(source["expires_at"] - time.time()), 0)
+    return {
+        "Cache-Control": f"private, max-age={max_age}, immutable",
+        "ETag": f'"{stat.st_mtime_ns:x}-{stat.st_size:x}-{variant}"',
+    }
+
+
+def _not_modified(request: Request, headers: dict) -> Response | None:
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+@router.get("/separated/{file_id}/{stem}/peaks")
+async def get_stem_peaks(request: Request, file_id: str, stem: str, level: int | None = Query(None, ge=0)):
+    """waveform peaks (min/max แบบ int8) ของ stem ในรูปแบบ JSON ของ waveform-data (peaks.js) ให้ UI วาด waveform
+    ได้โดยไม่ต้องโหลด WAV ทั้งไฟล์ — level 0 = ละเอียดสุด ไม่ระบุ = หยาบสุด (ภาพรวมทั้งเพลง)
+
+    peaks สร้างระหว่างแยกเสียง ถ้า stem ไม่มี (เช่นไฟล์ก่อนมีฟีเจอร์นี้) จะสร้างจาก WAV ตอนนี้แล้วเก็บไว้
+    """
+    safe_file_id = os.path.basename(file_id)
+    safe_stem = os.path.basename(stem)
+    source = await asyncio.to_thread(artifact_registry.get, safe_file_id, f"{safe_stem}.wav")
+    if safe_stem not in STEM_TARGETS or source is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": f"ไม่พบไฟล์ stem {stem}"})
+
+    path = peaks_path(os.path.dirname(source["path"]), safe_stem)
+    if not os.path.exists(path):
+        get_pool(POOL_LIGHT_DSP).check_admission()
+        async with get_pool(POOL_LIGHT_DSP).slot():
+            await run_cpu_task(TASK_DSP, build_peaks_file, source["path"], path)
+
+    headers = derived_cache_headers(source, path, f"peaks-{level}")
+    not_modified = _not_modified(request, headers)
+    if not_modified is not None:
+        return not_modified
+    try:
+        peaks = await asyncio.to_thread(read_peaks_level, path, level)
+    except IndexError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return JSONResponse(
+        content={
+            "version": 2,
+            "channels": 1,
+            "sample_rate": peaks["sample_rate"],
+            "samples_per_pixel": peaks["samples_per_peak"],
+            "bits": 8,
+            "length": peaks["data"].size // 2,
+            "duration": peaks["frames"] / peaks["sample_rate"],
+            "level": peaks["level"],
+            "levels": peaks["levels"],
+            "data": peaks["data"].tolist(),
+        },
+        headers=headers,
+    )
+
+
+async def _stem_spectrogram(file_id: str, stem: str) -> tuple[dict, str] | None:
+    """(artifact ของ stem, path ของไฟล์ spectrogram) — สร้างไฟล์ครั้งแรกที่ถูกขอ คืน None ถ้าไม่พบ stem"""
+    source = await asyncio.to_thread(artifact_registry.get, file_id, f"{stem}.wav")
+    if stem not in STEM_TARGETS or source is None:
+        return None
+    if not spectrograms.has_spectrogram(source["path"], stem):
+        get_pool(POOL_LIGHT_DSP).check_admission()
+    return source, await spectrograms.get_spectrogram(source["path"], stem)
+
+
+@router.get("/separated/{file_id}/{stem}/spectrogram")
+async def get_stem_spectrogram_info(request: Request, file_id: str, stem: str):
+    """ข้อมูลของ spectrogram tiles ของ stem: พารามิเตอร์ STFT, ช่วง dB ของค่า uint8 และขนาด/จำนวน tile ต่อระดับ
+
+    ระดับ L รวม 2^L เฟรม x 2^L bin (0 = ละเอียดสุด) — ดึง tile ที่ tile_url (x = ช่วงเวลา, y = ช่วงความถี่)
+    """
+    safe_file_id = os.path.basename(file_id)
+    safe_stem = os.path.basename(stem)
+    resolved = await _stem_spectrogram(safe_file_id, safe_stem)
+    if resolved is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": f"ไม่พบไฟล์ stem {stem}"})
+    source, path = resolved
+
+    headers = derived_cache_headers(source, path, "spectrogram")
+    not_modified = _not_modified(request, headers)
+    if not_modified is not None:
+        return not_modified
+    info = await asyncio.to_thread(read_spectrogram_info, path)
+    sample_rate, hop_length = info["sample_rate"], info["hop_length"]
+    return JSONResponse(
+        content={
+            "sample_rate": sample_rate,
+            "n_fft": info["n_fft"],
+            "hop_length": hop_length,
+            "db_floor": info["db_floor"],
+            "db_ceiling": info["db_ceiling"],
+            "tile_size": SPECTROGRAM_TILE_SIZE,
+            "tile_url": f"/separated/{safe_file_id}/{safe_stem}/spectrogram/{{level}}/{{x}}/{{y}}",
+            "levels": [
+                {
+                    "level": entry["level"],
+                    "frames": entry["frames"],
+                    "bins": entry["bins"],
+                    "tiles_x": -(-entry["frames"] // SPECTROGRAM_TILE_SIZE),
+                    "tiles_y": -(-entry["bins"] // SPECTROGRAM_TILE_SIZE),
+                    "seconds_per_column": hop_length * (1 << entry["level"]) / sample_rate,
+                    "hz_per_row": sample_rate / info["n_fft"] * (1 << entry["level"]),
+                }
+                for entry in info["levels"]
+            ],
+        },
+        headers=headers,
+    )
+
+
+@router.get("/separated/{file_id}/{stem}/spectrogram/{level}/{x}/{y}")
+async def get_stem_spectrogram_tile(request: Request, file_id: str, stem: str, level: int, x: int, y: int):
+    """tile ของ spectrogram เป็นไบต์ uint8 (แถว = bin เริ่มจากความถี่ต่ำสุด, คอลัมน์ = เฟรม)
+
+    ขนาดจริงอยู่ใน header X-Tile-Width (เฟรม) / X-Tile-Height (bin) — tile ที่ขอบอาจเล็กกว่า tile_size
+    """
+    safe_file_id = os.path.basename(file_id)
+    safe_stem = os.path.basename(stem)
+    resolved = await _stem_spectrogram(safe_file_id, safe_stem)
+    if resolved is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": f"ไม่พบไฟล์ stem {stem}"})
+    source, path = resolved
+
+    headers = derived_cache_headers(source, path, f"{level}-{x}-{y}")
+    not_modified = _not_modified(request, headers)
+    if not_modified is not None:
+        return not_modified
+    try:
+        tile = await asyncio.to_thread(read_spectrogram_tile, path, level, x, y, SPECTROGRAM_TILE_SIZE)
+    except IndexError as exc:
+        return JSONResponse(status_code=404, content={"status": "error", "message": str(exc)})
+    headers.update({"X-Tile-Width": str(tile.shape[1]), "X-Tile-Height": str(tile.shape[0])})
+    return Response(content=tile.tobytes(), media_type="application/octet-stream", headers=headers)
+
+
 @router.get("/separated/{file_id}/{filename}")
-async def get_separated_file(file_id: str, filename: str):
-    """ส่งคืนไฟล์เสียง Stem เดี่ยวจากโฟลเดอร์ผลลัพธ์"""
+async def get_separated_file(
+    file_id: str,
+    filename: str,
+    start: float | None = Query(None, description="วินาที"),
+    end: float | None = Query(None, description="วินาที"),
+    export_format: str | None = Query(None, pattern="^(wav|mp3)$"),
+):
+    """ส่งคืนไฟล์เสียง Stem เดี่ยว (หรือไฟล์ที่สร้างต่อจาก stems) ที่ลงทะเบียนไว้ของ file_id
+
+    ระบุ start / end (วินาที) เพื่อรับเฉพาะช่วงนั้น และ export_format=mp3 เพื่อ encode เฉพาะช่วงนั้นเป็น MP3
+    """
     safe_file_id = os.path.basename(file_id)
     safe_filename = os.path.basename(filename)
-    folder = job_manager.get_job_directory(safe_file_id) or os.path.join("separated", safe_file_id)
-    path = os.path.join(folder, safe_filename)
-
-    if os.path.exists(path):
-        ext = safe_filename.lower().split(".")[-1]
-        media_types = {
-            "wav": "audio/wav",
-            "mp3": "audio/mpeg",
-            "zip": "application/zip",
-            "json": "application/json"
-        }
-        media_type = media_types.get(ext, "application/octet-stream")
-
-        if ext == "zip":
-            return FileResponse(
-                path,
-                media_type=media_type,
-                filename=safe_filename
-            )
-        return FileResponse(path, media_type=media_type)
-    return JSONResponse(status_code=404, content={"status": "error", "message": f"ไม่พบไฟล์ {filename}"})
+    entry = await asyncio.to_thread(artifact_registry.get, safe_file_id, safe_filename)
+    if entry is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": f"ไม่พบไฟล์ {filename}"})
+    if _wants_window(entry, start, end, export_format):
+        return await audio_window_response(entry, start, end, export_format)
+    return FileResponse(entry["path"], media_type=entry["media_type"])
 
 
 @router.get("/karaoke/{file_id}")
@@ -194,22 +575,20 @@ async def get_karaoke(
 ):
     """รวมไฟล์ Stem ดนตรี (Drums, Bass, Other) ทำเป็น Karaoke / Backing Track"""
     safe_file_id = os.path.basename(file_id)
-    folder = job_manager.get_job_directory(safe_file_id) or os.path.join("separated", safe_file_id)
-    karaoke_path = os.path.join(folder, "karaoke.wav")
+    existing = await asyncio.to_thread(artifact_registry.get, safe_file_id, "karaoke.wav")
+    if existing is not None:
+        return FileResponse(existing["path"], media_type="audio/wav", filename="karaoke.wav")
 
-    if os.path.exists(karaoke_path):
-        return FileResponse(karaoke_path, media_type="audio/wav", filename="karaoke.wav")
-
-    if not os.path.exists(folder):
+    folder = await asyncio.to_thread(find_stem_folder, safe_file_id)
+    if folder is None:
         return JSONResponse(status_code=404, content={"status": "error", "message": "ไม่พบข้อมูลการแยกเสียงสำหรับ file id นี้"})
+    karaoke_path = os.path.join(folder, "karaoke.wav")
 
     targets = ["drums.wav", "bass.wav", "other.wav"]
 
     try:
-        existing_paths = [
-            os.path.join(folder, target) for target in targets
-            if os.path.exists(os.path.join(folder, target))
-        ]
+        entries = [await asyncio.to_thread(artifact_registry.get, safe_file_id, target) for target in targets]
+        existing_paths = [entry["path"] for entry in entries if entry is not None]
         if not existing_paths:
             return JSONResponse(status_code=404, content={"status": "error", "message": "ไม่พบไฟล์ stem เสียงดนตรีเพื่อทำคาราโอเกะ"})
 
@@ -217,9 +596,13 @@ async def get_karaoke(
         sf.write(karaoke_path, mix, samplerate)
 
         if export_format == "mp3":
-            karaoke_path = await asyncio.to_thread(convert_to_mp3, karaoke_path)
+            async with get_pool(POOL_ENCODING).slot():
+                karaoke_path = await asyncio.to_thread(convert_to_mp3, karaoke_path)
+            await asyncio.to_thread(artifact_registry.record, safe_file_id, karaoke_path, ARTIFACT_KARAOKE)
             return FileResponse(karaoke_path, media_type="audio/mpeg", filename="karaoke.mp3")
 
+        await asyncio.to_thread(artifact_registry.record, safe_file_id, karaoke_path, ARTIFACT_KARAOKE)
+
         return FileResponse(karaoke_path, media_type="audio/wav", filename="karaoke.wav")
     except ValueError:
         # mixdown_stems ไม่พบไฟล์ -> 404 (C6: exception อื่นปล่อยให้ global handler จัดการ)
@@ -230,24 +613,72 @@ async def get_karaoke(
 async def process_vocal_polish(file_id: str = Query(...)):
     """API ขัดเกลาเสียงร้องอัตโนมัติ (Vocal Polish)"""
     safe_file_id = os.path.basename(file_id)
-    folder = job_manager.get_job_directory(safe_file_id) or os.path.join("separated", safe_file_id)
-    input_path = os.path.join(folder, "vocals.wav")
-    
-    if not os.path.exists(input_path):
+    vocals = await asyncio.to_thread(artifact_registry.get, safe_file_id, "vocals.wav")
+
+    if vocals is None:
         raise HTTPException(status_code=404, detail="ไม่พบไฟล์เสียงร้อง (vocals.wav) ในระบบ")
-        
+
+    input_path = vocals["path"]
     output_filename = "vocals_polished.wav"
-    output_path = os.path.join(folder, output_filename)
+    output_path = os.path.join(os.path.dirname(input_path), output_filename)
     
+    get_pool(POOL_LIGHT_DSP).check_admission()
     try:
-        async with processing_semaphore:
-            await asyncio.to_thread(polish_vocal_file, input_path, output_path)
+        async with get_pool(POOL_LIGHT_DSP).slot():
+            await run_cpu_task(TASK_DSP, polish_vocal_file, input_path, output_path)
+        await asyncio.to_thread(artifact_registry.record, safe_file_id, output_path, ARTIFACT_VOCAL_POLISH)
         return {"status": "success", "file_url": f"/separated/{safe_file_id}/{output_filename}"}
     except Exception as e:
         logger.error(f"Error polishing vocals: {e}")
         raise HTTPException(status_code=500, detail="เกิดข้อผิดพลาดในการปรับแต่งเสียงร้อง")
 
 
+def _selected_stem_files(file_id: str, stems: list[str]) -> list[tuple[str, str]]:
+    """WAV ของ stem ที่เลือกจากทะเบียน artifact (vocals ใช้เวอร์ชัน polished ถ้ามี) เป็นรายการ (path, arcname)"""
+    selected = []
+    for stem in STEM_TARGETS:
+        if stem in stems:
+            entry = None
+            if stem == "vocals":
+                entry = artifact_registry.get(file_id, "vocals_polished.wav")
+            if entry is None:
+                entry = artifact_registry.get(file_id, f"{stem}.wav")
+            if entry is not None:
+                selected.append((entry["path"], f"{stem}.wav"))
+    return selected
+
+
+def _record_export(file_id: str, path: str) -> None:
+    """ลงทะเบียนไฟล์ที่ export (คงชนิดเดิมถ้ามีอยู่แล้ว เช่น MP3 ของ stem จากงานแยกเสียงยังอยู่ใน ZIP ของ /download)"""
+    existing = artifact_registry.get(file_id, os.path.basename(path))
+    artifact_registry.record(file_id, path, existing["kind"] if existing else ARTIFACT_EXPORT)
+
+
+@router.get("/api/process/export/{file_id}/stems.zip")
+async def download_export_stems(
+    file_id: str,
+    export_format: str = Query("wav", pattern="^(wav|mp3)$"),
+    stems: list[str] = Query(...),
+):
+    """ZIP ของ stem ที่ export แล้ว (สร้างระหว่างส่ง response จากไฟล์ที่ POST /api/process/export เตรียมไว้)"""
+    safe_file_id = os.path.basename(file_id)
+    entries = []
+    for path, arcname in await asyncio.to_thread(_selected_stem_files, safe_file_id, stems):
+        if export_format == "mp3":
+            # MP3 ที่ POST export สร้างจาก WAV ตัวที่เลือก (เช่น vocals_polished.wav -> vocals_polished.mp3)
+            exported = await asyncio.to_thread(
+                artifact_registry.get, safe_file_id, os.path.basename(path).rsplit(".", 1)[0] + ".mp3"
+            )
+            arcname = arcname.replace(".wav", ".mp3")
+            if exported is None:
+                return JSONResponse(status_code=404, content={"status": "error", "message": f"ไม่พบไฟล์ {arcname} (ต้อง export ก่อน)"})
+            path = exported["path"]
+        entries.append((path, arcname))
+    if not entries:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "ไม่พบข้อมูลสำหรับการส่งออก"})
+    return zip_response(entries, f"HarmoniQ_Stems_{safe_file_id[:6]}.zip")
+
+
 @router.post("/api/process/export")
 async def process_export(
     file_id: str = Query(...),
@@ -258,26 +689,17 @@ async def process_export(
 ):
     """API สำหรับ Export Mixdown หรือ Stems แบบคัสตอม"""
     safe_file_id = os.path.basename(file_id)
-    folder = job_manager.get_job_directory(safe_file_id) or os.path.join("separated", safe_file_id)
-    
-    if not os.path.exists(folder):
+    folder = await asyncio.to_thread(find_stem_folder, safe_file_id)
+
+    if folder is None:
         raise HTTPException(status_code=404, detail="ไม่พบข้อมูลสำหรับการส่งออก")
+    if export_type == "mix":
+        get_pool(POOL_LIGHT_DSP).check_admission()
         
     export_files = []
     
     try:
-        valid_stems = ["vocals", "drums", "bass", "other"]
-        selected_stem_files = []
-        for stem in valid_stems:
-            if stem in stems:
-                filename = f"{stem}.wav"
-                if stem == "vocals" and os.path.exists(os.path.join(folder, "vocals_polished.wav")):
-                    filename = "vocals_polished.wav"
-                
-                path = os.path.join(folder, filename)
-                if os.path.exists(path):
-                    selected_stem_files.append((path, f"{stem}.wav"))
-                    
+        selected_stem_files = await asyncio.to_thread(_selected_stem_files, safe_file_id, stems)
         if not selected_stem_files:
             raise HTTPException(status_code=400, detail="กรุณาเลือกอย่างน้อย 1 แทร็กเพื่อ Export")
             
@@ -290,19 +712,23 @@ async def process_export(
             output_filename = f"custom_mix_{target_lufs}.wav"
             output_path = os.path.join(folder, output_filename)
 
-            async with processing_semaphore:
-                await asyncio.to_thread(apply_lufs_mastering, mixed_path, output_path, target_lufs)
+            async with get_pool(POOL_LIGHT_DSP).slot():
+                await run_cpu_task(TASK_DSP, apply_lufs_mastering, mixed_path, output_path, target_lufs)
 
             if export_format == "mp3":
-                output_path = await asyncio.to_thread(convert_to_mp3, output_path)
+                async with get_pool(POOL_ENCODING).slot():
+                    output_path = await asyncio.to_thread(convert_to_mp3, output_path)
                 output_filename = os.path.basename(output_path)
 
+            await asyncio.to_thread(_record_export, safe_file_id, output_path)
             export_files.append((output_path, output_filename))
         else:
             for path, arcname in selected_stem_files:
                 if export_format == "mp3":
                     # เก็บ WAV ต้นฉบับไว้ เพื่อไม่ให้ stem หายก่อน TTL และ export ซ้ำได้
-                    path = await asyncio.to_thread(convert_to_mp3, path, remove_source=False)
+                    async with get_pool(POOL_ENCODING).slot():
+                        path = await asyncio.to_thread(convert_to_mp3, path, remove_source=False)
+                    await asyncio.to_thread(_record_export, safe_file_id, path)
                     arcname = arcname.replace(".wav", ".mp3")
                 export_files.append((path, arcname))
                 
@@ -316,13 +742,12 @@ async def process_export(
                 "filename": arcname
             }
         else:
-            zip_filename = f"export_stems_{export_format}.zip"
-            zip_path = os.path.join(folder, zip_filename)
-            await asyncio.to_thread(create_zip_archive, zip_path, export_files)
+            # ZIP สร้างแบบ streaming ตอนดาวน์โหลด (ไม่เขียน archive ซ้ำลงโฟลเดอร์งาน)
+            query = urlencode([("export_format", export_format)] + [("stems", arcname.split(".")[0]) for _, arcname in export_files])
             return {
                 "status": "success",
                 "type": "zip",
-                "file_url": f"/separated/{safe_file_id}/{zip_filename}",
+                "file_url": f"/api/process/export/{safe_file_id}/stems.zip?{query}",
                 "filename": f"HarmoniQ_Stems_{safe_file_id[:6]}.zip"
             }
             
@@ -0,0 +1,282 @@
+# backend/services/artifact_registry.py
+# ทะเบียนไฟล์ผลลัพธ์ (artifact) ต่อ file_id: ให้ /download, /separated, /karaoke และ export หาไฟล์ได้จาก key
+# แทนการ listdir ทั้งโฟลเดอร์ uploads/, eq_applied/, compressed/ ทุก request
+# - endpoint ที่สร้างไฟล์เป็นผู้บันทึก (path, kind, ขนาด, media type, เวลาหมดอายุ)
+# - เก็บใน SQLite เดียวกับคิวงาน (เห็นได้จากทุก uvicorn worker) + cache ใน process
+# - sync กับไฟล์บนดิสก์ตอนเริ่มเซิร์ฟเวอร์ (rebuild_from_disk) และลบรายการหมดอายุใน cleanup
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from backend.config import (
+    DEFAULT_CLEANUP_TTL_SECONDS,
+    DIR_COMPRESSED,
+    DIR_EQ_APPLIED,
+    DIR_SEPARATED,
+    DIR_UPLOADS,
+    JOB_DB_PATH,
+    STEM_TARGETS,
+)
+
+logger = logging.getLogger(__name__)
+
+# ชนิดของ artifact (ใช้กรองตอนค้นหา)
+ARTIFACT_STEM = "stem"
+ARTIFACT_EQ = "eq"
+ARTIFACT_COMPRESSED = "compressed"
+ARTIFACT_PITCH_SHIFT = "pitch-shift"
+ARTIFACT_KARAOKE = "karaoke"
+ARTIFACT_VOCAL_POLISH = "vocal-polish"
+ARTIFACT_EXPORT = "export"
+
+# ผลลัพธ์ไฟล์เดี่ยวที่ /download/{file_id} ส่งให้ (ตามลำดับการค้นหาเดิม uploads/ -> eq_applied/ -> compressed/)
+DOWNLOADABLE_KINDS = (ARTIFACT_PITCH_SHIFT, ARTIFACT_EQ, ARTIFACT_COMPRESSED)
+
+MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "flac": "audio/flac",
+    "zip": "application/zip",
+    "json": "application/json",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    file_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    media_type TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (file_id, name)
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_expires ON artifacts (expires_at);
+"""
+
+_COLUMNS = ("file_id", "name", "path", "kind", "size", "media_type", "created_at", "expires_at")
+
+
+def media_type_for_path(path: str) -> str:
+    return MEDIA_TYPES.get(path.lower().rsplit(".", 1)[-1], "application/octet-stream")
+
+
+def _classify_output(directory: str, name: str) -> Optional[str]:
+    """ชนิดของไฟล์ผลลัพธ์ที่อยู่บนดิสก์ (None = ไม่ใช่ผลลัพธ์ เช่นไฟล์อัปโหลดที่ยังประมวลผลไม่เสร็จ)"""
+    base, ext = os.path.splitext(name)
+    if ext.lower() not in (".wav", ".mp3"):
+        return None
+    if directory == DIR_UPLOADS:
+        return ARTIFACT_PITCH_SHIFT if base.endswith("_pitch") else None
+    if directory == DIR_EQ_APPLIED:
+        return ARTIFACT_EQ
+    if directory == DIR_COMPRESSED:
+        return ARTIFACT_COMPRESSED
+    # ไฟล์ในโฟลเดอร์งานแยกเสียง
+    if base in STEM_TARGETS:
+        return ARTIFACT_STEM
+    if base == "karaoke":
+        return ARTIFACT_KARAOKE
+    if base == "vocals_polished":
+        return ARTIFACT_VOCAL_POLISH
+    if base.startswith("custom_mix_"):
+        return ARTIFACT_EXPORT
+    return None
+
+
+class ArtifactRegistry:
+    """บันทึก/ค้นหาไฟล์ผลลัพธ์ตาม (file_id, name) ด้วย primary key แทนการสแกนโฟลเดอร์"""
+
+    def __init__(self, db_path: str = JOB_DB_PATH, ttl_seconds: float = DEFAULT_CLEANUP_TTL_SECONDS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    def _make_entry(self, file_id: str, path: str, kind: str, name: Optional[str], now: float) -> Dict[str, Any]:
+        return {
+            "file_id": file_id,
+            "name": name or os.path.basename(path),
+            "path": path,
+            "kind": kind,
+            "size": os.path.getsize(path),
+            "media_type": media_type_for_path(path),
+            "created_at": now,
+            "expires_at": now + self.ttl_seconds,
+        }
+
+    def _write(self, entries: list[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        conn = self._connect()
+        try:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO artifacts ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                [tuple(entry[column] for column in _COLUMNS) for entry in entries],
+            )
+        finally:
+            conn.close()
+        with self._lock:
+            for entry in entries:
+                self._entries.setdefault(entry["file_id"], {})[entry["name"]] = entry
+
+    def record(self, file_id: str, path: str, kind: str, name: Optional[str] = None) -> Dict[str, Any]:
+        """บันทึกไฟล์ผลลัพธ์ของ file_id (name = ชื่อที่ใช้ค้นหา ค่าเริ่มต้นคือชื่อไฟล์)"""
+        entry = self._make_entry(file_id, path, kind, name, time.time())
+        self._write([entry])
+        return entry
+
+    def record_many(self, file_id: str, paths: Iterable[str], kind: str) -> None:
+        now = time.time()
+        self._write([self._make_entry(file_id, path, kind, None, now) for path in paths if os.path.isfile(path)])
+
+    def _query(self, sql: str, params: tuple) -> list[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        finally:
+            conn.close()
+
+    def _live(self, entry: Dict[str, Any], now: float) -> bool:
+        return entry["expires_at"] > now and os.path.isfile(entry["path"])
+
+    def get(self, file_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """artifact ชื่อ name ของ file_id (None ถ้าไม่มี หมดอายุ หรือไฟล์ถูกลบไปแล้ว)"""
+        with self._lock:
+            entry = self._entries.get(file_id, {}).get(name)
+        if entry is None:
+            # ไม่อยู่ใน cache ของ process นี้ (อาจถูกบันทึกโดย worker อื่น) -> query ด้วย primary key
+            rows = self._query("SELECT * FROM artifacts WHERE file_id = ? AND name = ?", (file_id, name))
+            if not rows:
+                return None
+            entry = rows[0]
+            with self._lock:
+                self._entries.setdefault(file_id, {})[name] = entry
+        if not self._live(entry, time.time()):
+            return None
+        return entry
+
+    def find(self, file_id: str, kinds: Optional[Iterable[str]] = None) -> list[Dict[str, Any]]:
+        """artifact ทั้งหมดของ file_id (กรองตามชนิด) เรียงตามลำดับชนิดที่ขอแล้วตามชื่อ"""
+        now = time.time()
+        order = {kind: index for index, kind in enumerate(kinds)} if kinds is not None else None
+        entries = [
+            entry
+            for entry in self._query("SELECT * FROM artifacts WHERE file_id = ?", (file_id,))
+            if (order is None or entry["kind"] in order) and self._live(entry, now)
+        ]
+        return sorted(entries, key=lambda entry: (order[entry["kind"]] if order else 0, entry["name"]))
+
+    def discard(self, file_id: str) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM artifacts WHERE file_id = ?", (file_id,))
+        finally:
+            conn.close()
+        with self._lock:
+            self._entries.pop(file_id, None)
+
+    def purge_expired(self) -> int:
+        """ลบรายการที่หมดอายุ (เรียกจาก cleanup_task) คืนจำนวนแถวที่ลบ"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute("DELETE FROM artifacts WHERE expires_at <= ?", (now,))
+        finally:
+            conn.close()
+        with self._lock:
+            for file_id in list(self._entries):
+                live = {name: entry for name, entry in self._entries[file_id].items() if entry["expires_at"] > now}
+                if live:
+                    self._entries[file_id] = live
+                else:
+                    del self._entries[file_id]
+        return cursor.rowcount
+
+    def rebuild_from_disk(self, skip_file_ids: Iterable[str] = ()) -> int:
+        """sync ทะเบียนกับไฟล์บนดิสก์ (ตอนเริ่มเซิร์ฟเวอร์ ทุก uvicorn worker) — เวลาหมดอายุ = mtime + TTL เหมือน cleanup
+
+        skip_file_ids = งานที่ยังรอคิว/กำลังประมวลผล (ไฟล์ยังไม่ครบ จึงยังไม่ลงทะเบียน)
+        """
+        skipped = set(skip_file_ids)
+        entries = []
+
+        def add(file_id: str, path: str, kind: str) -> None:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                return
+            entry = self._make_entry(file_id, path, kind, None, mtime)
+            entries.append(entry)
+
+        for directory in (DIR_UPLOADS, DIR_EQ_APPLIED, DIR_COMPRESSED):
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                kind = _classify_output(directory, name)
+                file_id = name.split("_", 1)[0]
+                if kind is not None and "_" in name and file_id not in skipped:
+                    add(file_id, os.path.join(directory, name), kind)
+
+        if os.path.isdir(DIR_SEPARATED):
+            for file_id in os.listdir(DIR_SEPARATED):
+                folder = os.path.join(DIR_SEPARATED, file_id)
+                if file_id in skipped or not os.path.isdir(folder):
+                    continue
+                for name in os.listdir(folder):
+                    kind = _classify_output(DIR_SEPARATED, name)
+                    if kind is not None:
+                        add(file_id, os.path.join(folder, name), kind)
+
+        now = time.time()
+        entries = [entry for entry in entries if entry["expires_at"] > now]
+        # ไม่ล้างทั้งตาราง: worker อื่นอาจเพิ่งบันทึก stems ของงานที่เสร็จหลัง snapshot ของ skip_file_ids
+        # จึง upsert เฉพาะไฟล์ที่สแกนเจอ (รายการที่ endpoint บันทึกไว้แล้วคงชนิด/เวลาเดิม) และลบเฉพาะแถวที่ไฟล์หายไปแล้ว
+        # ภายใน transaction เดียว — reader ของ worker อื่นไม่เห็นช่วงที่ทะเบียนว่าง
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                f"INSERT INTO artifacts ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))}) "
+                "ON CONFLICT (file_id, name) DO UPDATE SET "
+                "path = excluded.path, size = excluded.size, media_type = excluded.media_type",
+                [tuple(entry[column] for column in _COLUMNS) for entry in entries],
+            )
+            missing = [
+                (row["file_id"], row["name"])
+                for row in conn.execute("SELECT file_id, name, path FROM artifacts").fetchall()
+                if not os.path.isfile(row["path"])
+            ]
+            conn.executemany("DELETE FROM artifacts WHERE file_id = ? AND name = ?", missing)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        with self._lock:
+            self._entries = {}
+        logger.info(f"สร้างทะเบียน artifact จากดิสก์: {len(entries)} ไฟล์")
+        return len(entries)
+
+
+# Global instance สำหรับเรียกใช้ทั่วทั้งแอป
+artifact_registry = ArtifactRegistry()
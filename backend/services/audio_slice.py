@@ -0,0 +1,93 @@
+# backend/services/audio_slice.py
+# ตัดช่วงเวลาของไฟล์เสียงฝั่ง server สำหรับ /separated/{file_id}/{filename} และ /download/{file_id} (?start=&end=)
+# - seek ไปที่เฟรมแรกด้วย SoundFile.seek แล้วอ่านทีละ block เฉพาะเฟรมในช่วง (ไม่อ่าน/ถอดรหัสส่วนอื่นของไฟล์)
+# - WAV: สร้าง header ของช่วงที่ตัดไว้ล่วงหน้า (ขนาดรู้ก่อนส่ง จึงตั้ง Content-Length ได้) แล้ว stream PCM ตามมา
+#   คง subtype เดิมของไฟล์ต้นทาง (PCM 16/24/32, FLOAT, DOUBLE); ต้นทางอื่น (เช่น MP3) ส่งเป็น PCM_16
+# - MP3 ของช่วงที่ตัด encode ผ่าน encoder (services/encoder.py) ตอนขอ
+
+import struct
+from typing import Iterator
+
+import numpy as np
+import soundfile as sf
+
+from backend.config import ENCODER_BLOCK_FRAMES
+
+# subtype ต้นทาง -> (format tag ของ WAV, บิตต่อ sample, dtype ที่อ่านจาก libsndfile)
+_WAV_SUBTYPES = {
+    "PCM_16": (1, 16, "int16"),
+    "PCM_24": (1, 24, "int32"),
+    "PCM_32": (1, 32, "int32"),
+    "FLOAT": (3, 32, "float32"),
+    "DOUBLE": (3, 64, "float64"),
+}
+_WAV_FALLBACK = "PCM_16"
+_WAV_HEADER_BYTES = 44
+
+
+def slice_frames(total_frames: int, samplerate: int, start: float | None, end: float | None) -> tuple[int, int]:
+    """แปลงช่วงเวลา (วินาที) เป็น (เฟรมแรก, จำนวนเฟรม) — ไม่ระบุ start = ต้นไฟล์, ไม่ระบุ end = ท้ายไฟล์
+
+    ใช้กติกาเดียวกับ trim_start/trim_end ของ save_upload; ช่วงไม่ถูกต้อง -> ValueError
+    """
+    duration = total_frames / float(samplerate)
+    start = 0.0 if start is None else float(start)
+    end = duration if end is None else float(end)
+    if start < 0.0:
+        raise ValueError("start ต้องไม่น้อยกว่า 0 วินาที")
+    if start >= duration:
+        raise ValueError("start ต้องน้อยกว่าความยาวไฟล์")
+    if end <= start:
+        raise ValueError("end ต้องมากกว่า start")
+    if end > duration:
+        raise ValueError("end ต้องไม่เกินความยาวไฟล์")
+    first = int(start * samplerate)
+    frames = min(int(end * samplerate), total_frames) - first
+    if frames <= 0:
+        raise ValueError("ช่วงเวลาที่เลือกไม่มีความยาวเสียง")
+    return first, frames
+
+
+def _wav_layout(subtype: str) -> tuple[int, int, str]:
+    return _WAV_SUBTYPES.get(subtype, _WAV_SUBTYPES[_WAV_FALLBACK])
+
+
+def wav_slice_header(samplerate: int, channels: int, subtype: str, frames: int) -> bytes:
+    """header ของ WAV (RIFF + fmt + data) ที่มี PCM ตามจำนวนเฟรมของช่วงที่ตัด"""
+    tag, bits, _ = _wav_layout(subtype)
+    block_align = channels * bits // 8
+    data_bytes = frames * block_align
+    return (
+        struct.pack("<4sI4s", b"RIFF", _WAV_HEADER_BYTES - 8 + data_bytes, b"WAVE")
+        + struct.pack("<4sIHHIIHH", b"fmt ", 16, tag, channels, samplerate, samplerate * block_align, block_align, bits)
+        + struct.pack("<4sI", b"data", data_bytes)
+    )
+
+
+def wav_slice_size(channels: int, subtype: str, frames: int) -> int:
+    _, bits, _ = _wav_layout(subtype)
+    return _WAV_HEADER_BYTES + frames * channels * bits // 8
+
+
+def iter_wav_slice(
+    path: str, start_frame: int, frames: int, block_frames: int = ENCODER_BLOCK_FRAMES
+) -> Iterator[bytes]:
+    """ไบต์ของ WAV ที่มีเฉพาะเฟรม [start_frame, start_frame + frames): header ก่อน แล้ว PCM ทีละ block"""
+    with sf.SoundFile(path) as source:
+        _, bits, dtype = _wav_layout(source.subtype)
+        yield wav_slice_header(source.samplerate, source.channels, source.subtype, frames)
+        source.seek(start_frame)
+        remaining = frames
+        while remaining > 0:
+            block = np.frombuffer(source.buffer_read(min(block_frames, remaining), dtype=dtype), dtype=dtype)
+            if not block.size:
+                break
+            remaining -= block.size // source.channels
+            if bits == 24:
+                # libsndfile คืน 24 บิตชิดบนของ int32 -> ตัดไบต์ต่ำสุดทิ้ง (little-endian)
+                yield block.view(np.uint8).reshape(-1, 4)[:, 1:].tobytes()
+            else:
+                yield block.tobytes()
+        if remaining > 0:
+            # ไฟล์สั้นกว่าที่ header ระบุ (ไม่ควรเกิด) -> เติมความเงียบให้ครบตาม Content-Length
+            yield bytes(remaining * source.channels * bits // 8)
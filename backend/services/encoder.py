@@ -0,0 +1,241 @@
+# backend/services/encoder.py
+# Encoder แบบ streaming: อ่าน PCM ทีละ block จาก soundfile แล้วเขียนเข้า encoder ของ libsndfile โดยตรง
+# (MP3 ผ่าน LAME ใน libsndfile >= 1.1, FLAC, WAV) แทน pydub ที่ decode ทั้งไฟล์เข้าหน่วยความจำ
+# แล้วส่งสำเนาชั่วคราวให้ ffmpeg อีกรอบ
+# - จำกัดจำนวนไฟล์ที่ encode พร้อมกัน (ENCODER_MAX_CONCURRENT) ด้วย semaphore
+# - เก็บสถิติ throughput (วินาทีเสียงต่อวินาทีจริง) สำหรับ /metrics
+
+import os
+import time
+import logging
+import threading
+from typing import Any, BinaryIO, Callable, Dict, Optional
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+from backend.config import ENCODER_BLOCK_FRAMES, ENCODER_MAX_CONCURRENT, ENCODER_MP3_BITRATE_KBPS
+
+logger = logging.getLogger(__name__)
+
+# format ปลายทาง -> (major format ของ libsndfile, media type)
+ENCODE_FORMATS = {
+    "mp3": ("MP3", "audio/mpeg"),
+    "flac": ("FLAC", "audio/flac"),
+    "wav": ("WAV", "audio/wav"),
+}
+
+# sample rate ที่ MPEG-1/2/2.5 Layer III รองรับ (ค่าอื่นต้อง resample ก่อน)
+MP3_SAMPLE_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)
+MP3_MIN_BITRATE_KBPS = 32
+MP3_MAX_BITRATE_KBPS = 320
+
+_HIGH_RESOLUTION_SUBTYPES = ("PCM_24", "PCM_32", "FLOAT", "DOUBLE")
+
+
+def media_type_for(export_format: str) -> str:
+    return ENCODE_FORMATS[export_format][1]
+
+
+def _mp3_compression_level(bitrate_kbps: int) -> float:
+    # libsndfile map ระดับ 0..1 เป็น bitrate 320..32 kbps เมื่อใช้ CBR
+    span = MP3_MAX_BITRATE_KBPS - MP3_MIN_BITRATE_KBPS
+    return float(np.clip((MP3_MAX_BITRATE_KBPS - bitrate_kbps) / span, 0.0, 1.0))
+
+
+def _mp3_sample_rate(samplerate: int) -> int:
+    for rate in MP3_SAMPLE_RATES:
+        if rate >= samplerate:
+            return rate
+    return MP3_SAMPLE_RATES[-1]
+
+
+def _open_target(path: str | BinaryIO, export_format: str, source: sf.SoundFile, bitrate_kbps: int) -> sf.SoundFile:
+    major = ENCODE_FORMATS[export_format][0]
+    if export_format == "mp3":
+        if source.channels > 2:
+            raise ValueError(f"MP3 รองรับสูงสุด 2 channel (ไฟล์นี้มี {source.channels})")
+        return sf.SoundFile(
+            path,
+            "w",
+            _mp3_sample_rate(source.samplerate),
+            source.channels,
+            subtype="MPEG_LAYER_III",
+            format=major,
+            bitrate_mode="CONSTANT",
+            compression_level=_mp3_compression_level(bitrate_kbps),
+        )
+    # FLAC/WAV: คงความละเอียดเดิมถ้าปลายทางรองรับ (ต้นทาง MP3/FLOAT ที่ปลายทางไม่รองรับใช้ 24/16 บิต)
+    subtype = source.subtype
+    if not (subtype.startswith("PCM") or subtype in _HIGH_RESOLUTION_SUBTYPES) or not sf.check_format(major, subtype):
+        subtype = "PCM_24" if subtype in _HIGH_RESOLUTION_SUBTYPES else "PCM_16"
+    return sf.SoundFile(path, "w", source.samplerate, source.channels, subtype=subtype, format=major)
+
+
+def _transcode(source: sf.SoundFile, target: sf.SoundFile, block_frames: int, frames: Optional[int] = None) -> int:
+    """อ่าน source ทีละ block (จากตำแหน่งปัจจุบัน ไม่เกิน frames ถ้าระบุ) เขียนลง target คืนจำนวนเฟรมที่อ่าน"""
+    resampler = None
+    if target.samplerate != source.samplerate:
+        resampler = soxr.ResampleStream(source.samplerate, target.samplerate, source.channels, dtype="float32")
+    remaining = frames
+    done = 0
+    while True:
+        size = block_frames if remaining is None else min(block_frames, remaining)
+        block = source.read(size, dtype="float32", always_2d=True)
+        done += len(block)
+        if remaining is not None:
+            remaining -= len(block)
+        last = len(block) < size or remaining == 0
+        if resampler is not None:
+            block = resampler.resample_chunk(block, last=last)
+        if len(block):
+            target.write(block)
+        if last:
+            return done
+
+
+def encode_file(
+    source_path: str,
+    target_path: str,
+    export_format: Optional[str] = None,
+    bitrate_kbps: int = ENCODER_MP3_BITRATE_KBPS,
+    block_frames: int = ENCODER_BLOCK_FRAMES,
+) -> Dict[str, Any]:
+    """encode source_path เป็น target_path ทีละ block (หน่วยความจำคงที่ตามขนาด block)
+
+    export_format=None ใช้นามสกุลของ target_path; เขียนลงไฟล์ชั่วคราวก่อนแล้วค่อย rename
+    คืน {"frames", "audio_seconds", "bytes"}
+    """
+    export_format = (export_format or os.path.splitext(target_path)[1].lstrip(".")).lower()
+    if export_format not in ENCODE_FORMATS:
+        raise ValueError(f"ไม่รองรับ format: {export_format}")
+
+    partial_path = f"{target_path}.part"
+    try:
+        with sf.SoundFile(source_path) as source:
+            with _open_target(partial_path, export_format, source, bitrate_kbps) as target:
+                frames = _transcode(source, target, block_frames)
+            samplerate = source.samplerate
+        os.replace(partial_path, target_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return {
+        "frames": frames,
+        "audio_seconds": frames / float(samplerate),
+        "bytes": os.path.getsize(target_path),
+    }
+
+
+def encode_window(
+    source_path: str,
+    target: BinaryIO,
+    export_format: str,
+    start_frame: int,
+    frames: int,
+    bitrate_kbps: int = ENCODER_MP3_BITRATE_KBPS,
+    block_frames: int = ENCODER_BLOCK_FRAMES,
+) -> Dict[str, Any]:
+    """encode เฉพาะช่วง [start_frame, start_frame + frames) ของ source_path ลง target (file object เช่น BytesIO)
+
+    seek ไปที่เฟรมแรกแล้วอ่านทีละ block เท่าที่ต้องการ (ไม่ถอดรหัสส่วนอื่นของไฟล์) คืน {"frames", "audio_seconds", "bytes"}
+    """
+    if export_format not in ENCODE_FORMATS:
+        raise ValueError(f"ไม่รองรับ format: {export_format}")
+    with sf.SoundFile(source_path) as source:
+        source.seek(start_frame)
+        with _open_target(target, export_format, source, bitrate_kbps) as handle:
+            frames = _transcode(source, handle, block_frames, frames)
+        samplerate = source.samplerate
+    return {
+        "frames": frames,
+        "audio_seconds": frames / float(samplerate),
+        "bytes": target.tell(),
+    }
+
+
+class EncoderService:
+    """ตัวกลาง encode ไฟล์เสียงที่จำกัดจำนวนงานพร้อมกันและเก็บสถิติ throughput (เรียกจาก thread)"""
+
+    def __init__(self, max_concurrent: int = ENCODER_MAX_CONCURRENT, block_frames: int = ENCODER_BLOCK_FRAMES):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.block_frames = block_frames
+        self.encodes = 0
+        self.failed = 0
+        self.active = 0
+        self.waiting = 0
+        self.audio_seconds = 0.0
+        self.encode_seconds = 0.0
+        self.bytes_written = 0
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+
+    def encode(
+        self,
+        source_path: str,
+        target_path: str,
+        export_format: Optional[str] = None,
+        bitrate_kbps: int = ENCODER_MP3_BITRATE_KBPS,
+    ) -> Dict[str, Any]:
+        """encode ไฟล์ (รอ slot ถ้ามีงาน encode ครบจำนวนแล้ว) คืนผลของ encode_file พร้อม "seconds" """
+        return self._run(encode_file, source_path, target_path, export_format, bitrate_kbps, self.block_frames)
+
+    def encode_window(
+        self,
+        source_path: str,
+        target: BinaryIO,
+        export_format: str,
+        start_frame: int,
+        frames: int,
+        bitrate_kbps: int = ENCODER_MP3_BITRATE_KBPS,
+    ) -> Dict[str, Any]:
+        """encode ช่วงเวลาหนึ่งของไฟล์ลง file object (ใช้ slot และสถิติร่วมกับ encode) คืนผลของ encode_window"""
+        return self._run(
+            encode_window, source_path, target, export_format, start_frame, frames, bitrate_kbps, self.block_frames
+        )
+
+    def _run(self, fn: Callable[..., Dict[str, Any]], *args: Any) -> Dict[str, Any]:
+        with self._lock:
+            self.waiting += 1
+        self._slots.acquire()
+        with self._lock:
+            self.waiting -= 1
+            self.active += 1
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+        result["seconds"] = time.perf_counter() - start
+        with self._lock:
+            self.encodes += 1
+            self.audio_seconds += result["audio_seconds"]
+            self.encode_seconds += result["seconds"]
+            self.bytes_written += result["bytes"]
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "active": self.active,
+                "waiting": self.waiting,
+                "encodes": self.encodes,
+                "failed": self.failed,
+                "audio_seconds": round(self.audio_seconds, 2),
+                "encode_seconds": round(self.encode_seconds, 2),
+                # วินาทีเสียงที่ encode ได้ต่อ 1 วินาทีจริง (ต่องาน)
+                "realtime_factor": round(self.audio_seconds / self.encode_seconds, 2) if self.encode_seconds else 0.0,
+                "output_megabytes": round(self.bytes_written / (1024 * 1024), 2),
+            }
+
+
+# Global instance สำหรับเรียกใช้ทั่วทั้งแอป
+encoder = EncoderService()
@@ -0,0 +1,179 @@
+# backend/services/executor.py
+# Execution backend สำหรับงาน CPU หนัก (แยกเสียง / AI inference / DSP)
+# - โหมด "thread": ใช้ asyncio.to_thread แบบเดิม (ค่าเริ่มต้น เหมาะกับ dev/test)
+# - โหมด "process": ส่งงานเข้า ProcessPoolExecutor แยกตามชนิดงาน ทำให้โค้ดที่ถือ GIL
+#   (librosa / NumPy loop) กระจายไปหลาย core ได้จริง
+#   worker แต่ละตัวโหลดโมเดลครั้งเดียวตอน spawn, จำกัดหน่วยความจำ และถูก recycle ตามจำนวนงาน
+#   (นับงานที่ส่งเข้าแต่ละ pool แล้วเปลี่ยน pool ใหม่เอง — max_tasks_per_child ของ ProcessPoolExecutor
+#   มีเฉพาะ Python >= 3.11 แต่โปรเจกต์รันบน 3.10)
+
+import asyncio
+import logging
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict
+
+from backend.config import (
+    DSP_EXECUTOR,
+    EXECUTOR_SEPARATION_WORKERS,
+    EXECUTOR_INFERENCE_WORKERS,
+    EXECUTOR_DSP_WORKERS,
+    EXECUTOR_MAX_TASKS_PER_CHILD,
+    EXECUTOR_MAX_MEMORY_MB,
+    EXECUTOR_TORCH_THREADS,
+)
+
+logger = logging.getLogger(__name__)
+
+# ชนิดงาน (แต่ละชนิดมี pool ของตัวเอง งานยาวอย่างแยกเสียงจึงไม่บัง DSP สั้น ๆ)
+TASK_SEPARATION = "separation"
+TASK_INFERENCE = "inference"
+TASK_DSP = "dsp"
+
+_POOL_WORKERS = {
+    TASK_SEPARATION: EXECUTOR_SEPARATION_WORKERS,
+    TASK_INFERENCE: EXECUTOR_INFERENCE_WORKERS,
+    TASK_DSP: EXECUTOR_DSP_WORKERS,
+}
+
+_pools: Dict[str, ProcessPoolExecutor] = {}
+# จำนวนงานที่ส่งเข้า pool ปัจจุบันของแต่ละชนิดงาน (ใช้ตัดสินใจ recycle)
+_submitted: Dict[str, int] = {}
+
+
+def _limit_worker_memory(max_memory_mb: int) -> None:
+    if max_memory_mb <= 0:
+        return
+    try:
+        import resource
+    except ImportError:  # Windows ไม่มี resource module
+        logger.warning("ไม่รองรับการจำกัดหน่วยความจำ worker บนแพลตฟอร์มนี้")
+        return
+    limit = max_memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _preload_separation_models() -> None:
+    from backend.process_audio import get_openunmix_separator
+
+    get_openunmix_separator()
+
+
+def _preload_inference_models() -> None:
+    from backend.auto_eq_inference import SUPPORTED_AUTO_EQ_MODELS, load_auto_eq_model
+
+    for model_id in SUPPORTED_AUTO_EQ_MODELS:
+        load_auto_eq_model("cpu", model_id=model_id)
+
+
+_PRELOADERS: Dict[str, Callable[[], None]] = {
+    TASK_SEPARATION: _preload_separation_models,
+    TASK_INFERENCE: _preload_inference_models,
+}
+
+
+def _init_worker(task_class: str, max_memory_mb: int, torch_threads: int) -> None:
+    """initializer ของ worker process: จำกัดหน่วยความจำ ตั้งจำนวน thread และโหลดโมเดลครั้งเดียวตอน spawn"""
+    _limit_worker_memory(max_memory_mb)
+    if torch_threads > 0:
+        import torch
+
+        torch.set_num_threads(torch_threads)
+
+    preload = _PRELOADERS.get(task_class)
+    if preload is None:
+        return
+    try:
+        preload()
+    except Exception as exc:
+        # โหลดไม่สำเร็จไม่ควรทำให้ pool ใช้ไม่ได้ งานจะลองโหลดใหม่และรายงาน error ตามปกติ
+        logger.warning(f"Preload โมเดลสำหรับ worker {task_class} ไม่สำเร็จ: {exc}")
+
+
+def _create_pool(task_class: str) -> ProcessPoolExecutor:
+    kwargs: Dict[str, Any] = {
+        "max_workers": max(_POOL_WORKERS[task_class], 1),
+        # spawn: ไม่ fork สถานะของ event loop/torch threads จาก process หลัก
+        "mp_context": multiprocessing.get_context("spawn"),
+        "initializer": _init_worker,
+        "initargs": (task_class, EXECUTOR_MAX_MEMORY_MB, EXECUTOR_TORCH_THREADS),
+    }
+    logger.info(f"สร้าง process pool สำหรับงาน {task_class} ({kwargs['max_workers']} workers)")
+    return ProcessPoolExecutor(**kwargs)
+
+
+def _get_pool(task_class: str) -> ProcessPoolExecutor:
+    if task_class not in _POOL_WORKERS:
+        raise ValueError(f"ไม่รู้จักชนิดงาน: {task_class}")
+    pool = _pools.get(task_class)
+    if pool is None:
+        pool = _pools[task_class] = _create_pool(task_class)
+        _submitted[task_class] = 0
+    return pool
+
+
+def _discard_pool(task_class: str, pool: ProcessPoolExecutor, cancel_futures: bool) -> None:
+    """ทิ้ง pool (งานถัดไปของชนิดนี้จะได้ pool ใหม่จาก _get_pool)"""
+    if _pools.get(task_class) is pool:
+        _pools.pop(task_class, None)
+        _submitted.pop(task_class, None)
+    pool.shutdown(wait=False, cancel_futures=cancel_futures)
+
+
+def _recycle_limit(task_class: str) -> int:
+    """จำนวนงานต่อ pool ก่อน recycle: worker แต่ละตัวทำเฉลี่ยครบ EXECUTOR_MAX_TASKS_PER_CHILD งาน (0 = ไม่ recycle)"""
+    if EXECUTOR_MAX_TASKS_PER_CHILD <= 0:
+        return 0
+    return EXECUTOR_MAX_TASKS_PER_CHILD * max(_POOL_WORKERS[task_class], 1)
+
+
+def _submit_pool(task_class: str) -> ProcessPoolExecutor:
+    """pool สำหรับงานถัดไป: เมื่อ pool ปัจจุบันรับงานครบกำหนดแล้วจะถูกปลดระวาง (งานที่ค้างอยู่ทำต่อจนเสร็จ)
+    แล้วสร้าง pool ใหม่ — worker ที่หน่วยความจำบวมจาก PyTorch/librosa จึงถูกแทนที่เป็นระยะ
+    """
+    pool = _get_pool(task_class)
+    limit = _recycle_limit(task_class)
+    if limit and _submitted[task_class] >= limit:
+        logger.info(f"Recycle process pool ของงาน {task_class} หลังรับงานครบ {limit} งาน")
+        _discard_pool(task_class, pool, cancel_futures=False)
+        pool = _get_pool(task_class)
+    _submitted[task_class] += 1
+    return pool
+
+
+def uses_process_pool() -> bool:
+    return DSP_EXECUTOR == "process"
+
+
+async def run_cpu_task(task_class: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """รันงาน CPU หนักตามชนิดงานบน execution backend ที่ตั้งไว้ (DSP_EXECUTOR)
+
+    ในโหมด process ฟังก์ชันและอาร์กิวเมนต์ทั้งหมดต้อง pickle ได้ (ฟังก์ชันระดับ module เท่านั้น)
+    """
+    if not uses_process_pool():
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+    pool = _submit_pool(task_class)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+    except BrokenProcessPool:
+        # worker ตาย (เช่นเกิน memory cap) -> ทิ้ง pool เดิม งานถัดไปจะได้ pool ใหม่
+        logger.error(f"Process pool ของงาน {task_class} เสียหาย กำลังสร้างใหม่ในงานถัดไป")
+        _discard_pool(task_class, pool, cancel_futures=True)
+        raise
+
+
+def start_executors() -> None:
+    """สร้าง pool ล่วงหน้าตอนเริ่มเซิร์ฟเวอร์ (โหมด process เท่านั้น)"""
+    if not uses_process_pool():
+        return
+    for task_class in _POOL_WORKERS:
+        _get_pool(task_class)
+
+
+def shutdown_executors() -> None:
+    for task_class, pool in list(_pools.items()):
+        _discard_pool(task_class, pool, cancel_futures=True)
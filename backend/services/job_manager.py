@@ -1,36 +1,319 @@
 # backend/services/job_manager.py
-# ระบบจัดการวงจรชีวิตงานประมวลผลเสียง (Job Session Lifecycle)
+# ระบบจัดการวงจรชีวิตงานประมวลผลเสียง (Job Session Lifecycle) และคิวงานแบบถาวร
+# - เก็บสถานะงานใน SQLite เพื่อให้อยู่รอดหลัง restart และมองเห็นได้จากทุก uvicorn worker
+# - สถานะ: queued -> processing -> completed / failed
 
 import os
+import json
 import time
+import sqlite3
 import logging
 from typing import Dict, Any, Optional
 
+from backend.config import DIR_SEPARATED, JOB_DB_PATH, JOB_MAX_ATTEMPTS, JOB_WORKERS
+
 logger = logging.getLogger(__name__)
 
+JOB_QUEUED = "queued"
+JOB_PROCESSING = "processing"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# งานที่ลงทะเบียนตรงโดยไม่ผ่านคิว (ไม่มี payload ให้ worker ประมวลผลซ้ำ)
+JOB_KIND_SYNC = "sync"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    file_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
 
 class AudioJobSessionManager:
-    """จัดการสถานะ Job ID, โฟลเดอร์ผลลัพธ์ และเวลาหมดอายุเพื่อการCleanup อย่างปลอดภัย"""
+    """จัดการสถานะ Job ID, โฟลเดอร์ผลลัพธ์ และเวลาหมดอายุเพื่อการCleanup อย่างปลอดภัย
 
-    def __init__(self):
+    - SQLite เป็นแหล่งข้อมูลหลัก (ใช้ร่วมกันได้หลาย process)
+    - _jobs เป็น cache ใน process สำหรับค้นหาโฟลเดอร์ผลลัพธ์ได้เร็วโดยไม่ต้อง query
+    """
+
+    def __init__(self, db_path: str = JOB_DB_PATH):
+        self.db_path = db_path
         self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # เปิด connection ใหม่ทุกครั้ง เพราะถูกเรียกจากหลาย thread (asyncio.to_thread)
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def _row_to_job(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job.get("payload") or "{}")
+        job["result"] = json.loads(job["result"]) if job.get("result") else None
+        return job
+
+    def _insert(self, file_id: str, output_dir: str, kind: str, status: str, payload: Dict[str, Any]) -> None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (file_id, kind, status, output_dir, payload, created_at, started_at, heartbeat_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    file_id,
+                    kind,
+                    status,
+                    output_dir,
+                    json.dumps(payload),
+                    now,
+                    now if status == JOB_PROCESSING else None,
+                    now if status == JOB_PROCESSING else None,
+                ),
+            )
+        finally:
+            conn.close()
+        self._jobs[file_id] = {"output_dir": output_dir, "created_at": now, "status": status}
 
     def register_job(self, file_id: str, output_dir: str) -> None:
-        self._jobs[file_id] = {
-            "output_dir": output_dir,
-            "created_at": time.time(),
-            "status": "processing",
-        }
+        """ลงทะเบียนงานที่เริ่มประมวลผลทันที (ไม่ผ่านคิว จึงไม่ถูกคืนเข้าคิวเมื่อค้าง)"""
+        self._insert(file_id, output_dir, JOB_KIND_SYNC, JOB_PROCESSING, {})
+
+    def enqueue_job(self, file_id: str, output_dir: str, kind: str, payload: Dict[str, Any]) -> None:
+        """เพิ่มงานเข้าคิว ให้ worker ดึงไปประมวลผลตามลำดับเวลาที่เข้าคิว"""
+        self._insert(file_id, output_dir, kind, JOB_QUEUED, payload)
+
+    def claim_next_job(self) -> Optional[Dict[str, Any]]:
+        """ดึงงานที่รอนานที่สุดออกจากคิวแบบ atomic (BEGIN IMMEDIATE กันหลาย worker แย่งงานเดียวกัน)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (JOB_QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ?, attempts = attempts + 1, progress = 0 "
+                "WHERE file_id = ?",
+                (JOB_PROCESSING, now, now, row["file_id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        job = self._row_to_job(row)
+        job.update(status=JOB_PROCESSING, started_at=now, heartbeat_at=now, attempts=job["attempts"] + 1, progress=0.0)
+        self._jobs[job["file_id"]] = {"output_dir": job["output_dir"], "created_at": job["created_at"], "status": JOB_PROCESSING}
+        return job
+
+    def _update(self, file_id: str, sql: str, params: tuple) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(sql, params + (file_id,))
+        finally:
+            conn.close()
+
+    def heartbeat(self, file_id: str) -> None:
+        self._update(file_id, "UPDATE jobs SET heartbeat_at = ? WHERE file_id = ?", (time.time(),))
 
-    def complete_job(self, file_id: str) -> None:
+    def update_progress(self, file_id: str, progress: float) -> None:
+        value = min(max(float(progress), 0.0), 1.0)
+        self._update(file_id, "UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE file_id = ?", (value, time.time()))
+
+    def complete_job(self, file_id: str, result: Optional[Dict[str, Any]] = None) -> None:
+        self._update(
+            file_id,
+            "UPDATE jobs SET status = ?, progress = 1, finished_at = ?, result = ? WHERE file_id = ?",
+            (JOB_COMPLETED, time.time(), json.dumps(result) if result is not None else None),
+        )
+        if file_id in self._jobs:
+            self._jobs[file_id]["status"] = JOB_COMPLETED
+
+    def fail_job(self, file_id: str, error: str) -> None:
+        self._update(
+            file_id,
+            "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE file_id = ?",
+            (JOB_FAILED, time.time(), error),
+        )
         if file_id in self._jobs:
-            self._jobs[file_id]["status"] = "completed"
+            self._jobs[file_id]["status"] = JOB_FAILED
+
+    def get_job(self, file_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE file_id = ?", (file_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_job(row)
+
+    def queue_position(self, file_id: str) -> int:
+        """ลำดับในคิว (1 = งานถัดไป) หรือ 0 ถ้างานไม่ได้อยู่ในคิว"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at <= "
+                "(SELECT created_at FROM jobs WHERE file_id = ? AND status = ?)",
+                (JOB_QUEUED, file_id, JOB_QUEUED),
+            ).fetchone()
+        finally:
+            conn.close()
+        return int(row[0]) if row else 0
+
+    def queue_length(self) -> int:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (JOB_QUEUED,)).fetchone()
+        finally:
+            conn.close()
+        return int(row[0])
+
+    def average_duration(self, kind: str, sample_size: int = 20) -> Optional[float]:
+        """เวลาเฉลี่ยต่องานจากงานที่เสร็จล่าสุด ใช้ประมาณ ETA"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT AVG(finished_at - started_at) FROM ("
+                "SELECT finished_at, started_at FROM jobs WHERE kind = ? AND status = ? AND started_at IS NOT NULL "
+                "ORDER BY finished_at DESC LIMIT ?)",
+                (kind, JOB_COMPLETED, sample_size),
+            ).fetchone()
+        finally:
+            conn.close()
+        return float(row[0]) if row and row[0] is not None else None
+
+    def describe_job(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """สรุปสถานะงานสำหรับ API: สถานะ, ลำดับคิว, ความคืบหน้า และเวลาที่คาดว่าจะเสร็จ (วินาที)"""
+        job = self.get_job(file_id)
+        if job is None:
+            return None
+
+        status = job["status"]
+        position = self.queue_position(file_id) if status == JOB_QUEUED else 0
+        average = self.average_duration(job["kind"])
+        eta_seconds = None
+        if status == JOB_QUEUED and average is not None:
+            # งานก่อนหน้าถูกประมวลผลพร้อมกันทีละ JOB_WORKERS งาน
+            rounds = (position - 1) // max(JOB_WORKERS, 1) + 1
+            eta_seconds = average * rounds
+        elif status == JOB_PROCESSING:
+            elapsed = time.time() - (job["started_at"] or time.time())
+            progress = float(job["progress"] or 0.0)
+            if progress > 0.05:
+                eta_seconds = elapsed / progress * (1.0 - progress)
+            elif average is not None:
+                eta_seconds = max(average - elapsed, 0.0)
+        elif status in (JOB_COMPLETED, JOB_FAILED):
+            eta_seconds = 0.0
+
+        return {
+            "file_id": file_id,
+            "kind": job["kind"],
+            "status": status,
+            "queue_position": position,
+            "progress": round(float(job["progress"] or 0.0), 4),
+            "eta_seconds": round(eta_seconds, 1) if eta_seconds is not None else None,
+            "error": job["error"],
+            "result": job["result"],
+        }
+
+    def requeue_stale_jobs(self, stale_seconds: float) -> int:
+        """คืนงาน processing ที่ไม่มี heartbeat นานเกินกำหนด (worker ตาย/restart) กลับเข้าคิว
+        งานที่ลองครบ JOB_MAX_ATTEMPTS แล้ว หรืองานที่ไม่ได้มาจากคิว จะถูกตั้งเป็น failed แทน"""
+        cutoff = time.time() - stale_seconds
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? "
+                "WHERE status = ? AND heartbeat_at < ? AND (attempts >= ? OR kind = ?)",
+                (
+                    JOB_FAILED,
+                    time.time(),
+                    "งานหยุดทำงานกลางคันและไม่สามารถประมวลผลต่อได้",
+                    JOB_PROCESSING,
+                    cutoff,
+                    JOB_MAX_ATTEMPTS,
+                    JOB_KIND_SYNC,
+                ),
+            )
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, progress = 0 WHERE status = ? AND heartbeat_at < ?",
+                (JOB_QUEUED, JOB_PROCESSING, cutoff),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        if cursor.rowcount:
+            logger.warning(f"คืนงานค้าง {cursor.rowcount} งานกลับเข้าคิว")
+        return cursor.rowcount
+
+    def active_file_ids(self) -> set[str]:
+        """file_id ของงานที่ยังรอคิวหรือกำลังประมวลผล (cleanup ต้องไม่ลบไฟล์ของงานเหล่านี้)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT file_id FROM jobs WHERE status IN (?, ?)", (JOB_QUEUED, JOB_PROCESSING)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {row[0] for row in rows}
+
+    def purge_finished_jobs(self, ttl_seconds: float) -> int:
+        """ลบแถวของงานที่จบแล้วและเก่ากว่า TTL (ไฟล์ผลลัพธ์ถูก cleanup ลบไปแล้วเช่นกัน)"""
+        cutoff = time.time() - ttl_seconds
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND COALESCE(finished_at, created_at) < ?",
+                (JOB_COMPLETED, JOB_FAILED, cutoff),
+            )
+        finally:
+            conn.close()
+        finished = (JOB_COMPLETED, JOB_FAILED)
+        for file_id in [key for key, job in self._jobs.items() if job["status"] in finished and job["created_at"] < cutoff]:
+            self._jobs.pop(file_id, None)
+        return cursor.rowcount
 
     def get_job_directory(self, file_id: str) -> Optional[str]:
         job = self._jobs.get(file_id)
         if job:
             return job["output_dir"]
-        folder = os.path.join("separated", file_id)
+        stored = self.get_job(file_id)
+        if stored and os.path.exists(stored["output_dir"]):
+            return stored["output_dir"]
+        folder = os.path.join(DIR_SEPARATED, file_id)
         if os.path.exists(folder):
             return folder
         return None
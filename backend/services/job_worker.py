@@ -0,0 +1,91 @@
+# backend/services/job_worker.py
+# Worker pool สำหรับดึงงานจากคิวถาวร (job_manager) มาประมวลผลเบื้องหลัง
+# - router ลงทะเบียน handler ตามชนิดงาน (เช่น "separate") ผ่าน register_handler
+# - แต่ละ worker ส่ง heartbeat ระหว่างทำงาน เพื่อให้ worker อื่นคืนงานเข้าคิวได้ถ้า process นี้ตาย
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from backend.config import JOB_HEARTBEAT_SECONDS, JOB_POLL_INTERVAL_SECONDS, JOB_STALE_SECONDS
+from backend.services.job_manager import job_manager
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def register_handler(kind: str, handler: JobHandler) -> None:
+    """ผูกชนิดงานกับ coroutine ที่ประมวลผลงานนั้น (handler คืน dict ผลลัพธ์ที่จะเก็บไว้ในคิว)"""
+    _handlers[kind] = handler
+
+
+async def _heartbeat(file_id: str) -> None:
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            await asyncio.to_thread(job_manager.heartbeat, file_id)
+        except Exception as exc:
+            logger.warning(f"ส่ง heartbeat ของงาน {file_id} ไม่สำเร็จ: {exc}")
+
+
+async def process_next_job() -> bool:
+    """ดึงงานถัดไปจากคิวมาประมวลผลหนึ่งงาน คืน False ถ้าคิวว่าง"""
+    job = await asyncio.to_thread(job_manager.claim_next_job)
+    if job is None:
+        return False
+
+    file_id = job["file_id"]
+    handler = _handlers.get(job["kind"])
+    if handler is None:
+        logger.error(f"ไม่พบ handler สำหรับงานชนิด {job['kind']} ({file_id})")
+        await asyncio.to_thread(job_manager.fail_job, file_id, f"ไม่รองรับงานชนิด {job['kind']}")
+        return True
+
+    heartbeat_task = asyncio.create_task(_heartbeat(file_id))
+    try:
+        result = await handler(job)
+    except asyncio.CancelledError:
+        # server กำลังปิด: ปล่อยงานค้างไว้ให้ requeue_stale_jobs คืนเข้าคิวหลัง restart
+        raise
+    except Exception as exc:
+        logger.exception("Job %s (%s) failed", file_id, job["kind"])
+        await asyncio.to_thread(job_manager.fail_job, file_id, str(exc) or exc.__class__.__name__)
+    else:
+        await asyncio.to_thread(job_manager.complete_job, file_id, result)
+    finally:
+        heartbeat_task.cancel()
+    return True
+
+
+async def _worker_loop(worker_index: int) -> None:
+    logger.info(f"Job worker #{worker_index} started")
+    while True:
+        try:
+            processed = await process_next_job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.error(f"Job worker #{worker_index} error: {exc}")
+            processed = False
+        if not processed:
+            await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+
+
+async def _stale_job_monitor() -> None:
+    # ตรวจงานที่ค้างเพราะ worker ตาย (รวมทั้งงานที่ค้างอยู่ตอน restart) แล้วคืนเข้าคิว
+    while True:
+        try:
+            await asyncio.to_thread(job_manager.requeue_stale_jobs, JOB_STALE_SECONDS)
+        except Exception as exc:
+            logger.error(f"ตรวจงานค้างไม่สำเร็จ: {exc}")
+        await asyncio.sleep(max(JOB_STALE_SECONDS / 2.0, 1.0))
+
+
+def start_workers(count: int) -> list[asyncio.Task]:
+    """เริ่ม worker pool ภายใน event loop ปัจจุบัน (เรียกจาก lifespan ของ FastAPI)"""
+    tasks = [asyncio.create_task(_worker_loop(index + 1)) for index in range(max(int(count), 0))]
+    tasks.append(asyncio.create_task(_stale_job_monitor()))
+    return tasks
@@ -0,0 +1,82 @@
+# backend/services/model_warmup.py
+# โหลดโมเดล (Open-Unmix / Auto-EQ) ล่วงหน้าใน background ตอนเริ่มเซิร์ฟเวอร์ พร้อมรัน dummy inference
+# เพื่อไม่ให้ request แรกหลัง deploy ต้องรอโหลด checkpoint ภายใน slot ของ scheduler
+# สถานะของแต่ละโมเดลถูกรายงานผ่าน /ready ให้ load balancer รอจนกว่า worker จะพร้อม
+
+import time
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+from backend.auto_eq_inference import SUPPORTED_AUTO_EQ_MODELS, warmup_auto_eq_model
+from backend.process_audio import warmup_separator
+from backend.services.executor import run_cpu_task, TASK_INFERENCE, TASK_SEPARATION
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR_MODEL_ID = "umxl"
+
+MODEL_PENDING = "pending"
+MODEL_LOADING = "loading"
+MODEL_READY = "ready"
+MODEL_FAILED = "failed"
+
+# สถานะของโมเดลที่สั่งโหลดล่วงหน้า (ชื่อโมเดล -> state / load_seconds / warmup_seconds / error)
+model_status: Dict[str, Dict[str, Any]] = {}
+
+
+def resolve_preload_models(names: Iterable[str]) -> list[str]:
+    """แปลงค่าจาก PRELOAD_MODELS เป็นรายชื่อโมเดล ("all" = ทุกโมเดลที่รองรับ)"""
+    available = [SEPARATOR_MODEL_ID, *SUPPORTED_AUTO_EQ_MODELS]
+    resolved: list[str] = []
+    for name in names:
+        candidates = available if name == "all" else [name]
+        for candidate in candidates:
+            if candidate not in available:
+                logger.warning(f"ไม่รู้จักโมเดลใน PRELOAD_MODELS: {candidate}")
+                continue
+            if candidate not in resolved:
+                resolved.append(candidate)
+    return resolved
+
+
+async def _warm_model(model_id: str) -> Dict[str, float]:
+    if model_id == SEPARATOR_MODEL_ID:
+        return await run_cpu_task(TASK_SEPARATION, warmup_separator)
+    return await run_cpu_task(TASK_INFERENCE, warmup_auto_eq_model, model_id)
+
+
+async def preload_models(names: Iterable[str]) -> None:
+    """โหลดและอุ่นเครื่องโมเดลทีละตัว (รันเป็น background task จาก lifespan)"""
+    models = resolve_preload_models(names)
+    for model_id in models:
+        model_status[model_id] = {"state": MODEL_PENDING, "load_seconds": None, "warmup_seconds": None, "error": None}
+
+    for model_id in models:
+        status = model_status[model_id]
+        status["state"] = MODEL_LOADING
+        started = time.perf_counter()
+        try:
+            timings = await _warm_model(model_id)
+        except Exception as exc:
+            status.update(state=MODEL_FAILED, error=str(exc) or exc.__class__.__name__)
+            logger.error(f"Preload โมเดล {model_id} ไม่สำเร็จ: {exc}")
+            continue
+        status.update(
+            state=MODEL_READY,
+            load_seconds=round(timings.get("load_seconds", time.perf_counter() - started), 3),
+            warmup_seconds=round(timings.get("warmup_seconds", 0.0), 3),
+        )
+        logger.info(f"Preload โมเดล {model_id} เสร็จใน {time.perf_counter() - started:.2f}s")
+
+
+def readiness(expected: Optional[Iterable[str]] = None) -> tuple[bool, Dict[str, Any]]:
+    """พร้อมรับงานเมื่อโมเดลที่สั่งโหลดทุกตัวอยู่ในสถานะ ready (โมเดลที่ยังไม่เริ่มนับเป็น pending)"""
+    models = resolve_preload_models(expected) if expected is not None else list(model_status)
+    states = {
+        model_id: model_status.get(
+            model_id, {"state": MODEL_PENDING, "load_seconds": None, "warmup_seconds": None, "error": None}
+        )
+        for model_id in models
+    }
+    ready = all(state["state"] == MODEL_READY for state in states.values())
+    return ready, states
@@ -0,0 +1,60 @@
+# backend/services/on_demand_files.py
+# ฐานของ store ที่สร้างไฟล์ลงดิสก์ครั้งแรกที่ถูกขอแล้วเก็บไว้ใช้ซ้ำ (pitch variant, spectrogram)
+# - request ที่ขอไฟล์เดียวกันพร้อมกันรอ task สร้างไฟล์เดียวกัน (asyncio.shield: request ที่ถูกยกเลิกไม่ยกเลิกงานของคนอื่น)
+# - งานคำนวณใช้ slot ของ light_dsp pool และรันใน process pool ของ TASK_DSP
+# - นับ hit/miss, จำนวนที่สร้างสำเร็จ/ล้มเหลวสำหรับ /metrics
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict
+
+from backend.services.executor import run_cpu_task, TASK_DSP
+from backend.services.scheduler import get_pool, POOL_LIGHT_DSP
+
+logger = logging.getLogger(__name__)
+
+
+class OnDemandFileStore:
+    """in-flight dedupe และสถิติ hit/miss ที่ store ของไฟล์ซึ่งสร้างตอนขอใช้ร่วมกัน"""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.built = 0
+        self.failed = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _count_lookup(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    async def _build_once(self, target_path: str, build: Callable[..., Any], *args: Any) -> str:
+        """รัน build(*args) ที่เขียนไฟล์ target_path ครั้งเดียว แม้มีหลาย request ขอพร้อมกัน"""
+        task = self._inflight.get(target_path)
+        if task is None:
+            task = asyncio.create_task(self._run_build(target_path, build, *args))
+            self._inflight[target_path] = task
+            task.add_done_callback(lambda _: self._inflight.pop(target_path, None))
+        return await asyncio.shield(task)
+
+    async def _run_build(self, target_path: str, build: Callable[..., Any], *args: Any) -> str:
+        try:
+            async with get_pool(POOL_LIGHT_DSP).slot():
+                await run_cpu_task(TASK_DSP, build, *args)
+        except Exception as exc:
+            self.failed += 1
+            logger.warning(f"สร้าง {target_path} ไม่สำเร็จ: {exc}")
+            raise
+        self.built += 1
+        return target_path
+
+    def _lookup_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "failed": self.failed,
+        }
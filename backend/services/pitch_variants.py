@@ -0,0 +1,111 @@
+# backend/services/pitch_variants.py
+# Pitch variant ของ stem ที่ render ล่วงหน้า: ผู้ใช้ใน studio มักเลื่อน pitch ทีละ semitone ในช่วงแคบ ๆ
+# - หลัง /separate เสร็จ render offset ที่ใช้บ่อย (PITCH_VARIANT_SEMITONES) ของทุก stem ลง {job}/pitch/ เบื้องหลัง
+# - งานเบื้องหลังมี priority ต่ำ: รอจน light_dsp pool ว่าง (ไม่มีงานรอ/มี slot เหลือ) ก่อน render แต่ละไฟล์
+# - lookup ที่ไม่เจอ variant จะ render ทันที (on-demand) แล้วเก็บไว้ใช้ซ้ำ พร้อมนับ hit/miss สำหรับ /metrics
+
+import os
+import asyncio
+from typing import Any, Dict, Optional
+
+from backend.config import PITCH_VARIANT_IDLE_POLL_SECONDS, PITCH_VARIANT_SEMITONES, STEM_TARGETS
+from backend.pitch_shifter import pitch_shift_file
+from backend.services.on_demand_files import OnDemandFileStore
+from backend.services.scheduler import get_pool, POOL_LIGHT_DSP
+
+PITCH_VARIANT_DIR = "pitch"
+
+
+def variant_path(folder: str, stem: str, semitones: int) -> str:
+    return os.path.join(folder, PITCH_VARIANT_DIR, f"{stem}_{int(semitones):+d}.wav")
+
+
+def render_pitch_variant(source_path: str, target_path: str, semitones: int) -> str:
+    """render variant ลงไฟล์ชั่วคราวแล้วค่อย rename (ไม่มีทางเสิร์ฟไฟล์ที่เขียนไม่เสร็จ)"""
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    partial_path = f"{target_path}.part.wav"
+    try:
+        pitch_shift_file(source_path, partial_path, semitones)
+        os.replace(partial_path, target_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return target_path
+
+
+class PitchVariantStore(OnDemandFileStore):
+    """render/ค้นหา pitch variant ของ stem ในโฟลเดอร์งาน และเก็บสถิติ hit/miss"""
+
+    def __init__(self, semitones: tuple[int, ...] = PITCH_VARIANT_SEMITONES, stems: tuple[str, ...] = STEM_TARGETS):
+        super().__init__()
+        # offset ที่ใกล้ 0 ก่อน (ผู้ใช้เลื่อนทีละ semitone จึงมักใช้ ±1 ก่อน ±2)
+        self.semitones = tuple(sorted({int(value) for value in semitones if int(value) != 0}, key=lambda v: (abs(v), v)))
+        self.stems = tuple(stems)
+        self.idle_poll_seconds = PITCH_VARIANT_IDLE_POLL_SECONDS
+        self._background: set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.semitones)
+
+    def schedule(self, folder: str) -> Optional[asyncio.Task]:
+        """เริ่ม render variant ของทุก stem ใน folder เบื้องหลัง (ไม่รอผล)"""
+        if not self.enabled:
+            return None
+        task = asyncio.create_task(self.prerender(folder))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def prerender(self, folder: str) -> int:
+        """render variant ที่ยังไม่มีทีละไฟล์ โดยรอให้งาน interactive ใช้ light_dsp ก่อน คืนจำนวนที่ render"""
+        count = 0
+        for semitones in self.semitones:
+            for stem in self.stems:
+                source_path = os.path.join(folder, f"{stem}.wav")
+                target_path = variant_path(folder, stem, semitones)
+                if not os.path.exists(source_path) or os.path.exists(target_path):
+                    continue
+                await self._wait_for_idle()
+                try:
+                    await self._render(source_path, target_path, semitones)
+                    count += 1
+                except Exception:
+                    # _run_build บันทึก log แล้ว -> ข้ามไป variant ถัดไป
+                    continue
+        return count
+
+    async def _wait_for_idle(self) -> None:
+        pool = get_pool(POOL_LIGHT_DSP)
+        while pool.waiting > 0 or pool.active >= pool.concurrency:
+            await asyncio.sleep(self.idle_poll_seconds)
+
+    async def _render(self, source_path: str, target_path: str, semitones: int) -> str:
+        # งานเบื้องหลังและ request ที่ขอ variant เดียวกันพร้อมกันใช้ task เดียวกัน (ไม่ render ซ้ำ)
+        return await self._build_once(target_path, render_pitch_variant, source_path, target_path, semitones)
+
+    def has_variant(self, folder: str, stem: str, semitones: int) -> bool:
+        return os.path.exists(variant_path(folder, stem, semitones))
+
+    async def get_variant(self, folder: str, stem: str, semitones: int) -> tuple[str, bool]:
+        """คืน (path, render ไว้ล่วงหน้าแล้วหรือไม่) — ถ้ายังไม่มีจะ render ทันทีแล้วเก็บไว้"""
+        target_path = variant_path(folder, stem, semitones)
+        prerendered = os.path.exists(target_path)
+        self._count_lookup(prerendered)
+        if prerendered:
+            return target_path, True
+        await self._render(os.path.join(folder, f"{stem}.wav"), target_path, semitones)
+        return target_path, False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "semitones": list(self.semitones),
+            **self._lookup_stats(),
+            "rendered": self.built,
+            "pending_jobs": len(self._background),
+        }
+
+
+# Global instance สำหรับเรียกใช้ทั่วทั้งแอป
+pitch_variants = PitchVariantStore()
@@ -0,0 +1,188 @@
+# backend/services/result_cache.py
+# แคชผลลัพธ์แบบ content-addressed: ผู้ใช้อัปโหลดไฟล์เดิมด้วยพารามิเตอร์เดิมซ้ำบ่อย
+# - key = sha256(hash ของไฟล์อัปโหลด + operation + พารามิเตอร์ + model id)
+# - เก็บผลลัพธ์เป็น hard link ใน cache/{key}/ (ไม่เปลืองพื้นที่ซ้ำกับไฟล์ที่ยังไม่หมดอายุ)
+# - evict ตาม TTL และ LRU เมื่อขนาดรวมเกิน RESULT_CACHE_MAX_BYTES (เรียกจาก cleanup_task)
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from backend.config import DIR_CACHE, RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        # คนละ filesystem หรือไม่รองรับ hard link
+        shutil.copy2(src, dst)
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ResultCache:
+    """แคชไฟล์ผลลัพธ์ตาม key ที่คำนวณจากเนื้อหาไฟล์อัปโหลดและพารามิเตอร์การประมวลผล"""
+
+    def __init__(self, root: str = DIR_CACHE, max_bytes: int = RESULT_CACHE_MAX_BYTES, enabled: bool = RESULT_CACHE_ENABLED):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(upload_digest: str, operation: str, params: Dict[str, Any], model_id: Optional[str] = None) -> str:
+        payload = json.dumps(
+            {"digest": upload_digest, "operation": operation, "params": params, "model_id": model_id},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, os.path.basename(key))
+
+    def lookup(self, key: Optional[str]) -> Optional[str]:
+        """คืนโฟลเดอร์ของ entry ถ้ามีในแคช (และอัปเดตเวลาใช้งานล่าสุดสำหรับ LRU)"""
+        if not self.enabled or not key:
+            return None
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir) and os.listdir(entry_dir):
+            try:
+                os.utime(entry_dir)
+            except OSError:
+                pass
+            self.hits += 1
+            return entry_dir
+        self.misses += 1
+        return None
+
+    def _store(self, key: str, files: Iterable[tuple[str, str]]) -> None:
+        entry_dir = self._entry_dir(key)
+        staging_dir = f"{entry_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        os.makedirs(staging_dir, exist_ok=True)
+        try:
+            for src, relpath in files:
+                dst = os.path.join(staging_dir, relpath)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                _link_or_copy(src, dst)
+            with self._lock:
+                if os.path.isdir(entry_dir):
+                    # มีงานอื่นเก็บ key เดียวกันไปก่อนแล้ว
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+                    return
+                os.replace(staging_dir, entry_dir)
+            self.stores += 1
+        except Exception as exc:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            logger.warning(f"เก็บผลลัพธ์ลงแคชไม่สำเร็จ ({key}): {exc}")
+
+    def store_file(self, key: Optional[str], path: str) -> None:
+        if not self.enabled or not key or not os.path.isfile(path):
+            return
+        self._store(key, [(path, os.path.basename(path))])
+
+    def store_directory(self, key: Optional[str], directory: str) -> None:
+        if not self.enabled or not key or not os.path.isdir(directory):
+            return
+        files = []
+        for root, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                files.append((path, os.path.relpath(path, directory)))
+        if files:
+            self._store(key, files)
+
+    def restore_file(self, entry_dir: str, output_path: str) -> Optional[str]:
+        """วางไฟล์ผลลัพธ์จากแคชไว้ที่ output_path (นามสกุลตามไฟล์ในแคช) คืน None ถ้า entry เสีย"""
+        names = sorted(os.listdir(entry_dir)) if os.path.isdir(entry_dir) else []
+        if not names:
+            return None
+        cached = os.path.join(entry_dir, names[0])
+        target = os.path.splitext(output_path)[0] + os.path.splitext(cached)[1]
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        _link_or_copy(cached, target)
+        return target
+
+    def restore_directory(self, entry_dir: str, output_dir: str) -> None:
+        for root, _, names in os.walk(entry_dir):
+            for name in names:
+                src = os.path.join(root, name)
+                dst = os.path.join(output_dir, os.path.relpath(src, entry_dir))
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                if not os.path.exists(dst):
+                    _link_or_copy(src, dst)
+
+    def evict(self, ttl_seconds: float) -> int:
+        """ลบ entry ที่ไม่ได้ใช้นานเกิน TTL แล้วลบตาม LRU จนขนาดรวมไม่เกิน max_bytes"""
+        if not os.path.isdir(self.root):
+            return 0
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                last_used = os.path.getmtime(path)
+            except OSError:
+                continue
+            entries.append((last_used, path, _directory_size(path)))
+
+        entries.sort()
+        total = sum(size for _, _, size in entries)
+        removed = 0
+        for last_used, path, size in entries:
+            if now - last_used <= ttl_seconds and total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        if removed:
+            self.evictions += removed
+            logger.info(f"ลบผลลัพธ์ในแคช {removed} รายการ (เหลือ {total} bytes)")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+
+# Global instance สำหรับเรียกใช้ทั่วทั้งแอป
+result_cache = ResultCache()
+
+
+def upload_cache_key(
+    upload_digest: Optional[str], operation: str, params: Dict[str, Any], model_id: Optional[str] = None
+) -> Optional[str]:
+    """สร้าง key จาก hash ของไฟล์ที่ save_upload คืนมา (None ถ้าไม่มี hash หรือแคชถูกปิด)"""
+    if not result_cache.enabled or not upload_digest:
+        return None
+    return ResultCache.make_key(upload_digest, operation, params, model_id)
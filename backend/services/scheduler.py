@@ -0,0 +1,117 @@
+# backend/services/scheduler.py
+# Admission control แยกตามชนิดทรัพยากร (separation / inference / light_dsp / encoding)
+# - แต่ละ pool มี concurrency และความยาวคิวของตัวเอง งานสั้นอย่าง /analyze จึงไม่ต้องรอหลังงานแยกเสียง
+# - คิวเต็ม -> ปฏิเสธทันทีด้วย 429 พร้อม Retry-After ที่ประมาณจากเวลาเฉลี่ยต่องาน (EWMA)
+
+import math
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+from fastapi import HTTPException
+
+from backend.config import (
+    SCHED_SEPARATION_CONCURRENCY,
+    SCHED_SEPARATION_QUEUE,
+    SCHED_INFERENCE_CONCURRENCY,
+    SCHED_INFERENCE_QUEUE,
+    SCHED_LIGHT_DSP_CONCURRENCY,
+    SCHED_LIGHT_DSP_QUEUE,
+    SCHED_ENCODING_CONCURRENCY,
+    SCHED_ENCODING_QUEUE,
+)
+
+logger = logging.getLogger(__name__)
+
+POOL_SEPARATION = "separation"
+POOL_INFERENCE = "inference"
+POOL_LIGHT_DSP = "light_dsp"
+POOL_ENCODING = "encoding"
+
+# น้ำหนักของงานล่าสุดในค่าเฉลี่ยเวลาต่องาน
+EWMA_ALPHA = 0.2
+
+
+class ResourcePool:
+    """Pool ของทรัพยากรหนึ่งชนิด: จำกัดจำนวนงานที่รันพร้อมกันและจำนวนงานที่รอคิว"""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, initial_seconds: float):
+        self.name = name
+        self.concurrency = max(int(concurrency), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self.avg_seconds = float(initial_seconds)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    def retry_after(self, pending: int = 0) -> int:
+        """ประมาณเวลา (วินาที) จนกว่าจะมีที่ว่างในคิว"""
+        backlog = self.waiting + pending + self.active
+        return max(math.ceil(self.avg_seconds * backlog / self.concurrency), 1)
+
+    def check_admission(self, pending: int = 0) -> None:
+        """ปฏิเสธงานใหม่ด้วย 429 ถ้าคิวเต็ม (pending = งานที่รออยู่นอก pool เช่นคิวถาวรของ /separate)"""
+        queued = self.waiting + pending
+        if self.active >= self.concurrency and queued >= self.max_queue:
+            self.rejected += 1
+            retry_after = self.retry_after(pending)
+            logger.warning(f"ปฏิเสธงาน {self.name}: คิวเต็ม ({queued}/{self.max_queue}), retry after {retry_after}s")
+            raise HTTPException(
+                status_code=429,
+                detail="ระบบกำลังประมวลผลงานจำนวนมาก กรุณาลองใหม่ภายหลัง",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """รอจนได้ slot ของ pool แล้วรันงาน (ไม่ตรวจ admission — ใช้กับงานที่รับเข้ามาแล้ว)"""
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.avg_seconds = (1.0 - EWMA_ALPHA) * self.avg_seconds + EWMA_ALPHA * elapsed
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "avg_seconds": round(self.avg_seconds, 3),
+        }
+
+
+pools: Dict[str, ResourcePool] = {
+    POOL_SEPARATION: ResourcePool(POOL_SEPARATION, SCHED_SEPARATION_CONCURRENCY, SCHED_SEPARATION_QUEUE, 240.0),
+    POOL_INFERENCE: ResourcePool(POOL_INFERENCE, SCHED_INFERENCE_CONCURRENCY, SCHED_INFERENCE_QUEUE, 20.0),
+    POOL_LIGHT_DSP: ResourcePool(POOL_LIGHT_DSP, SCHED_LIGHT_DSP_CONCURRENCY, SCHED_LIGHT_DSP_QUEUE, 10.0),
+    POOL_ENCODING: ResourcePool(POOL_ENCODING, SCHED_ENCODING_CONCURRENCY, SCHED_ENCODING_QUEUE, 5.0),
+}
+
+
+def get_pool(name: str) -> ResourcePool:
+    return pools[name]
+
+
+def scheduler_metrics() -> Dict[str, Dict[str, Any]]:
+    """สรุปสถานะทุก pool สำหรับ endpoint /metrics"""
+    return {name: pool.metrics() for name, pool in pools.items()}
@@ -0,0 +1,37 @@
+# backend/services/spectrograms.py
+# Spectrogram tiles ของ stem: คำนวณครั้งเดียวต่อ stem เมื่อถูกขอครั้งแรก แล้วเก็บไว้ที่ {job}/spectrogram/{stem}.spec
+# - request ที่ขอ tile ของ stem เดียวกันพร้อมกัน (viewport หนึ่งขอหลาย tile) รอ task สร้างไฟล์เดียวกัน ไม่คำนวณซ้ำ
+# - dedupe, slot ของ light_dsp pool และสถิติ hit/miss ใช้ OnDemandFileStore ร่วมกับ pitch variant
+
+import os
+from typing import Any, Dict
+
+from backend.spectrogram_tiles import build_spectrogram_file, spectrogram_path
+from backend.services.on_demand_files import OnDemandFileStore
+
+
+class SpectrogramStore(OnDemandFileStore):
+    """สร้าง/ค้นหาไฟล์ spectrogram ของ stem และเก็บสถิติ hit/miss"""
+
+    def has_spectrogram(self, source_path: str, stem: str) -> bool:
+        return os.path.exists(spectrogram_path(os.path.dirname(source_path), stem))
+
+    async def get_spectrogram(self, source_path: str, stem: str) -> str:
+        """คืน path ของไฟล์ spectrogram ของ stem (ไฟล์ WAV ที่ source_path) — ถ้ายังไม่มีจะสร้างตอนนี้แล้วเก็บไว้"""
+        target_path = spectrogram_path(os.path.dirname(source_path), stem)
+        exists = os.path.exists(target_path)
+        self._count_lookup(exists)
+        if exists:
+            return target_path
+        return await self._build_once(target_path, build_spectrogram_file, source_path, target_path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._lookup_stats(),
+            "built": self.built,
+            "building": len(self._inflight),
+        }
+
+
+# Global instance สำหรับเรียกใช้ทั่วทั้งแอป
+spectrograms = SpectrogramStore()
@@ -2,32 +2,36 @@
 # โมดูลกลางจัดการไฟล์อัปโหลด การตรวจสอบขนาด/นามสกุลไฟล์ การแปลงฟอร์แมต และการตัดช่วงเสียง
 
 import os
-import asyncio
-import shutil
+import hashlib
 import logging
 import soundfile as sf
 from uuid import uuid4
 from typing import Tuple
 from fastapi import UploadFile, HTTPException
 
-from backend.config import MAX_UPLOAD_BYTES, DIR_UPLOADS, MAX_CONCURRENT_TASKS
+from backend.config import MAX_UPLOAD_BYTES, DIR_UPLOADS
+from backend.services.encoder import encoder
 
 logger = logging.getLogger(__name__)
 
 UPLOAD_DIR = DIR_UPLOADS
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-# Semaphore สำหรับจำกัด Concurrency การประมวลผล AI/DSP
-processing_semaphore = asyncio.Semaphore(MAX_CONCURRENT_TASKS)
+# ข้อความแจ้งขนาดไฟล์เกิน (อิงค่า MAX_UPLOAD_BYTES ที่ตั้งผ่าน env ได้)
+UPLOAD_LIMIT_MESSAGE = f"ไฟล์ต้องมีขนาดไม่เกิน {MAX_UPLOAD_BYTES // (1024 * 1024)}MB"
 
+UPLOAD_CHUNK_BYTES = 1024 * 1024
 
 async def save_upload(
     file: UploadFile,
     upload_dir: str = UPLOAD_DIR,
     trim_start: float | None = None,
     trim_end: float | None = None
-) -> Tuple[str, str]:
-    """บันทึกไฟล์อัปโหลดลงดิสก์ ตรวจสอบความถูกต้อง และตัดช่วงเวลาเสียงถ้ามีการระบุ"""
+) -> Tuple[str, str, str]:
+    """บันทึกไฟล์อัปโหลดลงดิสก์ ตรวจสอบความถูกต้อง และตัดช่วงเวลาเสียงถ้ามีการระบุ
+
+    คืน (file_id, input_path, sha256 ของไฟล์ที่อัปโหลดก่อน trim) — digest ส่งต่อให้ upload_cache_key เป็นส่วนหนึ่งของ key
+    """
     filename = os.path.basename(file.filename or "")
     _, ext = os.path.splitext(filename)
 
@@ -35,19 +39,22 @@ async def save_upload(
         raise HTTPException(status_code=400, detail="รองรับเฉพาะไฟล์ WAV (.wav)")
 
     if file.size is not None and file.size > MAX_UPLOAD_BYTES:
-        raise HTTPException(status_code=400, detail="ไฟล์ต้องมีขนาดไม่เกิน 100MB")
+        raise HTTPException(status_code=400, detail=UPLOAD_LIMIT_MESSAGE)
 
     file_id = str(uuid4())
     stored_name = f"{file_id}_{filename}"
     input_path = os.path.join(upload_dir, stored_name)
 
-    # สตรีมมิ่งเขียนไฟล์ลงดิสก์เพื่อประหยัดหน่วยความจำ
+    # สตรีมมิ่งเขียนไฟล์ลงดิสก์เพื่อประหยัดหน่วยความจำ พร้อมคำนวณ hash ไปในรอบเดียวกัน
+    digest = hashlib.sha256()
     with open(input_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        while chunk := file.file.read(UPLOAD_CHUNK_BYTES):
+            digest.update(chunk)
+            buffer.write(chunk)
 
     if os.path.getsize(input_path) > MAX_UPLOAD_BYTES:
         os.remove(input_path)
-        raise HTTPException(status_code=400, detail="ไฟล์ต้องมีขนาดไม่เกิน 100MB")
+        raise HTTPException(status_code=400, detail=UPLOAD_LIMIT_MESSAGE)
 
     # ตัดช่วงเสียงถ้ามี trim_start หรือ trim_end
     if trim_start is not None or trim_end is not None:
@@ -80,25 +87,19 @@ async def save_upload(
             logger.error(f"Error trimming audio: {e}")
             raise HTTPException(status_code=400, detail=f"การตัดช่วงเวลาเสียงล้มเหลว: {e}")
 
-    return file_id, input_path
+    return file_id, input_path, digest.hexdigest()
 
 
 def convert_to_mp3(wav_path: str, remove_source: bool = True) -> str:
-    """แปลงไฟล์ WAV เป็น MP3
+    """แปลงไฟล์ WAV เป็น MP3 ผ่าน encoder แบบ streaming (services/encoder.py)
 
     - remove_source=True: ลบไฟล์ WAV ต้นทางหลังแปลงเสร็จ (ใช้กับไฟล์ผลลัพธ์ที่สร้างใหม่ เช่น karaoke/mix)
     - remove_source=False: เก็บไฟล์ WAV ต้นฉบับไว้ (ใช้กับ Stem ต้นฉบับเพื่อไม่ให้ไฟล์หายก่อน TTL)
     - ถ้าแปลงไม่สำเร็จจะ raise RuntimeError แทนการคืน path เดิมแบบเงียบๆ
     """
-    try:
-        from pydub import AudioSegment
-    except ImportError as exc:
-        raise RuntimeError("ต้องติดตั้ง pydub ก่อน: pip install pydub") from exc
-
     try:
         mp3_path = wav_path.rsplit(".", 1)[0] + ".mp3"
-        audio = AudioSegment.from_wav(wav_path)
-        audio.export(mp3_path, format="mp3", bitrate="320k")
+        encoder.encode(wav_path, mp3_path, "mp3")
         if remove_source and os.path.exists(wav_path):
             os.remove(wav_path)
         return mp3_path
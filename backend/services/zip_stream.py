@@ -0,0 +1,90 @@
+# backend/services/zip_stream.py
+# ZIP แบบ streaming: สร้าง archive ทีละ chunk จากรายการ (source_path, arcname) ขณะส่ง response
+# - entry แบบ stored (ไม่บีบอัด) เพราะ WAV/MP3 บีบอัดแทบไม่ได้ และขนาด archive คำนวณได้ล่วงหน้า (Content-Length)
+# - CRC-32 คำนวณระหว่างอ่านไฟล์แล้วเขียนใน data descriptor (flag bit 3) จึงอ่านแต่ละไฟล์รอบเดียว
+# - ไม่เขียนสำเนา archive ลงดิสก์ และไบต์แรกออกได้ทันทีโดยไม่ต้องรอให้ archive เสร็จ
+
+import os
+import time
+import zlib
+import struct
+from typing import Iterable, Iterator
+
+ZIP_STREAM_CHUNK_BYTES = 1024 * 1024
+
+# bit 3 = CRC/ขนาดอยู่ใน data descriptor หลังข้อมูล, bit 11 = ชื่อไฟล์เป็น UTF-8
+_FLAGS = 0x0008 | 0x0800
+_VERSION = 20
+# ไม่รองรับ ZIP64: ขนาดไฟล์และ offset ต้องไม่เกิน 4 GiB
+_ZIP32_LIMIT = 0xFFFFFFFF
+_MAX_ENTRIES = 0xFFFF
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_DATA_DESCRIPTOR = struct.Struct("<IIII")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_OF_CENTRAL_DIRECTORY = struct.Struct("<IHHHHIIH")
+
+
+def _dos_datetime(timestamp: float) -> tuple[int, int]:
+    t = time.localtime(timestamp)
+    year = min(max(t.tm_year, 1980), 2107)
+    return (year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday, t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+
+
+def _prepare(entries: Iterable[tuple[str, str]]) -> list[tuple[str, bytes, int, int, int]]:
+    prepared = []
+    for path, arcname in entries:
+        stat = os.stat(path)
+        date, dos_time = _dos_datetime(stat.st_mtime)
+        prepared.append((path, arcname.replace(os.sep, "/").encode("utf-8"), stat.st_size, date, dos_time))
+    if len(prepared) > _MAX_ENTRIES:
+        raise ValueError(f"ZIP แบบ streaming รองรับไม่เกิน {_MAX_ENTRIES} ไฟล์")
+    if _archive_size(prepared) > _ZIP32_LIMIT:
+        raise ValueError("ZIP แบบ streaming รองรับขนาดรวมไม่เกิน 4 GiB")
+    return prepared
+
+
+def _archive_size(prepared: list[tuple[str, bytes, int, int, int]]) -> int:
+    size = _END_OF_CENTRAL_DIRECTORY.size
+    for _, name, file_size, _, _ in prepared:
+        size += _LOCAL_HEADER.size + len(name) + file_size + _DATA_DESCRIPTOR.size
+        size += _CENTRAL_HEADER.size + len(name)
+    return size
+
+
+def zip_stream_size(entries: Iterable[tuple[str, str]]) -> int:
+    """ขนาด (ไบต์) ของ archive ที่ iter_zip_stream จะสร้างจาก entries เดียวกัน (ใช้เป็น Content-Length)"""
+    return _archive_size(_prepare(entries))
+
+
+def iter_zip_stream(entries: Iterable[tuple[str, str]], chunk_size: int = ZIP_STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """สร้างไฟล์ ZIP (stored) ทีละ chunk จากรายการ (source_path, arcname)"""
+    prepared = _prepare(entries)
+    central = []
+    offset = 0
+    for path, name, file_size, date, dos_time in prepared:
+        header = _LOCAL_HEADER.pack(0x04034B50, _VERSION, _FLAGS, 0, dos_time, date, 0, 0, 0, len(name), 0)
+        yield header + name
+        crc = 0
+        written = 0
+        with open(path, "rb") as source:
+            while chunk := source.read(chunk_size):
+                crc = zlib.crc32(chunk, crc)
+                written += len(chunk)
+                yield chunk
+        if written != file_size:
+            raise RuntimeError(f"ไฟล์ {path} เปลี่ยนขนาดระหว่างสร้าง ZIP")
+        yield _DATA_DESCRIPTOR.pack(0x08074B50, crc, file_size, file_size)
+        central.append(
+            _CENTRAL_HEADER.pack(
+                0x02014B50, _VERSION, _VERSION, _FLAGS, 0, dos_time, date, crc, file_size, file_size,
+                len(name), 0, 0, 0, 0, 0, offset,
+            )
+            + name
+        )
+        offset += _LOCAL_HEADER.size + len(name) + file_size + _DATA_DESCRIPTOR.size
+
+    directory = b"".join(central)
+    yield directory + _END_OF_CENTRAL_DIRECTORY.pack(
+        0x06054B50, 0, 0, len(central), len(central), len(directory), offset, 0
+    )
@@ -0,0 +1,159 @@
+"""
+
+- spectrogram (log magnitude) ของ stem แบบหลายระดับ zoom ให้หน้า studio แสดง spectral view ทีละ tile
+  โดยไม่ต้องโหลด WAV ทั้งไฟล์มาคำนวณ STFT ฝั่ง client
+- ใช้ STFT แบบเดียวกับ auto_eq_inference (N_FFT / HOP_LENGTH, hann, center=True) คำนวณทีละ block ของเฟรม
+  ด้วย reader ที่เติมศูนย์นอกขอบไฟล์ หน่วยความจำจึงไม่ขึ้นกับความยาวเพลง
+- ค่า dB (เทียบ full scale) ถูก quantize เป็น uint8 ระดับ L รวม 2^L เฟรม x 2^L bin ด้วย max (ไม่ให้ transient หาย)
+- เก็บเป็นไฟล์ binary: header + ตารางระดับ + grid (เฟรม, bin) ของแต่ละระดับ อ่าน tile ได้ด้วย seek ช่วงเดียว
+"""
+
+import os
+import struct
+from uuid import uuid4
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from backend.auto_eq_inference import HOP_LENGTH, N_FFT, ModelRateReader
+from backend.config import SPECTROGRAM_LEVELS
+
+SPECTROGRAM_DIR = "spectrogram"
+# ตัด bin Nyquist ทิ้งให้จำนวน bin เป็น 2^k (รวม bin ทีละ 2^L ได้ลงตัวทุกระดับ)
+SPECTROGRAM_BINS = N_FFT // 2
+# ช่วง dB ที่ map เป็น 0-255 (0 dB = sine เต็มสเกล)
+SPECTROGRAM_DB_FLOOR = -100.0
+SPECTROGRAM_DB_CEILING = 0.0
+SPECTROGRAM_BLOCK_FRAMES = 1024
+
+_MAGIC = b"HQSP"
+_VERSION = 1
+# magic, version, จำนวนระดับ, sample rate, n_fft, hop_length, dB ต่ำสุด, dB สูงสุด
+_HEADER = struct.Struct("<4sHHIIIff")
+# จำนวนเฟรม, จำนวน bin ของระดับนั้น
+_LEVEL = struct.Struct("<II")
+# ขนาดของ window ทำให้ sine เต็มสเกลมี magnitude = 1.0
+_MAGNITUDE_SCALE = 2.0 / float(librosa.filters.get_window("hann", N_FFT).sum())
+
+
+def spectrogram_path(folder: str, stem: str) -> str:
+    return os.path.join(folder, SPECTROGRAM_DIR, f"{stem}.spec")
+
+
+def _quantized_frames(segment: np.ndarray) -> np.ndarray:
+    """STFT แบบ center=False ของช่วงที่เติมขอบไว้แล้ว -> uint8 รูปทรง (เฟรม, bin)"""
+    magnitude = np.abs(librosa.stft(segment, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False))[:SPECTROGRAM_BINS]
+    db = 20.0 * np.log10(np.maximum(magnitude * _MAGNITUDE_SCALE, 1e-10))
+    scaled = (db - SPECTROGRAM_DB_FLOOR) * (255.0 / (SPECTROGRAM_DB_CEILING - SPECTROGRAM_DB_FLOOR))
+    return np.clip(np.rint(scaled), 0, 255).astype(np.uint8).T
+
+
+def _pool(grid: np.ndarray, factor: int) -> np.ndarray:
+    """รวม factor เฟรม x factor bin ด้วย max (เฟรมที่ไม่ครบกลุ่มท้าย block เติม 0 = เงียบ)"""
+    if factor == 1:
+        return grid
+    frames, bins = grid.shape
+    pad = -frames % factor
+    if pad:
+        grid = np.pad(grid, ((0, pad), (0, 0)))
+    return grid.reshape(-1, factor, bins // factor, factor).max(axis=(1, 3))
+
+
+def _level_shapes(frames: int, levels: int) -> list[tuple[int, int]]:
+    return [(-(-frames // (1 << level)), SPECTROGRAM_BINS >> level) for level in range(levels)]
+
+
+def build_spectrogram_file(
+    source_path: str,
+    target_path: str,
+    levels: int = SPECTROGRAM_LEVELS,
+    block_frames: int = SPECTROGRAM_BLOCK_FRAMES,
+) -> str:
+    """คำนวณ spectrogram ทุกระดับจากไฟล์เสียง (mono = ค่าเฉลี่ยทุก channel) ทีละ block แล้วเขียนไฟล์"""
+    levels = int(levels)
+    if levels < 1 or SPECTROGRAM_BINS >> (levels - 1) < 1:
+        raise ValueError("จำนวนระดับของ spectrogram ไม่ถูกต้อง")
+    # block ต้องเป็นพหุคูณของกลุ่มที่ใหญ่สุด เพื่อให้การรวมเฟรมของทุกระดับไม่คร่อม block
+    group = 1 << (levels - 1)
+    block_frames = max(-(-int(block_frames) // group) * group, group)
+    half = N_FFT // 2
+
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    # ชื่อไฟล์ชั่วคราวไม่ซ้ำกัน แล้วค่อย rename (ไม่มีทางเสิร์ฟไฟล์ที่เขียนไม่เสร็จ)
+    partial_path = f"{target_path}.{uuid4().hex}.part"
+    try:
+        with sf.SoundFile(source_path) as handle, open(partial_path, "wb") as output:
+            reader = ModelRateReader(handle, handle.samplerate)
+            total_frames = 1 + reader.length // HOP_LENGTH
+            shapes = _level_shapes(total_frames, levels)
+            output.write(
+                _HEADER.pack(
+                    _MAGIC, _VERSION, levels, reader.sr, N_FFT, HOP_LENGTH, SPECTROGRAM_DB_FLOOR, SPECTROGRAM_DB_CEILING
+                )
+            )
+            for frames, bins in shapes:
+                output.write(_LEVEL.pack(frames, bins))
+            offsets = []
+            offset = output.tell()
+            for frames, bins in shapes:
+                offsets.append(offset)
+                offset += frames * bins
+
+            for first in range(0, total_frames, block_frames):
+                last = min(first + block_frames, total_frames)
+                segment = reader.read(first * HOP_LENGTH - half, (last - 1) * HOP_LENGTH + half).mean(axis=0)
+                grid = _quantized_frames(segment)
+                for level, (_, bins) in enumerate(shapes):
+                    output.seek(offsets[level] + (first >> level) * bins)
+                    output.write(_pool(grid, 1 << level).tobytes())
+            output.truncate(offset)
+        os.replace(partial_path, target_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return target_path
+
+
+def read_spectrogram_info(path: str) -> dict:
+    """header ของไฟล์ spectrogram: พารามิเตอร์ STFT และขนาด/offset ของทุกระดับ"""
+    with open(path, "rb") as handle:
+        magic, version, levels, sample_rate, n_fft, hop_length, db_floor, db_ceiling = _HEADER.unpack(
+            handle.read(_HEADER.size)
+        )
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"ไฟล์ spectrogram ไม่ถูกต้อง: {path}")
+        table = [_LEVEL.unpack(handle.read(_LEVEL.size)) for _ in range(levels)]
+    offset = _HEADER.size + _LEVEL.size * levels
+    entries = []
+    for level, (frames, bins) in enumerate(table):
+        entries.append({"level": level, "frames": frames, "bins": bins, "offset": offset})
+        offset += frames * bins
+    return {
+        "sample_rate": sample_rate,
+        "n_fft": n_fft,
+        "hop_length": hop_length,
+        "db_floor": db_floor,
+        "db_ceiling": db_ceiling,
+        "levels": entries,
+    }
+
+
+def read_spectrogram_tile(path: str, level: int, x: int, y: int, tile_size: int) -> np.ndarray:
+    """tile (x = ลำดับช่วงเวลา, y = ลำดับช่วงความถี่) รูปทรง (bin, เฟรม): แถว 0 = ความถี่ต่ำสุด
+    tile ที่ขอบขวา/บนอาจเล็กกว่า tile_size
+    """
+    info = read_spectrogram_info(path)
+    if not 0 <= level < len(info["levels"]):
+        raise IndexError(f"level ต้องอยู่ในช่วง 0-{len(info['levels']) - 1}")
+    entry = info["levels"][level]
+    frames, bins = entry["frames"], entry["bins"]
+    first, low = x * tile_size, y * tile_size
+    if x < 0 or y < 0 or first >= frames or low >= bins:
+        raise IndexError("ตำแหน่ง tile อยู่นอกขอบเขตของ spectrogram")
+    rows = min(tile_size, frames - first)
+    with open(path, "rb") as handle:
+        # เฟรมของ tile อยู่ติดกันในไฟล์: อ่านช่วงเดียวแล้วตัดเฉพาะ bin ที่ต้องการ
+        handle.seek(entry["offset"] + first * bins)
+        band = np.frombuffer(handle.read(rows * bins), dtype=np.uint8).reshape(rows, bins)
+    return np.ascontiguousarray(band[:, low : low + tile_size].T)
@@ -0,0 +1,161 @@
+"""
+
+- waveform peaks (min/max) ของ stem แบบหลายระดับ zoom (pyramid) ให้หน้า studio วาด waveform ได้จากข้อมูลไม่กี่ KB
+  แทนการดาวน์โหลด WAV ทั้งไฟล์มาถอดรหัสก่อน
+- ระดับละเอียดสุดคำนวณทีละ block ระหว่างเขียน stem (vectorized: reshape แล้ว min/max ทีละ bin ไม่วน Python ต่อ sample)
+  ระดับที่หยาบกว่าได้จากการรวม bin ของระดับก่อนหน้า จึงอ่านเสียงรอบเดียว
+- เก็บเป็นไฟล์ binary: header + ตารางระดับ + ค่า int8 สลับ min,max (อ่านเฉพาะระดับที่ขอได้ด้วย seek)
+"""
+
+import os
+import struct
+from uuid import uuid4
+
+import numpy as np
+import soundfile as sf
+
+from backend.config import WAVEFORM_PEAK_SAMPLES_PER_PEAK
+
+PEAKS_DIR = "peaks"
+PEAKS_BLOCK_FRAMES = 65536
+# ระดับที่ใช้เมื่อสร้าง peaks ตอนขอ (กรณีปิดการสร้างตอนแยกเสียงด้วย WAVEFORM_PEAK_SAMPLES_PER_PEAK ว่าง)
+DEFAULT_SAMPLES_PER_PEAK = (256, 1024, 4096, 16384)
+
+_MAGIC = b"HQPK"
+_VERSION = 1
+# magic, version, จำนวนระดับ, sample rate, จำนวนเฟรมของเสียง
+_HEADER = struct.Struct("<4sHHIQ")
+# sample ต่อ peak, จำนวนคู่ (min, max) ของระดับนั้น
+_LEVEL = struct.Struct("<II")
+
+
+def peaks_path(folder: str, stem: str) -> str:
+    return os.path.join(folder, PEAKS_DIR, f"{stem}.peaks")
+
+
+def _validate_levels(samples_per_peak) -> tuple[int, ...]:
+    levels = tuple(int(value) for value in samples_per_peak)
+    if not levels or levels[0] <= 0:
+        raise ValueError("ต้องมีอย่างน้อย 1 ระดับ และจำนวน sample ต่อ peak ต้องมากกว่า 0")
+    for finer, coarser in zip(levels, levels[1:]):
+        if coarser <= finer or coarser % finer:
+            raise ValueError("จำนวน sample ต่อ peak ต้องเรียงจากน้อยไปมาก และแต่ละค่าต้องหารค่าถัดไปลงตัว")
+    return levels
+
+
+def _quantize(lows: np.ndarray, highs: np.ndarray) -> np.ndarray:
+    """แปลงเป็น int8 สลับ min,max (ปัด min ลง max ขึ้น เพื่อไม่ให้ envelope แคบกว่าสัญญาณจริง)"""
+    data = np.empty(lows.size * 2, dtype=np.int8)
+    data[0::2] = np.clip(np.floor(lows * 127.0), -128, 127)
+    data[1::2] = np.clip(np.ceil(highs * 127.0), -128, 127)
+    return data
+
+
+class PeakPyramidBuilder:
+    """สะสม min/max ของสัญญาณที่ส่งมาทีละ block (รวมทุก channel เป็น lane เดียว) แล้วสร้าง pyramid ตอน finish()"""
+
+    def __init__(self, sample_rate: int, samples_per_peak: tuple[int, ...] = WAVEFORM_PEAK_SAMPLES_PER_PEAK) -> None:
+        self.sample_rate = int(sample_rate)
+        self.levels = _validate_levels(samples_per_peak)
+        self.frames = 0
+        self._lows: list[np.ndarray] = []
+        self._highs: list[np.ndarray] = []
+        self._carry_low = np.empty(0, dtype=np.float32)
+        self._carry_high = np.empty(0, dtype=np.float32)
+
+    def add(self, block: np.ndarray) -> None:
+        """เพิ่ม block รูปทรง (frames, channels) หรือ (frames,)"""
+        block = np.asarray(block, dtype=np.float32)
+        if block.ndim == 1:
+            low = high = block
+        else:
+            low, high = block.min(axis=1), block.max(axis=1)
+        self.frames += low.size
+        if self._carry_low.size:
+            low = np.concatenate((self._carry_low, low))
+            high = np.concatenate((self._carry_high, high))
+
+        base = self.levels[0]
+        usable = low.size - low.size % base
+        if usable:
+            self._lows.append(low[:usable].reshape(-1, base).min(axis=1))
+            self._highs.append(high[:usable].reshape(-1, base).max(axis=1))
+        # sample ที่ยังไม่ครบ bin เก็บไว้ต่อกับ block ถัดไป
+        self._carry_low = low[usable:].copy()
+        self._carry_high = high[usable:].copy()
+
+    def finish(self) -> list[tuple[int, np.ndarray]]:
+        """คืน [(sample ต่อ peak, int8 สลับ min,max), ...] ของทุกระดับ (bin สุดท้ายอาจมี sample ไม่ครบ)"""
+        lows = self._lows + ([np.array([self._carry_low.min()])] if self._carry_low.size else [])
+        highs = self._highs + ([np.array([self._carry_high.max()])] if self._carry_high.size else [])
+        low = np.concatenate(lows).astype(np.float32) if lows else np.empty(0, dtype=np.float32)
+        high = np.concatenate(highs).astype(np.float32) if highs else np.empty(0, dtype=np.float32)
+
+        pyramid = [(self.levels[0], _quantize(low, high))]
+        for finer, coarser in zip(self.levels, self.levels[1:]):
+            factor = coarser // finer
+            pad = -low.size % factor
+            if pad:
+                # เติมด้วยค่าขอบ (ไม่เปลี่ยน min/max ของ bin สุดท้าย)
+                low = np.pad(low, (0, pad), mode="edge")
+                high = np.pad(high, (0, pad), mode="edge")
+            low = low.reshape(-1, factor).min(axis=1)
+            high = high.reshape(-1, factor).max(axis=1)
+            pyramid.append((coarser, _quantize(low, high)))
+        return pyramid
+
+    def write(self, path: str) -> str:
+        """เขียนไฟล์ peaks ลงไฟล์ชั่วคราวแล้วค่อย rename (ไม่มีทางเสิร์ฟไฟล์ที่เขียนไม่เสร็จ)"""
+        pyramid = self.finish()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # ชื่อไฟล์ชั่วคราวไม่ซ้ำกัน (request ที่สร้าง peaks ของ stem เดียวกันพร้อมกันไม่เขียนทับกัน)
+        partial_path = f"{path}.{uuid4().hex}.part"
+        try:
+            with open(partial_path, "wb") as handle:
+                handle.write(_HEADER.pack(_MAGIC, _VERSION, len(pyramid), self.sample_rate, self.frames))
+                for samples_per_peak, data in pyramid:
+                    handle.write(_LEVEL.pack(samples_per_peak, data.size // 2))
+                for _, data in pyramid:
+                    handle.write(data.tobytes())
+            os.replace(partial_path, path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        return path
+
+
+def build_peaks_file(
+    source_path: str,
+    target_path: str,
+    samples_per_peak: tuple[int, ...] = WAVEFORM_PEAK_SAMPLES_PER_PEAK or DEFAULT_SAMPLES_PER_PEAK,
+    block_frames: int = PEAKS_BLOCK_FRAMES,
+) -> str:
+    """สร้างไฟล์ peaks จากไฟล์เสียงที่มีอยู่แล้ว (อ่านทีละ block) — ใช้กับ stem ที่ไม่มี peaks จากตอนแยกเสียง"""
+    with sf.SoundFile(source_path) as source:
+        builder = PeakPyramidBuilder(source.samplerate, samples_per_peak)
+        for block in source.blocks(blocksize=block_frames, dtype="float32", always_2d=True):
+            builder.add(block)
+    return builder.write(target_path)
+
+
+def read_peaks_level(path: str, level: int | None = None) -> dict:
+    """อ่าน peaks ระดับที่ขอ (0 = ละเอียดสุด, None = หยาบสุด) โดย seek ไปเฉพาะข้อมูลของระดับนั้น"""
+    with open(path, "rb") as handle:
+        magic, version, count, sample_rate, frames = _HEADER.unpack(handle.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"ไฟล์ peaks ไม่ถูกต้อง: {path}")
+        table = [_LEVEL.unpack(handle.read(_LEVEL.size)) for _ in range(count)]
+        index = count - 1 if level is None else int(level)
+        if not 0 <= index < count:
+            raise IndexError(f"level ต้องอยู่ในช่วง 0-{count - 1}")
+        handle.seek(sum(pairs * 2 for _, pairs in table[:index]), os.SEEK_CUR)
+        samples_per_peak, pairs = table[index]
+        data = np.frombuffer(handle.read(pairs * 2), dtype=np.int8)
+    return {
+        "sample_rate": sample_rate,
+        "frames": frames,
+        "levels": [value for value, _ in table],
+        "level": index,
+        "samples_per_peak": samples_per_peak,
+        "data": data,
+    }
@@ -20,10 +20,61 @@ function extractFileId(headers: any): string | undefined {
   return typeof value === "string" && value ? value : undefined;
 }
 
+const JOB_POLL_INTERVAL_MS = 2000;
+
+// poll GET /jobs/{file_id} จนกว่างานในคิวจะเสร็จ (แสดงลำดับคิว/ความคืบหน้าระหว่างรอ)
+async function waitForJob(
+  statusUrl: string,
+  signal: AbortSignal,
+  onStatus: (text: string) => void
+): Promise<void> {
+  while (true) {
+    const { data } = await axios.get(statusUrl, { signal });
+    if (data.status === "completed") return;
+    if (data.status === "failed") {
+      throw new Error(data.error || "การแยกเสียงล้มเหลว");
+    }
+    if (data.status === "queued") {
+      onStatus(`อยู่ในคิวลำดับที่ ${data.queue_position ?? "-"}...`);
+    } else {
+      onStatus(`กำลังแยกเสียง... ${Math.round((data.progress ?? 0) * 100)}%`);
+    }
+    await new Promise<void>((resolve, reject) => {
+      if (signal.aborted) {
+        reject(new axios.CanceledError());
+        return;
+      }
+      const onAbort = () => {
+        clearTimeout(timer);
+        reject(new axios.CanceledError());
+      };
+      // ถอด listener เมื่อครบเวลา ไม่ให้ listener สะสมบน signal ทุกรอบที่ poll
+      const timer = setTimeout(() => {
+        signal.removeEventListener("abort", onAbort);
+        resolve();
+      }, JOB_POLL_INTERVAL_MS);
+      signal.addEventListener("abort", onAbort, { once: true });
+    });
+  }
+}
+
 export interface AudioAnalysisResult {
   tempo: number;
   key: string;
   pitch: string | null;
+  mode?: "fast" | "full";
+  // ค่าความมั่นใจ 0..1
+  confidence?: {
+    tempo: number;
+    pitch: number;
+    key: number;
+  };
+  // feature เสริม (มีเฉพาะโหมด full)
+  duration_seconds?: number;
+  spectral_centroid_hz?: number;
+  rms_db?: number;
+  loudness_lufs?: number | null;
+  waveform?: number[];
 }
 
 export interface UseAudioProcessorInput {
@@ -267,7 +318,11 @@ export function useAudioProcessor({
             signal,
             headers: reqHeaders,
           });
-          const { file_id, zip_url } = response.data;
+          const { file_id, zip_url, status_url } = response.data;
+          // backend ส่งงานเข้าคิวแล้วตอบ 202 -> poll สถานะจนกว่างานจะเสร็จ
+          if (response.status === 202 && status_url) {
+            await waitForJob(`${API_BASE}${status_url}`, signal, setStatusText);
+          }
           setFileId(file_id);
           setZipUrl(zip_url);
           successMsg = "แยกเสียงเสร็จแล้ว ดาวน์โหลด ZIP หรือลองเล่นทีละสเตมได้เลย";
@@ -363,7 +418,8 @@ export function useAudioProcessor({
         const analyzeData = new FormData();
         analyzeData.append("file", file);
         try {
-          const analyzeResp = await axios.post(`${API_BASE}/analyze`, analyzeData, {
+          // โหมด fast ตอบกลับเร็ว (วิเคราะห์เฉพาะช่วงตัวอย่าง) พร้อม confidence ของแต่ละค่า
+          const analyzeResp = await axios.post(`${API_BASE}/analyze?mode=fast`, analyzeData, {
             signal,
             headers: reqHeaders,
           });
@@ -425,6 +481,12 @@ export function useAudioProcessor({
           message = err.message;
         }
 
+        // คิวของ backend เต็ม (429): แจ้งเวลาที่ควรลองใหม่จาก Retry-After
+        const retryAfter = err?.response?.status === 429 ? err.response.headers?.["retry-after"] : undefined;
+        if (retryAfter) {
+          message = `${message} (ลองใหม่ในอีกประมาณ ${retryAfter} วินาที)`;
+        }
+
         setErrorMessage(message);
         toast.error(message);
         setStatusText(null);
@@ -0,0 +1,107 @@
+# tests สำหรับ /analyze โหมด fast (resample ครั้งเดียว + ช่วงตัวอย่าง + คำนวณ feature พร้อมกัน)
+# - tempo/key ต้องตรงกับสัญญาณสังเคราะห์ที่รู้ค่าจริง และ confidence อยู่ในช่วง 0..1
+# - ต้อง decode เฉพาะช่วงตัวอย่าง ไม่ใช่ทั้งเพลง
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import librosa
+import numpy as np
+import soundfile as sf
+from fastapi.testclient import TestClient
+
+import backend.main as main
+import backend.process_audio as process_audio
+from backend.routers import audio_ops
+
+SR = 44100
+
+
+def _write_song(path: str, seconds: float, bpm: float) -> None:
+    # คอร์ด A major (A3, C#4, E4, A4) + เสียง click ตามจังหวะ bpm
+    t = np.arange(int(SR * seconds)) / SR
+    y = 0.25 * np.sin(2 * np.pi * 220.0 * t)
+    for freq in (277.18, 329.63, 440.0):
+        y += 0.08 * np.sin(2 * np.pi * freq * t)
+    click_len = int(0.03 * SR)
+    envelope = 0.6 * np.exp(-np.arange(click_len) / (0.005 * SR)) * np.sin(2 * np.pi * 1500.0 * np.arange(click_len) / SR)
+    for beat in np.arange(0.0, seconds, 60.0 / bpm):
+        start = int(beat * SR)
+        end = min(start + click_len, y.size)
+        y[start:end] += envelope[: end - start]
+    sf.write(path, (0.7 * y).astype(np.float32), SR)
+
+
+class TestAnalyzeFast(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "song.wav")
+        _write_song(self.input_path, 75.0, bpm=128.0)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_fast_mode_estimates_tempo_and_key_with_confidence(self) -> None:
+        result = process_audio.analyze_audio(self.input_path, mode="fast")
+
+        self.assertEqual(result["mode"], "fast")
+        self.assertAlmostEqual(result["tempo"], 128.0, delta=128.0 * 0.03)
+        self.assertEqual(result["key"], "A major")
+        self.assertIsNotNone(result["pitch"])
+        self.assertEqual(set(result["confidence"]), {"tempo", "pitch", "key"})
+        for value in result["confidence"].values():
+            self.assertGreaterEqual(value, 0.0)
+            self.assertLessEqual(value, 1.0)
+        self.assertGreater(result["confidence"]["tempo"], 0.5)
+
+    def test_fast_mode_decodes_only_excerpts(self) -> None:
+        with patch.object(process_audio.librosa, "load", wraps=librosa.load) as load_spy:
+            process_audio.analyze_audio(self.input_path, mode="fast")
+
+        self.assertEqual(load_spy.call_count, process_audio.ANALYSIS_EXCERPTS)
+        for call in load_spy.call_args_list:
+            self.assertEqual(call.kwargs["sr"], process_audio.ANALYSIS_SAMPLE_RATE)
+            self.assertEqual(call.kwargs["duration"], process_audio.ANALYSIS_EXCERPT_SECONDS)
+            self.assertGreater(call.kwargs["offset"], 0.0)
+
+    def test_short_file_is_analyzed_whole(self) -> None:
+        short_path = os.path.join(self.temp_dir.name, "short.wav")
+        _write_song(short_path, 8.0, bpm=120.0)
+        excerpts = process_audio._load_analysis_excerpts(short_path, 22050, 3, 15.0)
+        self.assertEqual(len(excerpts), 1)
+        self.assertEqual(excerpts[0].shape[0], 8 * 22050)
+
+    def test_unknown_mode_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            process_audio.analyze_audio(self.input_path, mode="turbo")
+
+
+class TestAnalyzeEndpointMode(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = TestClient(main.app)
+
+    def test_mode_is_forwarded_to_analyzer(self) -> None:
+        captured: dict[str, str] = {}
+
+        def fake_analyze(input_path: str, mode: str = "full") -> dict:
+            captured["mode"] = mode
+            return {"tempo": 120.0, "pitch": "A3", "key": "A major", "mode": mode}
+
+        with patch.object(audio_ops, "analyze_audio", side_effect=fake_analyze):
+            response = self.client.post(
+                "/analyze?mode=fast", files={"file": ("song.wav", b"RIFF0000WAVE", "audio/wav")}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(captured["mode"], "fast")
+        self.assertEqual(response.json()["mode"], "fast")
+
+    def test_invalid_mode_returns_422(self) -> None:
+        response = self.client.post("/analyze?mode=turbo", files={"file": ("song.wav", b"RIFF", "audio/wav")})
+        self.assertEqual(response.status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
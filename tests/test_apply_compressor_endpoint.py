@@ -38,7 +38,7 @@ class TestApplyCompressorEndpoint(unittest.TestCase):
         captured: dict[str, object] = {}
 
         async def fake_save_upload(file, upload_dir=UPLOAD_DIR, trim_start=None, trim_end=None):
-            return "test-id", input_path
+            return "test-id", input_path, None
 
         def fake_apply_compression(input_file: str, strength: str, genre: str, output_dir: str, **kwargs) -> str:
             captured["input_file"] = input_file
@@ -81,7 +81,7 @@ class TestApplyCompressorEndpoint(unittest.TestCase):
             file.write(b"dummy")
 
         async def fake_save_upload(file, upload_dir=UPLOAD_DIR, trim_start=None, trim_end=None):
-            return "test-id", input_path
+            return "test-id", input_path, None
 
         def fake_apply_compression(*args, **kwargs) -> str:
             raise ValueError("invalid params")
@@ -36,7 +36,7 @@ class TestApplyEqAiEndpoint(unittest.TestCase):
             file.write(b"dummy")
 
         async def fake_save_upload(file, upload_dir=UPLOAD_DIR, trim_start=None, trim_end=None):
-            return "test-id", input_path
+            return "test-id", input_path, None
 
         captured: dict[str, float | str] = {}
 
@@ -73,7 +73,7 @@ class TestApplyEqAiEndpoint(unittest.TestCase):
             file.write(b"dummy")
 
         async def fake_save_upload(file, upload_dir=UPLOAD_DIR, trim_start=None, trim_end=None):
-            return "test-id", input_path
+            return "test-id", input_path, None
 
         captured: dict[str, float | str] = {}
 
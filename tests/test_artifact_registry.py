@@ -0,0 +1,190 @@
+# tests สำหรับทะเบียนไฟล์ผลลัพธ์ (backend.services.artifact_registry)
+# - ค้นหาด้วย (file_id, name) โดยไม่สแกนโฟลเดอร์ และเห็นรายการที่ instance อื่นบันทึก (SQLite ร่วมกัน)
+# - รายการหมดอายุ/ไฟล์ถูกลบต้องไม่ถูกส่งคืน และ purge_expired ลบออกจากตาราง
+# - rebuild_from_disk สร้างทะเบียนจากไฟล์ผลลัพธ์บนดิสก์ โดยข้ามงานที่ยังไม่เสร็จ
+# - /download/{file_id} และ /separated/{file_id}/{filename} resolve ผ่านทะเบียน
+
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.routers import stems
+from backend.services import artifact_registry as registry_module
+from backend.services.artifact_registry import (
+    ArtifactRegistry,
+    ARTIFACT_COMPRESSED,
+    ARTIFACT_EQ,
+    ARTIFACT_EXPORT,
+    ARTIFACT_KARAOKE,
+    ARTIFACT_PITCH_SHIFT,
+    ARTIFACT_STEM,
+    DOWNLOADABLE_KINDS,
+)
+
+
+def _write(path: str, payload: bytes = b"data") -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as handle:
+        handle.write(payload)
+    return path
+
+
+class TestArtifactRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "jobs.sqlite3")
+        self.registry = ArtifactRegistry(self.db_path, ttl_seconds=60)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _path(self, *parts: str) -> str:
+        return os.path.join(self.temp_dir.name, *parts)
+
+    def test_record_and_get_by_name(self) -> None:
+        path = _write(self._path("separated", "a", "vocals.mp3"), b"12345")
+
+        self.registry.record("a", path, ARTIFACT_STEM)
+        entry = self.registry.get("a", "vocals.mp3")
+
+        self.assertEqual(entry["path"], path)
+        self.assertEqual(entry["size"], 5)
+        self.assertEqual(entry["media_type"], "audio/mpeg")
+        self.assertAlmostEqual(entry["expires_at"] - entry["created_at"], 60)
+        self.assertIsNone(self.registry.get("a", "drums.mp3"))
+        self.assertIsNone(self.registry.get("b", "vocals.mp3"))
+
+    def test_entries_are_shared_between_instances(self) -> None:
+        path = _write(self._path("eq_applied", "a_eq.wav"))
+        self.registry.record("a", path, ARTIFACT_EQ)
+
+        other = ArtifactRegistry(self.db_path)
+        self.assertEqual(other.get("a", "a_eq.wav")["kind"], ARTIFACT_EQ)
+        self.assertEqual([entry["name"] for entry in other.find("a")], ["a_eq.wav"])
+
+    def test_find_orders_by_requested_kind_then_name(self) -> None:
+        self.registry.record("a", _write(self._path("compressed", "a_x_compressed.wav")), ARTIFACT_COMPRESSED)
+        self.registry.record("a", _write(self._path("uploads", "a_pitch.wav")), ARTIFACT_PITCH_SHIFT)
+        self.registry.record_many(
+            "a", [_write(self._path("separated", "a", name)) for name in ("vocals.wav", "bass.wav")], ARTIFACT_STEM
+        )
+
+        names = [entry["name"] for entry in self.registry.find("a", DOWNLOADABLE_KINDS)]
+        self.assertEqual(names, ["a_pitch.wav", "a_x_compressed.wav"])
+        self.assertEqual([entry["name"] for entry in self.registry.find("a", [ARTIFACT_STEM])], ["bass.wav", "vocals.wav"])
+
+    def test_expired_or_deleted_files_are_not_returned(self) -> None:
+        path = _write(self._path("separated", "a", "karaoke.wav"))
+        self.registry.record("a", path, ARTIFACT_KARAOKE)
+        os.remove(path)
+        self.assertIsNone(self.registry.get("a", "karaoke.wav"))
+
+        expired = ArtifactRegistry(self.db_path, ttl_seconds=-1)
+        expired.record("b", _write(self._path("uploads", "b_pitch.wav")), ARTIFACT_PITCH_SHIFT)
+        self.assertEqual(expired.find("b"), [])
+
+        self.assertEqual(self.registry.purge_expired(), 1)
+        self.assertEqual(self.registry.find("a"), [])
+
+    def test_rebuild_from_disk_skips_inputs_and_active_jobs(self) -> None:
+        _write(self._path("uploads", "a_song.wav"))
+        _write(self._path("uploads", "a_pitch.mp3"))
+        _write(self._path("eq_applied", "a_eq_ai_lstm_pop.wav"))
+        _write(self._path("compressed", "c_song_pop_compressed.wav"))
+        _write(self._path("separated", "b", "vocals.wav"))
+        _write(self._path("separated", "b", "karaoke.wav"))
+        _write(self._path("separated", "b", "vocals_pitch_+1.wav"))
+        _write(self._path("separated", "running", "vocals.wav"))
+        old = _write(self._path("separated", "old", "vocals.wav"))
+        os.utime(old, (time.time() - 3600, time.time() - 3600))
+        self.registry.record("stale", _write(self._path("stale.wav")), ARTIFACT_EQ)
+        os.remove(self._path("stale.wav"))
+
+        dirs = {
+            "DIR_UPLOADS": self._path("uploads"),
+            "DIR_EQ_APPLIED": self._path("eq_applied"),
+            "DIR_COMPRESSED": self._path("compressed"),
+            "DIR_SEPARATED": self._path("separated"),
+        }
+        with patch.multiple(registry_module, **dirs):
+            count = self.registry.rebuild_from_disk(skip_file_ids={"running"})
+
+        self.assertEqual(count, 5)
+        restarted = ArtifactRegistry(self.db_path)
+        self.assertEqual([entry["kind"] for entry in restarted.find("a")], [ARTIFACT_EQ, ARTIFACT_PITCH_SHIFT])
+        self.assertEqual(restarted.get("c", "c_song_pop_compressed.wav")["kind"], ARTIFACT_COMPRESSED)
+        self.assertEqual(sorted(entry["name"] for entry in restarted.find("b")), ["karaoke.wav", "vocals.wav"])
+        self.assertEqual(restarted.find("running"), [])
+        self.assertEqual(restarted.find("old"), [])
+        self.assertEqual(restarted.find("stale"), [])
+        # แถวของไฟล์ที่ถูกลบไปแล้วถูกลบออกจากตาราง
+        self.assertEqual(restarted._query("SELECT * FROM artifacts WHERE file_id = ?", ("stale",)), [])
+
+    def test_rebuild_keeps_entries_recorded_by_other_workers(self) -> None:
+        # งานที่อยู่ใน skip_file_ids ตอน snapshot แต่เสร็จและบันทึก stems ก่อน rebuild ทำงาน
+        finished = _write(self._path("separated", "running", "vocals.wav"))
+        self.registry.record("running", finished, ARTIFACT_STEM)
+        exported = _write(self._path("separated", "b", "vocals.mp3"))
+        ArtifactRegistry(self.db_path).record("b", exported, ARTIFACT_STEM)
+        _write(self._path("separated", "b", "custom_mix_-14.0.mp3"))
+
+        dirs = {
+            "DIR_UPLOADS": self._path("uploads"),
+            "DIR_EQ_APPLIED": self._path("eq_applied"),
+            "DIR_COMPRESSED": self._path("compressed"),
+            "DIR_SEPARATED": self._path("separated"),
+        }
+        with patch.multiple(registry_module, **dirs):
+            self.registry.rebuild_from_disk(skip_file_ids={"running"})
+
+        restarted = ArtifactRegistry(self.db_path)
+        self.assertEqual(restarted.get("running", "vocals.wav")["path"], finished)
+        # รายการที่บันทึกไว้แล้วคงชนิดเดิม ไฟล์ที่สแกนเจอใหม่ถูกเพิ่ม
+        self.assertEqual(restarted.get("b", "vocals.mp3")["kind"], ARTIFACT_STEM)
+        self.assertEqual(restarted.get("b", "custom_mix_-14.0.mp3")["kind"], ARTIFACT_EXPORT)
+
+
+class TestRegistryEndpoints(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.registry = ArtifactRegistry(os.path.join(self.temp_dir.name, "jobs.sqlite3"))
+        self._patch = patch.object(stems, "artifact_registry", self.registry)
+        self._patch.start()
+        self.client = TestClient(main.app)
+
+    def tearDown(self) -> None:
+        self._patch.stop()
+        self.temp_dir.cleanup()
+
+    def test_download_serves_recorded_output_without_listing_directories(self) -> None:
+        path = _write(os.path.join(self.temp_dir.name, "eq_applied", "a_eq_ai_lstm_pop.mp3"), b"mp3")
+        self.registry.record("a", path, ARTIFACT_EQ)
+
+        with patch.object(os, "listdir", side_effect=AssertionError("ไม่ควรสแกนโฟลเดอร์")):
+            response = self.client.get("/download/a")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"mp3")
+        self.assertEqual(response.headers["content-type"], "audio/mpeg")
+        self.assertIn("a_eq_ai_lstm_pop.mp3", response.headers["content-disposition"])
+        self.assertEqual(self.client.get("/download/missing").status_code, 404)
+
+    def test_separated_serves_only_recorded_files(self) -> None:
+        folder = os.path.join(self.temp_dir.name, "separated", "a")
+        self.registry.record("a", _write(os.path.join(folder, "vocals.wav"), b"wav"), ARTIFACT_STEM)
+        _write(os.path.join(folder, "mixed_custom.wav"))
+
+        response = self.client.get("/separated/a/vocals.wav")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "audio/wav")
+        self.assertEqual(self.client.get("/separated/a/mixed_custom.wav").status_code, 404)
+        self.assertEqual(self.client.get("/separated/a/..%2F..%2Fjobs.sqlite3").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
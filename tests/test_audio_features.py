@@ -0,0 +1,100 @@
+# tests สำหรับ front-end การวิเคราะห์แบบ decode ครั้งเดียว + STFT ครั้งเดียว (backend.audio_features)
+# - tempo/key/pitch ต้องตรงกับสัญญาณสังเคราะห์ที่รู้ค่าจริง
+# - LUFS ต้องใกล้กับ pyloudnorm บนไฟล์ต้นฉบับ และ /analyze โหมด full คืน payload ที่มี feature เสริม
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import librosa
+import numpy as np
+import pyloudnorm as pyln
+import soundfile as sf
+
+import backend.audio_features as audio_features
+import backend.process_audio as process_audio
+
+SR = 44100
+
+
+def _write_song(path: str, seconds: float, bpm: float) -> np.ndarray:
+    # คอร์ด A major (A3, C#4, E4, A4) + เสียง click ตามจังหวะ bpm (stereo)
+    t = np.arange(int(SR * seconds)) / SR
+    y = 0.25 * np.sin(2 * np.pi * 220.0 * t)
+    for freq in (277.18, 329.63, 440.0):
+        y += 0.08 * np.sin(2 * np.pi * freq * t)
+    click_len = int(0.03 * SR)
+    envelope = 0.6 * np.exp(-np.arange(click_len) / (0.005 * SR)) * np.sin(2 * np.pi * 1500.0 * np.arange(click_len) / SR)
+    for beat in np.arange(0.0, seconds, 60.0 / bpm):
+        start = int(beat * SR)
+        end = min(start + click_len, y.size)
+        y[start:end] += envelope[: end - start]
+    stereo = np.stack((0.7 * y, 0.5 * y), axis=1).astype(np.float32)
+    sf.write(path, stereo, SR)
+    return stereo
+
+
+class TestAudioFeatures(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.input_path = os.path.join(cls.temp_dir.name, "song.wav")
+        cls.waveform = _write_song(cls.input_path, 30.0, bpm=128.0)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp_dir.cleanup()
+
+    def test_extracts_musical_features_from_shared_front_end(self) -> None:
+        result = audio_features.extract_features(self.input_path)
+
+        self.assertAlmostEqual(result["tempo"], 128.0, delta=128.0 * 0.03)
+        self.assertEqual(result["key"], "A major")
+        self.assertEqual(result["pitch"], "A3")
+        for name in ("tempo", "pitch", "key"):
+            self.assertGreaterEqual(result["confidence"][name], 0.0)
+            self.assertLessEqual(result["confidence"][name], 1.0)
+        self.assertAlmostEqual(result["duration_seconds"], 30.0, places=2)
+
+    def test_level_features_and_waveform_overview(self) -> None:
+        result = audio_features.extract_features(self.input_path)
+
+        expected_lufs = pyln.Meter(SR).integrated_loudness(self.waveform.astype(np.float64))
+        self.assertAlmostEqual(result["loudness_lufs"], expected_lufs, delta=1.0)
+        self.assertTrue(np.isfinite(result["rms_db"]))
+        self.assertLess(result["rms_db"], 0.0)
+        self.assertGreater(result["spectral_centroid_hz"], 200.0)
+        self.assertLess(result["spectral_centroid_hz"], 2000.0)
+
+        waveform = np.asarray(result["waveform"])
+        self.assertEqual(waveform.size, audio_features.WAVEFORM_OVERVIEW_POINTS)
+        self.assertGreaterEqual(waveform.min(), 0.0)
+        self.assertLessEqual(waveform.max(), 1.0)
+
+    def test_decodes_once_and_transforms_once(self) -> None:
+        with patch.object(audio_features.librosa, "load", wraps=librosa.load) as load_spy, patch.object(
+            audio_features.librosa, "stft", wraps=librosa.stft
+        ) as stft_spy:
+            audio_features.extract_features(self.input_path)
+
+        self.assertEqual(load_spy.call_count, 1)
+        self.assertEqual(stft_spy.call_count, 1)
+
+    def test_silence_has_no_pitch_or_loudness(self) -> None:
+        front_end = audio_features.FeatureFrontEnd(np.zeros((2, SR), dtype=np.float32), SR)
+
+        self.assertEqual(front_end.pitch(), (None, 0.0))
+        self.assertIsNone(front_end.loudness_lufs())
+        self.assertEqual(max(front_end.waveform_overview()), 0.0)
+
+    def test_full_mode_returns_rich_payload(self) -> None:
+        result = process_audio.analyze_audio(self.input_path, mode="full")
+
+        self.assertEqual(result["mode"], "full")
+        for name in ("tempo", "pitch", "key", "confidence", "spectral_centroid_hz", "rms_db", "loudness_lufs", "waveform"):
+            self.assertIn(name, result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# tests สำหรับการตัดช่วงเวลาฝั่ง server (backend.services.audio_slice) และ ?start=&end= ของ /separated, /download
+# - WAV ที่ stream จากตำแหน่งที่ seek ต้องมี header ถูกต้อง ขนาดตรงกับ Content-Length และ sample ตรงกับช่วงของต้นฉบับ
+# - MP3 ที่ encode เฉพาะช่วงต้องมีความยาวเท่าช่วงนั้น และช่วงที่ไม่ถูกต้องได้ 400
+
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.routers import stems
+from backend.services.artifact_registry import ArtifactRegistry, ARTIFACT_EQ, ARTIFACT_STEM
+from backend.services.audio_slice import iter_wav_slice, slice_frames, wav_slice_size
+from backend.services.encoder import EncoderService
+
+SR = 8000
+
+
+class TestWavSlice(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.waveform = (0.3 * rng.standard_normal((SR * 2, 2))).astype(np.float32)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_slice_keeps_subtype_and_matches_source_frames(self) -> None:
+        for subtype in ("PCM_16", "PCM_24", "FLOAT"):
+            path = os.path.join(self.temp_dir.name, f"{subtype}.wav")
+            sf.write(path, self.waveform, SR, subtype=subtype)
+            expected, _ = sf.read(path)
+
+            data = b"".join(iter_wav_slice(path, 1234, 5000, block_frames=777))
+
+            self.assertEqual(len(data), wav_slice_size(2, subtype, 5000))
+            self.assertEqual(sf.info(io.BytesIO(data)).subtype, subtype)
+            decoded, sr = sf.read(io.BytesIO(data))
+            self.assertEqual(sr, SR)
+            np.testing.assert_array_equal(decoded, expected[1234:6234])
+
+    def test_slice_frames_validates_range(self) -> None:
+        self.assertEqual(slice_frames(SR * 2, SR, 0.5, 1.25), (4000, 6000))
+        self.assertEqual(slice_frames(SR * 2, SR, None, None), (0, SR * 2))
+        self.assertEqual(slice_frames(SR * 2, SR, 1.5, None), (12000, 4000))
+        for start, end in ((-1.0, None), (2.0, None), (1.0, 1.0), (0.0, 2.5)):
+            with self.assertRaises(ValueError):
+                slice_frames(SR * 2, SR, start, end)
+
+
+class TestSliceEndpoints(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(1)
+        self.waveform = (0.3 * rng.standard_normal((SR * 3, 2))).astype(np.float32)
+        folder = os.path.join(self.temp_dir.name, "job-1")
+        os.makedirs(folder)
+        self.stem = os.path.join(folder, "vocals.wav")
+        sf.write(self.stem, self.waveform, SR, subtype="FLOAT")
+        self.eq_output = os.path.join(self.temp_dir.name, "song_eq.wav")
+        sf.write(self.eq_output, self.waveform, SR, subtype="PCM_16")
+        self.registry = ArtifactRegistry(os.path.join(self.temp_dir.name, "jobs.sqlite3"))
+        self.registry.record("job-1", self.stem, ARTIFACT_STEM)
+        self.registry.record("eq-1", self.eq_output, ARTIFACT_EQ)
+        self.encoder = EncoderService(max_concurrent=1)
+        self._patches = [
+            patch.object(stems, "artifact_registry", self.registry),
+            patch.object(stems, "encoder", self.encoder),
+        ]
+        for item in self._patches:
+            item.start()
+        self.client = TestClient(main.app)
+
+    def tearDown(self) -> None:
+        for item in reversed(self._patches):
+            item.stop()
+        self.temp_dir.cleanup()
+
+    def test_stem_window_streams_only_requested_frames(self) -> None:
+        response = self.client.get("/separated/job-1/vocals.wav", params={"start": 0.5, "end": 1.25})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "audio/wav")
+        self.assertEqual(int(response.headers["content-length"]), len(response.content))
+        self.assertEqual((response.headers["X-Slice-Start"], response.headers["X-Slice-End"]), ("0.500000", "1.250000"))
+        decoded, sr = sf.read(io.BytesIO(response.content), dtype="float32")
+        self.assertEqual(sr, SR)
+        np.testing.assert_array_equal(decoded, self.waveform[4000:10000])
+
+    def test_stem_window_as_mp3(self) -> None:
+        response = self.client.get("/separated/job-1/vocals.wav", params={"start": 1.0, "export_format": "mp3"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "audio/mpeg")
+        info = sf.info(io.BytesIO(response.content))
+        self.assertEqual((info.format, info.channels), ("MP3", 2))
+        self.assertAlmostEqual(info.duration, 2.0, delta=0.1)
+        self.assertEqual(self.encoder.encodes, 1)
+        self.assertAlmostEqual(self.encoder.audio_seconds, 2.0)
+
+    def test_without_range_serves_whole_file(self) -> None:
+        response = self.client.get("/separated/job-1/vocals.wav")
+
+        with open(self.stem, "rb") as handle:
+            self.assertEqual(response.content, handle.read())
+        self.assertNotIn("X-Slice-Start", response.headers)
+
+    def test_invalid_range_returns_400(self) -> None:
+        for params in ({"start": 2.0, "end": 1.0}, {"start": 5.0}, {"end": 9.0}):
+            self.assertEqual(self.client.get("/separated/job-1/vocals.wav", params=params).status_code, 400)
+        self.assertEqual(self.client.get("/separated/job-1/vocals.wav", params={"export_format": "ogg"}).status_code, 422)
+
+    def test_download_window_of_single_output(self) -> None:
+        response = self.client.get("/download/eq-1", params={"start": 2.0})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('filename="song_eq.wav"', response.headers["content-disposition"])
+        decoded, _ = sf.read(io.BytesIO(response.content), dtype="int16")
+        expected, _ = sf.read(self.eq_output, dtype="int16")
+        np.testing.assert_array_equal(decoded, expected[SR * 2 :])
+
+    def test_download_of_stem_zip_cannot_be_sliced(self) -> None:
+        self.assertEqual(self.client.get("/download/job-1", params={"start": 1.0}).status_code, 400)
+        self.assertEqual(self.client.get("/download/job-1").headers["content-type"], "application/zip")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+# tests สำหรับ Auto-EQ LSTM แบบ batch (padded + packed sequence)
+# - ผลของ batch หลายไฟล์/หลาย channel ต้องเท่ากับการประมวลผลทีละ channel แบบเดิม
+# - ใช้โมเดลสุ่มขนาดเล็กแทน checkpoint จริง
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+import torch
+
+import backend.auto_eq_inference as auto_eq_inference
+
+SR = 22050
+
+
+def _random_lstm_model() -> auto_eq_inference.AutoEQLSTM:
+    torch.manual_seed(0)
+    model = auto_eq_inference.AutoEQLSTM(emb_dim=8, model_ch=16)
+    model.eval()
+    model.auto_eq_kind = "lstm"
+    model.auto_eq_model_id = auto_eq_inference.AUTO_EQ_MODEL_LSTM_LAST
+    model.auto_eq_genre2id = {genre: idx for idx, genre in enumerate(auto_eq_inference.SUPPORTED_GENRES)}
+    model.auto_eq_sample_rate = SR
+    return model
+
+
+def _write_tone(path: str, seconds: float, freqs: tuple[float, ...]) -> np.ndarray:
+    rng = np.random.default_rng(len(freqs))
+    t = np.arange(int(SR * seconds), dtype=np.float32) / SR
+    channels = [0.2 * np.sin(2 * np.pi * freq * t) + 0.01 * rng.standard_normal(t.shape) for freq in freqs]
+    waveform = np.stack(channels, axis=1).astype(np.float32)
+    sf.write(path, waveform, SR, subtype="FLOAT")
+    return waveform
+
+
+class TestAutoEqBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model = _random_lstm_model()
+        self._model_patch = patch.object(auto_eq_inference, "load_auto_eq_model", return_value=self.model)
+        self._model_patch.start()
+
+    def tearDown(self) -> None:
+        self._model_patch.stop()
+        self.temp_dir.cleanup()
+
+    def _reference(self, waveform: np.ndarray) -> np.ndarray:
+        channels = [
+            auto_eq_inference._apply_lstm_auto_eq_channel(waveform[:, idx], SR, self.model, "rock", 2.0)
+            for idx in range(waveform.shape[1])
+        ]
+        return np.clip(np.stack(channels, axis=1), -1.0, 1.0)
+
+    def test_packed_forward_matches_unbatched(self) -> None:
+        rng = np.random.default_rng(1)
+        mels = [rng.standard_normal((auto_eq_inference.N_MELS, frames)).astype(np.float32) for frames in (40, 23, 7)]
+
+        batched = auto_eq_inference._predict_lstm_delta_mel_db_batch(self.model, mels, "pop")
+        for mel, predicted in zip(mels, batched):
+            single = auto_eq_inference._predict_lstm_delta_mel_db(self.model, mel, "pop")
+            self.assertEqual(predicted.shape, mel.shape)
+            np.testing.assert_allclose(predicted, single, atol=1e-5)
+
+    def test_single_file_matches_per_channel_path(self) -> None:
+        input_path = os.path.join(self.temp_dir.name, "stereo.wav")
+        output_path = os.path.join(self.temp_dir.name, "stereo_eq.wav")
+        waveform = _write_tone(input_path, 1.0, (220.0, 330.0))
+
+        auto_eq_inference.apply_auto_eq_file(
+            input_path, output_path, genre="rock", model_id=auto_eq_inference.AUTO_EQ_MODEL_LSTM_LAST
+        )
+
+        processed, _ = sf.read(output_path, always_2d=True, dtype="float32")
+        np.testing.assert_allclose(processed, self._reference(waveform), atol=1e-4)
+
+    def test_batch_files_match_single_file_results(self) -> None:
+        specs = [(1.0, (220.0, 330.0)), (0.4, (440.0,)), (0.7, (110.0, 550.0))]
+        inputs, outputs, waveforms = [], [], []
+        for idx, (seconds, freqs) in enumerate(specs):
+            input_path = os.path.join(self.temp_dir.name, f"in_{idx}.wav")
+            inputs.append(input_path)
+            outputs.append(os.path.join(self.temp_dir.name, "out", f"out_{idx}.wav"))
+            waveforms.append(_write_tone(input_path, seconds, freqs))
+
+        with patch.object(
+            auto_eq_inference,
+            "_predict_lstm_delta_mel_db_batch",
+            wraps=auto_eq_inference._predict_lstm_delta_mel_db_batch,
+        ) as predict_spy:
+            result = auto_eq_inference.apply_auto_eq_files(
+                inputs, outputs, genre="rock", model_id=auto_eq_inference.AUTO_EQ_MODEL_LSTM_LAST, batch_size=2
+            )
+
+        self.assertEqual(result, outputs)
+        # 3 ไฟล์ / batch_size 2 -> LSTM forward แค่ 2 ครั้ง (5 channel รวมกัน)
+        self.assertEqual(predict_spy.call_count, 2)
+        for output_path, waveform in zip(outputs, waveforms):
+            processed, sr = sf.read(output_path, always_2d=True, dtype="float32")
+            self.assertEqual(sr, SR)
+            self.assertEqual(processed.shape, waveform.shape)
+            np.testing.assert_allclose(processed, self._reference(waveform), atol=1e-4)
+
+    def test_batch_rejects_mismatched_paths(self) -> None:
+        with self.assertRaises(ValueError):
+            auto_eq_inference.apply_auto_eq_files(["a.wav"], [], genre="pop")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# tests สำหรับ FIR/overlap-save filter engine ของ Auto-EQ
+# - ผลลัพธ์ต้องใกล้เคียง engine STFT/ISTFT เดิม: residual ต่ำกว่า -40 dB เทียบกับสัญญาณ output
+# - overlap-save แบบป้อนทีละ block ต้องได้ผลเท่ากับการกรองครั้งเดียว
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+import torch
+
+import backend.auto_eq_inference as auto_eq_inference
+
+SR = 44100
+MAX_RESIDUAL_DB = -40.0
+
+
+def _residual_db(actual: np.ndarray, expected: np.ndarray) -> float:
+    error = np.sqrt(np.mean((actual - expected) ** 2))
+    reference = np.sqrt(np.mean(expected**2))
+    return float(20.0 * np.log10(error / reference))
+
+
+class TestAutoEqFir(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.waveform = (0.1 * rng.standard_normal((SR * 2, 2))).astype(np.float32)
+
+    def tearDown(self) -> None:
+        auto_eq_inference._static_fir_kernel.cache_clear()
+
+    def test_fir_matches_stft_engine_for_every_genre(self) -> None:
+        model = auto_eq_inference.AutoEQCNN(ch1=4, ch2=8, ch3=16)
+        model.auto_eq_kind = "cnn"
+        model.auto_eq_model_id = auto_eq_inference.AUTO_EQ_MODEL_CNN_V1
+        for genre in auto_eq_inference.SUPPORTED_GENRES:
+            expected = auto_eq_inference._process_waveform(
+                self.waveform, SR, model, genre, auto_eq_inference.MAX_DELTA_CLAMP_DB, filter_engine="stft"
+            )
+            actual = auto_eq_inference._process_waveform(
+                self.waveform, SR, model, genre, auto_eq_inference.MAX_DELTA_CLAMP_DB, filter_engine="fir"
+            )
+            self.assertEqual(actual.shape, expected.shape)
+            self.assertLess(_residual_db(actual, expected), MAX_RESIDUAL_DB, genre)
+
+    def test_fir_matches_stft_engine_for_per_channel_lstm_curves(self) -> None:
+        torch.manual_seed(0)
+        model = auto_eq_inference.AutoEQLSTM(emb_dim=8, model_ch=16).eval()
+        model.auto_eq_kind = "lstm"
+        model.auto_eq_genre2id = {genre: idx for idx, genre in enumerate(auto_eq_inference.SUPPORTED_GENRES)}
+        model.auto_eq_sample_rate = SR
+        curves = auto_eq_inference._build_lstm_gain_curves(model, [(self.waveform, SR)], "pop", 4.0)[0]
+
+        expected = auto_eq_inference._process_waveform(
+            self.waveform, SR, model, "pop", 4.0, curves, filter_engine="stft"
+        )
+        actual = auto_eq_inference._process_waveform(self.waveform, SR, model, "pop", 4.0, curves, filter_engine="fir")
+        self.assertLess(_residual_db(actual, expected), MAX_RESIDUAL_DB)
+
+    def test_static_kernel_is_cached_per_setting(self) -> None:
+        first = auto_eq_inference._static_fir_kernel(SR, "rock", 2.0, "cnn-v1")
+        self.assertIs(auto_eq_inference._static_fir_kernel(SR, "rock", 2.0, "cnn-v1"), first)
+        self.assertIsNot(auto_eq_inference._static_fir_kernel(48000, "rock", 2.0, "cnn-v1"), first)
+        self.assertEqual(first.shape, (auto_eq_inference.N_FFT + 1,))
+
+    def test_overlap_save_blocks_match_single_pass(self) -> None:
+        kernel = auto_eq_inference._static_fir_kernel(SR, "trap", 3.0, "cnn-v1")
+        signal = np.ascontiguousarray(self.waveform.T)
+
+        whole = auto_eq_inference.OverlapSaveFilter(kernel, channels=2).process(signal)
+        streaming = auto_eq_inference.OverlapSaveFilter(kernel, channels=2, fft_size=4096)
+        pieces = [streaming.process(signal[:, start : start + 7000]) for start in range(0, signal.shape[1], 7000)]
+
+        np.testing.assert_allclose(np.concatenate(pieces, axis=1), whole, atol=1e-5)
+
+    def test_apply_auto_eq_file_rejects_unknown_engine(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_path = os.path.join(temp_dir, "input.wav")
+            sf.write(input_path, self.waveform, SR)
+            with patch.object(auto_eq_inference, "load_auto_eq_model") as load_model:
+                with self.assertRaises(ValueError):
+                    auto_eq_inference.apply_auto_eq_file(
+                        input_path, os.path.join(temp_dir, "out.wav"), genre="pop", filter_engine="iir"
+                    )
+            load_model.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
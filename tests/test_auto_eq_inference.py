@@ -67,6 +67,19 @@ class TestAutoEqInference(unittest.TestCase):
         self.assertEqual(len(reconstructed), len(y))
         self.assertTrue(np.isfinite(reconstructed).all())
 
+    def test_vectorized_smoothing_matches_per_row_reference(self) -> None:
+        rng = np.random.default_rng(0)
+        for shape in ((auto_eq_inference.N_MELS, 400), (6, 3), (1, 1)):
+            values = rng.uniform(-6.0, 6.0, size=shape).astype(np.float32)
+            for axis in (0, 1):
+                # รวม kernel คู่ (ต้องถูกปัดขึ้นเป็นคี่) และ kernel ที่ยาวกว่าข้อมูล
+                for kernel_size in (0, 1, 2, 9, 16, 17, 41):
+                    expected = auto_eq_inference._smooth_axis_reference(values, axis, kernel_size)
+                    actual = auto_eq_inference._smooth_axis(values, axis, kernel_size)
+                    self.assertEqual(actual.dtype, np.float32)
+                    self.assertEqual(actual.shape, expected.shape)
+                    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-5)
+
     def test_apply_lstm_auto_eq_file_preserves_shape_and_finite_values(self) -> None:
         with tempfile.TemporaryDirectory() as temp_dir:
             input_path = os.path.join(temp_dir, "input.wav")
@@ -0,0 +1,98 @@
+# tests สำหรับการประมาณ curve ของ Auto-EQ LSTM จากหน้าต่างตัวอย่าง (sampled segments)
+# - curve ต้องเบี่ยงจากผลทั้งเพลงไม่เกิน MAX_DEVIATION_DB ที่ clamp สูงสุด 6 dB
+#   (วัดได้ ≤ 0.2 dB เมื่อเพลงเปลี่ยนโทนทุก ≥ 20 วินาที และสูงสุดราว 0.95 dB เมื่อเปลี่ยนทุก 5 วินาที)
+# - LSTM ต้องถูกเรียกครั้งเดียวด้วยหน้าต่างยาวเท่ากันทุกหน้าต่าง
+
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import torch
+from torch import nn
+
+import backend.auto_eq_inference as auto_eq_inference
+
+SR = 44100
+SEGMENTS = 12
+MAX_DEVIATION_DB = 1.0
+
+
+class _TiltModel(nn.Module):
+    """โมเดลจำลองที่ตอบสนองต่อเนื้อเสียง: เสนอ delta ตรงข้ามกับโทนของแต่ละเฟรม"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.scale = nn.Parameter(torch.tensor(0.2))
+        self.auto_eq_kind = "lstm"
+        self.auto_eq_genre2id = {genre: idx for idx, genre in enumerate(auto_eq_inference.SUPPORTED_GENRES)}
+        self.auto_eq_sample_rate = SR
+
+    def forward(self, mel_db_frames: torch.Tensor, genre_ids: torch.Tensor, lengths=None) -> torch.Tensor:
+        return -(mel_db_frames - mel_db_frames.mean(dim=-1, keepdim=True)) * self.scale
+
+
+def _sectioned_track(seconds: int, section_seconds: int, seed: int = 0) -> np.ndarray:
+    # ต่อท่อน noise ที่ spectral tilt และความดังต่างกัน จำลองเพลงที่มีหลายท่อน
+    rng = np.random.default_rng(seed)
+    sections = []
+    for _ in range(seconds // section_seconds):
+        noise = rng.standard_normal(SR * section_seconds)
+        spectrum = np.fft.rfft(noise)
+        freqs = np.fft.rfftfreq(noise.size, d=1.0 / SR) + 20.0
+        spectrum *= (freqs / 1000.0) ** (rng.uniform(-0.5, 0.5))
+        section = np.fft.irfft(spectrum, noise.size)
+        sections.append(section / np.max(np.abs(section)) * rng.uniform(0.1, 0.8))
+    mono = np.concatenate(sections)
+    return np.stack((mono, np.roll(mono, SR)), axis=1).astype(np.float32)
+
+
+class TestAutoEqSegments(unittest.TestCase):
+    def setUp(self) -> None:
+        self.model = _TiltModel()
+
+    def test_sampled_curve_stays_within_bound_of_full_track(self) -> None:
+        for section_seconds in (5, 10, 20):
+            waveform = _sectioned_track(120, section_seconds)
+            full = auto_eq_inference._build_lstm_gain_curves(self.model, [(waveform, SR)], "pop", 6.0)[0]
+            sampled = auto_eq_inference._build_lstm_gain_curves(
+                self.model, [(waveform, SR)], "pop", 6.0, segments=SEGMENTS
+            )[0]
+
+            deviation_db = np.max(np.abs(20.0 * np.log10(sampled) - 20.0 * np.log10(full)))
+            self.assertLess(deviation_db, MAX_DEVIATION_DB, section_seconds)
+
+    def test_sampled_windows_go_through_one_batch(self) -> None:
+        waveform = _sectioned_track(120, 10)
+        with patch.object(
+            auto_eq_inference,
+            "_predict_lstm_delta_mel_db_batch",
+            wraps=auto_eq_inference._predict_lstm_delta_mel_db_batch,
+        ) as predict_spy:
+            auto_eq_inference._build_lstm_gain_curves(self.model, [(waveform, SR)], "pop", 2.0, segments=SEGMENTS)
+
+        predict_spy.assert_called_once()
+        windows = predict_spy.call_args.args[1]
+        self.assertEqual(len(windows), SEGMENTS * waveform.shape[1])
+        self.assertEqual({window.shape[1] for window in windows}, {auto_eq_inference.LSTM_STREAM_BLOCK_FRAMES})
+
+    def test_short_track_uses_every_frame(self) -> None:
+        waveform = _sectioned_track(20, 5)
+        full = auto_eq_inference._build_lstm_gain_curves(self.model, [(waveform, SR)], "rock", 2.0)
+        sampled = auto_eq_inference._build_lstm_gain_curves(
+            self.model, [(waveform, SR)], "rock", 2.0, segments=SEGMENTS
+        )
+        np.testing.assert_array_equal(sampled[0], full[0])
+
+    def test_segment_starts_cover_track_evenly(self) -> None:
+        starts = auto_eq_inference._segment_starts(10000, 4, window=100)
+        self.assertEqual(starts, [0, 3300, 6600, 9900])
+        self.assertIsNone(auto_eq_inference._segment_starts(10000, 0, window=100))
+        self.assertIsNone(auto_eq_inference._segment_starts(300, 4, window=100))
+
+    def test_negative_segments_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            auto_eq_inference._validate_lstm_segments(-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# tests สำหรับ Auto-EQ แบบ streaming (สองรอบ analyze/apply)
+# - curve จาก LSTM ทีละ block ต้องใกล้เคียง curve จากการอ่านทั้งไฟล์
+# - หน่วยความจำสูงสุดต้องไม่โตตามความยาวไฟล์
+
+import os
+import tempfile
+import tracemalloc
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+import torch
+
+import backend.auto_eq_inference as auto_eq_inference
+
+SR = 44100
+
+
+def _random_lstm_model(sample_rate: int = SR) -> auto_eq_inference.AutoEQLSTM:
+    torch.manual_seed(0)
+    model = auto_eq_inference.AutoEQLSTM(emb_dim=8, model_ch=16).eval()
+    model.auto_eq_kind = "lstm"
+    model.auto_eq_model_id = auto_eq_inference.AUTO_EQ_MODEL_LSTM_LAST
+    model.auto_eq_genre2id = {genre: idx for idx, genre in enumerate(auto_eq_inference.SUPPORTED_GENRES)}
+    model.auto_eq_sample_rate = sample_rate
+    return model
+
+
+def _cnn_model() -> auto_eq_inference.AutoEQCNN:
+    model = auto_eq_inference.AutoEQCNN(ch1=4, ch2=8, ch3=16)
+    model.auto_eq_kind = "cnn"
+    model.auto_eq_model_id = auto_eq_inference.AUTO_EQ_MODEL_CNN_V1
+    return model
+
+
+class TestAutoEqStreaming(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _write_input(self, name: str, seconds: float) -> tuple[str, np.ndarray]:
+        rng = np.random.default_rng(0)
+        t = np.arange(int(SR * seconds)) / SR
+        waveform = np.stack(
+            (0.3 * np.sin(2 * np.pi * 220.0 * t) * (1.0 + 0.5 * np.sin(t)), 0.1 * rng.standard_normal(t.shape)),
+            axis=1,
+        ).astype(np.float32)
+        path = os.path.join(self.temp_dir.name, name)
+        sf.write(path, waveform, SR, subtype="FLOAT")
+        return path, waveform
+
+    def test_streaming_lstm_curve_matches_full_track(self) -> None:
+        input_path, waveform = self._write_input("song.wav", 15.0)
+        for model_sr in (SR, 22050):
+            model = _random_lstm_model(model_sr)
+            expected = auto_eq_inference._build_lstm_gain_curves(model, [(waveform, SR)], "pop", 4.0)[0]
+            with sf.SoundFile(input_path) as handle:
+                actual = auto_eq_inference._stream_lstm_gain_curves(model, handle, "pop", 4.0)
+
+            deviation_db = np.max(np.abs(20.0 * np.log10(actual) - 20.0 * np.log10(expected)))
+            self.assertLess(deviation_db, 0.05, model_sr)
+
+    def test_streaming_cnn_output_matches_in_memory_fir(self) -> None:
+        input_path, waveform = self._write_input("song.wav", 3.0)
+        output_path = os.path.join(self.temp_dir.name, "out", "song_eq.wav")
+        model = _cnn_model()
+
+        auto_eq_inference._apply_auto_eq_streaming(input_path, output_path, model, "trap", 3.0, block_frames=10000)
+
+        expected = auto_eq_inference._process_waveform(waveform, SR, model, "trap", 3.0)
+        actual, sr = sf.read(output_path, always_2d=True, dtype="float32")
+        self.assertEqual(sr, SR)
+        self.assertEqual(actual.shape, expected.shape)
+        # ไฟล์ output เป็น PCM_16 เหมือนโหมดปกติ จึงคลาดเคลื่อนได้ราว 1 LSB
+        np.testing.assert_allclose(actual, expected, atol=1e-4)
+
+    def test_peak_memory_does_not_grow_with_duration(self) -> None:
+        model = _random_lstm_model()
+        warmup_path, _ = self._write_input("warmup.wav", 1.0)
+        auto_eq_inference._apply_auto_eq_streaming(warmup_path, warmup_path + ".out.wav", model, "rock", 2.0)
+
+        peaks = []
+        for seconds in (10.0, 40.0):
+            input_path, _ = self._write_input(f"song_{int(seconds)}.wav", seconds)
+            tracemalloc.start()
+            try:
+                auto_eq_inference._apply_auto_eq_streaming(input_path, input_path + ".out.wav", model, "rock", 2.0)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+
+        self.assertLess(peaks[1], peaks[0] * 1.2)
+
+    def test_large_files_switch_to_streaming_automatically(self) -> None:
+        input_path, _ = self._write_input("song.wav", 1.0)
+        output_path = os.path.join(self.temp_dir.name, "song_eq.wav")
+        with patch.object(auto_eq_inference, "load_auto_eq_model", return_value=_cnn_model()), patch.object(
+            auto_eq_inference, "AUTO_EQ_STREAMING_MIN_BYTES", 0
+        ), patch.object(
+            auto_eq_inference, "_apply_auto_eq_streaming", wraps=auto_eq_inference._apply_auto_eq_streaming
+        ) as streaming_spy:
+            auto_eq_inference.apply_auto_eq_file(input_path, output_path, genre="soul")
+
+        streaming_spy.assert_called_once()
+        self.assertTrue(os.path.exists(output_path))
+
+    def test_streaming_requires_fir_engine(self) -> None:
+        input_path, _ = self._write_input("song.wav", 0.5)
+        with self.assertRaises(ValueError):
+            auto_eq_inference.apply_auto_eq_file(
+                input_path, input_path + ".out.wav", genre="pop", filter_engine="stft", streaming=True
+            )
+
+    def test_streaming_median_matches_numpy_median(self) -> None:
+        rng = np.random.default_rng(3)
+        values = np.clip(rng.normal(0.0, 1.5, size=(8, 1001)), -2.0, 2.0)
+        median = auto_eq_inference._StreamingMedian(8, 2.0)
+        for start in range(0, values.shape[1], 300):
+            median.update(values[:, start : start + 300])
+
+        np.testing.assert_allclose(median.median(), np.median(values, axis=1), atol=median.step / 2 + 1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
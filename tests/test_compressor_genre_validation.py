@@ -55,7 +55,7 @@ class TestCompressorGenreValidation(unittest.TestCase):
             output_path = os.path.join(temp_dir, "output.wav")
 
             async def fake_save_upload(file, upload_dir=UPLOAD_DIR, trim_start=None, trim_end=None):
-                return "test-id", input_path
+                return "test-id", input_path, None
 
             def fake_apply_compression(*args, **kwargs) -> str:
                 with open(output_path, "wb") as file:
@@ -2,20 +2,36 @@
 # - แปลง wav -> mp3 (ไม่ต้องประมวลผลใหม่)
 # - format เดียวกัน -> ส่งกลับไฟล์เดิม
 # - ปฏิเสธนามสกุลอื่น
+# - ไม่เหลือไฟล์ชั่วคราวใน UPLOAD_DIR หลังส่ง response
 
 import io
+import os
+import tempfile
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
+import numpy as np
+import soundfile as sf
 from fastapi.testclient import TestClient
 
 import backend.main as main
 from backend.routers import audio_ops
 
 
+def _wav_bytes(seconds: float = 0.5, sample_rate: int = 44100) -> bytes:
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    tone = 0.3 * np.sin(2 * np.pi * 440.0 * t)
+    buffer = io.BytesIO()
+    sf.write(buffer, np.stack((tone, tone), axis=1), sample_rate, format="WAV")
+    return buffer.getvalue()
+
+
 class TestConvertFormatEndpoint(unittest.TestCase):
     def setUp(self) -> None:
         self.client = TestClient(main.app)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self._upload_dir_patch = patch.object(audio_ops, "UPLOAD_DIR", self.temp_dir.name)
+        self._upload_dir_patch.start()
         # ปิดการเช็คและนับโควตา (endpoint นี้ไม่หักโควตาโดย design แต่กันผลกระทบข้าม test)
         self._quota_patch = patch.object(
             audio_ops, "validate_request_quota", new=lambda *args, **kwargs: None
@@ -29,30 +45,40 @@ class TestConvertFormatEndpoint(unittest.TestCase):
     def tearDown(self) -> None:
         self._quota_patch.stop()
         self._increment_patch.stop()
+        self._upload_dir_patch.stop()
+        self.temp_dir.cleanup()
 
     def test_convert_wav_to_mp3(self) -> None:
-        fake_segment = MagicMock()
+        response = self.client.post(
+            "/convert-format?export_format=mp3",
+            files={"file": ("song.wav", _wav_bytes(), "audio/wav")},
+        )
 
-        def fake_export(output_path: str, *args, **kwargs) -> None:
-            with open(output_path, "wb") as f:
-                f.write(b"ID3-mp3data")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers.get("content-type", "").startswith("audio/mpeg"))
+        self.assertIn("song.mp3", response.headers.get("content-disposition", ""))
+        decoded, sample_rate = sf.read(io.BytesIO(response.content))
+        self.assertEqual((sample_rate, decoded.shape[1]), (44100, 2))
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
 
-        fake_segment.export = fake_export
+    def test_convert_mp3_to_wav(self) -> None:
+        mp3 = self.client.post(
+            "/convert-format?export_format=mp3",
+            files={"file": ("song.wav", _wav_bytes(), "audio/wav")},
+        ).content
 
-        with patch("pydub.AudioSegment.from_file", return_value=fake_segment):
-            response = self.client.post(
-                "/convert-format?export_format=mp3",
-                files={"file": ("song.wav", b"RIFF0000WAVE", "audio/wav")},
-            )
+        response = self.client.post(
+            "/convert-format?export_format=wav",
+            files={"file": ("song.mp3", mp3, "audio/mpeg")},
+        )
 
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(response.headers.get("content-type", "").startswith("audio/mpeg"))
-        self.assertEqual(response.content, b"ID3-mp3data")
-        self.assertIn("song.mp3", response.headers.get("content-disposition", ""))
+        self.assertTrue(response.headers.get("content-type", "").startswith("audio/wav"))
+        self.assertEqual(sf.info(io.BytesIO(response.content)).format, "WAV")
 
     def test_same_format_returns_file_as_is(self) -> None:
-        # wav -> wav: ไม่ต้องผ่าน pydub (ส่งไฟล์เดิมกลับ)
-        with patch("pydub.AudioSegment.from_file") as mock_from_file:
+        # wav -> wav: ไม่ต้องผ่าน encoder (ส่งไฟล์เดิมกลับ)
+        with patch.object(audio_ops.encoder, "encode") as mock_encode:
             response = self.client.post(
                 "/convert-format?export_format=wav",
                 files={"file": ("song.wav", b"RIFF0000WAVE", "audio/wav")},
@@ -61,7 +87,8 @@ class TestConvertFormatEndpoint(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(response.headers.get("content-type", "").startswith("audio/wav"))
         self.assertEqual(response.content, b"RIFF0000WAVE")
-        mock_from_file.assert_not_called()
+        mock_encode.assert_not_called()
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
 
     def test_rejects_non_audio_extension(self) -> None:
         response = self.client.post(
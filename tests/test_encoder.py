@@ -0,0 +1,103 @@
+# tests สำหรับ encoder แบบ streaming (backend.services.encoder)
+# - FLAC/WAV ต้อง lossless และคงความละเอียดเดิม ไม่ว่าขนาด block เท่าไร
+# - MP3 คง channel/sample rate (sample rate ที่ MP3 ไม่รองรับต้อง resample) และ bitrate ตามที่ตั้ง
+# - จำกัดจำนวนงาน encode พร้อมกัน และเก็บสถิติ throughput
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+
+from backend.services import encoder as encoder_module
+from backend.services.encoder import EncoderService, encode_file
+
+SR = 44100
+
+
+class TestEncoder(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.waveform = (0.2 * rng.standard_normal((SR, 2))).astype(np.float32)
+        self.source = os.path.join(self.temp_dir.name, "stem.wav")
+        sf.write(self.source, self.waveform, SR, subtype="PCM_24")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.temp_dir.name, name)
+
+    def test_flac_is_lossless_for_any_block_size(self) -> None:
+        expected, _ = sf.read(self.source, dtype="int32")
+        for block in (1000, 65536):
+            target = self._path(f"stem_{block}.flac")
+            result = encode_file(self.source, target, block_frames=block)
+
+            decoded, sr = sf.read(target, dtype="int32")
+            self.assertEqual((sr, sf.info(target).subtype), (SR, "PCM_24"))
+            np.testing.assert_array_equal(decoded, expected)
+            self.assertEqual(result["frames"], SR)
+            self.assertAlmostEqual(result["audio_seconds"], 1.0)
+
+    def test_mp3_keeps_channels_and_uses_requested_bitrate(self) -> None:
+        target = self._path("stem.mp3")
+        result = encode_file(self.source, target, "mp3", bitrate_kbps=320)
+
+        info = sf.info(target)
+        self.assertEqual((info.format, info.channels, info.samplerate), ("MP3", 2, SR))
+        self.assertAlmostEqual(result["bytes"] * 8 / 1000, 320, delta=40)
+        self.assertFalse(os.path.exists(f"{target}.part"))
+
+    def test_mp3_resamples_unsupported_sample_rate(self) -> None:
+        source = self._path("hires.wav")
+        sf.write(source, np.zeros((96000, 2), dtype=np.float32), 96000)
+
+        encode_file(source, self._path("hires.mp3"))
+
+        self.assertEqual(sf.info(self._path("hires.mp3")).samplerate, 48000)
+
+    def test_failed_encode_leaves_no_partial_file(self) -> None:
+        source = self._path("broken.wav")
+        with open(source, "wb") as file:
+            file.write(b"not audio")
+
+        with self.assertRaises(Exception):
+            encode_file(source, self._path("broken.mp3"))
+
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)), ["broken.wav", "stem.wav"])
+
+    def test_service_bounds_concurrency_and_reports_throughput(self) -> None:
+        service = EncoderService(max_concurrent=2)
+        peak = {"active": 0}
+        real_encode = encode_file
+
+        def slow_encode(*args, **kwargs):
+            peak["active"] = max(peak["active"], service.active)
+            time.sleep(0.05)
+            return real_encode(*args, **kwargs)
+
+        with patch.object(encoder_module, "encode_file", side_effect=slow_encode):
+            threads = [
+                threading.Thread(target=service.encode, args=(self.source, self._path(f"stem_{i}.mp3")))
+                for i in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        stats = service.stats()
+        self.assertEqual(peak["active"], 2)
+        self.assertEqual((stats["encodes"], stats["failed"], stats["active"], stats["waiting"]), (5, 0, 0, 0))
+        self.assertAlmostEqual(stats["audio_seconds"], 5.0)
+        self.assertGreater(stats["realtime_factor"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
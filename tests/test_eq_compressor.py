@@ -1,10 +1,14 @@
 import os
 import tempfile
 import unittest
+from unittest.mock import patch
 
+import numpy as np
+import soundfile as sf
 import torch
 import torchaudio
 
+import backend.eq_compressor as eq_compressor
 from backend.eq_compressor import apply_compression
 
 
@@ -72,5 +76,62 @@ class TestEqCompressor(unittest.TestCase):
                 apply_compression(input_path, strength="extreme")
 
 
+class TestStreamingCompressor(unittest.TestCase):
+    def _write_noise(self, path: str, subtype: str, seconds: float = 2.3) -> None:
+        rng = np.random.default_rng(2)
+        sr = 22050
+        frames = int(sr * seconds)
+        # สัญญาณที่ดังเบาสลับกันเพื่อให้ envelope ข้าม block ทั้งช่วง attack และ release
+        level = np.repeat(rng.uniform(0.05, 0.9, frames // 2000 + 1), 2000)[:frames]
+        data = (rng.uniform(-1.0, 1.0, (frames, 2)) * level[:, np.newaxis]).astype(np.float32)
+        sf.write(path, data, sr, subtype=subtype)
+
+    def _compare(self, subtype: str, **kwargs) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_path = os.path.join(temp_dir, "input.wav")
+            self._write_noise(input_path, subtype)
+
+            one_shot = apply_compression(
+                input_path, genre="rock", output_dir=os.path.join(temp_dir, "a"), streaming=False, **kwargs
+            )
+            with patch.object(eq_compressor, "COMPRESSOR_BLOCK_FRAMES", 1000):
+                streamed = apply_compression(
+                    input_path, genre="rock", output_dir=os.path.join(temp_dir, "b"), streaming=True, **kwargs
+                )
+
+            expected, expected_sr = sf.read(one_shot, dtype="float32")
+            actual, actual_sr = sf.read(streamed, dtype="float32")
+            self.assertEqual(expected_sr, actual_sr)
+            np.testing.assert_array_equal(actual, expected)
+
+    def test_streaming_matches_one_shot(self) -> None:
+        self._compare("PCM_16", makeup_gain=3.0, dry_wet=70.0)
+
+    def test_streaming_matches_one_shot_with_output_ceiling(self) -> None:
+        self._compare("FLOAT", makeup_gain=12.0, output_ceiling=-2.0)
+
+
+class TestEnvelopeFollower(unittest.TestCase):
+    def _peaks(self, size: int = 5000) -> np.ndarray:
+        rng = np.random.default_rng(1)
+        # สลับช่วงดัง/เบาเพื่อให้ใช้ทั้ง attack และ release coefficient
+        bursts = np.repeat(rng.uniform(0.0, 1.0, size // 50), 50)
+        return (bursts * rng.uniform(0.5, 1.0, bursts.shape[0])).astype(np.float32)
+
+    def test_engine_matches_reference_loop(self) -> None:
+        peaks = self._peaks()
+        expected, expected_last = eq_compressor._follow_envelope_reference(peaks, 0.7, 0.98)
+        actual, actual_last = eq_compressor._follow_envelope(peaks, 0.7, 0.98)
+        np.testing.assert_array_equal(actual, expected)
+        self.assertEqual(actual_last, expected_last)
+
+    def test_state_carries_across_segments(self) -> None:
+        peaks = self._peaks()
+        whole, _ = eq_compressor._follow_envelope(peaks, 0.6, 0.99)
+        head, state = eq_compressor._follow_envelope(peaks[:1234], 0.6, 0.99)
+        tail, _ = eq_compressor._follow_envelope(peaks[1234:], 0.6, 0.99, initial=state)
+        np.testing.assert_array_equal(np.concatenate([head, tail]), whole)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,58 @@
+# tests สำหรับ execution backend ของงาน CPU หนัก (thread / process pool)
+
+import asyncio
+import os
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
+from backend.services import executor
+
+
+class TestRunCpuTask(unittest.TestCase):
+    def tearDown(self) -> None:
+        executor.shutdown_executors()
+
+    def test_thread_mode_runs_in_current_process(self) -> None:
+        with patch.object(executor, "DSP_EXECUTOR", "thread"):
+            pid = asyncio.run(executor.run_cpu_task(executor.TASK_DSP, os.getpid))
+        self.assertEqual(pid, os.getpid())
+
+    def test_process_mode_runs_in_worker_process(self) -> None:
+        with patch.object(executor, "DSP_EXECUTOR", "process"):
+            pid = asyncio.run(executor.run_cpu_task(executor.TASK_DSP, os.getpid))
+            total = asyncio.run(executor.run_cpu_task(executor.TASK_DSP, sum, [1, 2, 3], start=4))
+        self.assertNotEqual(pid, os.getpid())
+        self.assertEqual(total, 10)
+
+    def test_broken_pool_is_replaced(self) -> None:
+        with patch.object(executor, "DSP_EXECUTOR", "process"):
+            with self.assertRaises(BrokenProcessPool):
+                asyncio.run(executor.run_cpu_task(executor.TASK_DSP, os._exit, 1))
+            self.assertNotIn(executor.TASK_DSP, executor._pools)
+            pid = asyncio.run(executor.run_cpu_task(executor.TASK_DSP, os.getpid))
+        self.assertNotEqual(pid, os.getpid())
+
+    def test_worker_is_recycled_after_max_tasks(self) -> None:
+        async def worker_pids() -> list[int]:
+            return [await executor.run_cpu_task(executor.TASK_DSP, os.getpid) for _ in range(5)]
+
+        with patch.object(executor, "DSP_EXECUTOR", "process"), patch.object(
+            executor, "EXECUTOR_MAX_TASKS_PER_CHILD", 2
+        ), patch.dict(executor._POOL_WORKERS, {executor.TASK_DSP: 1}):
+            pids = asyncio.run(worker_pids())
+        # worker เดียว ทำครบ 2 งานแล้วถูกแทนที่ด้วย process ใหม่
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+        self.assertEqual(pids[2], pids[3])
+        self.assertNotEqual(pids[3], pids[4])
+        self.assertEqual(len(set(pids)), 3)
+
+    def test_unknown_task_class_rejected(self) -> None:
+        with patch.object(executor, "DSP_EXECUTOR", "process"):
+            with self.assertRaises(ValueError):
+                asyncio.run(executor.run_cpu_task("gpu", os.getpid))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+# tests สำหรับคิวงานถาวร (SQLite) และ endpoint /separate แบบ 202 + GET /jobs/{file_id}
+# - งานต้องอยู่รอดหลังสร้าง manager ใหม่ (จำลอง restart)
+# - งานที่ worker ตายระหว่างทำต้องถูกคืนเข้าคิว และ fail เมื่อลองครบจำนวนครั้ง
+
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.config import JOB_MAX_ATTEMPTS
+from backend.routers import jobs, stems
+from backend.services import job_worker
+from backend.services.job_manager import AudioJobSessionManager
+from backend.services.artifact_registry import ArtifactRegistry
+
+
+class TestAudioJobSessionManager(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "jobs.sqlite3")
+        self.manager = AudioJobSessionManager(self.db_path)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_claims_in_fifo_order_with_queue_positions(self) -> None:
+        for file_id in ("a", "b", "c"):
+            self.manager.enqueue_job(file_id, f"out/{file_id}", "separate", {"input_path": file_id})
+
+        self.assertEqual(self.manager.queue_position("c"), 3)
+        self.assertEqual(self.manager.claim_next_job()["file_id"], "a")
+        self.assertEqual(self.manager.queue_position("c"), 2)
+        self.assertEqual(self.manager.queue_position("a"), 0)
+        self.assertEqual(self.manager.describe_job("a")["status"], "processing")
+
+    def test_jobs_survive_new_manager_instance(self) -> None:
+        self.manager.enqueue_job("persist", "out/persist", "separate", {"input_path": "x.wav"})
+
+        restarted = AudioJobSessionManager(self.db_path)
+        job = restarted.claim_next_job()
+        self.assertEqual(job["file_id"], "persist")
+        self.assertEqual(job["payload"], {"input_path": "x.wav"})
+        restarted.complete_job("persist", {"zip_url": "/download/persist"})
+
+        status = AudioJobSessionManager(self.db_path).describe_job("persist")
+        self.assertEqual(status["status"], "completed")
+        self.assertEqual(status["result"], {"zip_url": "/download/persist"})
+
+    def test_stale_job_is_requeued_then_failed_after_max_attempts(self) -> None:
+        self.manager.enqueue_job("stale", "out/stale", "separate", {})
+
+        for _ in range(JOB_MAX_ATTEMPTS - 1):
+            self.assertEqual(self.manager.claim_next_job()["file_id"], "stale")
+            self.manager.requeue_stale_jobs(stale_seconds=-1)
+            self.assertEqual(self.manager.get_job("stale")["status"], "queued")
+
+        self.manager.claim_next_job()
+        self.manager.requeue_stale_jobs(stale_seconds=-1)
+        self.assertEqual(self.manager.get_job("stale")["status"], "failed")
+
+    def test_active_file_ids_excludes_finished_jobs(self) -> None:
+        self.manager.enqueue_job("waiting", "out/waiting", "separate", {})
+        self.manager.register_job("done", "out/done")
+        self.manager.complete_job("done")
+
+        self.assertEqual(self.manager.active_file_ids(), {"waiting"})
+
+
+class TestSeparateJobEndpoints(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.manager = AudioJobSessionManager(os.path.join(self.temp_dir.name, "jobs.sqlite3"))
+        self.registry = ArtifactRegistry(os.path.join(self.temp_dir.name, "jobs.sqlite3"))
+        self.client = TestClient(main.app)
+        self.input_path = os.path.join(self.temp_dir.name, "job-queue-test.wav")
+        self.output_dir = os.path.join(self.temp_dir.name, "separated")
+
+        async def fake_save_upload(file, trim_start=None, trim_end=None):
+            with open(self.input_path, "wb") as handle:
+                handle.write(await file.read())
+            return "job-queue-test", self.input_path, None
+
+        self._patches = [
+            patch.object(stems, "job_manager", self.manager),
+            patch.object(jobs, "job_manager", self.manager),
+            patch.object(job_worker, "job_manager", self.manager),
+            patch.object(stems, "save_upload", side_effect=fake_save_upload),
+            patch.object(stems, "validate_request_quota", new=lambda *args, **kwargs: None),
+            patch.object(stems, "increment_guest_quota", new=lambda *args, **kwargs: None),
+            patch.object(stems, "DIR_SEPARATED", self.output_dir),
+            patch.object(stems, "artifact_registry", self.registry),
+        ]
+        for item in self._patches:
+            item.start()
+
+    def tearDown(self) -> None:
+        for item in reversed(self._patches):
+            item.stop()
+        self.temp_dir.cleanup()
+
+    def test_separate_returns_202_and_job_completes(self) -> None:
+        response = self.client.post("/separate", files={"file": ("song.wav", b"RIFFdata", "audio/wav")})
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual(body["status"], "queued")
+        self.assertEqual(body["status_url"], "/jobs/job-queue-test")
+        self.assertEqual(body["queue_position"], 1)
+        self.assertTrue(os.path.exists(self.input_path))
+
+        def fake_separate(input_path, output_dir, progress_callback=None):
+            with open(os.path.join(output_dir, "vocals.wav"), "wb") as handle:
+                handle.write(b"stem")
+            progress_callback(1.0)
+
+        with patch.object(stems, "separate_audio", side_effect=fake_separate):
+            self.assertTrue(asyncio.run(job_worker.process_next_job()))
+
+        status = self.client.get("/jobs/job-queue-test").json()
+        self.assertEqual(status["status"], "completed")
+        self.assertEqual(status["result"]["zip_url"], "/download/job-queue-test")
+        self.assertEqual(set(status["result"]["timings"]["stems"]), {"vocals"})
+        self.assertFalse(os.path.exists(self.input_path))
+        # stems ลงทะเบียนเมื่องานเสร็จ -> /download ส่ง ZIP ได้
+        self.assertEqual(self.registry.get("job-queue-test", "vocals.wav")["kind"], "stem")
+
+    def test_failed_separation_is_reported(self) -> None:
+        self.client.post("/separate", files={"file": ("song.wav", b"RIFFdata", "audio/wav")})
+
+        with patch.object(stems, "separate_audio", side_effect=RuntimeError("model crashed")):
+            asyncio.run(job_worker.process_next_job())
+
+        status = self.client.get("/jobs/job-queue-test").json()
+        self.assertEqual(status["status"], "failed")
+        self.assertEqual(status["error"], "model crashed")
+        self.assertFalse(os.path.exists(self.input_path))
+
+    def test_cancelled_job_keeps_input_for_requeue(self) -> None:
+        self.client.post("/separate", files={"file": ("song.wav", b"RIFFdata", "audio/wav")})
+        started, release = threading.Event(), threading.Event()
+
+        def blocking_separate(input_path, output_dir, progress_callback=None):
+            started.set()
+            release.wait(5)
+
+        async def shutdown_during_separation() -> None:
+            task = asyncio.create_task(job_worker.process_next_job())
+            self.assertTrue(await asyncio.to_thread(started.wait, 5))
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            release.set()
+
+        with patch.object(stems, "separate_audio", side_effect=blocking_separate):
+            asyncio.run(shutdown_during_separation())
+
+        # จำลอง restart: งานค้างถูกคืนเข้าคิว และไฟล์ input ยังอยู่ให้ประมวลผลใหม่
+        self.assertTrue(os.path.exists(self.input_path))
+        self.manager.requeue_stale_jobs(stale_seconds=-1)
+        self.assertEqual(self.manager.get_job("job-queue-test")["status"], "queued")
+
+        def fake_separate(input_path, output_dir, progress_callback=None):
+            with open(os.path.join(output_dir, "vocals.wav"), "wb") as handle:
+                handle.write(b"stem")
+
+        with patch.object(stems, "separate_audio", side_effect=fake_separate):
+            self.assertTrue(asyncio.run(job_worker.process_next_job()))
+        self.assertEqual(self.client.get("/jobs/job-queue-test").json()["status"], "completed")
+        self.assertFalse(os.path.exists(self.input_path))
+
+    def test_unknown_job_returns_404(self) -> None:
+        response = self.client.get("/jobs/does-not-exist")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["status"], "error")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+# tests สำหรับการโหลดโมเดลล่วงหน้าและ readiness endpoint
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import backend.auto_eq_inference as auto_eq_inference
+import backend.main as main
+from backend.auto_eq_inference import AutoEQLSTM, SUPPORTED_GENRES
+from backend.services import model_warmup
+
+
+class TestPreloadModels(unittest.TestCase):
+    def setUp(self) -> None:
+        model_warmup.model_status.clear()
+
+    def tearDown(self) -> None:
+        model_warmup.model_status.clear()
+
+    def test_resolve_all_expands_every_model(self) -> None:
+        resolved = model_warmup.resolve_preload_models(["all", "umxl", "unknown"])
+        self.assertEqual(resolved, ["umxl", *auto_eq_inference.SUPPORTED_AUTO_EQ_MODELS])
+
+    def test_preload_records_timings_and_failures(self) -> None:
+        def fake_auto_eq_warmup(model_id: str) -> dict:
+            raise auto_eq_inference.AutoEQModelLoadError("missing checkpoint")
+
+        with patch.object(
+            model_warmup, "warmup_separator", return_value={"load_seconds": 1.5, "warmup_seconds": 0.25}
+        ), patch.object(model_warmup, "warmup_auto_eq_model", side_effect=fake_auto_eq_warmup):
+            asyncio.run(model_warmup.preload_models(["umxl", "cnn-v1"]))
+
+        self.assertEqual(model_warmup.model_status["umxl"]["state"], "ready")
+        self.assertEqual(model_warmup.model_status["umxl"]["load_seconds"], 1.5)
+        self.assertEqual(model_warmup.model_status["cnn-v1"]["state"], "failed")
+        self.assertIn("missing checkpoint", model_warmup.model_status["cnn-v1"]["error"])
+
+    def test_ready_endpoint_waits_for_preloaded_models(self) -> None:
+        client = TestClient(main.app)
+        with patch.object(main, "PRELOAD_MODELS", ["umxl"]):
+            response = client.get("/ready")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()["models"]["umxl"]["state"], "pending")
+
+            model_warmup.model_status["umxl"] = {
+                "state": "ready",
+                "load_seconds": 2.0,
+                "warmup_seconds": 0.5,
+                "error": None,
+            }
+            response = client.get("/ready")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "ready")
+
+    def test_ready_without_preload_is_ready(self) -> None:
+        with patch.object(main, "PRELOAD_MODELS", []):
+            response = TestClient(main.app).get("/ready")
+        self.assertEqual(response.status_code, 200)
+
+
+class TestWarmupAutoEqModel(unittest.TestCase):
+    def test_lstm_warmup_runs_dummy_forward(self) -> None:
+        model = AutoEQLSTM(model_ch=16).eval()
+        model.auto_eq_kind = "lstm"
+        model.auto_eq_genre2id = {genre: idx for idx, genre in enumerate(SUPPORTED_GENRES)}
+
+        with patch.object(auto_eq_inference, "load_auto_eq_model", return_value=model), patch.object(
+            model, "forward", wraps=model.forward
+        ) as forward:
+            timings = auto_eq_inference.warmup_auto_eq_model("lstm-last")
+
+        forward.assert_called_once()
+        self.assertGreaterEqual(timings["load_seconds"], 0.0)
+        self.assertGreaterEqual(timings["warmup_seconds"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# tests สำหรับ pitch shift แบบ streaming (backend.pitch_shifter)
+# - ผลลัพธ์ต้องไม่ขึ้นกับขนาด block และตรงกับ librosa.effects.pitch_shift ช่วงต้นเพลง
+#   (librosa สะสม phase แบบ float32 จึง drift ออกไปเรื่อย ๆ ตามความยาว ส่วน engine สะสมแบบ float64)
+# - ต้องคง stereo และความยาวไฟล์เดิม และเลื่อนความถี่ได้ตามจำนวน semitone
+
+import os
+import tempfile
+import unittest
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from backend.pitch_shifter import StreamingPitchShifter, pitch_shift_file
+from backend.process_audio import pitch_shift_audio
+
+SR = 22050
+
+
+def _shift(waveform: np.ndarray, semitones: float, block: int) -> np.ndarray:
+    shifter = StreamingPitchShifter(SR, waveform.shape[0], semitones)
+    pieces = [shifter.process(waveform[:, start : start + block]) for start in range(0, waveform.shape[1], block)]
+    pieces.append(shifter.flush())
+    return np.concatenate(pieces, axis=1)[:, : waveform.shape[1]]
+
+
+def _peak_hz(signal: np.ndarray) -> float:
+    spectrum = np.abs(np.fft.rfft(signal * np.hanning(signal.size)))
+    return float(np.fft.rfftfreq(signal.size, d=1.0 / SR)[np.argmax(spectrum)])
+
+
+class TestPitchShifter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        t = np.arange(SR * 3) / SR
+        left = 0.3 * np.sin(2 * np.pi * 440.0 * t) + 0.01 * rng.standard_normal(t.size)
+        right = 0.3 * np.sin(2 * np.pi * 330.0 * t) + 0.01 * rng.standard_normal(t.size)
+        self.waveform = np.stack((left, right)).astype(np.float32)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_output_is_independent_of_block_size(self) -> None:
+        whole = _shift(self.waveform, 5, self.waveform.shape[1])
+        for block in (1000, 4096, 30000):
+            np.testing.assert_allclose(_shift(self.waveform, 5, block), whole, atol=1e-5)
+
+    def test_matches_librosa_at_start_of_signal(self) -> None:
+        for semitones in (2, -6, 12):
+            expected = librosa.effects.pitch_shift(self.waveform, sr=SR, n_steps=semitones)
+            shifted = _shift(self.waveform, semitones, 8192)
+            self.assertEqual(shifted.shape, expected.shape)
+            head = slice(0, SR // 2)
+            error = np.mean((shifted[:, head] - expected[:, head]) ** 2) / np.mean(expected[:, head] ** 2)
+            self.assertLess(10.0 * np.log10(error), -50.0)
+
+    def test_file_keeps_stereo_length_and_shifts_each_channel(self) -> None:
+        input_path = os.path.join(self.temp_dir.name, "stereo.wav")
+        output_path = os.path.join(self.temp_dir.name, "shifted.wav")
+        sf.write(input_path, self.waveform.T, SR, subtype="FLOAT")
+
+        result = pitch_shift_file(input_path, output_path, 12, block_frames=4096)
+
+        self.assertEqual(result, output_path)
+        shifted, sr = sf.read(output_path, always_2d=True, dtype="float32")
+        self.assertEqual(sr, SR)
+        self.assertEqual(shifted.shape, self.waveform.T.shape)
+        middle = slice(SR, 2 * SR)
+        self.assertAlmostEqual(_peak_hz(shifted[middle, 0]), 880.0, delta=5.0)
+        self.assertAlmostEqual(_peak_hz(shifted[middle, 1]), 660.0, delta=5.0)
+
+    def test_pitch_shift_audio_uses_streaming_engine(self) -> None:
+        input_path = os.path.join(self.temp_dir.name, "stereo.wav")
+        output_path = os.path.join(self.temp_dir.name, "shifted.wav")
+        sf.write(input_path, self.waveform.T, SR)
+
+        pitch_shift_audio(input_path, -2, output_path)
+
+        info = sf.info(output_path)
+        self.assertEqual(info.channels, 2)
+        self.assertEqual(info.frames, self.waveform.shape[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+# tests สำหรับ pitch variant ของ stem ที่ render ล่วงหน้า (backend.services.pitch_variants)
+# - prerender ต้อง render ทุก stem x ทุก offset และหลีกทางให้งาน interactive (light_dsp pool ไม่ว่าง)
+# - endpoint /separated/{file_id}/{stem}/pitch เสิร์ฟ variant ที่มีอยู่ทันที ไม่มีก็ render แล้วเก็บไว้
+# - นับ hit/miss และแสดงใน /metrics
+
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.routers import stems
+from backend.services.artifact_registry import ArtifactRegistry, ARTIFACT_STEM
+from backend.services.pitch_variants import PitchVariantStore, variant_path
+from backend.services.scheduler import get_pool, POOL_LIGHT_DSP
+
+SR = 8000
+
+
+def _write_stems(folder: str, names: tuple[str, ...]) -> None:
+    os.makedirs(folder, exist_ok=True)
+    t = np.arange(SR // 2) / SR
+    for index, name in enumerate(names):
+        tone = 0.2 * np.sin(2 * np.pi * (220.0 + 110.0 * index) * t)
+        sf.write(os.path.join(folder, f"{name}.wav"), np.stack((tone, tone), axis=1), SR)
+
+
+class TestPitchVariantStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.temp_dir.name, "job")
+        _write_stems(self.folder, ("vocals", "bass"))
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_prerender_renders_each_stem_and_offset_nearest_first(self) -> None:
+        store = PitchVariantStore(semitones=(2, -1, 1, 0))
+        self.assertEqual(store.semitones, (-1, 1, 2))
+
+        rendered = asyncio.run(store.prerender(self.folder))
+
+        self.assertEqual(rendered, 6)
+        for stem in ("vocals", "bass"):
+            for semitones in (-1, 1, 2):
+                info = sf.info(variant_path(self.folder, stem, semitones))
+                self.assertEqual((info.channels, info.frames), (2, SR // 2))
+        # render ซ้ำไม่ทำงานซ้ำ
+        self.assertEqual(asyncio.run(store.prerender(self.folder)), 0)
+        self.assertEqual(store.stats()["rendered"], 6)
+
+    def test_prerender_waits_while_interactive_work_is_running(self) -> None:
+        store = PitchVariantStore(semitones=(1,))
+        store.idle_poll_seconds = 0.01
+        pool = get_pool(POOL_LIGHT_DSP)
+
+        async def scenario() -> None:
+            pool.active = pool.concurrency
+            try:
+                task = asyncio.create_task(store.prerender(self.folder))
+                await asyncio.sleep(0.1)
+                self.assertFalse(store.has_variant(self.folder, "vocals", 1))
+            finally:
+                pool.active = 0
+            self.assertEqual(await task, 2)
+
+        asyncio.run(scenario())
+        self.assertTrue(store.has_variant(self.folder, "vocals", 1))
+
+    def test_lookup_counts_hits_and_misses(self) -> None:
+        store = PitchVariantStore(semitones=(1,))
+
+        path, prerendered = asyncio.run(store.get_variant(self.folder, "vocals", 3))
+        self.assertFalse(prerendered)
+        self.assertTrue(os.path.exists(path))
+        _, prerendered = asyncio.run(store.get_variant(self.folder, "vocals", 3))
+        self.assertTrue(prerendered)
+
+        stats = store.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (1, 1, 0.5))
+
+
+class TestPitchVariantEndpoint(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = PitchVariantStore(semitones=(-1, 1))
+        _write_stems(os.path.join(self.temp_dir.name, "job-1"), ("vocals",))
+        self.registry = ArtifactRegistry(os.path.join(self.temp_dir.name, "jobs.sqlite3"))
+        self.registry.record("job-1", os.path.join(self.temp_dir.name, "job-1", "vocals.wav"), ARTIFACT_STEM)
+        self._patches = [
+            patch.object(stems, "artifact_registry", self.registry),
+            patch.object(stems, "pitch_variants", self.store),
+            patch.object(main, "pitch_variants", self.store),
+        ]
+        for item in self._patches:
+            item.start()
+        self.client = TestClient(main.app)
+
+    def tearDown(self) -> None:
+        for item in reversed(self._patches):
+            item.stop()
+        self.temp_dir.cleanup()
+
+    def test_serves_prerendered_variant_then_renders_missing_one(self) -> None:
+        asyncio.run(self.store.prerender(os.path.join(self.temp_dir.name, "job-1")))
+
+        response = self.client.get("/separated/job-1/vocals/pitch", params={"semitones": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-Pitch-Variant"], "prerendered")
+
+        response = self.client.get("/separated/job-1/vocals/pitch", params={"semitones": -2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-Pitch-Variant"], "rendered")
+
+        metrics = self.client.get("/metrics").json()["pitch_variants"]
+        self.assertEqual((metrics["hits"], metrics["misses"]), (1, 1))
+
+    def test_guest_limited_to_free_pitch_range(self) -> None:
+        response = self.client.get(
+            "/separated/job-1/vocals/pitch", params={"semitones": 5}, headers={"X-User-Tier": "PRO"}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_unknown_stem_returns_404(self) -> None:
+        response = self.client.get("/separated/job-1/guitar/pitch", params={"semitones": 1})
+        self.assertEqual(response.status_code, 404)
+
+    def test_separation_job_schedules_prerender(self) -> None:
+        with patch.object(self.store, "schedule") as schedule:
+            output_dir = os.path.join(self.temp_dir.name, "job-2")
+            input_path = os.path.join(self.temp_dir.name, "input.wav")
+            open(input_path, "wb").close()
+
+            def fake_separate(input_path, output_dir, progress_callback=None):
+                _write_stems(output_dir, ("vocals",))
+
+            with patch.object(stems, "separate_audio", side_effect=fake_separate), patch.object(
+                stems.job_manager, "update_progress"
+            ):
+                asyncio.run(
+                    stems.run_separation_job(
+                        {"file_id": "job-2", "output_dir": output_dir, "payload": {"input_path": input_path}}
+                    )
+                )
+
+        schedule.assert_called_once_with(output_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+# tests สำหรับแคชผลลัพธ์แบบ content-addressed
+# - ไฟล์เดิม + พารามิเตอร์เดิม ต้องได้ผลลัพธ์จากแคชโดยไม่ประมวลผลซ้ำ
+# - evict ตาม TTL และ LRU เมื่อเกินขนาด
+
+import asyncio
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.routers import audio_ops
+from backend.services import storage
+from backend.services.result_cache import ResultCache, upload_cache_key
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.temp_dir.name, "cache"), max_bytes=10_000, enabled=True)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _write(self, name: str, size: int) -> str:
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "wb") as handle:
+            handle.write(b"x" * size)
+        return path
+
+    def test_key_depends_on_every_component(self) -> None:
+        base = ResultCache.make_key("abc", "apply-eq-ai", {"genre": "pop"}, "cnn-v1")
+        self.assertEqual(base, ResultCache.make_key("abc", "apply-eq-ai", {"genre": "pop"}, "cnn-v1"))
+        self.assertNotEqual(base, ResultCache.make_key("abd", "apply-eq-ai", {"genre": "pop"}, "cnn-v1"))
+        self.assertNotEqual(base, ResultCache.make_key("abc", "apply-eq-ai", {"genre": "rock"}, "cnn-v1"))
+        self.assertNotEqual(base, ResultCache.make_key("abc", "apply-eq-ai", {"genre": "pop"}, "lstm-last"))
+
+    def test_store_lookup_and_restore(self) -> None:
+        source = self._write("result.mp3", 100)
+        self.assertIsNone(self.cache.lookup("key"))
+        self.cache.store_file("key", source)
+        entry = self.cache.lookup("key")
+        self.assertIsNotNone(entry)
+
+        restored = self.cache.restore_file(entry, os.path.join(self.temp_dir.name, "out", "new-id.wav"))
+        self.assertTrue(restored.endswith("new-id.mp3"))
+        with open(restored, "rb") as handle:
+            self.assertEqual(handle.read(), b"x" * 100)
+        self.assertEqual((self.cache.hits, self.cache.misses, self.cache.stores), (1, 1, 1))
+
+    def test_directory_entries_round_trip(self) -> None:
+        stems_dir = os.path.join(self.temp_dir.name, "stems")
+        os.makedirs(stems_dir)
+        for name in ("vocals.wav", "drums.wav"):
+            with open(os.path.join(stems_dir, name), "wb") as handle:
+                handle.write(name.encode())
+        self.cache.store_directory("sep", stems_dir)
+
+        output_dir = os.path.join(self.temp_dir.name, "restored")
+        self.cache.restore_directory(self.cache.lookup("sep"), output_dir)
+        self.assertEqual(sorted(os.listdir(output_dir)), ["drums.wav", "vocals.wav"])
+
+    def test_evicts_least_recently_used_when_over_size(self) -> None:
+        for index, key in enumerate(("old", "mid", "new")):
+            self.cache.store_file(key, self._write(f"{key}.wav", 4_000))
+            entry = os.path.join(self.cache.root, key)
+            os.utime(entry, (time.time() - 100 + index, time.time() - 100 + index))
+        # ใช้งาน "old" ล่าสุด -> "mid" กลายเป็นรายการที่เก่าที่สุด
+        self.cache.lookup("old")
+
+        removed = self.cache.evict(ttl_seconds=3600)
+        self.assertEqual(removed, 1)
+        self.assertIsNone(self.cache.lookup("mid"))
+        self.assertIsNotNone(self.cache.lookup("old"))
+
+    def test_evicts_expired_entries(self) -> None:
+        self.cache.store_file("stale", self._write("stale.wav", 10))
+        entry = os.path.join(self.cache.root, "stale")
+        os.utime(entry, (time.time() - 7200, time.time() - 7200))
+        self.assertEqual(self.cache.evict(ttl_seconds=3600), 1)
+
+
+class TestUploadDigest(unittest.TestCase):
+    def test_save_upload_returns_digest_of_uploaded_bytes(self) -> None:
+        import hashlib
+
+        payload = b"RIFF" + b"\x00" * 5000
+        with tempfile.TemporaryDirectory() as temp_dir:
+            upload = UploadFile(file=io.BytesIO(payload), filename="song.wav")
+            _, _, upload_digest = asyncio.run(storage.save_upload(upload, upload_dir=temp_dir))
+        self.assertEqual(upload_digest, hashlib.sha256(payload).hexdigest())
+
+    def test_upload_cache_key_without_digest_is_none(self) -> None:
+        self.assertIsNone(upload_cache_key(None, "separate", {}))
+
+
+class TestCompressorCacheHit(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = TestClient(main.app)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.temp_dir.name, "cache"), enabled=True)
+        self._patches = [
+            patch.object(audio_ops, "validate_request_quota", new=lambda *args, **kwargs: None),
+            patch.object(audio_ops, "increment_guest_quota", new=lambda *args, **kwargs: None),
+            patch.object(audio_ops, "result_cache", self.cache),
+            patch.object(audio_ops, "upload_cache_key", return_value="same-audio-same-params"),
+        ]
+        for item in self._patches:
+            item.start()
+        self.restored_paths: list[str] = []
+
+    def tearDown(self) -> None:
+        for item in reversed(self._patches):
+            item.stop()
+        for path in self.restored_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self.temp_dir.cleanup()
+
+    def test_second_identical_request_skips_processing(self) -> None:
+        calls: list[str] = []
+        uploads = iter(["first-id", "second-id"])
+
+        async def fake_save_upload(file, upload_dir=None, trim_start=None, trim_end=None):
+            file_id = next(uploads)
+            path = os.path.join(self.temp_dir.name, f"{file_id}_song.wav")
+            with open(path, "wb") as handle:
+                handle.write(await file.read())
+            return file_id, path, None
+
+        def fake_apply_compression(input_file, strength, genre, output_dir, **kwargs):
+            calls.append(input_file)
+            output_path = os.path.join(self.temp_dir.name, "first-id_song_pop_compressed.wav")
+            with open(output_path, "wb") as handle:
+                handle.write(b"RIFFcompressed")
+            return output_path
+
+        with patch.object(audio_ops, "save_upload", new=fake_save_upload), patch.object(
+            audio_ops, "apply_compression", side_effect=fake_apply_compression
+        ):
+            first = self.client.post("/apply-compressor?genre=pop", files={"file": ("song.wav", b"abc", "audio/wav")})
+            second = self.client.post("/apply-compressor?genre=pop", files={"file": ("song.wav", b"abc", "audio/wav")})
+
+        self.restored_paths.append(os.path.join("compressed", "second-id_song_pop_compressed.wav"))
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(second.content, b"RIFFcompressed")
+        self.assertEqual(second.headers["x-file-id"], "second-id")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
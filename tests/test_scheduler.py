@@ -0,0 +1,90 @@
+# tests สำหรับ admission control แยกตามชนิดทรัพยากร
+# - pool หนึ่งเต็มต้องไม่บล็อก pool อื่น
+# - คิวเต็มต้องตอบ 429 พร้อม Retry-After
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.routers import audio_ops
+from backend.services import scheduler
+from backend.services.scheduler import ResourcePool
+
+
+class TestResourcePool(unittest.TestCase):
+    def test_rejects_with_retry_after_when_queue_full(self) -> None:
+        async def scenario() -> None:
+            pool = ResourcePool("test", concurrency=1, max_queue=1, initial_seconds=30.0)
+            release = asyncio.Event()
+
+            async def hold() -> None:
+                async with pool.slot():
+                    await release.wait()
+
+            running = [asyncio.create_task(hold()), asyncio.create_task(hold())]
+            await asyncio.sleep(0)
+            self.assertEqual((pool.active, pool.waiting), (1, 1))
+
+            with self.assertRaises(HTTPException) as ctx:
+                pool.check_admission()
+            self.assertEqual(ctx.exception.status_code, 429)
+            # งานที่รันอยู่ 1 + รอคิว 1 งาน * 30 วินาที / concurrency 1
+            self.assertEqual(ctx.exception.headers["Retry-After"], "60")
+            self.assertEqual(pool.rejected, 1)
+
+            release.set()
+            await asyncio.gather(*running)
+            pool.check_admission()
+            self.assertEqual(pool.completed, 2)
+
+        asyncio.run(scenario())
+
+    def test_pending_jobs_count_towards_queue(self) -> None:
+        async def scenario() -> None:
+            pool = ResourcePool("test", concurrency=1, max_queue=3, initial_seconds=1.0)
+            release = asyncio.Event()
+
+            async def hold() -> None:
+                async with pool.slot():
+                    await release.wait()
+
+            task = asyncio.create_task(hold())
+            await asyncio.sleep(0)
+            pool.check_admission(pending=2)
+            with self.assertRaises(HTTPException):
+                pool.check_admission(pending=3)
+            release.set()
+            await task
+
+        asyncio.run(scenario())
+
+
+class TestAnalyzeAdmission(unittest.TestCase):
+    def test_analyze_rejected_when_light_dsp_pool_full(self) -> None:
+        client = TestClient(main.app)
+        full_pool = ResourcePool(scheduler.POOL_LIGHT_DSP, concurrency=1, max_queue=0, initial_seconds=5.0)
+        full_pool.active = 1
+        with patch.dict(scheduler.pools, {scheduler.POOL_LIGHT_DSP: full_pool}), patch.object(
+            audio_ops, "save_upload"
+        ) as save_upload:
+            response = client.post("/analyze", files={"file": ("song.wav", b"RIFF", "audio/wav")})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "5")
+        save_upload.assert_not_called()
+
+    def test_metrics_reports_every_pool(self) -> None:
+        response = TestClient(main.app).get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.json()["scheduler"]),
+            {scheduler.POOL_SEPARATION, scheduler.POOL_INFERENCE, scheduler.POOL_LIGHT_DSP, scheduler.POOL_ENCODING},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
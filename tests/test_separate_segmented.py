@@ -0,0 +1,106 @@
+# tests สำหรับโหมดแยก stem แบบ segmented (หน้าต่างคงที่ + crossfade)
+# - ผลลัพธ์ต้องตรงกับโหมด one-shot เมื่อโมเดลเป็นฟังก์ชันแบบ pointwise
+# - ต้องไม่ส่งข้อมูลยาวเกินหน้าต่างเข้าโมเดล (หน่วยความจำจำกัดตามขนาดหน้าต่าง)
+# - waveform peaks ที่สร้างระหว่างเขียน stem ต้องตรงกับ peaks ที่คำนวณจากไฟล์ stem
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import soundfile as sf
+import torch
+
+import backend.process_audio as process_audio
+from backend.config import STEM_TARGETS
+from backend.waveform_peaks import build_peaks_file, peaks_path, read_peaks_level
+
+SR = 8000
+
+
+def _fake_estimate_stems(audio_tensor: torch.Tensor, rate: int, separator) -> dict:
+    """จำลองโมเดลแยกเสียง: แต่ละ stem เป็นฟังก์ชัน pointwise ของสัญญาณต้นฉบับ"""
+    return {
+        target: torch.tanh(audio_tensor * (idx + 1)) * 0.5
+        for idx, target in enumerate(STEM_TARGETS)
+    }
+
+
+class TestSeparateSegmented(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "input.wav")
+        rng = np.random.default_rng(0)
+        t = np.arange(SR * 3) / SR
+        left = 0.4 * np.sin(2 * np.pi * 220.0 * t) + 0.05 * rng.standard_normal(t.shape)
+        right = 0.3 * np.sin(2 * np.pi * 330.0 * t)
+        sf.write(self.input_path, np.stack([left, right], axis=1).astype(np.float32), SR, subtype="FLOAT")
+        self._separator_patch = patch.object(process_audio, "get_openunmix_separator", return_value=MagicMock())
+        self._separator_patch.start()
+
+    def tearDown(self) -> None:
+        self._separator_patch.stop()
+        self.temp_dir.cleanup()
+
+    def _run(self, name: str, **kwargs) -> str:
+        output_dir = os.path.join(self.temp_dir.name, name)
+        with patch.object(process_audio, "_estimate_stems", side_effect=_fake_estimate_stems):
+            process_audio.separate_audio(self.input_path, output_dir, **kwargs)
+        return output_dir
+
+    def test_segmented_matches_one_shot(self) -> None:
+        one_shot_dir = self._run("one_shot", segment_seconds=0)
+        segmented_dir = self._run("segmented", segment_seconds=0.7, overlap_seconds=0.1)
+
+        for target in STEM_TARGETS:
+            expected, expected_sr = sf.read(os.path.join(one_shot_dir, f"{target}.wav"), dtype="float32")
+            actual, actual_sr = sf.read(os.path.join(segmented_dir, f"{target}.wav"), dtype="float32")
+            self.assertEqual(expected_sr, actual_sr)
+            self.assertEqual(expected.shape, actual.shape)
+            np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+    def test_peaks_are_written_with_each_stem(self) -> None:
+        for name, kwargs in (("one_shot", {"segment_seconds": 0}), ("segmented", {"segment_seconds": 0.7, "overlap_seconds": 0.1})):
+            output_dir = self._run(name, **kwargs)
+            for target in STEM_TARGETS:
+                written = peaks_path(output_dir, target)
+                rebuilt = build_peaks_file(os.path.join(output_dir, f"{target}.wav"), written + ".check")
+                first, second = read_peaks_level(written, 0), read_peaks_level(rebuilt, 0)
+                self.assertEqual(first["frames"], SR * 3)
+                np.testing.assert_array_equal(first["data"], second["data"])
+
+    def test_segmented_never_exceeds_window(self) -> None:
+        seen_frames: list[int] = []
+
+        def spy_estimate(audio_tensor: torch.Tensor, rate: int, separator) -> dict:
+            seen_frames.append(int(audio_tensor.shape[-1]))
+            return _fake_estimate_stems(audio_tensor, rate, separator)
+
+        output_dir = os.path.join(self.temp_dir.name, "spy")
+        with patch.object(process_audio, "_estimate_stems", side_effect=spy_estimate):
+            process_audio.separate_audio(self.input_path, output_dir, segment_seconds=0.5, overlap_seconds=0.1)
+
+        self.assertGreater(len(seen_frames), 1)
+        self.assertLessEqual(max(seen_frames), int(0.5 * SR))
+
+    def test_short_file_uses_one_shot_path(self) -> None:
+        calls: list[int] = []
+
+        def spy_estimate(audio_tensor: torch.Tensor, rate: int, separator) -> dict:
+            calls.append(int(audio_tensor.shape[-1]))
+            return _fake_estimate_stems(audio_tensor, rate, separator)
+
+        output_dir = os.path.join(self.temp_dir.name, "short")
+        with patch.object(process_audio, "_estimate_stems", side_effect=spy_estimate):
+            process_audio.separate_audio(self.input_path, output_dir, segment_seconds=60.0)
+
+        self.assertEqual(calls, [SR * 3])
+
+    def test_negative_segment_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            process_audio.separate_audio(self.input_path, self.temp_dir.name, segment_seconds=-1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# tests สำหรับขั้นหลังแยกเสียงของ /separate (stems._encode_separation_output)
+# - encode MP3 ทุก stem พร้อมกัน (fan-out) และอัปเดต progress ทันทีที่แต่ละ stem encode เสร็จ (fan-in)
+# - คืนเวลา encode ต่อ stem และไม่สร้าง ZIP บนดิสก์ (ZIP สร้างแบบ streaming ตอน /download)
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+
+from backend.routers import stems
+from backend.services.encoder import EncoderService
+
+SR = 22050
+STEMS = ("bass", "drums", "other", "vocals")
+
+
+class TestSeparationPostprocess(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.temp_dir.name, "job-1")
+        os.makedirs(self.output_dir)
+        t = np.arange(SR // 2) / SR
+        for index, stem in enumerate(STEMS):
+            tone = 0.2 * np.sin(2 * np.pi * 110.0 * (index + 1) * t)
+            sf.write(os.path.join(self.output_dir, f"{stem}.wav"), np.stack((tone, tone), axis=1), SR)
+        self.encoder = EncoderService(max_concurrent=4)
+        self.progress = []
+        self._patches = [
+            patch.object(stems, "encoder", self.encoder),
+            patch.object(stems.job_manager, "update_progress", side_effect=lambda _, value: self.progress.append(value)),
+        ]
+        for item in self._patches:
+            item.start()
+
+    def tearDown(self) -> None:
+        for item in reversed(self._patches):
+            item.stop()
+        self.temp_dir.cleanup()
+
+    def _run(self, export_format: str) -> dict:
+        return asyncio.run(stems._encode_separation_output("job-1", self.output_dir, export_format))
+
+    def test_mp3_export_encodes_every_stem_and_reports_timings(self) -> None:
+        timings = self._run("mp3")
+
+        names = set(os.listdir(self.output_dir))
+        self.assertEqual(names, {f"{stem}.{ext}" for stem in STEMS for ext in ("wav", "mp3")})
+        self.assertEqual(set(timings["stems"]), set(STEMS))
+        for stem in STEMS:
+            self.assertGreater(timings["stems"][stem]["encode_seconds"], 0.0)
+        self.assertEqual(self.encoder.stats()["encodes"], 4)
+        self.assertEqual(len(self.progress), 4)
+        self.assertAlmostEqual(self.progress[-1], 1.0)
+        self.assertEqual(os.listdir(self.temp_dir.name), ["job-1"])
+
+    def test_wav_export_skips_encoding(self) -> None:
+        timings = self._run("wav")
+
+        self.assertEqual(set(os.listdir(self.output_dir)), {f"{stem}.wav" for stem in STEMS})
+        self.assertEqual({value["encode_seconds"] for value in timings["stems"].values()}, {0.0})
+        self.assertEqual(self.encoder.stats()["encodes"], 0)
+
+    def test_stems_encode_concurrently_and_report_progress_as_each_finishes(self) -> None:
+        real_encode = self.encoder.encode
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+        events = []
+
+        def tracked_encode(source_path, target_path, export_format=None):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            # vocals ช้าที่สุด: progress ของ stem อื่นต้องขยับก่อน vocals encode เสร็จ
+            time.sleep(0.4 if "vocals" in source_path else 0.1)
+            result = real_encode(source_path, target_path, export_format)
+            with lock:
+                state["running"] -= 1
+                events.append(("encoded", os.path.basename(target_path)))
+            return result
+
+        def tracked_progress(_, value):
+            events.append(("progress", value))
+
+        with patch.object(self.encoder, "encode", side_effect=tracked_encode), patch.object(
+            stems.job_manager, "update_progress", side_effect=tracked_progress
+        ):
+            self._run("mp3")
+
+        self.assertEqual(state["peak"], 4)
+        first_progress = next(index for index, event in enumerate(events) if event[0] == "progress")
+        self.assertLess(first_progress, events.index(("encoded", "vocals.mp3")))
+
+    def test_failed_encode_propagates(self) -> None:
+        with patch.object(self.encoder, "encode", side_effect=RuntimeError("encoder crashed")):
+            with self.assertRaises(RuntimeError):
+                self._run("mp3")
+
+        self.assertEqual(set(os.listdir(self.output_dir)), {f"{stem}.wav" for stem in STEMS})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# tests สำหรับ SeparationSession: ต้องให้ผลเท่ากับ openunmix.predict.separate
+# และเตรียม separator ครั้งเดียว (ไม่ freeze/ย้าย device ซ้ำทุก request)
+
+import unittest
+import warnings
+from unittest.mock import patch
+
+import torch
+import torchaudio
+from openunmix.model import OpenUnmix, Separator
+from openunmix.predict import separate
+
+import backend.process_audio as process_audio
+from backend.process_audio import SeparationSession
+
+MODEL_RATE = 8000
+
+
+def _tiny_separator() -> Separator:
+    torch.manual_seed(0)
+    targets = {
+        name: OpenUnmix(nb_bins=257, nb_channels=2, hidden_size=16, max_bin=257)
+        for name in ("vocals", "drums", "bass", "other")
+    }
+    return Separator(
+        targets, niter=1, sample_rate=MODEL_RATE, n_fft=512, n_hop=128, wiener_win_len=40
+    ).eval()
+
+
+class TestSeparationSession(unittest.TestCase):
+    def setUp(self) -> None:
+        self.separator = _tiny_separator()
+        torch.manual_seed(1)
+        self.session = SeparationSession(self.separator, device=torch.device("cpu"), num_threads=0)
+
+    def _reference(self, audio: torch.Tensor, rate: int) -> dict:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            estimates = separate(audio=audio, rate=rate, separator=self.separator, device="cpu")
+        stems = {}
+        for target, waveform in estimates.items():
+            waveform = waveform.squeeze(0)
+            if rate != MODEL_RATE:
+                waveform = torchaudio.functional.resample(waveform, orig_freq=MODEL_RATE, new_freq=rate)
+            stems[target] = waveform[..., : audio.shape[-1]]
+        return stems
+
+    def test_matches_openunmix_at_model_rate(self) -> None:
+        audio = torch.randn(2, MODEL_RATE * 2) * 0.1
+        expected = self._reference(audio, MODEL_RATE)
+        actual = self.session.estimate(audio, MODEL_RATE)
+        self.assertEqual(set(actual), set(expected))
+        for target in expected:
+            torch.testing.assert_close(actual[target], expected[target], rtol=1e-4, atol=1e-5)
+
+    def test_matches_openunmix_with_resampling_and_mono_input(self) -> None:
+        audio = torch.randn(1, 16000) * 0.1
+        expected = self._reference(audio, 16000)
+        actual = self.session.estimate(audio, 16000)
+        for target in expected:
+            self.assertEqual(actual[target].shape, (2, 16000))
+            torch.testing.assert_close(actual[target], expected[target], rtol=1e-4, atol=1e-5)
+
+    def test_track_reports_phase_timings(self) -> None:
+        with self.session.track() as timings:
+            self.session.estimate(torch.zeros(2, 16000), 16000)
+        self.assertTrue({"resample", "stft", "model", "wiener", "istft"} <= set(timings))
+        self.assertTrue(all(value >= 0.0 for value in timings.values()))
+
+    def test_session_is_prepared_once_per_separator(self) -> None:
+        with patch.object(process_audio, "get_openunmix_separator", return_value=self.separator), patch.object(
+            self.separator, "freeze", wraps=self.separator.freeze
+        ) as freeze, patch.object(process_audio, "_session", None):
+            first = process_audio.get_separation_session()
+            second = process_audio.get_separation_session()
+        self.assertIs(first, second)
+        self.assertEqual(first.separator_rate, MODEL_RATE)
+        freeze.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+# tests สำหรับ spectrogram tiles ของ stem (backend.spectrogram_tiles, backend.services.spectrograms)
+# - ระดับ 0 ที่คำนวณทีละ block ต้องตรงกับ STFT ทั้งไฟล์ (N_FFT / HOP_LENGTH ของ auto_eq_inference, center=True)
+# - ระดับที่หยาบกว่าคือ max ของ 2^L เฟรม x 2^L bin และ tile ตัดจากไฟล์ได้ถูกตำแหน่ง
+# - endpoint สร้างไฟล์ครั้งเดียวต่อ stem (request พร้อมกันไม่คำนวณซ้ำ) และส่ง header cache / 304
+
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import librosa
+import numpy as np
+import soundfile as sf
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.auto_eq_inference import HOP_LENGTH, N_FFT
+from backend.routers import stems
+from backend.services.artifact_registry import ArtifactRegistry, ARTIFACT_STEM
+from backend.services.spectrograms import SpectrogramStore
+from backend.spectrogram_tiles import (
+    SPECTROGRAM_BINS,
+    build_spectrogram_file,
+    read_spectrogram_info,
+    read_spectrogram_tile,
+    spectrogram_path,
+)
+
+SR = 22050
+
+
+def _write_stem(path: str, seconds: float = 2.0) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(int(SR * seconds)) / SR
+    left = 0.9 * np.sin(2 * np.pi * 1000.0 * t) + 0.01 * rng.standard_normal(t.size)
+    right = 0.3 * np.sin(2 * np.pi * 3000.0 * t)
+    stereo = np.stack((left, right), axis=1).astype(np.float32)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sf.write(path, stereo, SR, subtype="FLOAT")
+    return stereo
+
+
+def _reference_level0(stereo: np.ndarray) -> np.ndarray:
+    magnitude = np.abs(librosa.stft(stereo.mean(axis=1), n_fft=N_FFT, hop_length=HOP_LENGTH))[:SPECTROGRAM_BINS]
+    db = 20.0 * np.log10(np.maximum(magnitude / (N_FFT / 4), 1e-10))
+    return np.clip(np.rint((db + 100.0) * 2.55), 0, 255).astype(np.uint8).T
+
+
+def _read_level(path: str, level: int, tile_size: int = 64) -> np.ndarray:
+    entry = read_spectrogram_info(path)["levels"][level]
+    columns = []
+    for x in range(-(-entry["frames"] // tile_size)):
+        rows = [read_spectrogram_tile(path, level, x, y, tile_size) for y in range(-(-entry["bins"] // tile_size))]
+        columns.append(np.concatenate(rows, axis=0))
+    return np.concatenate(columns, axis=1).T
+
+
+class TestSpectrogramFile(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.temp_dir.name, "vocals.wav")
+        self.stereo = _write_stem(self.source)
+        self.target = os.path.join(self.temp_dir.name, "spectrogram", "vocals.spec")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_blockwise_level0_matches_full_stft(self) -> None:
+        build_spectrogram_file(self.source, self.target, levels=3, block_frames=20)
+
+        expected = _reference_level0(self.stereo)
+        actual = _read_level(self.target, 0)
+        self.assertEqual(actual.shape, expected.shape)
+        self.assertLessEqual(int(np.abs(actual.astype(int) - expected.astype(int)).max()), 1)
+        # sine 0.9 (L) + 0.3 (R) เฉลี่ยเป็น mono -> bin ของ 1 kHz ที่ราว -7 dB
+        self.assertAlmostEqual(actual[40, int(round(1000.0 * N_FFT / SR))] / 2.55 - 100.0, -6.9, delta=1.0)
+
+    def test_coarser_levels_are_max_pooled(self) -> None:
+        build_spectrogram_file(self.source, self.target, levels=3, block_frames=20)
+
+        level0 = _read_level(self.target, 0)
+        for level in (1, 2):
+            factor = 1 << level
+            frames = -(-level0.shape[0] // factor)
+            padded = np.pad(level0, ((0, frames * factor - level0.shape[0]), (0, 0)))
+            expected = padded.reshape(frames, factor, SPECTROGRAM_BINS // factor, factor).max(axis=(1, 3))
+            np.testing.assert_array_equal(_read_level(self.target, level), expected)
+
+        info = read_spectrogram_info(self.target)
+        self.assertEqual([entry["bins"] for entry in info["levels"]], [1024, 512, 256])
+        self.assertEqual((info["n_fft"], info["hop_length"], info["sample_rate"]), (N_FFT, HOP_LENGTH, SR))
+
+    def test_tiles_outside_grid_are_rejected(self) -> None:
+        build_spectrogram_file(self.source, self.target, levels=2)
+
+        frames = read_spectrogram_info(self.target)["levels"][0]["frames"]
+        edge = read_spectrogram_tile(self.target, 0, frames // 64, 0, 64)
+        self.assertEqual(edge.shape, (64, frames % 64))
+        for level, x, y in ((2, 0, 0), (0, frames // 64 + 1, 0), (0, 0, 16), (0, -1, 0)):
+            with self.assertRaises(IndexError):
+                read_spectrogram_tile(self.target, level, x, y, 64)
+
+
+class TestSpectrogramEndpoints(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.temp_dir.name, "job-1")
+        source = os.path.join(self.folder, "bass.wav")
+        _write_stem(source, seconds=1.0)
+        self.registry = ArtifactRegistry(os.path.join(self.temp_dir.name, "jobs.sqlite3"))
+        self.registry.record("job-1", source, ARTIFACT_STEM)
+        self.store = SpectrogramStore()
+        self._patches = [
+            patch.object(stems, "artifact_registry", self.registry),
+            patch.object(stems, "spectrograms", self.store),
+            patch.object(main, "spectrograms", self.store),
+        ]
+        for item in self._patches:
+            item.start()
+        self.client = TestClient(main.app)
+
+    def tearDown(self) -> None:
+        for item in reversed(self._patches):
+            item.stop()
+        self.temp_dir.cleanup()
+
+    def test_info_and_tiles_with_cache_headers(self) -> None:
+        info = self.client.get("/separated/job-1/bass/spectrogram")
+        self.assertEqual(info.status_code, 200)
+        body = info.json()
+        self.assertTrue(os.path.exists(spectrogram_path(self.folder, "bass")))
+        self.assertEqual(body["tile_size"], stems.SPECTROGRAM_TILE_SIZE)
+        self.assertEqual(body["levels"][0]["bins"], SPECTROGRAM_BINS)
+        self.assertAlmostEqual(body["levels"][1]["seconds_per_column"], 2 * HOP_LENGTH / SR)
+
+        url = body["tile_url"].format(level=1, x=0, y=0)
+        tile = self.client.get(url)
+        self.assertEqual(tile.status_code, 200)
+        self.assertEqual(tile.headers["content-type"], "application/octet-stream")
+        width, height = int(tile.headers["X-Tile-Width"]), int(tile.headers["X-Tile-Height"])
+        self.assertEqual(width, body["levels"][1]["frames"])
+        self.assertEqual(len(tile.content), width * height)
+        self.assertIn("max-age=", tile.headers["cache-control"])
+
+        cached = self.client.get(url, headers={"If-None-Match": tile.headers["etag"]})
+        self.assertEqual(cached.status_code, 304)
+        self.assertNotEqual(self.client.get(body["tile_url"].format(level=0, x=0, y=1)).headers["etag"], tile.headers["etag"])
+        self.assertEqual(self.client.get(body["tile_url"].format(level=0, x=99, y=0)).status_code, 404)
+
+        metrics = self.client.get("/metrics").json()["spectrograms"]
+        self.assertEqual(metrics["built"], 1)
+        self.assertEqual(metrics["misses"], 1)
+
+    def test_concurrent_requests_build_once(self) -> None:
+        source = os.path.join(self.folder, "bass.wav")
+
+        async def scenario() -> list[str]:
+            return await asyncio.gather(*(self.store.get_spectrogram(source, "bass") for _ in range(4)))
+
+        paths = asyncio.run(scenario())
+        self.assertEqual(set(paths), {spectrogram_path(self.folder, "bass")})
+        self.assertEqual(self.store.built, 1)
+
+    def test_peaks_are_cacheable(self) -> None:
+        response = self.client.get("/separated/job-1/bass/peaks")
+        self.assertIn("immutable", response.headers["cache-control"])
+        self.assertEqual(
+            self.client.get("/separated/job-1/bass/peaks", headers={"If-None-Match": response.headers["etag"]}).status_code,
+            304,
+        )
+
+    def test_unknown_stem_returns_404(self) -> None:
+        self.assertEqual(self.client.get("/separated/job-1/vocals/spectrogram").status_code, 404)
+        self.assertEqual(self.client.get("/separated/job-1/bass/spectrogram/0/0/0x").status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
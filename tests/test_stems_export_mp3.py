@@ -10,7 +10,7 @@ from fastapi.testclient import TestClient
 
 import backend.main as main
 from backend.routers import stems
-from backend.services.job_manager import job_manager
+from backend.services.artifact_registry import ArtifactRegistry, ARTIFACT_STEM
 
 
 def _fake_convert_to_mp3(wav_path: str, remove_source: bool = True) -> str:
@@ -26,7 +26,9 @@ class TestStemsExportKeepsOriginalWav(unittest.TestCase):
         self.client = TestClient(main.app)
         self.temp_dir = tempfile.TemporaryDirectory()
         self.file_id = "test-export-mp3-keep"
-        job_manager.register_job(self.file_id, self.temp_dir.name)
+        self.registry = ArtifactRegistry(os.path.join(self.temp_dir.name, "jobs.sqlite3"))
+        self._registry_patch = patch.object(stems, "artifact_registry", self.registry)
+        self._registry_patch.start()
         # ปิดการเช็คและนับโควตา เพื่อให้เทสไม่ชน quota ตาม IP
         self._quota_patch = patch.object(
             stems, "validate_request_quota", new=lambda *args, **kwargs: None
@@ -40,12 +42,14 @@ class TestStemsExportKeepsOriginalWav(unittest.TestCase):
     def tearDown(self) -> None:
         self._quota_patch.stop()
         self._increment_patch.stop()
-        job_manager._jobs.pop(self.file_id, None)
+        self._registry_patch.stop()
         self.temp_dir.cleanup()
 
     def _write_stem(self, name: str) -> None:
-        with open(os.path.join(self.temp_dir.name, name), "wb") as file:
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "wb") as file:
             file.write(b"RIFF0000WAVEfmt ")
+        self.registry.record(self.file_id, path, ARTIFACT_STEM)
 
     def test_export_stems_mp3_keeps_original_wav_files(self) -> None:
         # regression B3: หลัง export MP3 แล้ว wav ต้นฉบับต้องยังอยู่
@@ -1,14 +1,18 @@
-# regression tests สำหรับ C2: mixdown_stems helper
+# regression tests สำหรับ C2: mixdown_stems helper และ ZIP ของ stems
 # - รวม mono หลายไฟล์, จัดการ mono+stereo ปนกัน, normalize peak, ไฟล์ว่าง -> ValueError
+# - ZIP (สร้างแบบ streaming ด้วย iter_zip_stream) เก็บไฟล์ตาม arcname ที่กำหนด
 
+import io
 import os
 import tempfile
 import unittest
+import zipfile
 
 import numpy as np
 import soundfile as sf
 
-from backend.routers.stems import mixdown_stems, create_zip_archive
+from backend.routers.stems import mixdown_stems
+from backend.services.zip_stream import iter_zip_stream
 
 
 def _write_tone(path: str, amplitude: float, stereo: bool = False) -> None:
@@ -54,18 +58,16 @@ class TestMixdownStems(unittest.TestCase):
             mixdown_stems([])
 
 
-class TestCreateZipArchive(unittest.TestCase):
-    def test_creates_zip_with_arcnames(self) -> None:
+class TestStemZipStream(unittest.TestCase):
+    def test_zip_stream_uses_arcnames(self) -> None:
         with tempfile.TemporaryDirectory() as temp_dir:
             src = os.path.join(temp_dir, "song.wav")
             with open(src, "wb") as f:
                 f.write(b"wavdata")
-            zip_path = os.path.join(temp_dir, "out.zip")
 
-            create_zip_archive(zip_path, [(src, "nested/song.wav")])
+            data = b"".join(iter_zip_stream([(src, "nested/song.wav")]))
 
-            import zipfile
-            with zipfile.ZipFile(zip_path) as zf:
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
                 self.assertIn("nested/song.wav", zf.namelist())
                 self.assertEqual(zf.read("nested/song.wav"), b"wavdata")
 
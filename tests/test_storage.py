@@ -6,7 +6,6 @@ import io
 import os
 import tempfile
 import unittest
-from unittest.mock import MagicMock, patch
 
 import torch
 import torchaudio
@@ -61,14 +60,14 @@ class TestSaveUploadTrimValidation(unittest.TestCase):
         self.assertEqual(ctx.exception.status_code, 400)
 
     def test_valid_trim_truncates_file(self) -> None:
-        _, input_path = self._run_save(trim_start=0.5, trim_end=1.5)
+        _, input_path, _ = self._run_save(trim_start=0.5, trim_end=1.5)
         self.assertTrue(os.path.exists(input_path))
         data, sr = torchaudio.load(input_path)
         duration = data.shape[-1] / sr
         self.assertAlmostEqual(duration, 1.0, delta=0.01)
 
     def test_no_trim_keeps_full_length(self) -> None:
-        _, input_path = self._run_save()
+        _, input_path, _ = self._run_save()
         data, sr = torchaudio.load(input_path)
         self.assertAlmostEqual(data.shape[-1] / sr, 2.0, delta=0.01)
 
@@ -81,25 +80,17 @@ class TestSaveUploadTrimValidation(unittest.TestCase):
 
 
 class TestConvertToMp3(unittest.TestCase):
-    def _make_segment(self) -> MagicMock:
-        segment = MagicMock()
-
-        def fake_export(mp3_path: str, *args, **kwargs) -> bool:
-            with open(mp3_path, "wb") as file:
-                file.write(b"mp3data")
-            return True
-
-        segment.export = fake_export
-        return segment
+    def _write_wav(self, temp_dir: str) -> str:
+        wav_path = os.path.join(temp_dir, "song.wav")
+        with open(wav_path, "wb") as file:
+            file.write(_make_wav_bytes(seconds=0.5))
+        return wav_path
 
     def test_success_removes_source_by_default(self) -> None:
         with tempfile.TemporaryDirectory() as temp_dir:
-            wav_path = os.path.join(temp_dir, "song.wav")
-            with open(wav_path, "wb") as file:
-                file.write(b"wavdata")
+            wav_path = self._write_wav(temp_dir)
 
-            with patch("pydub.AudioSegment.from_wav", return_value=self._make_segment()):
-                out_path = convert_to_mp3(wav_path)
+            out_path = convert_to_mp3(wav_path)
 
             self.assertEqual(out_path, os.path.join(temp_dir, "song.mp3"))
             self.assertTrue(os.path.exists(out_path))
@@ -108,12 +99,9 @@ class TestConvertToMp3(unittest.TestCase):
     def test_success_keeps_source_when_remove_source_false(self) -> None:
         # regression B3: stem ต้นฉบับต้องไม่ถูกลบ
         with tempfile.TemporaryDirectory() as temp_dir:
-            wav_path = os.path.join(temp_dir, "song.wav")
-            with open(wav_path, "wb") as file:
-                file.write(b"wavdata")
+            wav_path = self._write_wav(temp_dir)
 
-            with patch("pydub.AudioSegment.from_wav", return_value=self._make_segment()):
-                out_path = convert_to_mp3(wav_path, remove_source=False)
+            out_path = convert_to_mp3(wav_path, remove_source=False)
 
             self.assertTrue(os.path.exists(out_path))
             self.assertTrue(os.path.exists(wav_path))
@@ -125,11 +113,11 @@ class TestConvertToMp3(unittest.TestCase):
             with open(wav_path, "wb") as file:
                 file.write(b"wavdata")
 
-            with patch("pydub.AudioSegment.from_wav", side_effect=Exception("corrupt wav")):
-                with self.assertRaises(RuntimeError):
-                    convert_to_mp3(wav_path)
+            with self.assertRaises(RuntimeError):
+                convert_to_mp3(wav_path)
 
             self.assertTrue(os.path.exists(wav_path))
+            self.assertFalse(os.path.exists(os.path.join(temp_dir, "song.mp3")))
 
 
 if __name__ == "__main__":
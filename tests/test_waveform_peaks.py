@@ -0,0 +1,125 @@
+# tests สำหรับ waveform peaks แบบหลายระดับ (backend.waveform_peaks) และ endpoint /separated/{file_id}/{stem}/peaks
+# - ผลจากการส่งทีละ block ต้องเท่ากับการคำนวณทั้งสัญญาณ และแต่ละระดับต้องตรงกับ min/max ของ sample จริง
+# - อ่านระดับที่ขอจากไฟล์ได้ถูกต้อง และ endpoint สร้าง peaks จาก WAV เมื่อยังไม่มีไฟล์
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.routers import stems
+from backend.services.artifact_registry import ArtifactRegistry, ARTIFACT_STEM
+from backend.waveform_peaks import PeakPyramidBuilder, build_peaks_file, peaks_path, read_peaks_level
+
+SR = 8000
+LEVELS = (4, 16, 64)
+
+
+def _expected_level(signal: np.ndarray, samples_per_peak: int) -> np.ndarray:
+    """min/max ต่อ bin แบบตรงไปตรงมา (วนทีละ bin) สำหรับเทียบผล"""
+    mono_low, mono_high = signal.min(axis=1), signal.max(axis=1)
+    data = []
+    for start in range(0, len(signal), samples_per_peak):
+        data.append(np.floor(mono_low[start : start + samples_per_peak].min() * 127.0))
+        data.append(np.ceil(mono_high[start : start + samples_per_peak].max() * 127.0))
+    return np.clip(np.array(data), -128, 127).astype(np.int8)
+
+
+class TestPeakPyramid(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.signal = np.clip(rng.standard_normal((1001, 2)) * 0.4, -1.0, 1.0).astype(np.float32)
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_blockwise_matches_reference_at_every_level(self) -> None:
+        builder = PeakPyramidBuilder(SR, LEVELS)
+        for start in range(0, len(self.signal), 37):
+            builder.add(self.signal[start : start + 37])
+
+        pyramid = builder.finish()
+        self.assertEqual(builder.frames, 1001)
+        self.assertEqual([samples for samples, _ in pyramid], list(LEVELS))
+        for samples_per_peak, data in pyramid:
+            np.testing.assert_array_equal(data, _expected_level(self.signal, samples_per_peak))
+
+    def test_write_and_read_each_level(self) -> None:
+        builder = PeakPyramidBuilder(SR, LEVELS)
+        builder.add(self.signal)
+        path = builder.write(os.path.join(self.temp_dir.name, "peaks", "vocals.peaks"))
+
+        coarsest = read_peaks_level(path)
+        self.assertEqual((coarsest["level"], coarsest["samples_per_peak"]), (2, 64))
+        self.assertEqual(coarsest["levels"], list(LEVELS))
+        self.assertEqual((coarsest["sample_rate"], coarsest["frames"]), (SR, 1001))
+        np.testing.assert_array_equal(read_peaks_level(path, 1)["data"], _expected_level(self.signal, 16))
+        with self.assertRaises(IndexError):
+            read_peaks_level(path, 3)
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["vocals.peaks"])
+
+    def test_build_from_file_matches_builder(self) -> None:
+        source = os.path.join(self.temp_dir.name, "vocals.wav")
+        sf.write(source, self.signal, SR, subtype="FLOAT")
+
+        path = build_peaks_file(source, os.path.join(self.temp_dir.name, "vocals.peaks"), LEVELS, block_frames=100)
+
+        np.testing.assert_array_equal(read_peaks_level(path, 0)["data"], _expected_level(self.signal, 4))
+
+    def test_levels_must_divide_each_other(self) -> None:
+        with self.assertRaises(ValueError):
+            PeakPyramidBuilder(SR, (4, 10))
+        with self.assertRaises(ValueError):
+            PeakPyramidBuilder(SR, ())
+
+
+class TestPeaksEndpoint(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.temp_dir.name, "job-1")
+        os.makedirs(self.folder)
+        t = np.arange(SR) / SR
+        tone = (0.5 * np.sin(2 * np.pi * 3.0 * t)).astype(np.float32)
+        self.source = os.path.join(self.folder, "vocals.wav")
+        sf.write(self.source, np.stack((tone, tone), axis=1), SR, subtype="FLOAT")
+        self.registry = ArtifactRegistry(os.path.join(self.temp_dir.name, "jobs.sqlite3"))
+        self.registry.record("job-1", self.source, ARTIFACT_STEM)
+        self._patch = patch.object(stems, "artifact_registry", self.registry)
+        self._patch.start()
+        self.client = TestClient(main.app)
+
+    def tearDown(self) -> None:
+        self._patch.stop()
+        self.temp_dir.cleanup()
+
+    def test_builds_missing_peaks_then_serves_requested_level(self) -> None:
+        response = self.client.get("/separated/job-1/vocals/peaks")
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(os.path.exists(peaks_path(self.folder, "vocals")))
+        self.assertEqual(body["bits"], 8)
+        self.assertEqual(body["samples_per_pixel"], body["levels"][-1])
+        self.assertEqual(body["length"] * 2, len(body["data"]))
+        self.assertAlmostEqual(body["duration"], 1.0)
+        self.assertLessEqual(min(body["data"]), -63)
+        self.assertGreaterEqual(max(body["data"]), 63)
+
+        finest = self.client.get("/separated/job-1/vocals/peaks", params={"level": 0}).json()
+        self.assertEqual(finest["level"], 0)
+        self.assertGreater(finest["length"], body["length"])
+        self.assertEqual(self.client.get("/separated/job-1/vocals/peaks", params={"level": 99}).status_code, 400)
+
+    def test_unknown_stem_returns_404(self) -> None:
+        self.assertEqual(self.client.get("/separated/job-1/drums/peaks").status_code, 404)
+        self.assertEqual(self.client.get("/separated/job-2/vocals/peaks").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+# tests สำหรับ ZIP แบบ streaming (backend.services.zip_stream) และ endpoint ที่ใช้
+# - archive ต้องเปิดได้ด้วย zipfile (CRC ถูกต้อง, entry แบบ stored, ชื่อ UTF-8) และขนาดตรงกับ zip_stream_size
+# - /download/{file_id} ส่ง stems ของงานที่เสร็จแล้วเป็น ZIP โดยไม่เขียน archive ลงดิสก์
+# - export แบบหลาย stem คืน URL ของ ZIP แบบ streaming
+
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.routers import stems
+from backend.services.artifact_registry import ArtifactRegistry, ARTIFACT_VOCAL_POLISH
+from backend.services.zip_stream import iter_zip_stream, zip_stream_size
+
+
+class TestZipStream(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.entries = []
+        for name, payload in (("vocals.wav", os.urandom(300_000)), ("drums.mp3", b"")):
+            path = os.path.join(self.temp_dir.name, name)
+            with open(path, "wb") as handle:
+                handle.write(payload)
+            self.entries.append((path, name))
+        self.entries.append((self.entries[0][0], "โฟลเดอร์/เสียงร้อง.wav"))
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_archive_is_readable_and_size_is_known_up_front(self) -> None:
+        data = b"".join(iter_zip_stream(self.entries, chunk_size=65536))
+
+        self.assertEqual(len(data), zip_stream_size(self.entries))
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), ["vocals.wav", "drums.mp3", "โฟลเดอร์/เสียงร้อง.wav"])
+            self.assertEqual({info.compress_type for info in archive.infolist()}, {zipfile.ZIP_STORED})
+            with open(self.entries[0][0], "rb") as handle:
+                self.assertEqual(archive.read("โฟลเดอร์/เสียงร้อง.wav"), handle.read())
+
+    def test_first_chunk_is_sent_before_files_are_read(self) -> None:
+        stream = iter_zip_stream(self.entries)
+        first = next(stream)
+
+        self.assertTrue(first.startswith(b"PK\x03\x04"))
+        self.assertTrue(first.endswith(b"vocals.wav"))
+
+
+class TestZipEndpoints(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.registry = ArtifactRegistry(os.path.join(self.temp_dir.name, "jobs.sqlite3"))
+        self.folder = os.path.join(self.temp_dir.name, "separated", "job-1")
+        os.makedirs(self.folder)
+        for name in ("vocals.wav", "drums.wav", "vocals.mp3", "drums.mp3", "vocals_polished.wav", "mixed_custom.wav"):
+            with open(os.path.join(self.folder, name), "wb") as handle:
+                handle.write(name.encode())
+        self._patches = [patch.object(stems, "artifact_registry", self.registry)]
+        for item in self._patches:
+            item.start()
+        self.client = TestClient(main.app)
+
+    def tearDown(self) -> None:
+        for item in reversed(self._patches):
+            item.stop()
+        self.temp_dir.cleanup()
+
+    def _complete_separation(self) -> None:
+        stems.record_separation_output("job-1", self.folder)
+        self.registry.record("job-1", os.path.join(self.folder, "vocals_polished.wav"), ARTIFACT_VOCAL_POLISH)
+
+    def test_download_streams_stems_of_completed_job(self) -> None:
+        self._complete_separation()
+        before = set(os.listdir(self.temp_dir.name))
+
+        response = self.client.get("/download/job-1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/zip")
+        self.assertEqual(int(response.headers["content-length"]), len(response.content))
+        self.assertIn("separated.zip", response.headers["content-disposition"])
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            self.assertEqual(sorted(archive.namelist()), ["drums.mp3", "drums.wav", "vocals.mp3", "vocals.wav"])
+            self.assertEqual(archive.read("vocals.wav"), b"vocals.wav")
+        self.assertEqual(set(os.listdir(self.temp_dir.name)), before)
+
+    def test_download_is_not_served_before_stems_are_recorded(self) -> None:
+        response = self.client.get("/download/job-1")
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_stems_returns_streaming_zip_url(self) -> None:
+        def fake_convert(wav_path: str, remove_source: bool = True) -> str:
+            mp3_path = wav_path[:-4] + ".mp3"
+            with open(mp3_path, "wb") as handle:
+                handle.write(os.path.basename(mp3_path).encode())
+            return mp3_path
+
+        self._complete_separation()
+        with patch.object(stems, "convert_to_mp3", side_effect=fake_convert):
+            response = self.client.post(
+                "/api/process/export",
+                params={"file_id": "job-1", "export_type": "stems", "export_format": "mp3", "stems": ["vocals", "drums"]},
+            )
+
+        body = response.json()
+        self.assertEqual(body["type"], "zip")
+        self.assertFalse(any(name.endswith(".zip") for name in os.listdir(self.folder)))
+
+        archive_response = self.client.get(body["file_url"])
+        self.assertEqual(archive_response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(archive_response.content)) as archive:
+            self.assertEqual(archive.namelist(), ["vocals.mp3", "drums.mp3"])
+            # vocals ใช้เวอร์ชัน polished ถ้ามี
+            self.assertEqual(archive.read("vocals.mp3"), b"vocals_polished.mp3")
+
+    def test_export_zip_requires_exported_files(self) -> None:
+        self._complete_separation()
+        os.remove(os.path.join(self.folder, "drums.mp3"))
+
+        response = self.client.get(
+            "/api/process/export/job-1/stems.zip", params={"export_format": "mp3", "stems": ["drums"]}
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()